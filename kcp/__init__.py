@@ -6,12 +6,24 @@ from kcp.nodes.keyframe_promote import KCP_KeyframePromoteToAsset
 from kcp.nodes.keyframe_set_item_load import KCP_KeyframeSetItemLoad
 from kcp.nodes.keyframe_set_item_pick import KCP_KeyframeSetItemPick
 from kcp.nodes.keyframe_set_load_batch import KCP_KeyframeSetLoadBatch
+from kcp.nodes.keyframe_set_load_stacked import KCP_KeyframeSetLoadStacked
+from kcp.nodes.keyframe_set_contact_sheet import KCP_SetContactSheet
+from kcp.nodes.keyframe_set_dedupe import KCP_SetDedupe
+from kcp.nodes.keyframe_set_retention import KCP_SetRetention
+from kcp.nodes.keyframe_set_tiering import KCP_SetTiering
+from kcp.nodes.keyframe_set_export import KCP_SetExport
+from kcp.nodes.keyframe_set_claim import KCP_ClaimNextItem
+from kcp.nodes.keyframe_set_sidecar_cache import KCP_KeyframeSetSidecarCache
 from kcp.nodes.keyframe_set_summary import KCP_KeyframeSetSummary
 from kcp.nodes.render_pack_status import KCP_RenderPackStatus
 from kcp.nodes.keyframe_set_item_save_image import KCP_KeyframeSetItemSaveImage
 from kcp.nodes.keyframe_set_item_save_batch import KCP_KeyframeSetItemSaveBatch
 from kcp.nodes.project_init import KCP_ProjectInit
 from kcp.nodes.project_status import KCP_ProjectStatus
+from kcp.nodes.project_integrity_scan import KCP_ProjectIntegrityScan
+from kcp.nodes.project_dashboard import KCP_ProjectDashboard
+from kcp.nodes.project_transfer import KCP_ProjectExport, KCP_ProjectImport
+from kcp.nodes.project_sync import KCP_SyncExport, KCP_SyncImport
 from kcp.nodes.prompt_compose import KCP_PromptCompose
 from kcp.nodes.character_forge import KCP_CharacterForge
 from kcp.nodes.environment_forge import KCP_EnvironmentForge
@@ -33,6 +45,12 @@ NODE_CLASS_MAPPINGS = {
     "KCP_VariantPick": KCP_VariantPick,
     "KCP_VariantUnroll": KCP_VariantUnroll,
     "KCP_ProjectStatus": KCP_ProjectStatus,
+    "KCP_ProjectIntegrityScan": KCP_ProjectIntegrityScan,
+    "KCP_ProjectDashboard": KCP_ProjectDashboard,
+    "KCP_ProjectExport": KCP_ProjectExport,
+    "KCP_ProjectImport": KCP_ProjectImport,
+    "KCP_SyncExport": KCP_SyncExport,
+    "KCP_SyncImport": KCP_SyncImport,
     "KCP_KeyframeSetSave": KCP_KeyframeSetSave,
     "KCP_KeyframeSetMarkPicked": KCP_KeyframeSetMarkPicked,
     "KCP_KeyframeSetPick": KCP_KeyframeSetPick,
@@ -41,6 +59,14 @@ NODE_CLASS_MAPPINGS = {
     "KCP_KeyframeSetItemLoad": KCP_KeyframeSetItemLoad,
     "KCP_KeyframeSetItemPick": KCP_KeyframeSetItemPick,
     "KCP_KeyframeSetLoadBatch": KCP_KeyframeSetLoadBatch,
+    "KCP_KeyframeSetLoadStacked": KCP_KeyframeSetLoadStacked,
+    "KCP_KeyframeSetSidecarCache": KCP_KeyframeSetSidecarCache,
+    "KCP_SetContactSheet": KCP_SetContactSheet,
+    "KCP_SetDedupe": KCP_SetDedupe,
+    "KCP_SetRetention": KCP_SetRetention,
+    "KCP_SetTiering": KCP_SetTiering,
+    "KCP_SetExport": KCP_SetExport,
+    "KCP_ClaimNextItem": KCP_ClaimNextItem,
     "KCP_KeyframeSetSummary": KCP_KeyframeSetSummary,
     "KCP_RenderPackStatus": KCP_RenderPackStatus,
     "KCP_KeyframePromoteToAsset": KCP_KeyframePromoteToAsset,
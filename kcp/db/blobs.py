@@ -0,0 +1,299 @@
+from __future__ import annotations
+
+import os
+import shutil
+import sqlite3
+from contextlib import nullcontext
+from pathlib import Path
+
+from kcp.db.repo import get_meta, media_housekeeping, set_meta
+from kcp.util.hashing import sha256_file
+from kcp.util.time_utils import now_ms
+
+
+BLOBS_DIRNAME = "blobs"
+META_BLOB_STORE = "blob_store"
+# Store files without a row are only collected once older than this: an ingest moves the file in before its row commits.
+_GC_GRACE_MS = 60 * 60 * 1000
+
+
+def blob_store_enabled(conn: sqlite3.Connection) -> bool:
+    return get_meta(conn, META_BLOB_STORE, "0") == "1"
+
+
+def set_blob_store_enabled(conn: sqlite3.Connection, enabled: bool) -> None:
+    set_meta(conn, META_BLOB_STORE, "1" if enabled else "0")
+
+
+def blob_rel_path(sha256: str) -> str:
+    sha = str(sha256).strip().lower()
+    if len(sha) != 64:
+        raise ValueError(f"invalid sha256: {sha256}")
+    return f"{BLOBS_DIRNAME}/{sha[:2]}/{sha[2:4]}/{sha}"
+
+
+def is_blob_ref(rel: str | None) -> bool:
+    return bool(rel) and str(rel).replace("\\", "/").startswith(f"{BLOBS_DIRNAME}/")
+
+
+def blob_sha_from_ref(rel: str) -> str:
+    return str(rel).replace("\\", "/").rsplit("/", 1)[-1]
+
+
+def _bump_ref(conn: sqlite3.Connection, sha256: str, size_bytes: int) -> None:
+    ts = now_ms()
+    conn.execute(
+        """
+        INSERT INTO media_blobs (sha256, size_bytes, ref_count, created_at, updated_at)
+        VALUES (?, ?, 1, ?, ?)
+        ON CONFLICT(sha256) DO UPDATE SET
+          ref_count = ref_count + 1,
+          updated_at = excluded.updated_at
+        """,
+        (sha256, int(size_bytes), ts, ts),
+    )
+
+
+def add_ref(conn: sqlite3.Connection, root: Path, rel: str) -> None:
+    """Record one more DB reference to an existing blob (no-op for non-blob paths)."""
+    if not is_blob_ref(rel):
+        return
+    blob_abs = root / rel
+    size = blob_abs.stat().st_size if blob_abs.exists() else 0
+    _bump_ref(conn, blob_sha_from_ref(rel), size)
+
+
+def release_ref(conn: sqlite3.Connection, rel: str | None) -> None:
+    """Drop one DB reference to a blob.
+
+    Unreferenced blobs are left on disk (ref_count=0) until `gc_blobs` runs;
+    nothing is deleted here.
+    """
+    if not is_blob_ref(rel):
+        return
+    conn.execute(
+        "UPDATE media_blobs SET ref_count = MAX(ref_count - 1, 0), updated_at = ? WHERE sha256 = ?",
+        (now_ms(), blob_sha_from_ref(str(rel))),
+    )
+
+
+def ingest_file(
+    conn: sqlite3.Connection, root: Path, src: Path, sha256: str | None = None, pending: dict | None = None
+) -> tuple[str, bool]:
+    """Move `src` into the content-addressed store and take one reference.
+
+    Returns `(blob_rel, deduped)`; `deduped=True` means identical bytes were
+    already stored and `src` was removed instead of moved. Does not commit.
+
+    Without `pending`, `src` must be a freshly written file that no committed
+    row points at. With `pending` (see `new_pending_ingest`), `src` is linked or copied into
+    the store instead and only removed by `finish_ingest` after the caller's
+    commit, so a rollback never leaves rows pointing at moved files.
+    """
+    digest = sha256 or sha256_file(src)
+    rel = blob_rel_path(digest)
+    dst = root / rel
+    size = src.stat().st_size
+    deduped = dst.exists()
+    if pending is not None:
+        if not deduped:
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            tmp = dst.with_name(dst.name + ".tmp")
+            try:
+                os.link(src, tmp)
+            except OSError:
+                shutil.copyfile(src, tmp)
+            os.replace(tmp, dst)
+            pending["written"].append(dst)
+        pending["sources"].append(src)
+        _bump_ref(conn, digest, size)
+        return rel, deduped
+    if deduped:
+        src.unlink()
+    else:
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(src, dst)
+    try:
+        src.parent.rmdir()
+    except OSError:
+        pass
+    _bump_ref(conn, digest, size)
+    return rel, deduped
+
+
+def new_pending_ingest() -> dict:
+    return {"written": [], "sources": []}
+
+
+def finish_ingest(pending: dict) -> None:
+    """After the commit: remove the loose sources of a deferred ingest."""
+    for src in pending["sources"]:
+        try:
+            src.unlink()
+        except FileNotFoundError:
+            continue
+        try:
+            src.parent.rmdir()
+        except OSError:
+            pass
+    pending["sources"].clear()
+    pending["written"].clear()
+
+
+def discard_ingest(pending: dict) -> None:
+    """After a rollback: remove the blobs a deferred ingest created; sources stay untouched."""
+    for dst in pending["written"]:
+        try:
+            dst.unlink()
+        except FileNotFoundError:
+            pass
+    pending["sources"].clear()
+    pending["written"].clear()
+
+
+def ingest_media_pair(
+    conn: sqlite3.Connection,
+    root: Path,
+    image_abs: Path,
+    thumb_abs: Path | None,
+    previous: tuple[str | None, str | None] = ("", ""),
+    image_sha256: str | None = None,
+    pending: dict | None = None,
+) -> tuple[str, str]:
+    """Write-through helper for save/promote nodes.
+
+    Ingests the freshly written image (and thumb, when one was generated),
+    then releases the references held by the row's previous media paths.
+    When `thumb_abs` is None the thumb shares the image blob. Pass `pending`
+    and call `finish_ingest` after the commit, or `discard_ingest` after a
+    rollback.
+    """
+    image_rel, _ = ingest_file(conn, root, image_abs, sha256=image_sha256, pending=pending)
+    if thumb_abs is not None and thumb_abs.exists():
+        thumb_rel, _ = ingest_file(conn, root, thumb_abs, pending=pending)
+    else:
+        add_ref(conn, root, image_rel)
+        thumb_rel = image_rel
+    for old in previous:
+        release_ref(conn, old)
+    return image_rel, thumb_rel
+
+
+def convert_project(conn: sqlite3.Connection, root: Path, dry_run: bool = False) -> dict:
+    """Convert an existing project in place to blob references.
+
+    Walks asset and set item media columns, moves each referenced file into
+    `blobs/`, drops byte-identical duplicates and rewrites the DB paths.
+    Blobs are created before the commit, and loose files are removed only
+    after it. A failed run removes the new blobs and leaves every loose file
+    in place.
+    """
+    report = {
+        "dry_run": bool(dry_run),
+        "files_seen": 0,
+        "files_converted": 0,
+        "duplicates_removed": 0,
+        "bytes_reclaimed": 0,
+        "missing": [],
+    }
+    converted: dict[str, str] = {}
+    # Bytes already in the store count as duplicates in a dry run too.
+    seen_digests: set[str] = {r[0] for r in conn.execute("SELECT sha256 FROM media_blobs").fetchall()}
+    pending = new_pending_ingest()
+
+    def convert(rel: str | None) -> str | None:
+        if not rel or is_blob_ref(rel):
+            return rel
+        key = str(rel).replace("\\", "/")
+        if key in converted:
+            if not dry_run:
+                add_ref(conn, root, converted[key])
+            return converted[key]
+        src = root / rel
+        if not src.exists():
+            report["missing"].append(key)
+            return rel
+        report["files_seen"] += 1
+        digest = sha256_file(src)
+        size = src.stat().st_size
+        if digest in seen_digests:
+            report["duplicates_removed"] += 1
+            report["bytes_reclaimed"] += size
+        seen_digests.add(digest)
+        if dry_run:
+            converted[key] = blob_rel_path(digest)
+        else:
+            converted[key], _ = ingest_file(conn, root, src, sha256=digest, pending=pending)
+            report["files_converted"] += 1
+        return converted[key]
+
+    try:
+        with nullcontext() if dry_run else media_housekeeping(conn):
+            for row in conn.execute("SELECT id, image_path, thumb_path FROM assets").fetchall():
+                image_rel = convert(row["image_path"])
+                thumb_rel = convert(row["thumb_path"])
+                if not dry_run and (image_rel, thumb_rel) != (row["image_path"], row["thumb_path"]):
+                    conn.execute("UPDATE assets SET image_path=?, thumb_path=? WHERE id=?", (image_rel, thumb_rel, row["id"]))
+            for row in conn.execute("SELECT id, image_path, thumb_path FROM keyframe_set_items").fetchall():
+                image_rel = convert(row["image_path"])
+                thumb_rel = convert(row["thumb_path"])
+                if not dry_run and (image_rel, thumb_rel) != (row["image_path"], row["thumb_path"]):
+                    conn.execute("UPDATE keyframe_set_items SET image_path=?, thumb_path=? WHERE id=?", (image_rel, thumb_rel, row["id"]))
+        if not dry_run:
+            set_meta(conn, META_BLOB_STORE, "1", commit=False)
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        discard_ingest(pending)
+        raise
+    finish_ingest(pending)
+    return report
+
+
+def gc_blobs(conn: sqlite3.Connection, root: Path, dry_run: bool = True) -> dict:
+    """Delete blobs no row references any more.
+
+    Rows at ref_count=0 are deleted in one transaction, and their files only
+    after it commits. Files under `blobs/` with no row at all (left by an
+    interrupted ingest) are deleted once older than `_GC_GRACE_MS`.
+    """
+    if not dry_run:
+        conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+    try:
+        dead = conn.execute("SELECT sha256, size_bytes FROM media_blobs WHERE ref_count = 0").fetchall()
+        known = {row[0] for row in conn.execute("SELECT sha256 FROM media_blobs WHERE ref_count > 0")}
+        known.update(row["sha256"] for row in dead)
+        cutoff_ns = (now_ms() - _GC_GRACE_MS) * 1_000_000
+        strays: list[tuple[Path, int]] = []
+        for dirpath, _, names in os.walk(root / BLOBS_DIRNAME):
+            for name in names:
+                if name in known:
+                    continue
+                st = os.stat(os.path.join(dirpath, name))
+                if st.st_mtime_ns < cutoff_ns:
+                    strays.append((Path(dirpath) / name, st.st_size))
+        report = {
+            "dry_run": bool(dry_run),
+            "blobs_deleted": len(dead),
+            "stray_files_deleted": len(strays),
+            "bytes_freed": sum(int(row["size_bytes"]) for row in dead) + sum(size for _, size in strays),
+        }
+        if dry_run:
+            return report
+        conn.executemany("DELETE FROM media_blobs WHERE sha256 = ? AND ref_count = 0", [(row["sha256"],) for row in dead])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    for path in [root / blob_rel_path(row["sha256"]) for row in dead] + [path for path, _ in strays]:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            continue
+        for parent in (path.parent, path.parent.parent):
+            try:
+                parent.rmdir()
+            except OSError:
+                break
+    return report
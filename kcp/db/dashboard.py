@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from kcp.db.repo import connect
+
+
+DEFAULT_DAYS = 30
+DEFAULT_TOP_N = 10
+
+_cache_lock = threading.Lock()
+# db path -> (reader connection, data_version when computed, {(days, top_n): dashboard})
+_cache: dict[str, tuple[sqlite3.Connection, int, dict]] = {}
+
+
+def _counters(conn: sqlite3.Connection, scope: str, order: str = "key", limit: int = -1) -> list[sqlite3.Row]:
+    return conn.execute(
+        f"SELECT key, n, picked, bytes FROM project_counters WHERE scope = ? AND n > 0 ORDER BY {order} LIMIT ?", (scope, int(limit))
+    ).fetchall()
+
+
+def _items(conn: sqlite3.Connection) -> dict:
+    by_tier: dict[str, int] = {"loose": 0, "blob": 0, "pack": 0, "archive": 0}
+    by_retention: dict[str, int] = {}
+    total = none = 0
+    for row in _counters(conn, "items"):
+        tier, retention = row["key"].split("|", 1)
+        n = int(row["n"])
+        total += n
+        if tier == "none":
+            none += n
+        else:
+            by_tier[tier] = by_tier.get(tier, 0) + n
+        if retention:
+            by_retention[retention] = by_retention.get(retention, 0) + n
+    return {
+        "total": total,
+        "with_media": total - none,
+        "without_media": none,
+        "hot": total - none - by_tier["archive"],
+        "cold": by_tier["archive"],
+        "by_storage": by_tier,
+        "retired": by_retention.get("deleted", 0),
+        "downscaled": by_retention.get("downscaled", 0),
+    }
+
+
+def _recorded_bytes(conn: sqlite3.Connection) -> dict:
+    """Byte totals the DB records: blob sizes, pack entry lengths and archive members.
+
+    These are not disk usage: loose files carry no size in the DB and are not
+    counted. `KCP_SetTiering action=stats` walks the tree for those.
+    """
+    media = {row["key"]: (int(row["n"]), int(row["bytes"])) for row in _counters(conn, "media")}
+    blob, pack = media.get("blob", (0, 0)), media.get("pack", (0, 0))
+    archive, compressed = media.get("archive", (0, 0)), media.get("archive_compressed", (0, 0))
+    return {
+        "hot": {"blob_files": blob[0], "blob_bytes": blob[1], "pack_entries": pack[0], "pack_bytes": pack[1]},
+        "cold": {"archive_members": archive[0], "bytes": archive[1], "compressed_bytes": compressed[1]},
+    }
+
+
+def compute_dashboard(conn: sqlite3.Connection, days: int = DEFAULT_DAYS, top_n: int = DEFAULT_TOP_N) -> dict:
+    """Production counters for the whole project.
+
+    Set and item numbers come from `project_counters` (schema v9), which
+    triggers keep rolled up per tier, day, stack and policy, so the cost does
+    not grow with the item count. Assets are few and are grouped directly.
+    `sets.per_day` covers the last `days` days that had sets (UTC dates);
+    `top_stacks` / `top_policies` rank by set count and keep `top_n` rows.
+    """
+    started = time.perf_counter()
+    assets = {}
+    for row in conn.execute("SELECT type, COUNT(*) AS n, COALESCE(SUM(is_archived), 0) AS archived FROM assets GROUP BY type ORDER BY type"):
+        assets[row["type"]] = {"total": int(row["n"]), "archived": int(row["archived"])}
+    promoted = conn.execute(
+        "SELECT COUNT(*) FROM assets WHERE type = 'keyframe' AND json_extract(json_fields, '$.source.set_id') IS NOT NULL"
+    ).fetchone()[0]
+
+    sets = conn.execute(
+        "SELECT COALESCE(SUM(n), 0) AS n, COALESCE(SUM(picked), 0) AS picked FROM project_counters WHERE scope = 'sets_stack'"
+    ).fetchone()
+    per_day = [{"date": row["key"], "sets": int(row["n"]), "picked": int(row["picked"])} for row in _counters(conn, "sets_day", "key DESC", days)]
+    top_stacks = [
+        {"stack_id": row["key"], "name": row["name"] or "", "sets": int(row["n"]), "picked": int(row["picked"])}
+        for row in conn.execute(
+            "SELECT c.key, c.n, c.picked, st.name FROM project_counters c LEFT JOIN stacks st ON st.id = c.key "
+            "WHERE c.scope = 'sets_stack' AND c.n > 0 ORDER BY c.n DESC, c.key LIMIT ?",
+            (int(top_n),),
+        )
+    ]
+    top_policies = [
+        {"variant_policy_id": row["key"], "sets": int(row["n"]), "picked": int(row["picked"])}
+        for row in _counters(conn, "sets_policy", "n DESC, key", top_n)
+    ]
+    n_sets, picked = int(sets["n"]), int(sets["picked"])
+    return {
+        "assets": {"by_type": assets, "promoted_keyframes": int(promoted)},
+        "sets": {
+            "total": n_sets,
+            "picked": picked,
+            "picked_rate": round(picked / n_sets, 4) if n_sets else 0.0,
+            "per_day": per_day,
+        },
+        "items": _items(conn),
+        "recorded_bytes": _recorded_bytes(conn),
+        "top_stacks": top_stacks,
+        "top_policies": top_policies,
+        "computed_ms": round((time.perf_counter() - started) * 1000.0, 1),
+    }
+
+
+def project_dashboard(db_path: Path, days: int = DEFAULT_DAYS, top_n: int = DEFAULT_TOP_N) -> dict:
+    """`compute_dashboard` behind a per-database cache invalidated by `PRAGMA data_version`.
+
+    One reader connection per database stays open; its `data_version` changes
+    whenever any other connection commits, so an unchanged project is answered
+    from memory. The result carries `cached` to tell the two apart.
+    """
+    key = str(Path(db_path).resolve())
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is None:
+            conn = connect(Path(db_path))
+            conn.close()
+            # Already migrated above; the long-lived reader only ever reads.
+            conn = sqlite3.connect(key, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            entry = (conn, -1, {})
+        conn, version, results = entry
+        current = int(conn.execute("PRAGMA data_version").fetchone()[0])
+        if current != version:
+            results = {}
+        params = (int(days), int(top_n))
+        cached = params in results
+        if not cached:
+            results[params] = compute_dashboard(conn, *params)
+        _cache[key] = (conn, current, results)
+        return {**results[params], "cached": cached}
+
+
+def clear_dashboard_cache() -> None:
+    with _cache_lock:
+        for conn, _, _ in _cache.values():
+            conn.close()
+        _cache.clear()
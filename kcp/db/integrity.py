@@ -0,0 +1,278 @@
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from kcp.db.blobs import BLOBS_DIRNAME, blob_sha_from_ref, is_blob_ref
+from kcp.db.packs import PackedMedia, is_pack_ref, pack_ref, split_pack_ref
+from kcp.db.paths import SETS_DIRNAME
+from kcp.db.sidecars import SIDECAR_SUFFIX
+from kcp.db.tiers import is_archive_ref, split_archive_ref
+from kcp.util.durable_io import STAGED_SUFFIX
+from kcp.util.hashing import sha256_file
+from kcp.util.image_io import probe
+from kcp.util.time_utils import now_ms
+
+
+SCAN_MODES = ("full", "incremental")
+SCAN_DIRS = ("images", "thumbs", SETS_DIRNAME, BLOBS_DIRNAME)
+TEMP_SUFFIXES = (".tmp", STAGED_SUFFIX)
+_STATE_CHUNK = 500
+
+
+def _norm(rel: str) -> str:
+    return str(rel).strip().replace("\\", "/")
+
+
+def walk_media(root: Path) -> dict[str, tuple[int, int]]:
+    """`{rel: (size, mtime_ns)}` for every file under the media dirs, one scandir per directory.
+
+    `.npy` sidecars are a disposable cache and are not listed.
+    """
+    files: dict[str, tuple[int, int]] = {}
+    stack = [(str(root / d), d) for d in SCAN_DIRS]
+    while stack:
+        path, rel = stack.pop()
+        try:
+            it = os.scandir(path)
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        with it:
+            for entry in it:
+                child = f"{rel}/{entry.name}"
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append((entry.path, child))
+                elif entry.is_file() and not entry.name.endswith(SIDECAR_SUFFIX):
+                    st = entry.stat()
+                    files[child] = (st.st_size, st.st_mtime_ns)
+    return files
+
+
+def collect_refs(conn: sqlite3.Connection) -> tuple[dict[str, list[tuple]], dict[str, str]]:
+    """Every media path the DB points at, read with one query per table.
+
+    Returns `(owners, expected_sha256)`: `owners[rel]` lists compact owner
+    tuples, and `expected_sha256[rel]` holds the recorded content hash for
+    asset images and blob refs.
+    """
+    owners: dict[str, list[tuple]] = {}
+    expected: dict[str, str] = {}
+
+    def add(rel, owner: tuple) -> None:
+        rel = _norm(rel or "")
+        if rel:
+            owners.setdefault(rel, []).append(owner)
+            if is_blob_ref(rel):
+                expected[rel] = blob_sha_from_ref(rel)
+
+    for row in conn.execute("SELECT type, name, image_path, thumb_path, image_hash FROM assets"):
+        add(row["image_path"], ("asset", row["type"], row["name"], "image_path"))
+        add(row["thumb_path"], ("asset", row["type"], row["name"], "thumb_path"))
+        image_rel = _norm(row["image_path"] or "")
+        if image_rel and (row["image_hash"] or "") and not is_blob_ref(image_rel):
+            expected[image_rel] = row["image_hash"]
+    for row in conn.execute("SELECT set_id, idx, image_path, thumb_path FROM keyframe_set_items"):
+        add(row["image_path"], ("set_item", row["set_id"], row["idx"], "image_path"))
+        add(row["thumb_path"], ("set_item", row["set_id"], row["idx"], "thumb_path"))
+    for row in conn.execute("SELECT owner_kind, owner_id, level_px, path FROM media_previews"):
+        add(row["path"], ("preview", row["owner_kind"], row["owner_id"], row["level_px"]))
+    for row in conn.execute("SELECT set_id, pack_path FROM media_packs"):
+        add(row["pack_path"], ("pack", row["set_id"]))
+    return owners, expected
+
+
+def _owner_json(owner: tuple) -> dict:
+    kind = owner[0]
+    if kind == "asset":
+        return {"kind": kind, "type": owner[1], "name": owner[2], "field": owner[3]}
+    if kind == "set_item":
+        return {"kind": kind, "set_id": owner[1], "idx": owner[2], "field": owner[3]}
+    if kind == "preview":
+        return {"kind": kind, "owner_kind": owner[1], "owner_id": owner[2], "level_px": owner[3]}
+    return {"kind": kind, "set_id": owner[1]}
+
+
+def _pack_index(conn: sqlite3.Connection) -> dict[str, dict[str, tuple[int, int]]]:
+    index: dict[str, dict[str, tuple[int, int]]] = {}
+    for row in conn.execute("SELECT pack_path, name, byte_offset, byte_length FROM media_pack_entries"):
+        index.setdefault(_norm(row["pack_path"]), {})[row["name"]] = (row["byte_offset"], row["byte_length"])
+    return index
+
+
+def _archive_index(conn: sqlite3.Connection) -> dict[str, set[str]]:
+    index: dict[str, set[str]] = {}
+    for row in conn.execute("SELECT archive_path, member FROM media_archive_entries"):
+        index.setdefault(row["archive_path"], set()).add(row["member"])
+    return index
+
+
+def _check_file(root: Path, rel: str, expected_sha: str, entries: list | None, verify_hashes: bool) -> list[list[str]]:
+    """Header-probe one file (or each referenced entry of a pack) and optionally re-hash it."""
+    problems: list[list[str]] = []
+    if entries is not None:
+        pack = root / rel
+        for name, offset, length in entries:
+            info = probe(PackedMedia(pack, name, offset, length))
+            if not info["ok"]:
+                problems.append([pack_ref(rel, name), f"corrupt: {info['error']}"])
+        return problems
+    path = root / rel
+    info = probe(path)
+    if not info["ok"]:
+        return [[rel, f"corrupt: {info['error']}"]]
+    if verify_hashes and expected_sha:
+        try:
+            actual = sha256_file(path)
+        except OSError as e:
+            return [[rel, f"corrupt: unreadable: {e.strerror or e}"]]
+        if actual != expected_sha.lower():
+            problems.append([rel, f"hash_mismatch: expected {expected_sha} got {actual}"])
+    return problems
+
+
+def _load_state(conn: sqlite3.Connection) -> dict[str, tuple[int, int, int, str]]:
+    return {
+        row["path"]: (row["size_bytes"], row["mtime_ns"], row["hashed"], row["problems_json"])
+        for row in conn.execute("SELECT path, size_bytes, mtime_ns, hashed, problems_json FROM media_scan_state")
+    }
+
+
+def _save_state(conn: sqlite3.Connection, rows: list[tuple], stale: list[str]) -> None:
+    try:
+        for i in range(0, len(rows), _STATE_CHUNK):
+            conn.executemany(
+                "INSERT OR REPLACE INTO media_scan_state (path, size_bytes, mtime_ns, hashed, problems_json, checked_at) VALUES (?, ?, ?, ?, ?, ?)",
+                rows[i : i + _STATE_CHUNK],
+            )
+        conn.executemany("DELETE FROM media_scan_state WHERE path = ?", [(p,) for p in stale])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def scan_project(
+    conn: sqlite3.Connection,
+    root: Path,
+    mode: str = "full",
+    verify_hashes: bool = True,
+    workers: int = 0,
+    max_listed: int = 0,
+) -> dict:
+    """Cross-check the media tree under `root` against every DB media reference.
+
+    Files are listed with one `os.scandir` per directory and references are
+    read in bulk. Each referenced file is header-probed (pack files: each
+    referenced entry) on a thread pool; with `verify_hashes`, asset images
+    and blobs are also re-hashed against their recorded sha256.
+    `mode="incremental"` reuses the previous result for files whose size and
+    mtime are unchanged. Nothing is modified except `media_scan_state`.
+    `max_listed > 0` caps each report list; the counts stay exact.
+    """
+    if mode not in SCAN_MODES:
+        raise ValueError(f"unknown scan mode: {mode}")
+    started = time.perf_counter()
+    files = walk_media(root)
+    owners, expected = collect_refs(conn)
+    pack_index = _pack_index(conn)
+    archive_index = _archive_index(conn)
+    archives_present: dict[str, bool] = {}
+
+    dangling: dict[str, list[tuple]] = {}
+    pack_checks: dict[str, list] = {}
+    for rel, rel_owners in owners.items():
+        if is_pack_ref(rel):
+            pack_rel, name = split_pack_ref(rel)
+            entry = pack_index.get(pack_rel, {}).get(name)
+            stat = files.get(pack_rel)
+            if entry is None or stat is None or stat[0] < entry[0] + entry[1]:
+                dangling[rel] = rel_owners
+            else:
+                pack_checks.setdefault(pack_rel, []).append((name, *entry))
+        elif is_archive_ref(rel):
+            # Cold-tier members are only checked against the archive index, not decompressed.
+            archive_rel, member = split_archive_ref(rel)
+            if archive_rel not in archives_present:
+                archives_present[archive_rel] = (root / archive_rel).is_file()
+            if not archives_present[archive_rel] or member not in archive_index.get(archive_rel, ()):
+                dangling[rel] = rel_owners
+        elif rel not in files:
+            # References outside the scanned dirs are still checked, just never orphans.
+            try:
+                st = os.stat(root / rel)
+            except OSError:
+                dangling[rel] = rel_owners
+                continue
+            files[rel] = (st.st_size, st.st_mtime_ns)
+
+    pack_files = set(pack_index) | {rel for rel, rel_owners in owners.items() if rel_owners[0][0] == "pack"}
+    for pack_rel in pack_files:
+        if pack_rel in files:
+            pack_checks.setdefault(pack_rel, [])
+    referenced = {rel for rel in owners if not is_pack_ref(rel) and not is_archive_ref(rel) and rel in files} | set(pack_checks)
+    orphans = sorted(rel for rel in files if rel not in referenced)
+
+    state = _load_state(conn) if mode == "incremental" else {}
+    to_check: list[str] = []
+    problems_by_file: dict[str, list] = {}
+    skipped = 0
+    for rel in sorted(referenced):
+        size, mtime_ns = files[rel]
+        prev = state.get(rel)
+        if prev is not None and prev[0] == size and prev[1] == mtime_ns and (prev[2] or not verify_hashes):
+            problems_by_file[rel] = json.loads(prev[3])
+            skipped += 1
+        else:
+            to_check.append(rel)
+
+    n_workers = int(workers) if int(workers) > 0 else min(32, (os.cpu_count() or 1) + 4)
+    with ThreadPoolExecutor(max_workers=n_workers) as pool:
+        results = pool.map(
+            lambda rel: _check_file(root, rel, expected.get(rel, ""), pack_checks.get(rel), verify_hashes),
+            to_check,
+        )
+        checked_at = now_ms()
+        state_rows = []
+        for rel, problems in zip(to_check, results):
+            problems_by_file[rel] = problems
+            size, mtime_ns = files[rel]
+            state_rows.append((rel, size, mtime_ns, int(bool(verify_hashes)), json.dumps(problems), checked_at))
+    stale = [rel for rel in (state or _load_state(conn)) if rel not in referenced]
+    _save_state(conn, state_rows, stale)
+
+    corrupt = []
+    for rel in sorted(problems_by_file):
+        for path, error in problems_by_file[rel]:
+            corrupt.append({"path": path, "error": error, "owners": [_owner_json(o) for o in owners.get(path, [])]})
+
+    def capped(items: list) -> list:
+        return items[:max_listed] if max_listed > 0 else items
+
+    report = {
+        "mode": mode,
+        "verify_hashes": bool(verify_hashes),
+        "workers": n_workers,
+        "files_scanned": len(files),
+        "bytes_scanned": sum(size for size, _ in files.values()),
+        "refs": len(owners),
+        "checked": len(to_check),
+        "skipped_unchanged": skipped,
+        "counts": {
+            "orphans": len(orphans),
+            "orphan_bytes": sum(files[rel][0] for rel in orphans),
+            "dangling": len(dangling),
+            "corrupt": len(corrupt),
+        },
+        "orphans": capped(
+            [{"path": rel, "size_bytes": files[rel][0], "temp": rel.endswith(TEMP_SUFFIXES)} for rel in orphans]
+        ),
+        "dangling": capped([{"path": rel, "owners": [_owner_json(o) for o in dangling[rel]]} for rel in sorted(dangling)]),
+        "corrupt": capped(corrupt),
+    }
+    report["ok"] = not (orphans or dangling or corrupt)
+    report["elapsed_ms"] = round((time.perf_counter() - started) * 1000.0, 1)
+    return report
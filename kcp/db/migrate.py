@@ -3,7 +3,8 @@ from __future__ import annotations
 import sqlite3
 from pathlib import Path
 
-LATEST_SCHEMA_VERSION = 1
+# A new schema version is one `schema_v<N>.sql` file next to this module plus a bump here.
+LATEST_SCHEMA_VERSION = 13
 
 
 def get_user_version(conn: sqlite3.Connection) -> int:
@@ -11,16 +12,16 @@ def get_user_version(conn: sqlite3.Connection) -> int:
     return int(row[0]) if row else 0
 
 
-def apply_schema_v1(conn: sqlite3.Connection) -> None:
-    schema_path = Path(__file__).with_name("schema_v1.sql")
+def _apply(conn: sqlite3.Connection, version: int) -> None:
+    schema_path = Path(__file__).with_name(f"schema_v{version}.sql")
     conn.executescript(schema_path.read_text(encoding="utf-8"))
-    conn.execute("PRAGMA user_version = 1")
+    conn.execute(f"PRAGMA user_version = {int(version)}")
 
 
 def migrate(conn: sqlite3.Connection) -> int:
     current = get_user_version(conn)
-    if current < 1:
-        apply_schema_v1(conn)
+    for version in range(current + 1, LATEST_SCHEMA_VERSION + 1):
+        _apply(conn, version)
         conn.commit()
-        current = 1
+        current = version
     return current
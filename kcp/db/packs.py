@@ -0,0 +1,336 @@
+from __future__ import annotations
+
+import io
+import os
+import sqlite3
+from pathlib import Path
+
+from kcp.db.paths import set_dir_rel
+from kcp.db.repo import get_meta, media_housekeeping, set_meta
+from kcp.util.durable_io import fsync_dir, fsync_file
+from kcp.util.time_utils import now_ms
+
+
+META_SET_PACKS = "set_packs"
+PACK_SUFFIX = ".kpack"
+PACK_REF_SEP = "#"
+_COPY_CHUNK = 1024 * 1024
+
+
+def set_packs_enabled(conn: sqlite3.Connection) -> bool:
+    return get_meta(conn, META_SET_PACKS, "0") == "1"
+
+
+def set_set_packs_enabled(conn: sqlite3.Connection, enabled: bool) -> None:
+    set_meta(conn, META_SET_PACKS, "1" if enabled else "0")
+
+
+def is_pack_ref(rel: str | None) -> bool:
+    text = str(rel or "").replace("\\", "/")
+    return PACK_REF_SEP in text and text.split(PACK_REF_SEP, 1)[0].endswith(PACK_SUFFIX)
+
+
+def split_pack_ref(rel: str) -> tuple[str, str]:
+    pack_rel, name = str(rel).replace("\\", "/").split(PACK_REF_SEP, 1)
+    return pack_rel, name
+
+
+def pack_ref(pack_rel: str, name: str) -> str:
+    return f"{pack_rel}{PACK_REF_SEP}{name}"
+
+
+class _PackSlice(io.RawIOBase):
+    """Read-only file object over `[offset, offset + length)` of an open pack file."""
+
+    def __init__(self, fh, offset: int, length: int):
+        super().__init__()
+        self._fh = fh
+        self._start = int(offset)
+        # A truncated pack yields a short slice, so probe() reports it as truncated.
+        self._end = self._start + max(0, min(int(length), os.fstat(fh.fileno()).st_size - self._start))
+        self._pos = self._start
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos - self._start
+
+    def seek(self, pos: int, whence: int = os.SEEK_SET) -> int:
+        base = {os.SEEK_SET: self._start, os.SEEK_CUR: self._pos, os.SEEK_END: self._end}[whence]
+        self._pos = min(max(self._start, base + int(pos)), self._end)
+        return self._pos - self._start
+
+    def readinto(self, buf) -> int:
+        n = min(len(buf), self._end - self._pos)
+        if n <= 0:
+            return 0
+        self._fh.seek(self._pos)
+        got = self._fh.readinto(memoryview(buf)[:n])
+        self._pos += got or 0
+        return got or 0
+
+    def close(self) -> None:
+        if not self.closed:
+            self._fh.close()
+        super().close()
+
+
+class PackedMedia:
+    """One file stored inside a set pack; usable wherever loaders accept a media path.
+
+    `kcp.util.image_io` opens it through `open_media()` and caches it by
+    `media_key()`; `exists()`/`stat()` mirror the Path methods loaders use.
+    """
+
+    __slots__ = ("pack", "name", "offset", "length")
+
+    def __init__(self, pack: Path, name: str, offset: int, length: int):
+        self.pack = pack
+        self.name = name
+        self.offset = int(offset)
+        self.length = int(length)
+
+    def __repr__(self) -> str:
+        return f"PackedMedia({self.pack}{PACK_REF_SEP}{self.name})"
+
+    __str__ = __repr__
+
+    def exists(self) -> bool:
+        try:
+            return self.pack.stat().st_size >= self.offset + self.length
+        except OSError:
+            return False
+
+    def stat(self) -> os.stat_result:
+        return self.pack.stat()
+
+    def open_media(self):
+        return io.BufferedReader(_PackSlice(open(self.pack, "rb"), self.offset, self.length))
+
+    def read_bytes(self) -> bytes:
+        with self.open_media() as fh:
+            return fh.read()
+
+    def media_key(self) -> tuple:
+        st = self.pack.stat()
+        return (os.path.abspath(self.pack), self.offset, self.length, st.st_mtime_ns)
+
+
+def resolve_packed(conn: sqlite3.Connection, root: Path, rels) -> dict[str, PackedMedia]:
+    """Look up the offset index for every pack ref in `rels` (other paths are ignored)."""
+    wanted: dict[str, set[str]] = {}
+    for rel in rels:
+        if is_pack_ref(rel):
+            pack_rel, name = split_pack_ref(rel)
+            wanted.setdefault(pack_rel, set()).add(name)
+    out: dict[str, PackedMedia] = {}
+    for pack_rel, names in wanted.items():
+        for row in conn.execute(
+            "SELECT name, byte_offset, byte_length FROM media_pack_entries WHERE pack_path=?",
+            (pack_rel,),
+        ).fetchall():
+            if row["name"] in names:
+                out[pack_ref(pack_rel, row["name"])] = PackedMedia(root / pack_rel, row["name"], row["byte_offset"], row["byte_length"])
+    return out
+
+
+def media_source(root: Path, rel: str, packed: dict[str, PackedMedia] | None = None):
+    """Path or PackedMedia for a stored media ref; unknown pack refs resolve to a missing path."""
+    if packed and rel in packed:
+        return packed[rel]
+    return (root / rel).resolve()
+
+
+def _current_pack_rel(conn: sqlite3.Connection, set_id: str, layout: str) -> str:
+    row = conn.execute("SELECT pack_path FROM media_packs WHERE set_id=?", (set_id,)).fetchone()
+    return row["pack_path"] if row else f"{set_dir_rel(set_id, layout)}/media{PACK_SUFFIX}"
+
+
+def pack_files(conn: sqlite3.Connection, root: Path, set_id: str, layout: str, files, durability: str = "none") -> dict[Path, str]:
+    """Append freshly written loose files to the set's pack and index them.
+
+    Returns `{loose_path: ref}`. Re-packing a name supersedes its previous
+    entry; the old bytes stay in the pack until compaction. Does not commit,
+    and leaves the loose files in place: call `drop_loose_files` after the
+    DB commit.
+
+    The DB write lock is taken before the first byte is appended and held
+    until the caller commits, so concurrent writers append to a pack one at
+    a time and every offset points at this writer's bytes.
+    """
+    paths = [Path(p) for p in files if p is not None and Path(p).exists()]
+    if not paths:
+        return {}
+    # A pending write already holds the lock; otherwise take it now, not at the first index row.
+    if not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+    pack_rel = _current_pack_rel(conn, set_id, layout)
+    pack = root / pack_rel
+    pack.parent.mkdir(parents=True, exist_ok=True)
+    created = not pack.exists()
+    entries = []
+    with open(pack, "ab") as out:
+        # Bytes past the last indexed entry (an aborted append) are dead, never reused.
+        offset = os.fstat(out.fileno()).st_size
+        for path in paths:
+            with open(path, "rb") as src:
+                length = 0
+                for chunk in iter(lambda: src.read(_COPY_CHUNK), b""):
+                    out.write(chunk)
+                    length += len(chunk)
+            entries.append((path, path.name, offset, length))
+            offset += length
+        if durability != "none":
+            out.flush()
+            os.fsync(out.fileno())
+    if created and durability != "none":
+        fsync_dir(pack.parent)
+
+    ts = now_ms()
+    conn.execute(
+        "INSERT INTO media_packs (set_id, pack_path, created_at, updated_at) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT(set_id) DO UPDATE SET updated_at = excluded.updated_at",
+        (set_id, pack_rel, ts, ts),
+    )
+    refs: dict[Path, str] = {}
+    for path, name, off, length in entries:
+        conn.execute(
+            "INSERT INTO media_pack_entries (pack_path, name, byte_offset, byte_length, created_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(pack_path, name) DO UPDATE SET byte_offset = excluded.byte_offset, "
+            "byte_length = excluded.byte_length, created_at = excluded.created_at",
+            (pack_rel, name, off, length, ts),
+        )
+        refs[path] = pack_ref(pack_rel, name)
+    return refs
+
+
+def drop_loose_files(packed: dict[Path, str]) -> None:
+    for path in packed:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _live_names(conn: sqlite3.Connection, set_id: str, pack_rel: str) -> set[str]:
+    rels = [
+        r[0]
+        for r in conn.execute(
+            "SELECT image_path FROM keyframe_set_items WHERE set_id=? "
+            "UNION SELECT thumb_path FROM keyframe_set_items WHERE set_id=? "
+            "UNION SELECT path FROM media_previews WHERE owner_kind='set_item' "
+            "AND owner_id IN (SELECT id FROM keyframe_set_items WHERE set_id=?)",
+            (set_id, set_id, set_id),
+        ).fetchall()
+    ]
+    return {split_pack_ref(rel)[1] for rel in rels if is_pack_ref(rel) and split_pack_ref(rel)[0] == pack_rel}
+
+
+def pack_stats(conn: sqlite3.Connection, root: Path, set_id: str = "") -> list[dict]:
+    sql = "SELECT set_id, pack_path FROM media_packs"
+    rows = conn.execute(sql + " WHERE set_id=?" if set_id else sql + " ORDER BY set_id", (set_id,) if set_id else ()).fetchall()
+    out = []
+    for row in rows:
+        live = _live_names(conn, row["set_id"], row["pack_path"])
+        entries = conn.execute("SELECT name, byte_length FROM media_pack_entries WHERE pack_path=?", (row["pack_path"],)).fetchall()
+        live_bytes = sum(int(e["byte_length"]) for e in entries if e["name"] in live)
+        try:
+            size = (root / row["pack_path"]).stat().st_size
+        except OSError:
+            size = 0
+        out.append(
+            {
+                "set_id": row["set_id"],
+                "pack_path": row["pack_path"],
+                "size_bytes": size,
+                "live_bytes": live_bytes,
+                "dead_bytes": max(0, size - live_bytes),
+                "live_entries": len(live),
+            }
+        )
+    return out
+
+
+def _rewrite_refs(conn: sqlite3.Connection, set_id: str, old_pack: str, new_pack: str) -> None:
+    old_prefix = old_pack + PACK_REF_SEP
+    new_prefix = new_pack + PACK_REF_SEP
+    args = (new_prefix, len(old_prefix) + 1)
+    for column in ("image_path", "thumb_path"):
+        conn.execute(
+            f"UPDATE keyframe_set_items SET {column} = ? || substr({column}, ?) WHERE set_id = ? AND substr({column}, 1, ?) = ?",
+            (*args, set_id, len(old_prefix), old_prefix),
+        )
+    conn.execute(
+        "UPDATE media_previews SET path = ? || substr(path, ?) WHERE owner_kind = 'set_item' "
+        "AND owner_id IN (SELECT id FROM keyframe_set_items WHERE set_id = ?) AND substr(path, 1, ?) = ?",
+        (*args, set_id, len(old_prefix), old_prefix),
+    )
+
+
+def compact_packs(conn: sqlite3.Connection, root: Path, set_id: str = "", min_dead_ratio: float = 0.0, dry_run: bool = False) -> dict:
+    """Rewrite packs holding superseded bytes so they contain only referenced entries.
+
+    Live entries are copied into a new pack file, which is fsynced before one
+    transaction repoints the index and every item/preview ref at it. The old
+    pack is removed only after that commit, so a crash leaves either pack
+    fully valid.
+    """
+    report = {"dry_run": bool(dry_run), "packs_seen": 0, "packs_compacted": 0, "bytes_reclaimed": 0, "packs": []}
+    for stat in pack_stats(conn, root, set_id):
+        report["packs_seen"] += 1
+        size = stat["size_bytes"]
+        if size == 0 or stat["dead_bytes"] == 0 or stat["dead_bytes"] / size < float(min_dead_ratio):
+            continue
+        report["packs"].append(stat)
+        report["packs_compacted"] += 1
+        report["bytes_reclaimed"] += stat["dead_bytes"]
+        if dry_run:
+            continue
+
+        old_rel = stat["pack_path"]
+        live = _live_names(conn, stat["set_id"], old_rel)
+        entries = [
+            e
+            for e in conn.execute(
+                "SELECT name, byte_offset, byte_length FROM media_pack_entries WHERE pack_path=? ORDER BY byte_offset",
+                (old_rel,),
+            ).fetchall()
+            if e["name"] in live
+        ]
+        new_rel = f"{old_rel.rsplit('/', 1)[0]}/media-{now_ms()}{PACK_SUFFIX}"
+        new_pack = root / new_rel
+        moved = []
+        with open(root / old_rel, "rb") as src, open(new_pack, "wb") as out:
+            for e in entries:
+                src.seek(int(e["byte_offset"]))
+                moved.append((e["name"], out.tell(), int(e["byte_length"])))
+                remaining = int(e["byte_length"])
+                while remaining > 0:
+                    chunk = src.read(min(_COPY_CHUNK, remaining))
+                    if not chunk:
+                        raise RuntimeError(f"kcp_pack_truncated: {old_rel} entry={e['name']}")
+                    out.write(chunk)
+                    remaining -= len(chunk)
+        fsync_file(new_pack)
+        fsync_dir(new_pack.parent)
+        try:
+            ts = now_ms()
+            conn.executemany(
+                "INSERT INTO media_pack_entries (pack_path, name, byte_offset, byte_length, created_at) VALUES (?, ?, ?, ?, ?)",
+                [(new_rel, name, off, length, ts) for name, off, length in moved],
+            )
+            conn.execute("DELETE FROM media_pack_entries WHERE pack_path=?", (old_rel,))
+            conn.execute("UPDATE media_packs SET pack_path=?, updated_at=? WHERE set_id=?", (new_rel, ts, stat["set_id"]))
+            with media_housekeeping(conn):
+                _rewrite_refs(conn, stat["set_id"], old_rel, new_rel)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            new_pack.unlink()
+            raise
+        (root / old_rel).unlink()
+    return report
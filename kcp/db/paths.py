@@ -1,10 +1,13 @@
 from __future__ import annotations
 
+import hashlib
 from pathlib import Path
 import warnings
 
 
 DEFAULT_DB_PATH_INPUT = "output/kcp/db/kcp.sqlite"
+SETS_LAYOUTS = ("flat", "sharded")
+SETS_DIRNAME = "sets"
 
 
 def _comfy_output_dir() -> Path | None:
@@ -38,7 +41,7 @@ def ensure_layout(root: Path, db_filename: str) -> dict[str, Path]:
     db_dir = root / "db"
     images_dir = root / "images"
     thumbs_dir = root / "thumbs"
-    sets_dir = root / "sets"
+    sets_dir = root / SETS_DIRNAME
     receipts_dir = root / "receipts"
     for p in [db_dir, images_dir, thumbs_dir, sets_dir, receipts_dir]:
         p.mkdir(parents=True, exist_ok=True)
@@ -86,3 +89,28 @@ def with_projectinit_db_path_tip(db_path: str, err: Exception) -> RuntimeError:
 def kcp_root_from_db_path(db_path: str) -> Path:
     p = normalize_db_path(db_path)
     return p.parent.parent.resolve()
+
+
+def set_dir_rel(set_id: str, layout: str = "flat") -> str:
+    """Root-relative directory of a keyframe set.
+
+    `flat` is `sets/<set_id>`; `sharded` is `sets/ab/cd/<set_id>`, where `abcd`
+    are the first hex digits of sha256(set_id), so sets/ stays at most 256
+    entries wide at every level.
+    """
+    if layout == "sharded":
+        h = hashlib.sha256(set_id.encode("utf-8")).hexdigest()
+        return f"{SETS_DIRNAME}/{h[:2]}/{h[2:4]}/{set_id}"
+    if layout != "flat":
+        raise ValueError(f"unknown sets layout: {layout}")
+    return f"{SETS_DIRNAME}/{set_id}"
+
+
+def set_dir(root: Path, set_id: str, layout: str = "flat") -> Path:
+    return root / set_dir_rel(set_id, layout)
+
+
+def set_item_media_rels(set_id: str, idx: int, ext: str, layout: str = "flat") -> tuple[str, str]:
+    """(image_rel, thumb_rel) for a set item saved as `<idx>.<ext>` plus its WEBP thumb."""
+    base = set_dir_rel(set_id, layout)
+    return f"{base}/{int(idx)}.{ext}", f"{base}/{int(idx)}_thumb.webp"
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import sqlite3
+from pathlib import Path
+from typing import TypeVar
+
+from kcp.db.blobs import ingest_file, release_ref
+from kcp.db.repo import get_meta, set_meta
+from kcp.util.image_io import DEFAULT_THUMB_MAX_PX, image_size
+from kcp.util.time_utils import now_ms
+
+
+META_PREVIEW_LEVELS = "preview_levels"
+
+T = TypeVar("T")
+
+
+def parse_preview_levels(text: str) -> list[int]:
+    """Parse a `128,384,1024` style list; the thumb level is always included."""
+    levels = {DEFAULT_THUMB_MAX_PX}
+    for part in str(text or "").replace(" ", "").split(","):
+        if not part:
+            continue
+        px = int(part)
+        if px < 16:
+            raise ValueError(f"preview level too small: {px}")
+        levels.add(px)
+    return sorted(levels)
+
+
+def preview_levels(conn: sqlite3.Connection) -> list[int]:
+    return parse_preview_levels(get_meta(conn, META_PREVIEW_LEVELS, ""))
+
+
+def set_preview_levels(conn: sqlite3.Connection, levels: list[int]) -> None:
+    set_meta(conn, META_PREVIEW_LEVELS, ",".join(str(px) for px in sorted(set(levels))))
+
+
+def preview_path(thumb_abs: Path, level_px: int) -> Path:
+    return thumb_abs.with_name(f"{thumb_abs.stem}_{int(level_px)}.webp")
+
+
+def plan_previews(conn: sqlite3.Connection, image_abs: Path, thumb_abs: Path) -> dict[int, Path]:
+    """Extra pyramid levels to generate next to `thumb_abs` for a freshly saved image.
+
+    The thumb itself is the DEFAULT_THUMB_MAX_PX level. Levels that are not
+    smaller than the source are skipped; the original already covers them.
+    """
+    levels = [px for px in preview_levels(conn) if px != DEFAULT_THUMB_MAX_PX]
+    if not levels:
+        return {}
+    side = max(image_size(image_abs))
+    return {px: preview_path(thumb_abs, px) for px in levels if px < side}
+
+
+def record_previews(
+    conn: sqlite3.Connection,
+    root: Path,
+    owner_kind: str,
+    owner_id: str,
+    written: dict[int, Path],
+    use_blobs: bool = False,
+    packed: dict[Path, str] | None = None,
+    pending: dict | None = None,
+) -> dict[int, str]:
+    """Replace the recorded preview levels of one set item/asset. Does not commit.
+
+    `packed` maps levels already appended to a set pack to their pack refs;
+    `pending` defers blob ingests as in `kcp.db.blobs.ingest_file`.
+    """
+    packed = packed or {}
+    for old in conn.execute(
+        "SELECT path FROM media_previews WHERE owner_kind=? AND owner_id=?",
+        (owner_kind, owner_id),
+    ).fetchall():
+        release_ref(conn, old["path"])
+    conn.execute("DELETE FROM media_previews WHERE owner_kind=? AND owner_id=?", (owner_kind, owner_id))
+
+    recorded: dict[int, str] = {}
+    ts = now_ms()
+    for px, path in sorted(written.items()):
+        if path in packed:
+            rel = packed[path]
+        elif not path.exists():
+            continue
+        else:
+            rel = ingest_file(conn, root, path, pending=pending)[0] if use_blobs else str(path.relative_to(root))
+        conn.execute(
+            "INSERT INTO media_previews (owner_kind, owner_id, level_px, path, created_at) VALUES (?, ?, ?, ?, ?)",
+            (owner_kind, owner_id, int(px), rel, ts),
+        )
+        recorded[int(px)] = rel
+    return recorded
+
+
+def list_previews(conn: sqlite3.Connection, owner_kind: str, owner_ids: list[str]) -> dict[str, dict[int, str]]:
+    out: dict[str, dict[int, str]] = {}
+    ids = [str(i) for i in owner_ids]
+    for start in range(0, len(ids), 500):
+        chunk = ids[start : start + 500]
+        marks = ",".join("?" for _ in chunk)
+        for row in conn.execute(
+            f"SELECT owner_id, level_px, path FROM media_previews WHERE owner_kind=? AND owner_id IN ({marks})",
+            (owner_kind, *chunk),
+        ).fetchall():
+            out.setdefault(row["owner_id"], {})[int(row["level_px"])] = row["path"]
+    return out
+
+
+def pick_preview_level(levels: dict[int, T], max_side: int) -> T | None:
+    """Smallest level whose size covers `max_side`; None means use the original."""
+    covering = [px for px in levels if px >= int(max_side)]
+    return levels[min(covering)] if covering else None
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import os
+import socket
+import sqlite3
+import uuid
+
+from kcp.util.time_utils import now_ms
+
+
+JOB_STATES = ("pending", "leased", "done", "failed")
+DEFAULT_LEASE_MS = 10 * 60 * 1000
+DEFAULT_MAX_ATTEMPTS = 3
+# UPDATE ... RETURNING needs SQLite 3.35; older libraries select and update inside the same write transaction.
+RETURNING_SUPPORTED = sqlite3.sqlite_version_info >= (3, 35, 0)
+_JOB_COLUMNS = "item_id, set_id, idx, state, worker, lease_token, leased_at, heartbeat_at, lease_expires_at, attempts, last_error"
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue_set(conn: sqlite3.Connection, set_id: str, *, commit: bool = True) -> int:
+    """Queue every item of a set that has no image yet; returns how many jobs were added.
+
+    Items already queued keep their job, so a finished or failed job is not
+    queued again. Items retired by retention (`media_retention` set) have no
+    image on purpose and are never queued.
+    """
+    ts = now_ms()
+    cur = conn.execute(
+        "INSERT OR IGNORE INTO render_jobs (item_id, set_id, idx, enqueued_at, updated_at) "
+        "SELECT id, set_id, idx, ?, ? FROM keyframe_set_items WHERE set_id = ? AND COALESCE(image_path, '') = '' "
+        "AND COALESCE(media_retention, '') = ''",
+        (ts, ts, set_id),
+    )
+    if commit:
+        conn.commit()
+    return max(cur.rowcount, 0)
+
+
+def claim_next_item(
+    conn: sqlite3.Connection,
+    set_id: str = "",
+    worker: str = "",
+    lease_ms: int = DEFAULT_LEASE_MS,
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+) -> dict | None:
+    """Lease the lowest-idx claimable job of `set_id` (any queued set when empty), or None.
+
+    A job is claimable while pending, or while leased with an expired lease.
+    The claim happens inside a `BEGIN IMMEDIATE` transaction, which takes the
+    write lock up front, so two workers can never pick the same job. With
+    `set_id`, the set's unrendered items are queued first. An expired lease
+    that has already used `max_attempts` claims is marked failed instead of
+    being handed out again.
+    """
+    ts = now_ms()
+    token = uuid.uuid4().hex
+    scope, params = ("AND set_id = ?", (set_id,)) if set_id else ("", ())
+    pick = (
+        "SELECT item_id FROM render_jobs WHERE (state = 'pending' OR (state = 'leased' AND lease_expires_at < ?)) "
+        f"{scope} ORDER BY enqueued_at, set_id, idx LIMIT 1"
+    )
+    lease = (
+        "UPDATE render_jobs SET state = 'leased', worker = ?, lease_token = ?, leased_at = ?, heartbeat_at = ?, "
+        "lease_expires_at = ?, attempts = attempts + 1, updated_at = ? WHERE item_id = "
+    )
+    lease_params = (worker or default_worker_id(), token, ts, ts, ts + int(lease_ms), ts)
+    conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if set_id:
+            enqueue_set(conn, set_id, commit=False)
+        conn.execute(
+            "UPDATE render_jobs SET state = 'failed', lease_token = NULL, last_error = 'lease expired', updated_at = ? "
+            f"WHERE state = 'leased' AND lease_expires_at < ? AND attempts >= ? {scope}",
+            (ts, ts, int(max_attempts), *params),
+        )
+        if RETURNING_SUPPORTED:
+            rows = conn.execute(f"{lease}({pick}) RETURNING {_JOB_COLUMNS}", (*lease_params, ts, *params)).fetchall()
+        else:
+            found = conn.execute(pick, (ts, *params)).fetchone()
+            rows = []
+            if found is not None:
+                conn.execute(f"{lease}?", (*lease_params, found["item_id"]))
+                rows = conn.execute(f"SELECT {_JOB_COLUMNS} FROM render_jobs WHERE item_id = ?", (found["item_id"],)).fetchall()
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return dict(rows[0]) if rows else None
+
+
+def heartbeat(conn: sqlite3.Connection, item_id: str, lease_token: str, lease_ms: int = DEFAULT_LEASE_MS) -> bool:
+    """Extend a lease this worker still holds; False once the job was finished or reclaimed."""
+    ts = now_ms()
+    cur = conn.execute(
+        "UPDATE render_jobs SET heartbeat_at = ?, lease_expires_at = ?, updated_at = ? "
+        "WHERE item_id = ? AND lease_token = ? AND state = 'leased'",
+        (ts, ts + int(lease_ms), ts, item_id, lease_token),
+    )
+    conn.commit()
+    return cur.rowcount == 1
+
+
+def release_job(conn: sqlite3.Connection, item_id: str, lease_token: str, error: str = "") -> bool:
+    """Give a held lease back so the job can be claimed again at once."""
+    cur = conn.execute(
+        "UPDATE render_jobs SET state = 'pending', lease_token = NULL, lease_expires_at = NULL, last_error = ?, updated_at = ? "
+        "WHERE item_id = ? AND lease_token = ? AND state = 'leased'",
+        (error, now_ms(), item_id, lease_token),
+    )
+    conn.commit()
+    return cur.rowcount == 1
+
+
+def queue_status(conn: sqlite3.Connection, set_id: str = "") -> dict[str, int]:
+    """Job counts by state; leased jobs whose lease ran out are counted as `expired`."""
+    scope, params = ("WHERE set_id = ?", (set_id,)) if set_id else ("", ())
+    counts = {state: 0 for state in JOB_STATES}
+    counts["expired"] = 0
+    ts = now_ms()
+    for row in conn.execute(
+        f"SELECT CASE WHEN state = 'leased' AND lease_expires_at < ? THEN 'expired' ELSE state END AS s, COUNT(*) AS n "
+        f"FROM render_jobs {scope} GROUP BY 1",
+        (ts, *params),
+    ):
+        counts[row["s"]] = int(row["n"])
+    return counts
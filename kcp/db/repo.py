@@ -3,6 +3,7 @@ from __future__ import annotations
 import json
 import sqlite3
 import uuid
+from contextlib import contextmanager
 from pathlib import Path
 
 from kcp.db.migrate import migrate
@@ -301,19 +302,117 @@ def get_set_item(conn: sqlite3.Connection, set_id: str, idx: int):
     ).fetchone()
 
 
+def iter_set_items(
+    conn: sqlite3.Connection,
+    set_id: str,
+    *,
+    start_idx: int = 0,
+    limit: int = 0,
+    only_with_media: bool = False,
+):
+    """Yield set item rows with `idx >= start_idx` in idx order.
+
+    Uses a keyset range scan on the UNIQUE(set_id, idx) index, so paging
+    through a large set never re-reads earlier rows. `limit=0` means no limit.
+    """
+    q = "SELECT * FROM keyframe_set_items WHERE set_id = ? AND idx >= ?"
+    args: list = [set_id, int(start_idx)]
+    if only_with_media:
+        q += " AND image_path != ''"
+    q += " ORDER BY idx"
+    if int(limit) > 0:
+        q += " LIMIT ?"
+        args.append(int(limit))
+    yield from conn.execute(q, args)
+
+
 def get_keyframe_set(conn: sqlite3.Connection, set_id: str):
     return conn.execute("SELECT * FROM keyframe_sets WHERE id = ?", (set_id,)).fetchone()
 
 
-def update_set_item_media(conn: sqlite3.Connection, set_id: str, idx: int, image_rel: str, thumb_rel: str):
+def update_set_item_media(
+    conn: sqlite3.Connection,
+    set_id: str,
+    idx: int,
+    image_rel: str,
+    thumb_rel: str,
+    *,
+    phash: str | None = None,
+    commit: bool = True,
+):
+    """Point a set item at new media.
+
+    `phash` belongs to the new media, so a stale hash is always replaced, and
+    any retention marker from `kcp.db.retention` is cleared.
+    """
     if int(idx) < 0:
         raise ValueError("idx must be >= 0")
     cur = conn.execute(
-        "UPDATE keyframe_set_items SET image_path = ?, thumb_path = ? WHERE set_id = ? AND idx = ?",
-        (image_rel, thumb_rel, set_id, int(idx)),
+        "UPDATE keyframe_set_items SET image_path = ?, thumb_path = ?, phash = ?, media_retention = '', media_retention_at = NULL "
+        "WHERE set_id = ? AND idx = ?",
+        (image_rel, thumb_rel, phash, set_id, int(idx)),
     )
     if cur.rowcount == 0:
         conn.rollback()
         raise ValueError(f"set item not found: set_id={set_id} idx={idx}")
-    conn.commit()
+    if commit:
+        conn.commit()
     return get_set_item(conn, set_id, int(idx))
+
+
+def get_meta(conn: sqlite3.Connection, key: str, default: str = "") -> str:
+    row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return str(row[0]) if row else default
+
+
+def set_meta(conn: sqlite3.Connection, key: str, value: str, *, commit: bool = True) -> None:
+    conn.execute(
+        "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+        (key, str(value)),
+    )
+    if commit:
+        conn.commit()
+
+
+META_MEDIA_HOUSEKEEPING = "media_housekeeping"
+
+
+@contextmanager
+def media_housekeeping(conn: sqlite3.Connection):
+    """Keep storage-only ref rewrites out of the sync change log (schema v13).
+
+    Moving bytes between loose files, blobs, packs and archives does not change
+    what a row says; logged, it would reach other hosts with a fresh clock and
+    beat their real edits. The marker lives in the caller's transaction and is
+    removed on exit, so commit after the block, not inside it.
+    """
+    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, '1')", (META_MEDIA_HOUSEKEEPING,))
+    try:
+        yield
+    finally:
+        conn.execute("DELETE FROM meta WHERE key = ?", (META_MEDIA_HOUSEKEEPING,))
+
+
+META_ENCODE_PROFILE = "encode_profile"
+
+
+def resolve_encode_profile(conn: sqlite3.Connection, requested: str = "project_default") -> str | None:
+    """Node-level encode profile, falling back to the project default in meta.
+
+    Returns None when neither is set, which keeps Pillow's encoder defaults.
+    """
+    choice = (requested or "").strip()
+    if choice and choice != "project_default":
+        return choice
+    return get_meta(conn, META_ENCODE_PROFILE, "") or None
+
+
+META_DURABILITY = "durability"
+
+
+def resolve_durability(conn: sqlite3.Connection, requested: str = "project_default") -> str:
+    """Node-level durability mode, falling back to the project default (`none`)."""
+    choice = (requested or "").strip()
+    if choice and choice != "project_default":
+        return choice
+    return get_meta(conn, META_DURABILITY, "") or "none"
@@ -0,0 +1,310 @@
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+from kcp.db.blobs import blob_sha_from_ref, discard_ingest, finish_ingest, ingest_file, is_blob_ref, new_pending_ingest, release_ref
+from kcp.db.packs import compact_packs, drop_loose_files, is_pack_ref, media_source, pack_files, resolve_packed, split_pack_ref
+from kcp.db.paths import set_dir
+from kcp.db.repo import media_housekeeping, resolve_encode_profile
+from kcp.db.sets_layout import sets_layout
+from kcp.db.tiers import is_archive_ref
+from kcp.db.sidecars import SIDECAR_SUFFIX
+from kcp.util.durable_io import finalize_file
+from kcp.util.image_io import encode_options, open_media
+from kcp.util.time_utils import now_ms
+
+
+RETENTION_ACTIONS = ("delete", "downscale")
+RETENTION_MARKERS = {"delete": "deleted", "downscale": "downscaled"}
+DEFAULT_DOWNSCALE_PX = 1024
+DEFAULT_BATCH_SIZE = 500
+_DAY_MS = 24 * 60 * 60 * 1000
+
+
+def promoted_sources(conn: sqlite3.Connection) -> set[tuple[str, int]]:
+    """`(set_id, idx)` of every set item a keyframe asset was promoted from."""
+    out: set[tuple[str, int]] = set()
+    for row in conn.execute("SELECT json_fields FROM assets WHERE type='keyframe'"):
+        try:
+            source = json.loads(row["json_fields"] or "{}").get("source")
+            if isinstance(source, dict) and source.get("set_id") and source.get("idx") is not None:
+                out.add((str(source["set_id"]), int(source["idx"])))
+        except (ValueError, TypeError, AttributeError):
+            continue
+    return out
+
+
+def _media_bytes(root: Path, rel: str, packed: dict) -> int:
+    try:
+        return packed[rel].length if is_pack_ref(rel) else os.stat(os.path.join(root, rel)).st_size
+    except (OSError, KeyError):
+        return 0
+
+
+def plan_retention(
+    conn: sqlite3.Connection,
+    root: Path,
+    action: str = "delete",
+    older_than_days: float = 30,
+    *,
+    set_id: str = "",
+    keep_promoted: bool = True,
+    only_picked_sets: bool = True,
+    limit: int = 0,
+) -> tuple[list[dict], dict]:
+    """Select the full-res set item images a retention run would touch.
+
+    Picked items are always kept, and so are thumbs and preview levels. Items
+    whose thumb is the image itself are kept too, since removing the image
+    would leave nothing to review. Returns `(candidates, report)`, with
+    per-reason keep counts in `report["kept"]`.
+    """
+    if action not in RETENTION_ACTIONS:
+        raise ValueError(f"unknown retention action: {action}")
+    cutoff = now_ms() - int(float(older_than_days) * _DAY_MS)
+    promoted = promoted_sources(conn) if keep_promoted else set()
+    kept = {"picked": 0, "promoted": 0, "unpicked_set": 0, "no_thumb": 0, "recent": 0, "already_downscaled": 0, "archived": 0}
+    sql = (
+        "SELECT i.id, i.set_id, i.idx, i.image_path, i.thumb_path, i.created_at, i.media_retention, s.picked_index "
+        "FROM keyframe_set_items i JOIN keyframe_sets s ON s.id = i.set_id WHERE i.image_path != ''"
+    )
+    params: tuple = ()
+    if set_id:
+        sql += " AND i.set_id = ?"
+        params = (set_id,)
+    scanned = 0
+    candidates: list[dict] = []
+    for row in conn.execute(sql + " ORDER BY i.set_id, i.idx", params):
+        scanned += 1
+        if row["picked_index"] is not None and int(row["picked_index"]) == int(row["idx"]):
+            kept["picked"] += 1
+        elif (row["set_id"], int(row["idx"])) in promoted:
+            kept["promoted"] += 1
+        elif only_picked_sets and row["picked_index"] is None:
+            kept["unpicked_set"] += 1
+        elif not row["thumb_path"] or row["thumb_path"] == row["image_path"]:
+            kept["no_thumb"] += 1
+        elif int(row["created_at"]) >= cutoff:
+            kept["recent"] += 1
+        elif is_archive_ref(row["image_path"]):
+            kept["archived"] += 1
+        elif action == "downscale" and row["media_retention"] == RETENTION_MARKERS["downscale"]:
+            kept["already_downscaled"] += 1
+        elif not limit or len(candidates) < int(limit):
+            candidates.append({"id": row["id"], "set_id": row["set_id"], "idx": int(row["idx"]), "image_path": row["image_path"]})
+
+    packed = resolve_packed(conn, root, [c["image_path"] for c in candidates])
+    by_set: dict[str, int] = {}
+    bytes_in_scope = 0
+    for c in candidates:
+        bytes_in_scope += _media_bytes(root, c["image_path"], packed)
+        by_set[c["set_id"]] = by_set.get(c["set_id"], 0) + 1
+    report = {
+        "action": action,
+        "older_than_days": float(older_than_days),
+        "cutoff_ms": cutoff,
+        "items_scanned": scanned,
+        "candidates": len(candidates),
+        "bytes_in_scope": bytes_in_scope,
+        "kept": kept,
+        "by_set": by_set,
+    }
+    return candidates, report
+
+
+def _downscale(conn, root: Path, c: dict, source, max_px: int, profile: str | None, layout: str, durability: str, pending: dict) -> str | None:
+    """Write a `max_px` copy of one item image; returns its new ref, or None when it is already small enough.
+
+    Loose files are replaced in place after the commit; blob and pack refs get
+    a new blob / pack entry now, and their old bytes are released by the caller.
+    New blobs go through the batch's pending ingest, so a rollback removes them.
+    """
+    from PIL import Image
+
+    old = c["image_path"]
+    fmt = "WEBP" if Path(old).suffix.lower() == ".webp" else "PNG"
+    with open_media(source) as fh, Image.open(fh) as img:
+        if max(img.size) <= max_px:
+            return None
+        small = img.convert("RGB")
+        small.thumbnail((max_px, max_px))
+    if is_pack_ref(old):
+        out = set_dir(root, c["set_id"], layout) / split_pack_ref(old)[1]
+    elif is_blob_ref(old):
+        out = set_dir(root, c["set_id"], layout) / f"{c['idx']}_retained.{fmt.lower()}"
+    else:
+        final = root / old
+        out = final.with_name(final.name + ".tmp")
+    out.parent.mkdir(parents=True, exist_ok=True)
+    small.save(out, format=fmt, **encode_options(fmt, profile))
+    pending["written"].append(out)
+    if is_pack_ref(old):
+        refs = pack_files(conn, root, c["set_id"], layout, [out], durability)
+        pending["loose_packed"].update(refs)
+        return refs[out]
+    if is_blob_ref(old):
+        rel, _ = ingest_file(conn, root, out, pending=pending["blobs"])
+        return rel
+    pending["replace"].append((out, root / old))
+    return old
+
+
+def _apply_batch(
+    conn: sqlite3.Connection,
+    root: Path,
+    batch: list[dict],
+    action: str,
+    max_px: int,
+    profile: str | None,
+    layout: str,
+    durability: str,
+    report: dict,
+    packed_sets: set[str],
+) -> None:
+    pending: dict = {"written": [], "replace": [], "loose_packed": {}, "blobs": new_pending_ingest()}
+    # (path, is_media) as plain strings: at millions of files pathlib overhead dominates the unlinks.
+    unlink: list[tuple[str, bool]] = []
+    set_dirs: dict[str, str] = {}
+    updates: list[tuple] = []
+    released: set[str] = set()
+    root_s = str(root)
+    marker = RETENTION_MARKERS[action]
+    ts = now_ms()
+    packed = resolve_packed(conn, root, [c["image_path"] for c in batch]) if action == "downscale" else {}
+    try:
+        for c in batch:
+            old = c["image_path"]
+            new = ""
+            if action == "downscale":
+                source = media_source(root, old, packed)
+                try:
+                    new = _downscale(conn, root, c, source, max_px, profile, layout, durability, pending)
+                except (OSError, ValueError) as e:
+                    report["errors"].append({"set_id": c["set_id"], "idx": c["idx"], "error": str(e)})
+                    continue
+                if new is None:
+                    report["skipped_small"] += 1
+                    continue
+            updates.append((new, marker, ts, c["id"]))
+            if c["set_id"] not in set_dirs:
+                set_dirs[c["set_id"]] = str(set_dir(root, c["set_id"], layout))
+            unlink.append((os.path.join(set_dirs[c["set_id"]], f"{c['idx']}{SIDECAR_SUFFIX}"), False))
+            if is_pack_ref(old):
+                # Retired or superseded pack entries are reclaimed by compaction below.
+                packed_sets.add(c["set_id"])
+            elif new == old:
+                continue
+            elif is_blob_ref(old):
+                release_ref(conn, old)
+                released.add(old)
+            else:
+                unlink.append((os.path.join(root_s, old), True))
+        with media_housekeeping(conn):
+            conn.executemany(
+                "UPDATE keyframe_set_items SET image_path = ?, media_retention = ?, media_retention_at = ? WHERE id = ?",
+                updates,
+            )
+        for rel in released:
+            sha = blob_sha_from_ref(rel)
+            row = conn.execute("SELECT ref_count FROM media_blobs WHERE sha256 = ?", (sha,)).fetchone()
+            if row is not None and int(row["ref_count"]) == 0:
+                conn.execute("DELETE FROM media_blobs WHERE sha256 = ?", (sha,))
+                unlink.append((os.path.join(root_s, rel), True))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        discard_ingest(pending["blobs"])
+        for path in pending["written"]:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+        raise
+    report["batches"] += 1
+    report["items_retired"] += len(updates)
+
+    # Files change only after the rows that reference them have been committed.
+    for tmp, final in pending["replace"]:
+        before = final.stat().st_size if final.exists() else 0
+        after = tmp.stat().st_size
+        finalize_file(tmp, final, "file" if durability != "none" else "none")
+        report["bytes_freed"] += max(0, before - after)
+    drop_loose_files(pending["loose_packed"])
+    finish_ingest(pending["blobs"])
+    for path, is_media in unlink:
+        try:
+            size = os.stat(path).st_size
+            os.unlink(path)
+        except FileNotFoundError:
+            continue
+        if is_media:
+            report["files_deleted"] += 1
+            report["bytes_freed"] += size
+
+
+def run_retention(
+    conn: sqlite3.Connection,
+    root: Path,
+    action: str = "delete",
+    older_than_days: float = 30,
+    *,
+    set_id: str = "",
+    keep_promoted: bool = True,
+    only_picked_sets: bool = True,
+    max_px: int = DEFAULT_DOWNSCALE_PX,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    limit: int = 0,
+    durability: str = "none",
+    dry_run: bool = True,
+) -> dict:
+    """Delete or downscale the full-res images of old, unpicked set items.
+
+    Dry-run by default: only the plan from `plan_retention` is reported.
+    Otherwise rows are updated in transactions of `batch_size` items, marked in
+    `media_retention`/`media_retention_at`, and each batch's files are removed
+    or replaced only after its commit. Blob files go once their ref count
+    reaches zero; packs holding retired entries are compacted at the end.
+    """
+    started = time.perf_counter()
+    candidates, report = plan_retention(
+        conn,
+        root,
+        action,
+        older_than_days,
+        set_id=set_id,
+        keep_promoted=keep_promoted,
+        only_picked_sets=only_picked_sets,
+        limit=limit,
+    )
+    report.update(
+        {
+            "dry_run": bool(dry_run),
+            "max_px": int(max_px) if action == "downscale" else None,
+            "items_retired": 0,
+            "skipped_small": 0,
+            "files_deleted": 0,
+            "bytes_freed": 0,
+            "batches": 0,
+            "packs_compacted": 0,
+            "errors": [],
+        }
+    )
+    if not dry_run and candidates:
+        layout = sets_layout(conn)
+        profile = resolve_encode_profile(conn, "project_default")
+        packed_sets: set[str] = set()
+        size = max(1, int(batch_size))
+        for i in range(0, len(candidates), size):
+            _apply_batch(conn, root, candidates[i : i + size], action, int(max_px), profile, layout, durability, report, packed_sets)
+        for packed_set in sorted(packed_sets):
+            compacted = compact_packs(conn, root, set_id=packed_set)
+            report["packs_compacted"] += compacted["packs_compacted"]
+            report["bytes_freed"] += compacted["bytes_reclaimed"]
+    elapsed = time.perf_counter() - started
+    report["elapsed_ms"] = round(elapsed * 1000.0, 1)
+    report["items_per_s"] = round((report["items_retired"] if not dry_run else report["items_scanned"]) / elapsed, 1) if elapsed > 0 else 0.0
+    return report
@@ -0,0 +1,75 @@
+-- Append-only change log for changeset sync between hosts (kcp.db.sync).
+-- One row per insert/update/delete of a synced row; the row content itself is read at export time.
+-- updated_at is the last-writer-wins clock (epoch ms), origin the host_id that made the change.
+-- Triggers stay quiet while an import holds meta.sync_applying; the import logs the remote change itself.
+INSERT OR IGNORE INTO meta (key, value) VALUES ('host_id', lower(hex(randomblob(8))));
+
+CREATE TABLE IF NOT EXISTS changes (
+  seq INTEGER PRIMARY KEY AUTOINCREMENT,
+  table_name TEXT NOT NULL,
+  row_id TEXT NOT NULL,
+  op TEXT NOT NULL,
+  updated_at INTEGER NOT NULL,
+  origin TEXT NOT NULL,
+  recorded_at INTEGER NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_changes_row ON changes(table_name, row_id);
+
+-- Existing rows are logged once, so a first export (since 0) carries the whole synced state.
+INSERT INTO changes (table_name, row_id, op, updated_at, origin, recorded_at)
+  SELECT 'assets', id, 'upsert', updated_at, (SELECT value FROM meta WHERE key = 'host_id'), CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER) FROM assets;
+INSERT INTO changes (table_name, row_id, op, updated_at, origin, recorded_at)
+  SELECT 'stacks', id, 'upsert', updated_at, (SELECT value FROM meta WHERE key = 'host_id'), CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER) FROM stacks;
+INSERT INTO changes (table_name, row_id, op, updated_at, origin, recorded_at)
+  SELECT 'keyframe_sets', id, 'upsert', updated_at, (SELECT value FROM meta WHERE key = 'host_id'), CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER) FROM keyframe_sets;
+INSERT INTO changes (table_name, row_id, op, updated_at, origin, recorded_at)
+  SELECT 'keyframe_set_items', id, 'upsert', created_at, (SELECT value FROM meta WHERE key = 'host_id'), CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER) FROM keyframe_set_items;
+
+CREATE TRIGGER IF NOT EXISTS trg_changes_assets_ins AFTER INSERT ON assets WHEN NOT EXISTS (SELECT 1 FROM meta WHERE key = 'sync_applying') BEGIN
+  INSERT INTO changes (table_name, row_id, op, updated_at, origin, recorded_at) VALUES ('assets', NEW.id, 'upsert', MAX(COALESCE(NEW.updated_at, 0), CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)), (SELECT value FROM meta WHERE key = 'host_id'), CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER));
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_changes_assets_upd AFTER UPDATE ON assets WHEN NOT EXISTS (SELECT 1 FROM meta WHERE key = 'sync_applying') BEGIN
+  INSERT INTO changes (table_name, row_id, op, updated_at, origin, recorded_at) VALUES ('assets', NEW.id, 'upsert', MAX(COALESCE(NEW.updated_at, 0), CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)), (SELECT value FROM meta WHERE key = 'host_id'), CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER));
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_changes_assets_del AFTER DELETE ON assets WHEN NOT EXISTS (SELECT 1 FROM meta WHERE key = 'sync_applying') BEGIN
+  INSERT INTO changes (table_name, row_id, op, updated_at, origin, recorded_at) VALUES ('assets', OLD.id, 'delete', CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER), (SELECT value FROM meta WHERE key = 'host_id'), CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER));
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_changes_stacks_ins AFTER INSERT ON stacks WHEN NOT EXISTS (SELECT 1 FROM meta WHERE key = 'sync_applying') BEGIN
+  INSERT INTO changes (table_name, row_id, op, updated_at, origin, recorded_at) VALUES ('stacks', NEW.id, 'upsert', MAX(COALESCE(NEW.updated_at, 0), CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)), (SELECT value FROM meta WHERE key = 'host_id'), CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER));
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_changes_stacks_upd AFTER UPDATE ON stacks WHEN NOT EXISTS (SELECT 1 FROM meta WHERE key = 'sync_applying') BEGIN
+  INSERT INTO changes (table_name, row_id, op, updated_at, origin, recorded_at) VALUES ('stacks', NEW.id, 'upsert', MAX(COALESCE(NEW.updated_at, 0), CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)), (SELECT value FROM meta WHERE key = 'host_id'), CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER));
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_changes_stacks_del AFTER DELETE ON stacks WHEN NOT EXISTS (SELECT 1 FROM meta WHERE key = 'sync_applying') BEGIN
+  INSERT INTO changes (table_name, row_id, op, updated_at, origin, recorded_at) VALUES ('stacks', OLD.id, 'delete', CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER), (SELECT value FROM meta WHERE key = 'host_id'), CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER));
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_changes_sets_ins AFTER INSERT ON keyframe_sets WHEN NOT EXISTS (SELECT 1 FROM meta WHERE key = 'sync_applying') BEGIN
+  INSERT INTO changes (table_name, row_id, op, updated_at, origin, recorded_at) VALUES ('keyframe_sets', NEW.id, 'upsert', MAX(COALESCE(NEW.updated_at, 0), CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)), (SELECT value FROM meta WHERE key = 'host_id'), CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER));
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_changes_sets_upd AFTER UPDATE ON keyframe_sets WHEN NOT EXISTS (SELECT 1 FROM meta WHERE key = 'sync_applying') BEGIN
+  INSERT INTO changes (table_name, row_id, op, updated_at, origin, recorded_at) VALUES ('keyframe_sets', NEW.id, 'upsert', MAX(COALESCE(NEW.updated_at, 0), CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)), (SELECT value FROM meta WHERE key = 'host_id'), CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER));
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_changes_sets_del AFTER DELETE ON keyframe_sets WHEN NOT EXISTS (SELECT 1 FROM meta WHERE key = 'sync_applying') BEGIN
+  INSERT INTO changes (table_name, row_id, op, updated_at, origin, recorded_at) VALUES ('keyframe_sets', OLD.id, 'delete', CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER), (SELECT value FROM meta WHERE key = 'host_id'), CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER));
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_changes_items_ins AFTER INSERT ON keyframe_set_items WHEN NOT EXISTS (SELECT 1 FROM meta WHERE key = 'sync_applying') BEGIN
+  INSERT INTO changes (table_name, row_id, op, updated_at, origin, recorded_at) VALUES ('keyframe_set_items', NEW.id, 'upsert', CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER), (SELECT value FROM meta WHERE key = 'host_id'), CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER));
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_changes_items_upd AFTER UPDATE ON keyframe_set_items WHEN NOT EXISTS (SELECT 1 FROM meta WHERE key = 'sync_applying') BEGIN
+  INSERT INTO changes (table_name, row_id, op, updated_at, origin, recorded_at) VALUES ('keyframe_set_items', NEW.id, 'upsert', CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER), (SELECT value FROM meta WHERE key = 'host_id'), CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER));
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_changes_items_del AFTER DELETE ON keyframe_set_items WHEN NOT EXISTS (SELECT 1 FROM meta WHERE key = 'sync_applying') BEGIN
+  INSERT INTO changes (table_name, row_id, op, updated_at, origin, recorded_at) VALUES ('keyframe_set_items', OLD.id, 'delete', CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER), (SELECT value FROM meta WHERE key = 'host_id'), CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER));
+END;
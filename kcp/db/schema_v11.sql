@@ -0,0 +1,30 @@
+-- Render work queue: one job per set item, claimed under a time-limited lease.
+-- state: pending | leased | done | failed. A leased job whose lease_expires_at
+-- has passed is claimable again; lease_token identifies the current holder.
+CREATE TABLE IF NOT EXISTS render_jobs (
+  item_id TEXT PRIMARY KEY,
+  set_id TEXT NOT NULL,
+  idx INTEGER NOT NULL,
+  state TEXT NOT NULL DEFAULT 'pending',
+  worker TEXT NOT NULL DEFAULT '',
+  lease_token TEXT,
+  leased_at INTEGER,
+  heartbeat_at INTEGER,
+  lease_expires_at INTEGER,
+  attempts INTEGER NOT NULL DEFAULT 0,
+  last_error TEXT NOT NULL DEFAULT '',
+  enqueued_at INTEGER NOT NULL,
+  updated_at INTEGER NOT NULL,
+  FOREIGN KEY(item_id) REFERENCES keyframe_set_items(id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_render_jobs_claim ON render_jobs(set_id, state, idx);
+CREATE INDEX IF NOT EXISTS idx_render_jobs_queue ON render_jobs(state, enqueued_at);
+
+-- Saving an image for a queued item finishes its job, whoever holds the lease.
+CREATE TRIGGER IF NOT EXISTS trg_render_jobs_item_saved AFTER UPDATE OF image_path ON keyframe_set_items
+WHEN COALESCE(NEW.image_path, '') != '' BEGIN
+  UPDATE render_jobs SET state = 'done', lease_token = NULL, lease_expires_at = NULL,
+    updated_at = CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)
+  WHERE item_id = NEW.id AND state != 'done';
+END;
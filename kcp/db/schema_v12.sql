@@ -0,0 +1,35 @@
+-- Item counter key for project_counters (schema v9): <tier>|<media_retention>, defined once.
+-- tier: none | archive | blob | pack | loose, read from the shape of image_path.
+ALTER TABLE keyframe_set_items ADD COLUMN counter_key TEXT GENERATED ALWAYS AS (
+  CASE
+    WHEN COALESCE(image_path, '') = '' THEN 'none'
+    WHEN substr(image_path, 1, 8) = 'archive/' THEN 'archive'
+    WHEN substr(image_path, 1, 6) = 'blobs/' THEN 'blob'
+    WHEN instr(image_path, '#') > 0 THEN 'pack'
+    ELSE 'loose'
+  END || '|' || COALESCE(media_retention, '')
+) VIRTUAL;
+
+DROP TRIGGER IF EXISTS trg_counters_items_ins;
+DROP TRIGGER IF EXISTS trg_counters_items_del;
+DROP TRIGGER IF EXISTS trg_counters_items_upd;
+
+DELETE FROM project_counters WHERE scope = 'items';
+INSERT INTO project_counters (scope, key, n) SELECT 'items', counter_key, COUNT(*) FROM keyframe_set_items GROUP BY counter_key;
+
+CREATE TRIGGER IF NOT EXISTS trg_counters_items_ins AFTER INSERT ON keyframe_set_items BEGIN
+  INSERT INTO project_counters (scope, key, n) VALUES ('items', NEW.counter_key, 1)
+    ON CONFLICT(scope, key) DO UPDATE SET n = n + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_counters_items_del AFTER DELETE ON keyframe_set_items BEGIN
+  UPDATE project_counters SET n = n - 1 WHERE scope = 'items' AND key = OLD.counter_key;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_counters_items_upd AFTER UPDATE OF image_path, media_retention ON keyframe_set_items
+  WHEN OLD.counter_key != NEW.counter_key
+BEGIN
+  UPDATE project_counters SET n = n - 1 WHERE scope = 'items' AND key = OLD.counter_key;
+  INSERT INTO project_counters (scope, key, n) VALUES ('items', NEW.counter_key, 1)
+    ON CONFLICT(scope, key) DO UPDATE SET n = n + 1;
+END;
@@ -0,0 +1,17 @@
+-- Storage-only rewrites of media refs (archiving, rehydration, blob/pack conversion, compaction,
+-- layout moves, retention) set meta.media_housekeeping inside their transaction. They change where
+-- the bytes live, not what the row says, so they are not logged as sync changes (schema v10).
+DROP TRIGGER IF EXISTS trg_changes_assets_upd;
+DROP TRIGGER IF EXISTS trg_changes_items_upd;
+
+CREATE TRIGGER IF NOT EXISTS trg_changes_assets_upd AFTER UPDATE ON assets
+  WHEN NOT EXISTS (SELECT 1 FROM meta WHERE key IN ('sync_applying', 'media_housekeeping'))
+BEGIN
+  INSERT INTO changes (table_name, row_id, op, updated_at, origin, recorded_at) VALUES ('assets', NEW.id, 'upsert', MAX(COALESCE(NEW.updated_at, 0), CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)), (SELECT value FROM meta WHERE key = 'host_id'), CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER));
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_changes_items_upd AFTER UPDATE ON keyframe_set_items
+  WHEN NOT EXISTS (SELECT 1 FROM meta WHERE key IN ('sync_applying', 'media_housekeeping'))
+BEGIN
+  INSERT INTO changes (table_name, row_id, op, updated_at, origin, recorded_at) VALUES ('keyframe_set_items', NEW.id, 'upsert', CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER), (SELECT value FROM meta WHERE key = 'host_id'), CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER));
+END;
@@ -0,0 +1,9 @@
+CREATE TABLE IF NOT EXISTS media_blobs (
+  sha256 TEXT PRIMARY KEY,
+  size_bytes INTEGER NOT NULL,
+  ref_count INTEGER NOT NULL DEFAULT 0,
+  created_at INTEGER NOT NULL,
+  updated_at INTEGER NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_media_blobs_refcount ON media_blobs(ref_count);
@@ -0,0 +1,8 @@
+CREATE TABLE IF NOT EXISTS media_previews (
+  owner_kind TEXT NOT NULL,
+  owner_id TEXT NOT NULL,
+  level_px INTEGER NOT NULL,
+  path TEXT NOT NULL,
+  created_at INTEGER NOT NULL,
+  PRIMARY KEY (owner_kind, owner_id, level_px)
+);
@@ -0,0 +1,3 @@
+ALTER TABLE keyframe_set_items ADD COLUMN phash TEXT;
+
+CREATE INDEX IF NOT EXISTS idx_items_phash ON keyframe_set_items(phash);
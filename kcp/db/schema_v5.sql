@@ -0,0 +1,15 @@
+CREATE TABLE IF NOT EXISTS media_packs (
+  set_id TEXT PRIMARY KEY,
+  pack_path TEXT NOT NULL,
+  created_at INTEGER NOT NULL,
+  updated_at INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS media_pack_entries (
+  pack_path TEXT NOT NULL,
+  name TEXT NOT NULL,
+  byte_offset INTEGER NOT NULL,
+  byte_length INTEGER NOT NULL,
+  created_at INTEGER NOT NULL,
+  PRIMARY KEY (pack_path, name)
+);
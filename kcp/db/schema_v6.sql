@@ -0,0 +1,8 @@
+CREATE TABLE IF NOT EXISTS media_scan_state (
+  path TEXT PRIMARY KEY,
+  size_bytes INTEGER NOT NULL,
+  mtime_ns INTEGER NOT NULL,
+  hashed INTEGER NOT NULL DEFAULT 0,
+  problems_json TEXT NOT NULL DEFAULT '[]',
+  checked_at INTEGER NOT NULL
+);
@@ -0,0 +1,4 @@
+ALTER TABLE keyframe_set_items ADD COLUMN media_retention TEXT DEFAULT '';
+ALTER TABLE keyframe_set_items ADD COLUMN media_retention_at INTEGER DEFAULT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_items_created ON keyframe_set_items(created_at);
@@ -0,0 +1,11 @@
+CREATE TABLE IF NOT EXISTS media_archive_entries (
+  archive_path TEXT NOT NULL,
+  member TEXT NOT NULL,
+  set_id TEXT NOT NULL,
+  byte_length INTEGER NOT NULL,
+  compressed_length INTEGER NOT NULL,
+  created_at INTEGER NOT NULL,
+  PRIMARY KEY (archive_path, member)
+);
+
+CREATE INDEX IF NOT EXISTS idx_archive_entries_set ON media_archive_entries(set_id);
@@ -0,0 +1,90 @@
+-- Rolled-up counts for KCP_ProjectDashboard, kept current by the triggers below.
+-- scope/key: items/<tier>|<media_retention>, sets_day/<YYYY-MM-DD>, sets_stack/<stack_id>,
+-- sets_policy/<variant_policy_id>, media/<blob|pack|archive|archive_compressed>.
+CREATE TABLE IF NOT EXISTS project_counters (
+  scope TEXT NOT NULL,
+  key TEXT NOT NULL,
+  n INTEGER NOT NULL DEFAULT 0,
+  picked INTEGER NOT NULL DEFAULT 0,
+  bytes INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (scope, key)
+) WITHOUT ROWID;
+
+DELETE FROM project_counters;
+-- The items scope is filled and maintained by schema v12, from keyframe_set_items.counter_key.
+INSERT INTO project_counters (scope, key, n, picked)
+  SELECT 'sets_day', date(s.created_at / 1000, 'unixepoch'), COUNT(*), SUM(s.picked_index IS NOT NULL) FROM keyframe_sets s GROUP BY 2;
+INSERT INTO project_counters (scope, key, n, picked)
+  SELECT 'sets_stack', s.stack_id, COUNT(*), SUM(s.picked_index IS NOT NULL) FROM keyframe_sets s GROUP BY 2;
+INSERT INTO project_counters (scope, key, n, picked)
+  SELECT 'sets_policy', s.variant_policy_id, COUNT(*), SUM(s.picked_index IS NOT NULL) FROM keyframe_sets s GROUP BY 2;
+INSERT INTO project_counters (scope, key, n, bytes) SELECT 'media', 'blob', COUNT(*), COALESCE(SUM(size_bytes), 0) FROM media_blobs;
+INSERT INTO project_counters (scope, key, n, bytes) SELECT 'media', 'pack', COUNT(*), COALESCE(SUM(byte_length), 0) FROM media_pack_entries;
+INSERT INTO project_counters (scope, key, n, bytes) SELECT 'media', 'archive', COUNT(*), COALESCE(SUM(byte_length), 0) FROM media_archive_entries;
+INSERT INTO project_counters (scope, key, n, bytes) SELECT 'media', 'archive_compressed', COUNT(*), COALESCE(SUM(compressed_length), 0) FROM media_archive_entries;
+
+CREATE TRIGGER IF NOT EXISTS trg_counters_sets_ins AFTER INSERT ON keyframe_sets BEGIN
+  INSERT INTO project_counters (scope, key, n, picked) VALUES ('sets_day', date(NEW.created_at / 1000, 'unixepoch'), 1, (NEW.picked_index IS NOT NULL))
+    ON CONFLICT(scope, key) DO UPDATE SET n = n + 1, picked = picked + excluded.picked;
+  INSERT INTO project_counters (scope, key, n, picked) VALUES ('sets_stack', NEW.stack_id, 1, (NEW.picked_index IS NOT NULL))
+    ON CONFLICT(scope, key) DO UPDATE SET n = n + 1, picked = picked + excluded.picked;
+  INSERT INTO project_counters (scope, key, n, picked) VALUES ('sets_policy', NEW.variant_policy_id, 1, (NEW.picked_index IS NOT NULL))
+    ON CONFLICT(scope, key) DO UPDATE SET n = n + 1, picked = picked + excluded.picked;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_counters_sets_del AFTER DELETE ON keyframe_sets BEGIN
+  UPDATE project_counters SET n = n - 1, picked = picked - (OLD.picked_index IS NOT NULL) WHERE scope = 'sets_day' AND key = date(OLD.created_at / 1000, 'unixepoch');
+  UPDATE project_counters SET n = n - 1, picked = picked - (OLD.picked_index IS NOT NULL) WHERE scope = 'sets_stack' AND key = OLD.stack_id;
+  UPDATE project_counters SET n = n - 1, picked = picked - (OLD.picked_index IS NOT NULL) WHERE scope = 'sets_policy' AND key = OLD.variant_policy_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_counters_sets_upd AFTER UPDATE OF picked_index, stack_id, variant_policy_id, created_at ON keyframe_sets BEGIN
+  UPDATE project_counters SET n = n - 1, picked = picked - (OLD.picked_index IS NOT NULL) WHERE scope = 'sets_day' AND key = date(OLD.created_at / 1000, 'unixepoch');
+  UPDATE project_counters SET n = n - 1, picked = picked - (OLD.picked_index IS NOT NULL) WHERE scope = 'sets_stack' AND key = OLD.stack_id;
+  UPDATE project_counters SET n = n - 1, picked = picked - (OLD.picked_index IS NOT NULL) WHERE scope = 'sets_policy' AND key = OLD.variant_policy_id;
+  INSERT INTO project_counters (scope, key, n, picked) VALUES ('sets_day', date(NEW.created_at / 1000, 'unixepoch'), 1, (NEW.picked_index IS NOT NULL))
+    ON CONFLICT(scope, key) DO UPDATE SET n = n + 1, picked = picked + excluded.picked;
+  INSERT INTO project_counters (scope, key, n, picked) VALUES ('sets_stack', NEW.stack_id, 1, (NEW.picked_index IS NOT NULL))
+    ON CONFLICT(scope, key) DO UPDATE SET n = n + 1, picked = picked + excluded.picked;
+  INSERT INTO project_counters (scope, key, n, picked) VALUES ('sets_policy', NEW.variant_policy_id, 1, (NEW.picked_index IS NOT NULL))
+    ON CONFLICT(scope, key) DO UPDATE SET n = n + 1, picked = picked + excluded.picked;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_counters_blobs_ins AFTER INSERT ON media_blobs BEGIN
+  INSERT INTO project_counters (scope, key, n, bytes) VALUES ('media', 'blob', 1, NEW.size_bytes)
+    ON CONFLICT(scope, key) DO UPDATE SET n = n + 1, bytes = bytes + excluded.bytes;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_counters_blobs_del AFTER DELETE ON media_blobs BEGIN
+  UPDATE project_counters SET n = n - 1, bytes = bytes - OLD.size_bytes WHERE scope = 'media' AND key = 'blob';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_counters_packs_ins AFTER INSERT ON media_pack_entries BEGIN
+  INSERT INTO project_counters (scope, key, n, bytes) VALUES ('media', 'pack', 1, NEW.byte_length)
+    ON CONFLICT(scope, key) DO UPDATE SET n = n + 1, bytes = bytes + excluded.bytes;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_counters_packs_del AFTER DELETE ON media_pack_entries BEGIN
+  UPDATE project_counters SET n = n - 1, bytes = bytes - OLD.byte_length WHERE scope = 'media' AND key = 'pack';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_counters_packs_upd AFTER UPDATE OF byte_length ON media_pack_entries BEGIN
+  UPDATE project_counters SET bytes = bytes - OLD.byte_length + NEW.byte_length WHERE scope = 'media' AND key = 'pack';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_counters_archive_ins AFTER INSERT ON media_archive_entries BEGIN
+  INSERT INTO project_counters (scope, key, n, bytes) VALUES ('media', 'archive', 1, NEW.byte_length)
+    ON CONFLICT(scope, key) DO UPDATE SET n = n + 1, bytes = bytes + excluded.bytes;
+  INSERT INTO project_counters (scope, key, n, bytes) VALUES ('media', 'archive_compressed', 1, NEW.compressed_length)
+    ON CONFLICT(scope, key) DO UPDATE SET n = n + 1, bytes = bytes + excluded.bytes;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_counters_archive_del AFTER DELETE ON media_archive_entries BEGIN
+  UPDATE project_counters SET n = n - 1, bytes = bytes - OLD.byte_length WHERE scope = 'media' AND key = 'archive';
+  UPDATE project_counters SET n = n - 1, bytes = bytes - OLD.compressed_length WHERE scope = 'media' AND key = 'archive_compressed';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_counters_archive_upd AFTER UPDATE OF byte_length, compressed_length ON media_archive_entries BEGIN
+  UPDATE project_counters SET bytes = bytes - OLD.byte_length + NEW.byte_length WHERE scope = 'media' AND key = 'archive';
+  UPDATE project_counters SET bytes = bytes - OLD.compressed_length + NEW.compressed_length WHERE scope = 'media' AND key = 'archive_compressed';
+END;
@@ -0,0 +1,303 @@
+from __future__ import annotations
+
+import csv
+import json
+import os
+import shutil
+import sqlite3
+import tarfile
+import tempfile
+import time
+import zipfile
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from kcp.db.blobs import blob_sha_from_ref, is_blob_ref
+from kcp.db.transfer import EXPORTS_DIRNAME, copy_stored_media, tar_member
+from kcp.util.durable_io import fsync_file
+from kcp.util.time_utils import now_ms
+
+
+SET_EXPORT_FORMAT = "kcp-set-export"
+SET_EXPORT_VERSION = 1
+SET_EXPORT_DESTINATIONS = ("folder", "tar")
+MANIFEST_JSON = "manifest.json"
+MANIFEST_CSV = "manifest.csv"
+MEDIA_DIRNAME = "media"
+STACK_SLOTS = ("character", "environment", "action", "camera", "lighting", "style")
+CSV_COLUMNS = (
+    "set_id", "set_name", "idx", "item_id", "picked", "seed", "base_seed", "width", "height", "model_ref",
+    "positive_prompt", "negative_prompt", "gen_params", "variant_policy_id", "variant_policy", "score",
+    "stack_id", "stack_name", *STACK_SLOTS, "promoted_assets", "set_created_at", "item_created_at",
+    "file", "sha256", "bytes", "source_path",
+)
+_COPY_CHUNK = 1024 * 1024
+_MAX_LISTED = 100
+
+
+def parse_date_bound(value: str, end: bool = False) -> int | None:
+    """`YYYY-MM-DD` (UTC) to epoch ms: the start of that day, or the start of the next one with `end`."""
+    value = (value or "").strip()
+    if not value:
+        return None
+    day = datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    if end:
+        day += timedelta(days=1)
+    return int(day.timestamp() * 1000)
+
+
+def _select_sql(set_ids: list[str], stack_id: str, since_ms: int | None, until_ms: int | None, picked_only: bool) -> tuple[str, list]:
+    """One joined query: items with their set, stack, stack component names and promoted keyframe assets."""
+    slots = ", ".join(f"a_{slot}.name AS {slot}" for slot in STACK_SLOTS)
+    slot_joins = " ".join(f"LEFT JOIN assets a_{slot} ON a_{slot}.id = st.{slot}_id" for slot in STACK_SLOTS)
+    where, params = [], []
+    if set_ids:
+        where.append("i.set_id IN (SELECT value FROM json_each(?))")
+        params.append(json.dumps(set_ids))
+    if stack_id:
+        where.append("s.stack_id = ?")
+        params.append(stack_id)
+    if since_ms is not None:
+        where.append("s.created_at >= ?")
+        params.append(since_ms)
+    if until_ms is not None:
+        where.append("s.created_at < ?")
+        params.append(until_ms)
+    if picked_only:
+        where.append("s.picked_index = i.idx")
+    sql = (
+        "WITH promoted AS ("
+        "SELECT json_extract(json_fields, '$.source.set_id') AS set_id, json_extract(json_fields, '$.source.idx') AS idx, "
+        "group_concat(name, ',') AS names FROM assets WHERE type = 'keyframe' AND json_extract(json_fields, '$.source.set_id') IS NOT NULL "
+        "GROUP BY 1, 2) "
+        "SELECT i.id AS item_id, i.set_id, i.idx, i.seed, i.positive_prompt, i.negative_prompt, i.gen_params_json, i.score_json, "
+        "i.image_path, i.created_at AS item_created_at, s.name AS set_name, s.stack_id, s.variant_policy_id, s.variant_policy_json, "
+        "s.base_seed, s.width, s.height, s.model_ref, s.picked_index, s.created_at AS set_created_at, st.name AS stack_name, "
+        f"{slots}, p.names AS promoted_assets "
+        "FROM keyframe_set_items i JOIN keyframe_sets s ON s.id = i.set_id LEFT JOIN stacks st ON st.id = s.stack_id "
+        f"{slot_joins} LEFT JOIN promoted p ON p.set_id = i.set_id AND p.idx = i.idx"
+    )
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    return sql + " ORDER BY s.created_at, i.set_id, i.idx", params
+
+
+def _json_or_raw(text: str | None):
+    try:
+        return json.loads(text) if text else {}
+    except ValueError:
+        return text
+
+
+def _manifest_row(row: sqlite3.Row) -> dict:
+    return {
+        "set_id": row["set_id"],
+        "set_name": row["set_name"] or "",
+        "idx": int(row["idx"]),
+        "item_id": row["item_id"],
+        "picked": row["picked_index"] is not None and int(row["picked_index"]) == int(row["idx"]),
+        "seed": int(row["seed"]),
+        "base_seed": int(row["base_seed"]),
+        "width": int(row["width"]),
+        "height": int(row["height"]),
+        "model_ref": row["model_ref"] or "",
+        "positive_prompt": row["positive_prompt"],
+        "negative_prompt": row["negative_prompt"] or "",
+        "gen_params": _json_or_raw(row["gen_params_json"]),
+        "variant_policy_id": row["variant_policy_id"],
+        "variant_policy": _json_or_raw(row["variant_policy_json"]),
+        "score": _json_or_raw(row["score_json"]),
+        "stack_id": row["stack_id"],
+        "stack_name": row["stack_name"] or "",
+        **{slot: row[slot] or "" for slot in STACK_SLOTS},
+        "promoted_assets": sorted((row["promoted_assets"] or "").split(",")) if row["promoted_assets"] else [],
+        "set_created_at": int(row["set_created_at"]),
+        "item_created_at": int(row["item_created_at"]),
+        "file": "",
+        "sha256": "",
+        "bytes": 0,
+        "source_path": row["image_path"] or "",
+    }
+
+
+def _csv_row(entry: dict) -> list:
+    out = []
+    for col in CSV_COLUMNS:
+        value = entry[col]
+        if isinstance(value, (dict, list)) and col != "promoted_assets":
+            value = json.dumps(value, sort_keys=True)
+        elif col == "promoted_assets":
+            value = ",".join(value)
+        out.append(value)
+    return out
+
+
+def _place_media(spool: Path, member: str, size: int, out: Path, tar: tarfile.TarFile | None, ts: int) -> None:
+    """Move a spooled image to `member`: appended to the tar, or renamed into the folder."""
+    if tar is not None:
+        with open(spool, "rb") as src:
+            tar.addfile(tar_member(member, size, ts), src)
+        spool.unlink()
+        # Nothing reads the member list back; dropping it keeps memory flat.
+        tar.members.clear()
+        return
+    target = out / member
+    if target.exists():
+        # Content-addressed: a file left by an earlier export into this folder is the same image.
+        spool.unlink()
+        return
+    os.replace(spool, target)
+
+
+def _place_manifests(td: Path, out: Path, tar: tarfile.TarFile | None, header: dict, rows_path: Path, csv_path: Path) -> None:
+    """Write `manifest.json` (the header with the spooled rows spliced in) and `manifest.csv`, after all media."""
+    json_path = td / "manifest.full.json"
+    with open(json_path, "wb") as dst, open(rows_path, "rb") as rows:
+        dst.write(json.dumps(header, indent=2)[:-2].encode("utf-8") + b',\n  "rows": ')
+        shutil.copyfileobj(rows, dst, _COPY_CHUNK)
+        dst.write(b"\n}\n")
+    for name, path in ((MANIFEST_CSV, csv_path), (MANIFEST_JSON, json_path)):
+        if tar is not None:
+            with open(path, "rb") as src:
+                tar.addfile(tar_member(name, os.fstat(src.fileno()).st_size, header["created_at"]), src)
+        else:
+            tmp = out / f"{name}.tmp"
+            shutil.copyfile(path, tmp)
+            os.replace(tmp, out / name)
+
+
+def export_sets(
+    conn: sqlite3.Connection,
+    root: Path,
+    out_path: Path | None = None,
+    destination: str = "folder",
+    *,
+    set_ids: list[str] | None = None,
+    stack_id: str = "",
+    since_ms: int | None = None,
+    until_ms: int | None = None,
+    picked_only: bool = True,
+) -> dict:
+    """Hand off set items (by default only picks) with their images and a denormalized manifest.
+
+    Items are selected with one joined query (see `_select_sql`) and filtered
+    by set ids, stack and set creation time (`[since_ms, until_ms)`). Each
+    image is stored once under `media/<sha256><ext>`, however many items
+    share it, in a folder or a tar. Each image is read once: it is copied to
+    a spool file while being hashed, and the spool is then named after that
+    digest, so a file that changes mid-export cannot be stored under the
+    wrong hash. `manifest.json` and `manifest.csv` carry
+    one row per item: prompts, seeds, gen params, variant policy, stack and
+    its component assets, and the keyframe assets promoted from it. Both are
+    spooled to disk while the media streams, and written last. Items whose
+    image is gone are still listed, with an empty `file`.
+    """
+    if destination not in SET_EXPORT_DESTINATIONS:
+        raise ValueError(f"unknown set export destination: {destination}")
+    started = time.perf_counter()
+    ts = now_ms()
+    suffix = ".tar" if destination == "tar" else ""
+    out = Path(out_path) if out_path else root / EXPORTS_DIRNAME / f"sets_{ts}{suffix}"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    filters = {
+        "set_ids": list(set_ids or []),
+        "stack_id": stack_id,
+        "since_ms": since_ms,
+        "until_ms": until_ms,
+        "picked_only": bool(picked_only),
+    }
+    report = {
+        "output_path": str(out),
+        "destination": destination,
+        "filter": filters,
+        "items": 0,
+        "sets": 0,
+        "files": 0,
+        "bytes": 0,
+        "deduplicated": 0,
+        "missing": 0,
+        "missing_items": [],
+    }
+    sql, params = _select_sql(filters["set_ids"], stack_id, since_ms, until_ms, picked_only)
+    seen: set[str] = set()
+    blob_files: dict[str, tuple[str, str, int]] = {}
+    sets: set[str] = set()
+    tmp_out = out.with_name(out.name + ".tmp")
+    tar = None
+    spool = None
+    try:
+        with tempfile.TemporaryDirectory(prefix="kcp_set_export_") as td:
+            rows_path, csv_path = Path(td) / "rows.json", Path(td) / MANIFEST_CSV
+            if destination == "tar":
+                tar = tarfile.open(tmp_out, "w", format=tarfile.PAX_FORMAT, copybufsize=_COPY_CHUNK)
+                spool = Path(td) / "media.spool"
+            else:
+                (out / MEDIA_DIRNAME).mkdir(parents=True, exist_ok=True)
+                # Spooled inside the output folder, so the final rename stays on one filesystem.
+                spool = out / MEDIA_DIRNAME / f".spool_{ts}.tmp"
+            with open(rows_path, "w", encoding="utf-8") as items_json, open(csv_path, "w", encoding="utf-8", newline="") as items_csv:
+                writer = csv.writer(items_csv)
+                writer.writerow(CSV_COLUMNS)
+                items_json.write("[")
+                for row in conn.execute(sql, params):
+                    entry = _manifest_row(row)
+                    sets.add(entry["set_id"])
+                    ref = entry["source_path"]
+                    if ref and is_blob_ref(ref) and blob_sha_from_ref(ref) in blob_files:
+                        # A blob already exported under this name: the store is content-addressed, so skip the read.
+                        file, sha, size = blob_files[blob_sha_from_ref(ref)]
+                        entry.update({"file": file, "sha256": sha, "bytes": size})
+                        report["deduplicated"] += 1
+                    elif ref:
+                        try:
+                            with open(spool, "wb") as dst:
+                                sha, size, ext = copy_stored_media(conn, root, ref, dst)
+                            entry.update({"file": f"{MEDIA_DIRNAME}/{sha}{ext}", "sha256": sha, "bytes": size})
+                            if is_blob_ref(ref):
+                                blob_files[blob_sha_from_ref(ref)] = (entry["file"], sha, size)
+                            if sha in seen:
+                                spool.unlink()
+                                report["deduplicated"] += 1
+                            else:
+                                _place_media(spool, entry["file"], size, out, tar, ts)
+                                seen.add(sha)
+                                report["files"] += 1
+                                report["bytes"] += size
+                        except (OSError, zipfile.BadZipFile):
+                            spool.unlink(missing_ok=True)
+                            entry.update({"file": "", "sha256": "", "bytes": 0})
+                    if not entry["file"]:
+                        report["missing"] += 1
+                        if len(report["missing_items"]) < _MAX_LISTED:
+                            report["missing_items"].append({"set_id": entry["set_id"], "idx": entry["idx"]})
+                    items_json.write(("," if report["items"] else "") + "\n    " + json.dumps(entry, sort_keys=True))
+                    writer.writerow(_csv_row(entry))
+                    report["items"] += 1
+                items_json.write("\n  ]")
+            report["sets"] = len(sets)
+            header = {
+                "format": SET_EXPORT_FORMAT,
+                "version": SET_EXPORT_VERSION,
+                "created_at": ts,
+                "filter": filters,
+                "sets": report["sets"],
+                "items": report["items"],
+                "files": report["files"],
+                "bytes": report["bytes"],
+                "missing": report["missing"],
+            }
+            _place_manifests(Path(td), out, tar, header, rows_path, csv_path)
+        if tar is not None:
+            tar.close()
+            tar = None
+            fsync_file(tmp_out)
+            os.replace(tmp_out, out)
+    except BaseException:
+        if tar is not None:
+            tar.close()
+        tmp_out.unlink(missing_ok=True)
+        if spool is not None:
+            spool.unlink(missing_ok=True)
+        raise
+    report["elapsed_ms"] = round((time.perf_counter() - started) * 1000.0, 1)
+    return report
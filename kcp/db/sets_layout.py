@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+from pathlib import Path
+
+from kcp.db.paths import SETS_DIRNAME, SETS_LAYOUTS, set_dir, set_dir_rel
+from kcp.db.repo import get_meta, media_housekeeping, set_meta
+
+
+META_SETS_LAYOUT = "sets_layout"
+
+
+def sets_layout(conn: sqlite3.Connection) -> str:
+    layout = get_meta(conn, META_SETS_LAYOUT, "flat")
+    return layout if layout in SETS_LAYOUTS else "flat"
+
+
+def set_sets_layout(conn: sqlite3.Connection, layout: str) -> None:
+    if layout not in SETS_LAYOUTS:
+        raise ValueError(f"unknown sets layout: {layout}")
+    set_meta(conn, META_SETS_LAYOUT, layout)
+
+
+def project_has_set_media(conn: sqlite3.Connection) -> bool:
+    row = conn.execute("SELECT 1 FROM keyframe_set_items WHERE image_path != '' OR thumb_path != '' LIMIT 1").fetchone()
+    return row is not None
+
+
+def _prune_empty_parents(path: Path, stop: Path) -> None:
+    while path != stop and path.is_dir():
+        try:
+            path.rmdir()
+        except OSError:
+            return
+        path = path.parent
+
+
+def _rewrite_prefix(conn: sqlite3.Connection, sql_table: str, column: str, where: str, params: tuple, old: str, new: str) -> int:
+    old_prefix = old + "/"
+    cur = conn.execute(
+        f"UPDATE {sql_table} SET {column} = ? || substr({column}, ?) WHERE {where} AND substr({column}, 1, ?) = ?",
+        (new + "/", len(old_prefix) + 1, *params, len(old_prefix), old_prefix),
+    )
+    return cur.rowcount
+
+
+def convert_sets_layout(conn: sqlite3.Connection, root: Path, layout: str, dry_run: bool = False) -> dict:
+    """Move every set directory to `layout` and rewrite the DB paths that point into it.
+
+    Each set is moved with one directory rename and its rows rewritten in one
+    transaction. The project switches to `layout` before the first move, so
+    new saves never land in the old layout. Re-running after an interruption
+    finishes the remaining sets, including one whose rename landed but whose
+    rows were not yet rewritten. Set pack refs and the pack index move along;
+    blob refs are untouched.
+    """
+    if layout not in SETS_LAYOUTS:
+        raise ValueError(f"unknown sets layout: {layout}")
+    current = sets_layout(conn)
+    other = [lay for lay in SETS_LAYOUTS if lay != layout]
+    report = {"dry_run": bool(dry_run), "from": current, "to": layout, "sets_seen": 0, "sets_moved": 0, "rows_rewritten": 0, "conflicts": []}
+    if not dry_run:
+        set_sets_layout(conn, layout)
+
+    sets_root = root / SETS_DIRNAME
+    for row in conn.execute("SELECT id FROM keyframe_sets ORDER BY id").fetchall():
+        set_id = row["id"]
+        report["sets_seen"] += 1
+        target_rel = set_dir_rel(set_id, layout)
+        target = set_dir(root, set_id, layout)
+        for old_layout in other:
+            old_rel = set_dir_rel(set_id, old_layout)
+            source = set_dir(root, set_id, old_layout)
+            if source.is_dir():
+                if target.exists():
+                    report["conflicts"].append(set_id)
+                    continue
+                report["sets_moved"] += 1
+                if not dry_run:
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    os.replace(source, target)
+                    _prune_empty_parents(source.parent, sets_root)
+            if dry_run:
+                continue
+            try:
+                with media_housekeeping(conn):
+                    item_ids = "SELECT id FROM keyframe_set_items WHERE set_id = ?"
+                    rewritten = 0
+                    for column in ("image_path", "thumb_path"):
+                        rewritten += _rewrite_prefix(conn, "keyframe_set_items", column, "set_id = ?", (set_id,), old_rel, target_rel)
+                    rewritten += _rewrite_prefix(
+                        conn, "media_previews", "path", f"owner_kind = 'set_item' AND owner_id IN ({item_ids})", (set_id,), old_rel, target_rel
+                    )
+                # Pack refs (`<set dir>/media.kpack#<name>`) moved with the directory; repoint the pack index too.
+                _rewrite_prefix(conn, "media_packs", "pack_path", "set_id = ?", (set_id,), old_rel, target_rel)
+                _rewrite_prefix(conn, "media_pack_entries", "pack_path", "1 = 1", (), old_rel, target_rel)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            report["rows_rewritten"] += rewritten
+    return report
@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from kcp.db.paths import SETS_DIRNAME, set_dir
+from kcp.db.repo import get_meta, set_meta
+from kcp.util.image_io import alloc_comfy_image, load_image_as_comfy, numpy_available, open_media
+
+
+META_SIDECAR_CACHE_MB = "sidecar_cache_mb"
+SIDECAR_SUFFIX = ".npy"
+# Eviction trims to this share of the budget, so the walk it needs is not repeated on the next miss.
+EVICT_TO_FRACTION = 0.9
+
+# Running sidecar byte total per project root, per process. Seeded by one walk,
+# then kept current by `load_set_item_image` writes and by every eviction.
+_totals: dict[str, int] = {}
+_totals_lock = threading.Lock()
+
+
+def sidecar_budget_bytes(conn: sqlite3.Connection) -> int:
+    """Project budget for decoded `.npy` sidecars; 0 (the default) disables them."""
+    try:
+        mb = int(get_meta(conn, META_SIDECAR_CACHE_MB, "0") or 0)
+    except ValueError:
+        mb = 0
+    return max(0, mb) * 1024 * 1024
+
+
+def set_sidecar_budget_mb(conn: sqlite3.Connection, mb: int) -> None:
+    set_meta(conn, META_SIDECAR_CACHE_MB, str(max(0, int(mb))))
+
+
+def sidecar_path(root: Path, set_id: str, idx: int, layout: str = "flat") -> Path:
+    return set_dir(root, set_id, layout) / f"{int(idx)}{SIDECAR_SUFFIX}"
+
+
+def load_sidecar(sidecar: Path, source: Path):
+    """Memory-map a valid sidecar as `uint8[H,W,3]`, or return None.
+
+    A sidecar is valid when its mtime equals the source's mtime (set at write
+    time). Hits bump the sidecar's atime, which orders LRU eviction.
+    """
+    try:
+        src_mtime = source.stat().st_mtime_ns
+        if sidecar.stat().st_mtime_ns != src_mtime:
+            return None
+    except OSError:
+        return None
+    import numpy as np  # type: ignore
+
+    try:
+        arr = np.load(sidecar, mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+    if arr.dtype != np.uint8 or arr.ndim != 3 or arr.shape[2] != 3:
+        return None
+    os.utime(sidecar, ns=(time.time_ns(), src_mtime))
+    return arr
+
+
+def write_sidecar(sidecar: Path, source: Path):
+    """Decode `source` once and store it as a `uint8[H,W,3]` `.npy` sidecar."""
+    import numpy as np  # type: ignore
+    from PIL import Image
+
+    src_mtime = source.stat().st_mtime_ns
+    with open_media(source) as fh, Image.open(fh) as img:
+        arr = np.asarray(img if img.mode == "RGB" else img.convert("RGB"))
+    sidecar.parent.mkdir(parents=True, exist_ok=True)
+    tmp = sidecar.with_name(sidecar.name + ".tmp")
+    with open(tmp, "wb") as fh:
+        np.save(fh, arr)
+    os.replace(tmp, sidecar)
+    os.utime(sidecar, ns=(time.time_ns(), src_mtime))
+    return arr
+
+
+def sidecar_to_comfy(arr: Any):
+    import numpy as np  # type: ignore
+
+    h, w = int(arr.shape[0]), int(arr.shape[1])
+    out, view = alloc_comfy_image(1, h, w)
+    np.multiply(arr, np.float32(1.0 / 255.0), out=view[0], casting="unsafe")
+    return out
+
+
+def _iter_sidecars(root: Path, set_id: str = "", layout: str = "flat"):
+    if set_id:
+        set_dirs = [set_dir(root, set_id, layout)]
+    else:
+        # Whole project: set dirs sit one (flat) or three (sharded) levels below sets/.
+        set_dirs = [Path(d) for d, _, _ in os.walk(root / SETS_DIRNAME)]
+    for d in set_dirs:
+        if not d.is_dir():
+            continue
+        for entry in os.scandir(d):
+            if entry.name.endswith(SIDECAR_SUFFIX) and entry.is_file():
+                yield entry
+
+
+def enforce_budget(root: Path, budget_bytes: int, target_bytes: int | None = None) -> dict:
+    """Delete least-recently-used sidecars until the project total fits `budget_bytes` (or `target_bytes`)."""
+    target = budget_bytes if target_bytes is None else target_bytes
+    entries = []
+    for entry in _iter_sidecars(root):
+        st = entry.stat()
+        entries.append((st.st_atime_ns, st.st_size, Path(entry.path)))
+    total = sum(e[1] for e in entries)
+    evicted = 0
+    evicted_bytes = 0
+    for _, size, path in sorted(entries):
+        if total <= target:
+            break
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        total -= size
+        evicted += 1
+        evicted_bytes += size
+    with _totals_lock:
+        _totals[os.path.abspath(root)] = total
+    return {"bytes": total, "evicted": evicted, "evicted_bytes": evicted_bytes}
+
+
+def _note_sidecar_write(root: Path, delta: int, budget_bytes: int) -> None:
+    """Add one write to the running total; walk the sets tree only to seed it or once it exceeds the budget.
+
+    Writes by other processes are only seen at the next walk, so the total
+    (and thus the budget) is approximate between walks.
+    """
+    key = os.path.abspath(root)
+    with _totals_lock:
+        total = _totals.get(key)
+        if total is not None:
+            total = _totals[key] = total + delta
+    if total is None:
+        total = sidecar_stats(root)["bytes"]
+        with _totals_lock:
+            _totals[key] = total
+    if total > budget_bytes:
+        enforce_budget(root, budget_bytes, int(budget_bytes * EVICT_TO_FRACTION))
+
+
+def clear_sidecars(root: Path, set_id: str = "", layout: str = "flat") -> dict:
+    files = 0
+    size = 0
+    for entry in list(_iter_sidecars(root, set_id, layout)):
+        size += entry.stat().st_size
+        os.unlink(entry.path)
+        files += 1
+    with _totals_lock:
+        _totals.pop(os.path.abspath(root), None)
+    return {"files_removed": files, "bytes_removed": size}
+
+
+def sidecar_stats(root: Path, set_id: str = "", layout: str = "flat") -> dict:
+    files = 0
+    size = 0
+    for entry in _iter_sidecars(root, set_id, layout):
+        files += 1
+        size += entry.stat().st_size
+    return {"files": files, "bytes": size}
+
+
+def load_set_item_image(root: Path, set_id: str, idx: int, source: Path, budget_bytes: int, layout: str = "flat"):
+    """Load a set item IMAGE through its sidecar when the cache is enabled.
+
+    Misses decode once and write the sidecar. The project budget is checked
+    against a running total, so only a miss that pushes it over the budget
+    walks the sets tree to evict.
+    Without a budget or NumPy this is `load_image_as_comfy`.
+    """
+    if budget_bytes <= 0 or not numpy_available():
+        return load_image_as_comfy(source)
+    sidecar = sidecar_path(root, set_id, idx, layout)
+    arr = load_sidecar(sidecar, source)
+    if arr is None:
+        try:
+            before = sidecar.stat().st_size
+        except OSError:
+            before = 0
+        arr = write_sidecar(sidecar, source)
+        _note_sidecar_write(root, sidecar.stat().st_size - before, budget_bytes)
+    return sidecar_to_comfy(arr)
@@ -0,0 +1,430 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tarfile
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+from kcp.db.blobs import add_ref, blob_rel_path, blob_sha_from_ref, blob_store_enabled, ingest_file, is_blob_ref, release_ref
+from kcp.db.migrate import LATEST_SCHEMA_VERSION, get_user_version
+from kcp.db.paths import set_dir_rel
+from kcp.db.previews import record_previews
+from kcp.db.repo import get_meta
+from kcp.db.sets_layout import sets_layout
+from kcp.db.transfer import EXPORTS_DIRNAME, hash_stored_media, open_stored_media, tar_member
+from kcp.util.durable_io import fsync_file
+from kcp.util.hashing import sha256_file
+from kcp.util.time_utils import now_ms
+
+
+CHANGESET_FORMAT = "kcp-changeset"
+CHANGESET_VERSION = 1
+# Parents before children: upserts are applied in this order, deletes in reverse.
+SYNC_TABLES = ("assets", "stacks", "keyframe_sets", "keyframe_set_items")
+MEDIA_COLUMNS = {"assets": ("image_path", "thumb_path"), "keyframe_set_items": ("image_path", "thumb_path")}
+PREVIEW_OWNERS = {"assets": "asset", "keyframe_set_items": "set_item"}
+META_HOST_ID = "host_id"
+META_SYNC_APPLYING = "sync_applying"
+HEADER_MEMBER = "changeset.json"
+CHANGES_MEMBER = "changes.jsonl"
+MEDIA_PREFIX = "media/"
+_COPY_CHUNK = 1024 * 1024
+_MAX_LISTED = 100
+
+
+def host_id(conn: sqlite3.Connection) -> str:
+    """This project's sync identity, created by schema v10. A copied DB file shares it with its source."""
+    return get_meta(conn, META_HOST_ID)
+
+
+def _table_columns(conn: sqlite3.Connection, table: str) -> list[str]:
+    return [row["name"] for row in conn.execute(f"PRAGMA main.table_info({table})")]
+
+
+def export_changes(conn: sqlite3.Connection, root: Path, since: int = 0, out_path: Path | None = None) -> dict:
+    """Write every synced row changed after `changes.seq = since` to a changeset tar.
+
+    Each row appears once, with its latest change (`upsert` carries the current
+    row, `delete` only the id) and that change's `updated_at` clock and origin
+    host, so rows received from other hosts travel on with their original
+    clock. Media columns are shipped by content: the row gets an empty ref, the
+    change a `media` entry with sha256/size/ext, and each distinct file is
+    stored once as `media/<sha256>`. Report `until` is the watermark for the
+    next export.
+    """
+    started = time.perf_counter()
+    ts = now_ms()
+    since = int(since)
+    until = int(conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0])
+    origin = host_id(conn)
+    out = Path(out_path) if out_path else root / EXPORTS_DIRNAME / f"changes_{origin}_{since}_{until}.tar"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp_out = out.with_name(out.name + ".tmp")
+    report = {
+        "changeset_path": str(out),
+        "origin": origin,
+        "since": since,
+        "until": until,
+        "changes": 0,
+        "by_table": {},
+        "files": 0,
+        "bytes": 0,
+        "missing": 0,
+        "missing_paths": [],
+    }
+    seen: set[str] = set()
+    try:
+        with tempfile.TemporaryDirectory(prefix="kcp_sync_") as td:
+            lines_path = Path(td) / CHANGES_MEMBER
+            with tarfile.open(tmp_out, "w", format=tarfile.PAX_FORMAT, copybufsize=_COPY_CHUNK) as tar:
+                with open(lines_path, "w", encoding="utf-8") as lines:
+                    for table in SYNC_TABLES:
+                        cols = _table_columns(conn, table)
+                        counts = {"upsert": 0, "delete": 0}
+                        # NOT INDEXED keeps this a rowid range scan over the new part of the log.
+                        sql = (
+                            f"SELECT c.row_id AS _row_id, c.op AS _op, c.updated_at AS _clock, c.origin AS _origin, t.id AS _present, "
+                            f"{', '.join('t.' + c for c in cols)} FROM changes c JOIN ("
+                            "SELECT MAX(seq) AS seq FROM changes NOT INDEXED WHERE seq > ? AND seq <= ? AND table_name = ? GROUP BY row_id"
+                            f") last ON last.seq = c.seq LEFT JOIN {table} t ON t.id = c.row_id ORDER BY c.seq"
+                        )
+                        for row in conn.execute(sql, (since, until, table)):
+                            op = row["_op"]
+                            if op == "upsert" and row["_present"] is None:
+                                continue
+                            change = {"table": table, "id": row["_row_id"], "op": op, "updated_at": int(row["_clock"]), "origin": row["_origin"]}
+                            if op == "upsert":
+                                data = {c: row[c] for c in cols}
+                                media = {}
+                                for col in MEDIA_COLUMNS.get(table, ()):
+                                    ref, data[col] = data[col] or "", ""
+                                    if ref:
+                                        media[col] = _ship_media(conn, root, ref, tar, seen, ts, report)
+                                change["row"] = data
+                                change["media"] = media
+                            lines.write(json.dumps(change) + "\n")
+                            counts[op] += 1
+                            report["changes"] += 1
+                        report["by_table"][table] = counts
+                lines_sha = sha256_file(lines_path)
+                tar.add(lines_path, arcname=CHANGES_MEMBER)
+                header = {
+                    "format": CHANGESET_FORMAT,
+                    "version": CHANGESET_VERSION,
+                    "created_at": ts,
+                    "origin": origin,
+                    "since": since,
+                    "until": until,
+                    "schema_version": get_user_version(conn),
+                    "changes": {"path": CHANGES_MEMBER, "sha256": lines_sha, "count": report["changes"]},
+                    "files": report["files"],
+                    "bytes": report["bytes"],
+                }
+                data = json.dumps(header, indent=2).encode("utf-8")
+                with tempfile.TemporaryFile() as fh:
+                    fh.write(data)
+                    fh.seek(0)
+                    tar.addfile(tar_member(HEADER_MEMBER, len(data), ts), fh)
+        fsync_file(tmp_out)
+        os.replace(tmp_out, out)
+    except BaseException:
+        tmp_out.unlink(missing_ok=True)
+        raise
+    report["elapsed_ms"] = round((time.perf_counter() - started) * 1000.0, 1)
+    return report
+
+
+def _ship_media(conn: sqlite3.Connection, root: Path, ref: str, tar: tarfile.TarFile, seen: set[str], ts: int, report: dict) -> dict | None:
+    """Add one stored file to the changeset (once per hash); None when it cannot be read here."""
+    try:
+        sha, size, ext = hash_stored_media(conn, root, ref)
+        if sha not in seen:
+            with open_stored_media(conn, root, ref) as (src, length):
+                tar.addfile(tar_member(MEDIA_PREFIX + sha, length, ts), src)
+            # Nothing reads the member list back; dropping it keeps memory flat.
+            tar.members.clear()
+            seen.add(sha)
+            report["files"] += 1
+            report["bytes"] += length
+    except (OSError, zipfile.BadZipFile):
+        report["missing"] += 1
+        if len(report["missing_paths"]) < _MAX_LISTED:
+            report["missing_paths"].append(ref)
+        return None
+    return {"sha256": sha, "size": size, "ext": ext}
+
+
+def _read_changeset(changeset: Path, staging: Path) -> tuple[dict, Path]:
+    """Stage every media member as `staging/<sha256>` and the change list, checking all hashes."""
+    header = None
+    lines_sha = None
+    lines_path = staging / CHANGES_MEMBER
+    try:
+        with tarfile.open(changeset, "r:", copybufsize=_COPY_CHUNK) as tar:
+            while True:
+                member = tar.next()
+                if member is None:
+                    break
+                tar.members.clear()
+                if not member.isfile():
+                    continue
+                fh = tar.extractfile(member)
+                if member.name.startswith(MEDIA_PREFIX):
+                    sha = member.name[len(MEDIA_PREFIX) :]
+                    if len(sha) != 64 or not all(c in "0123456789abcdef" for c in sha):
+                        raise ValueError(f"unexpected media member: {member.name}")
+                    dst_path = staging / sha
+                    digest = hashlib.sha256()
+                    with open(dst_path, "wb") as dst:
+                        for chunk in iter(lambda: fh.read(_COPY_CHUNK), b""):
+                            digest.update(chunk)
+                            dst.write(chunk)
+                    if digest.hexdigest() != sha:
+                        raise ValueError(f"media hash mismatch: {member.name}")
+                elif member.name == CHANGES_MEMBER:
+                    digest = hashlib.sha256()
+                    with open(lines_path, "wb") as dst:
+                        for chunk in iter(lambda: fh.read(_COPY_CHUNK), b""):
+                            digest.update(chunk)
+                            dst.write(chunk)
+                    lines_sha = digest.hexdigest()
+                elif member.name == HEADER_MEMBER:
+                    header = json.loads(fh.read())
+    except (tarfile.TarError, json.JSONDecodeError) as e:
+        raise ValueError(f"not a KCP changeset: {changeset} ({e})") from e
+    if not isinstance(header, dict) or header.get("format") != CHANGESET_FORMAT:
+        raise ValueError(f"not a KCP changeset: {changeset}")
+    if lines_sha is None or lines_sha != header.get("changes", {}).get("sha256"):
+        raise ValueError(f"change list hash mismatch: {changeset}")
+    if int(header.get("schema_version", 0)) > LATEST_SCHEMA_VERSION:
+        raise ValueError(f"changeset schema v{header['schema_version']} is newer than this install (v{LATEST_SCHEMA_VERSION})")
+    return header, lines_path
+
+
+def _loose_rel(table: str, row: dict, col: str, ext: str, layout: str) -> str:
+    """Where a loose copy of synced media goes: the path a local save would have used."""
+    thumb = col == "thumb_path"
+    if table == "keyframe_set_items":
+        return f"{set_dir_rel(row['set_id'], layout)}/{int(row['idx'])}{'_thumb' if thumb else ''}{ext}"
+    return f"{'thumbs' if thumb else 'images'}/{row['type']}/{row['id']}/{'thumb' if thumb else 'original'}{ext}"
+
+
+def _stored_sha(conn: sqlite3.Connection, root: Path, ref: str, current: sqlite3.Row, col: str) -> str | None:
+    if is_blob_ref(ref):
+        return blob_sha_from_ref(ref)
+    if col == "image_path" and "image_hash" in current.keys() and current["image_hash"]:
+        return current["image_hash"]
+    try:
+        return hash_stored_media(conn, root, ref)[0]
+    except (OSError, zipfile.BadZipFile):
+        return None
+
+
+def _place_media(conn: sqlite3.Connection, root: Path, staging: Path, table: str, row: dict, col: str, media: dict, current, ctx: dict) -> str:
+    """Local ref for one incoming media column: the current one when it already holds these bytes, else a new copy.
+
+    New files go to the blob store when it is enabled, else to the loose path
+    a local save would use. A loose file that already exists there is only
+    replaced after the commit (see `ctx["pending"]`).
+    """
+    sha = media["sha256"]
+    old = (current[col] or "") if current is not None else ""
+    if old and _stored_sha(conn, root, old, current, col) == sha:
+        return old
+    if ctx["use_blobs"]:
+        rel = blob_rel_path(sha)
+        if (root / rel).exists():
+            add_ref(conn, root, rel)
+        else:
+            copy = staging / "ingest.tmp"
+            shutil.copyfile(staging / sha, copy)
+            ingest_file(conn, root, copy, sha256=sha)
+            ctx["written"].append(root / rel)
+    else:
+        rel = _loose_rel(table, row, col, media.get("ext") or "", ctx["layout"])
+        target = root / rel
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if target.exists():
+            tmp = target.with_name(target.name + ".sync.tmp")
+            shutil.copyfile(staging / sha, tmp)
+            ctx["pending"].append((tmp, target))
+        else:
+            shutil.copyfile(staging / sha, target)
+            ctx["written"].append(target)
+    if old != rel:
+        release_ref(conn, old)
+    return rel
+
+
+def _upsert(conn: sqlite3.Connection, root: Path, staging: Path, change: dict, current, ctx: dict) -> None:
+    table = change["table"]
+    row = dict(change["row"])
+    media = change.get("media") or {}
+    placed: dict[str, str] = {}
+    for col in MEDIA_COLUMNS.get(table, ()):
+        entry = media.get(col, "absent")
+        if entry == "absent":
+            # Cleared on the other host.
+            if current is not None:
+                release_ref(conn, current[col])
+            row[col] = ""
+        elif entry is None:
+            # The other host could not read its file; keep whatever this host has.
+            row[col] = (current[col] or "") if current is not None else ""
+        elif entry["sha256"] in placed:
+            # A thumb that shares the image's bytes shares its ref too.
+            row[col] = placed[entry["sha256"]]
+            add_ref(conn, root, row[col])
+            if current is not None and current[col] != row[col]:
+                release_ref(conn, current[col])
+        else:
+            row[col] = placed[entry["sha256"]] = _place_media(conn, root, staging, table, row, col, entry, current, ctx)
+    if current is not None and table in PREVIEW_OWNERS and row.get("image_path") != current["image_path"]:
+        # Preview levels belong to the old image; readers fall back to the original until they are rebuilt.
+        record_previews(conn, root, PREVIEW_OWNERS[table], change["id"], {})
+    cols = [c for c in ctx["columns"][table] if c in row]
+    updates = ", ".join(f"{c} = excluded.{c}" for c in cols if c != "id")
+    conn.execute(
+        f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))}) ON CONFLICT(id) DO UPDATE SET {updates}",
+        [row[c] for c in cols],
+    )
+
+
+def _delete(conn: sqlite3.Connection, root: Path, table: str, current) -> None:
+    """Delete one row, releasing the blob refs and preview rows of everything that goes with it."""
+    owned = [(table, current)]
+    if table == "keyframe_sets":
+        owned += [("keyframe_set_items", item) for item in conn.execute("SELECT * FROM keyframe_set_items WHERE set_id = ?", (current["id"],))]
+    for owner_table, row in owned:
+        for col in MEDIA_COLUMNS.get(owner_table, ()):
+            release_ref(conn, row[col])
+        if owner_table in PREVIEW_OWNERS:
+            record_previews(conn, root, PREVIEW_OWNERS[owner_table], row["id"], {})
+    conn.execute(f"DELETE FROM {table} WHERE id = ?", (current["id"],))
+
+
+def _apply_change(conn: sqlite3.Connection, root: Path, staging: Path, change: dict, ctx: dict) -> str:
+    """Apply one change if it wins last-writer-wins; returns applied / stale / duplicate / conflict.
+
+    The clock is `(updated_at, origin)`: the later write wins, and the origin
+    host id breaks ties the same way on every host. Applied changes are
+    logged with their original clock, which makes a repeated import a no-op.
+    """
+    table, row_id = change["table"], change["id"]
+    incoming = (int(change["updated_at"]), str(change["origin"]))
+    last = conn.execute(
+        "SELECT updated_at, origin FROM changes WHERE table_name = ? AND row_id = ? ORDER BY seq DESC LIMIT 1", (table, row_id)
+    ).fetchone()
+    if last is not None:
+        local = (int(last["updated_at"]), str(last["origin"]))
+        if incoming == local:
+            return "duplicate"
+        if incoming < local:
+            return "stale"
+    current = conn.execute(f"SELECT * FROM {table} WHERE id = ?", (row_id,)).fetchone()
+    marks = (len(ctx["written"]), len(ctx["pending"]))
+    conn.execute("SAVEPOINT sync_change")
+    try:
+        if change["op"] == "delete":
+            if current is not None:
+                _delete(conn, root, table, current)
+        else:
+            _upsert(conn, root, staging, change, current, ctx)
+        conn.execute(
+            "INSERT INTO changes (table_name, row_id, op, updated_at, origin, recorded_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (table, row_id, change["op"], incoming[0], incoming[1], now_ms()),
+        )
+        conn.execute("RELEASE sync_change")
+    except sqlite3.IntegrityError:
+        # A unique name taken by another row, or a parent this host does not have.
+        conn.execute("ROLLBACK TO sync_change")
+        conn.execute("RELEASE sync_change")
+        for path in ctx["written"][marks[0] :]:
+            path.unlink(missing_ok=True)
+        for tmp, _ in ctx["pending"][marks[1] :]:
+            tmp.unlink(missing_ok=True)
+        del ctx["written"][marks[0] :], ctx["pending"][marks[1] :]
+        return "conflict"
+    return "applied"
+
+
+def _iter_changes(lines_path: Path, op: str, table: str):
+    with open(lines_path, encoding="utf-8") as fh:
+        for line in fh:
+            change = json.loads(line)
+            if change["op"] == op and change["table"] == table:
+                yield change
+
+
+def import_changes(conn: sqlite3.Connection, root: Path, changeset: Path) -> dict:
+    """Apply a changeset from another host in one transaction.
+
+    All hashes are checked before anything changes. Upserts run parents
+    first, deletes children first, each decided by `_apply_change`; rows that
+    hit a unique name or a missing parent are counted as conflicts and left
+    alone. The local change-log triggers are paused meanwhile (via
+    `meta.sync_applying`), so a change is never re-stamped with this host's
+    clock. Loose files of deleted rows stay on disk as orphans.
+    """
+    started = time.perf_counter()
+    changeset = Path(changeset)
+    report = {
+        "changeset_path": str(changeset),
+        "origin": None,
+        "since": None,
+        "until": None,
+        "changes": 0,
+        "applied": 0,
+        "stale": 0,
+        "duplicate": 0,
+        "conflict": 0,
+        "conflicts": [],
+        "by_table": {},
+        "files_written": 0,
+    }
+    # Staged under the root, so media moves into place on the same filesystem.
+    with tempfile.TemporaryDirectory(prefix=".kcp_sync_", dir=root) as td:
+        staging = Path(td)
+        header, lines_path = _read_changeset(changeset, staging)
+        report.update({"origin": header["origin"], "since": header["since"], "until": header["until"]})
+        ctx = {
+            "layout": sets_layout(conn),
+            "use_blobs": blob_store_enabled(conn),
+            "columns": {t: _table_columns(conn, t) for t in SYNC_TABLES},
+            "written": [],
+            "pending": [],
+        }
+        conn.commit()
+        try:
+            conn.execute("INSERT INTO meta (key, value) VALUES (?, ?)", (META_SYNC_APPLYING, header["origin"]))
+            for op, tables in (("upsert", SYNC_TABLES), ("delete", tuple(reversed(SYNC_TABLES)))):
+                for table in tables:
+                    counts = report["by_table"].setdefault(table, {"applied": 0, "stale": 0, "duplicate": 0, "conflict": 0})
+                    for change in _iter_changes(lines_path, op, table):
+                        outcome = _apply_change(conn, root, staging, change, ctx)
+                        report["changes"] += 1
+                        report[outcome] += 1
+                        counts[outcome] += 1
+                        if outcome == "conflict" and len(report["conflicts"]) < _MAX_LISTED:
+                            report["conflicts"].append({"table": table, "id": change["id"], "op": op})
+            conn.execute("DELETE FROM meta WHERE key = ?", (META_SYNC_APPLYING,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            for path in ctx["written"]:
+                path.unlink(missing_ok=True)
+            for tmp, _ in ctx["pending"]:
+                tmp.unlink(missing_ok=True)
+            raise
+        # Loose files the committed rows already pointed at change only now.
+        for tmp, target in ctx["pending"]:
+            os.replace(tmp, target)
+        report["files_written"] = len(ctx["written"]) + len(ctx["pending"])
+    report["elapsed_ms"] = round((time.perf_counter() - started) * 1000.0, 1)
+    return report
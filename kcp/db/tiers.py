@@ -0,0 +1,378 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+import time
+import zipfile
+from pathlib import Path
+
+from kcp.db.blobs import BLOBS_DIRNAME, blob_sha_from_ref, blob_store_enabled, ingest_file, is_blob_ref, release_ref
+from kcp.db.packs import compact_packs, drop_loose_files, is_pack_ref, media_source, pack_files, resolve_packed, set_packs_enabled
+from kcp.db.paths import SETS_DIRNAME, set_dir, set_item_media_rels
+from kcp.db.repo import media_housekeeping
+from kcp.db.sets_layout import sets_layout
+from kcp.db.sidecars import SIDECAR_SUFFIX
+from kcp.util.durable_io import finalize_file, fsync_dir, fsync_file
+from kcp.util.image_io import open_media, probe
+from kcp.util.time_utils import now_ms
+
+
+ARCHIVE_DIRNAME = "archive"
+ARCHIVE_SUFFIX = ".zip"
+ARCHIVE_REF_SEP = "#"
+_DAY_MS = 24 * 60 * 60 * 1000
+# Archives without any index entry may belong to a run that has not committed yet.
+_GC_GRACE_MS = 60 * 60 * 1000
+
+
+def is_archive_ref(rel: str | None) -> bool:
+    text = str(rel or "").replace("\\", "/")
+    return text.startswith(f"{ARCHIVE_DIRNAME}/") and ARCHIVE_REF_SEP in text and text.split(ARCHIVE_REF_SEP, 1)[0].endswith(ARCHIVE_SUFFIX)
+
+
+def split_archive_ref(rel: str) -> tuple[str, str]:
+    archive_rel, member = str(rel).replace("\\", "/").split(ARCHIVE_REF_SEP, 1)
+    return archive_rel, member
+
+
+def archive_ref(archive_rel: str, member: str) -> str:
+    return f"{archive_rel}{ARCHIVE_REF_SEP}{member}"
+
+
+def _month(ts_ms: int) -> str:
+    return time.strftime("%Y-%m", time.gmtime(int(ts_ms) / 1000.0))
+
+
+def cold_sets(conn: sqlite3.Connection, older_than_days: float, set_id: str = "") -> list[sqlite3.Row]:
+    """Sets not picked, edited or extended for `older_than_days` that still have hot full-res images."""
+    cutoff = now_ms() - int(float(older_than_days) * _DAY_MS)
+    sql = (
+        "SELECT s.id, s.created_at, MAX(s.updated_at, MAX(i.created_at)) AS touched_at "
+        "FROM keyframe_sets s JOIN keyframe_set_items i ON i.set_id = s.id "
+        "WHERE i.image_path != '' AND i.image_path NOT LIKE ?"
+    )
+    params: list = [f"{ARCHIVE_DIRNAME}/%"]
+    if set_id:
+        sql += " AND s.id = ?"
+        params.append(set_id)
+    sql += " GROUP BY s.id HAVING touched_at < ? ORDER BY s.created_at, s.id"
+    return conn.execute(sql, (*params, cutoff)).fetchall()
+
+
+def _hot_items(conn: sqlite3.Connection, set_id: str) -> list[sqlite3.Row]:
+    # Thumbs stay hot; an item whose thumb is the image itself is left alone.
+    return conn.execute(
+        "SELECT id, idx, image_path FROM keyframe_set_items WHERE set_id = ? AND image_path != '' "
+        "AND image_path != thumb_path AND thumb_path != '' AND image_path NOT LIKE ? ORDER BY idx",
+        (set_id, f"{ARCHIVE_DIRNAME}/%"),
+    ).fetchall()
+
+
+def _write_archive(root: Path, archive_rel: str, members: list[tuple[str, object]]) -> dict[str, tuple[int, int]]:
+    """Write a new, immutable zip with `members` and fsync it; returns `{member: (size, compressed)}`."""
+    archive = root / archive_rel
+    archive.parent.mkdir(parents=True, exist_ok=True)
+    tmp = archive.with_name(archive.name + ".tmp")
+    sizes: dict[str, tuple[int, int]] = {}
+    with zipfile.ZipFile(tmp, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for member, source in members:
+            with open_media(source) as src, zf.open(member, "w") as dst:
+                while True:
+                    chunk = src.read(1024 * 1024)
+                    if not chunk:
+                        break
+                    dst.write(chunk)
+        for info in zf.infolist():
+            sizes[info.filename] = (info.file_size, info.compress_size)
+    fsync_file(tmp)
+    os.replace(tmp, archive)
+    fsync_dir(archive.parent)
+    return sizes
+
+
+def _archived_copies(conn: sqlite3.Connection, set_id: str) -> dict[str, list[tuple[str, int]]]:
+    """`{member: [(archive_path, byte_length), ...]}` for every archived copy of a set's images."""
+    copies: dict[str, list[tuple[str, int]]] = {}
+    for row in conn.execute("SELECT archive_path, member, byte_length FROM media_archive_entries WHERE set_id = ? ORDER BY created_at", (set_id,)):
+        copies.setdefault(row["member"], []).append((row["archive_path"], int(row["byte_length"])))
+    return copies
+
+
+def _same_bytes(zips: dict, root: Path, archive_rel: str, member: str, source) -> bool:
+    try:
+        if archive_rel not in zips:
+            zips[archive_rel] = zipfile.ZipFile(root / archive_rel)
+        with zips[archive_rel].open(member) as a, open_media(source) as b:
+            while True:
+                chunk = a.read(1024 * 1024)
+                if chunk != b.read(1024 * 1024):
+                    return False
+                if not chunk:
+                    return True
+    except (OSError, KeyError, zipfile.BadZipFile):
+        return False
+
+
+def archive_cold_sets(conn: sqlite3.Connection, root: Path, older_than_days: float = 90, set_id: str = "", dry_run: bool = True) -> dict:
+    """Move the full-res images of cold sets into per-month zip archives.
+
+    Each run writes one new archive per production month,
+    `archive/<YYYY-MM>/<ts>.zip`, fsynced before any row changes, so archives
+    are never rewritten in place. Each set's rows are then repointed at
+    `<archive>#<member>` refs in one transaction, and the hot copies are
+    removed only after that commit (blob refs released, packs compacted).
+    Thumbs and preview levels stay hot. An image that was rehydrated and not
+    changed since is pointed back at its existing archive copy (`reused`)
+    instead of being archived again.
+    """
+    report = {
+        "dry_run": bool(dry_run),
+        "older_than_days": float(older_than_days),
+        "sets": 0,
+        "items": 0,
+        "reused": 0,
+        "bytes": 0,
+        "compressed_bytes": 0,
+        "archives": [],
+    }
+    sets = cold_sets(conn, older_than_days, set_id)
+    by_month: dict[str, list[tuple[sqlite3.Row, list[sqlite3.Row]]]] = {}
+    for s in sets:
+        items = _hot_items(conn, s["id"])
+        if items:
+            by_month.setdefault(_month(s["created_at"]), []).append((s, items))
+    layout = sets_layout(conn)
+    ts = now_ms()
+    zips: dict[str, zipfile.ZipFile] = {}
+    try:
+        for month, month_sets in sorted(by_month.items()):
+            archive_rel = f"{ARCHIVE_DIRNAME}/{month}/{ts}{ARCHIVE_SUFFIX}"
+            members: list[tuple[str, object]] = []
+            planned: list[tuple[str, list[tuple[sqlite3.Row, str, str]]]] = []
+            for s, items in month_sets:
+                packed = resolve_packed(conn, root, [i["image_path"] for i in items])
+                copies = _archived_copies(conn, s["id"])
+                rows = []
+                for item in items:
+                    source = media_source(root, item["image_path"], packed)
+                    if not source.exists():
+                        continue
+                    # Blob refs carry no suffix; the member name keeps the format for rehydration.
+                    suffix = Path(item["image_path"].split("#")[-1]).suffix or "." + (probe(source)["format"].lower() or "png")
+                    member = f"{s['id']}/{item['idx']}{suffix}"
+                    size = source.length if hasattr(source, "length") else os.stat(source).st_size
+                    kept = next((a for a, n in copies.get(member, ()) if n == size and _same_bytes(zips, root, a, member, source)), None)
+                    if kept is not None:
+                        report["reused"] += 1
+                        rows.append((item, kept, member))
+                        continue
+                    members.append((member, source))
+                    rows.append((item, archive_rel, member))
+                if rows:
+                    planned.append((s["id"], rows))
+            if not planned:
+                continue
+            report["sets"] += len(planned)
+            report["items"] += sum(len(rows) for _, rows in planned)
+            if dry_run:
+                report["bytes"] += sum(os.stat(m).st_size if not hasattr(m, "length") else m.length for _, m in members)
+                if members:
+                    report["archives"].append({"archive_path": archive_rel, "sets": len(planned), "items": len(members)})
+                continue
+            sizes: dict[str, tuple[int, int]] = {}
+            if members:
+                sizes = _write_archive(root, archive_rel, members)
+                report["bytes"] += sum(s[0] for s in sizes.values())
+                report["compressed_bytes"] += sum(s[1] for s in sizes.values())
+                report["archives"].append({"archive_path": archive_rel, "sets": len(planned), "items": len(members)})
+            for sid, rows in planned:
+                _repoint_set(conn, root, sid, archive_rel, rows, sizes, layout)
+    finally:
+        for zf in zips.values():
+            zf.close()
+    return report
+
+
+def _repoint_set(conn, root: Path, set_id: str, archive_rel: str, rows, sizes: dict, layout: str) -> None:
+    unlink: list[Path] = []
+    released: list[str] = []
+    compact = False
+    ts = now_ms()
+    try:
+        with media_housekeeping(conn):
+            for item, item_archive, member in rows:
+                old = item["image_path"]
+                if item_archive == archive_rel:
+                    size, compressed = sizes[member]
+                    conn.execute(
+                        "INSERT INTO media_archive_entries (archive_path, member, set_id, byte_length, compressed_length, created_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(archive_path, member) DO UPDATE SET set_id = excluded.set_id, "
+                        "byte_length = excluded.byte_length, compressed_length = excluded.compressed_length, created_at = excluded.created_at",
+                        (archive_rel, member, set_id, size, compressed, ts),
+                    )
+                conn.execute("UPDATE keyframe_set_items SET image_path = ? WHERE id = ?", (archive_ref(item_archive, member), item["id"]))
+                unlink.append(set_dir(root, set_id, layout) / f"{item['idx']}{SIDECAR_SUFFIX}")
+                if is_blob_ref(old):
+                    release_ref(conn, old)
+                    released.append(old)
+                elif is_pack_ref(old):
+                    compact = True
+                else:
+                    unlink.append(root / old)
+        for rel in released:
+            sha = blob_sha_from_ref(rel)
+            row = conn.execute("SELECT ref_count FROM media_blobs WHERE sha256 = ?", (sha,)).fetchone()
+            if row is not None and int(row["ref_count"]) == 0:
+                conn.execute("DELETE FROM media_blobs WHERE sha256 = ?", (sha,))
+                unlink.append(root / rel)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    for path in unlink:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+    if compact:
+        compact_packs(conn, root, set_id=set_id)
+
+
+def rehydrate_item(conn: sqlite3.Connection, root: Path, set_id: str, idx: int, durability: str = "none") -> str:
+    """Restore an archived item image to the hot tier; returns the item's (possibly new) image ref.
+
+    The image is stored the way a fresh save would be (loose, blob or pack),
+    and the row is repointed before any loose leftovers are removed. The
+    archive itself is immutable, so its copy stays in place: archiving the
+    item again reuses that copy, and `gc_archives` reclaims it once the item
+    has been re-saved.
+    """
+    row = conn.execute("SELECT id, image_path FROM keyframe_set_items WHERE set_id = ? AND idx = ?", (set_id, int(idx))).fetchone()
+    if row is None or not is_archive_ref(row["image_path"]):
+        return row["image_path"] if row is not None else ""
+    archive_rel, member = split_archive_ref(row["image_path"])
+    ext = Path(member).suffix.lstrip(".") or "png"
+    layout = sets_layout(conn)
+    image_rel, _ = set_item_media_rels(set_id, int(idx), ext, layout)
+    image_abs = root / image_rel
+    image_abs.parent.mkdir(parents=True, exist_ok=True)
+    tmp = image_abs.with_name(image_abs.name + ".tmp")
+    with zipfile.ZipFile(root / archive_rel) as zf, zf.open(member) as src, open(tmp, "wb") as dst:
+        while True:
+            chunk = src.read(1024 * 1024)
+            if not chunk:
+                break
+            dst.write(chunk)
+    finalize_file(tmp, image_abs, "file" if durability != "none" else "none")
+    packed: dict = {}
+    try:
+        if blob_store_enabled(conn):
+            image_rel, _ = ingest_file(conn, root, image_abs)
+        elif set_packs_enabled(conn):
+            packed = pack_files(conn, root, set_id, layout, [image_abs], durability)
+            image_rel = packed[image_abs]
+        with media_housekeeping(conn):
+            conn.execute("UPDATE keyframe_set_items SET image_path = ? WHERE id = ?", (image_rel, row["id"]))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    drop_loose_files(packed)
+    return image_rel
+
+
+def gc_archives(conn: sqlite3.Connection, root: Path, dry_run: bool = True) -> dict:
+    """Drop archive index entries no item points at, and delete archives with no live member.
+
+    Archives are immutable, so one that still holds a live member is kept
+    whole; its dead members are reported as `dead_bytes_kept`. Archive files
+    without any index entry are deleted only once they are older than
+    `_GC_GRACE_MS`, so a run that has not committed yet keeps its archive.
+    Index rows are removed in one transaction, and files only after it.
+    """
+    live = {row[0] for row in conn.execute("SELECT image_path FROM keyframe_set_items WHERE image_path LIKE ?", (f"{ARCHIVE_DIRNAME}/%",))}
+    live_archives = {split_archive_ref(ref)[0] for ref in live if is_archive_ref(ref)}
+    indexed: set[str] = set()
+    dead: list[tuple[str, str]] = []
+    dead_bytes: dict[str, int] = {}
+    for row in conn.execute("SELECT archive_path, member, compressed_length FROM media_archive_entries"):
+        indexed.add(row["archive_path"])
+        if archive_ref(row["archive_path"], row["member"]) not in live:
+            dead.append((row["archive_path"], row["member"]))
+            dead_bytes[row["archive_path"]] = dead_bytes.get(row["archive_path"], 0) + int(row["compressed_length"])
+    cutoff_ns = (now_ms() - _GC_GRACE_MS) * 1_000_000
+    doomed: list[tuple[Path, int]] = []
+    for dirpath, _, names in os.walk(root / ARCHIVE_DIRNAME):
+        for name in names:
+            if not name.endswith(ARCHIVE_SUFFIX):
+                continue
+            path = Path(dirpath) / name
+            rel = path.relative_to(root).as_posix()
+            st = path.stat()
+            if rel not in live_archives and (rel in indexed or st.st_mtime_ns < cutoff_ns):
+                doomed.append((path, st.st_size))
+    report = {
+        "dry_run": bool(dry_run),
+        "entries_dropped": len(dead),
+        "archives_deleted": len(doomed),
+        "bytes_freed": sum(size for _, size in doomed),
+        "dead_bytes_kept": sum(n for a, n in dead_bytes.items() if a in live_archives),
+    }
+    if dry_run:
+        return report
+    try:
+        conn.executemany("DELETE FROM media_archive_entries WHERE archive_path = ? AND member = ?", dead)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    for path, _ in doomed:
+        path.unlink(missing_ok=True)
+    return report
+
+
+def tier_stats(conn: sqlite3.Connection, root: Path) -> dict:
+    """Hot/cold byte and item counts for the project's set media.
+
+    Hot bytes are the files under `SETS_DIRNAME` (every set layout) plus the
+    blobs that set items and their preview levels point at; asset media are
+    not counted.
+    """
+    from kcp.db.integrity import walk_media
+
+    set_blobs = {
+        row[0]
+        for row in conn.execute(
+            "SELECT image_path FROM keyframe_set_items WHERE image_path LIKE ?1 UNION SELECT thumb_path FROM keyframe_set_items WHERE thumb_path LIKE ?1 "
+            "UNION SELECT path FROM media_previews WHERE owner_kind = 'set_item' AND path LIKE ?1",
+            (f"{BLOBS_DIRNAME}/%",),
+        )
+    }
+    hot_bytes = sum(size for rel, (size, _) in walk_media(root).items() if rel.startswith(f"{SETS_DIRNAME}/") or rel in set_blobs)
+    archive_bytes = 0
+    archives = 0
+    for dirpath, _, names in os.walk(root / ARCHIVE_DIRNAME):
+        for name in names:
+            if name.endswith(ARCHIVE_SUFFIX):
+                archives += 1
+                archive_bytes += os.stat(os.path.join(dirpath, name)).st_size
+    # Split each ref in SQL so every item is one primary-key lookup into the archive index.
+    row = conn.execute(
+        "SELECT COUNT(*) AS n, COALESCE(SUM(e.byte_length), 0) AS bytes, COALESCE(SUM(e.compressed_length), 0) AS compressed "
+        "FROM keyframe_set_items i JOIN media_archive_entries e "
+        "ON e.archive_path = substr(i.image_path, 1, instr(i.image_path, ?) - 1) AND e.member = substr(i.image_path, instr(i.image_path, ?) + 1) "
+        "WHERE i.image_path LIKE ?",
+        (ARCHIVE_REF_SEP, ARCHIVE_REF_SEP, f"{ARCHIVE_DIRNAME}/%"),
+    ).fetchone()
+    hot_items = conn.execute(
+        "SELECT COUNT(*) FROM keyframe_set_items WHERE image_path != '' AND image_path NOT LIKE ?", (f"{ARCHIVE_DIRNAME}/%",)
+    ).fetchone()[0]
+    return {
+        "hot_bytes": hot_bytes,
+        "hot_items": int(hot_items),
+        "cold_items": int(row["n"]),
+        "cold_bytes": int(row["bytes"]),
+        "cold_compressed_bytes": int(row["compressed"]),
+        "archive_files": archives,
+        "archive_bytes_on_disk": archive_bytes,
+    }
@@ -0,0 +1,674 @@
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import tarfile
+import tempfile
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+
+from kcp.db.blobs import BLOBS_DIRNAME, blob_sha_from_ref, is_blob_ref
+from kcp.db.migrate import LATEST_SCHEMA_VERSION, get_user_version
+from kcp.db.packs import PackedMedia, is_pack_ref, split_pack_ref
+from kcp.db.paths import set_dir_rel
+from kcp.db.repo import connect
+from kcp.db.sets_layout import sets_layout
+from kcp.db.tiers import is_archive_ref, split_archive_ref
+from kcp.util.durable_io import fsync_file
+from kcp.util.image_io import open_media
+from kcp.util.time_utils import now_ms
+
+
+EXPORT_FORMAT = "kcp-project-export"
+EXPORT_VERSION = 1
+EXPORT_MEDIA_MODES = ("full", "thumbs", "picked")
+IMPORT_CONFLICT_MODES = ("skip", "replace")
+EXPORTS_DIRNAME = "exports"
+MANIFEST_MEMBER = "manifest.json"
+MANIFEST_FILES_MEMBER = "manifest.jsonl"
+DB_MEMBER = "db/kcp.sqlite"
+MEDIA_PREFIX = "media/"
+# Derived or machine-local state: rebuilt by triggers or the next scan, never merged.
+# `meta` holds this project's own settings (layout, blob store, packs, sync ids), so it is never merged either.
+_SKIP_TABLES = {"meta", "project_counters", "media_scan_state", "sqlite_sequence", "changes", "render_jobs"}
+_COPY_CHUNK = 1024 * 1024
+_VERIFY_BATCH = 256
+_MAX_LISTED = 100
+# Import reads members up to this size whole and hashes them on the pool; larger ones stream inline.
+_INLINE_MAX = 4 * 1024 * 1024
+_INFLIGHT_BYTES = 64 * 1024 * 1024
+
+
+def _workers(workers: int) -> int:
+    return int(workers) if int(workers) > 0 else min(32, (os.cpu_count() or 1) + 4)
+
+
+def _copy_hashed(src, dst) -> tuple[str, int]:
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in iter(lambda: src.read(_COPY_CHUNK), b""):
+        digest.update(chunk)
+        dst.write(chunk)
+        size += len(chunk)
+    return digest.hexdigest(), size
+
+
+class _HashingReader:
+    """File-like wrapper that hashes whatever is read through it."""
+
+    def __init__(self, fh):
+        self.fh = fh
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def read(self, n: int = -1) -> bytes:
+        chunk = self.fh.read(n)
+        self.digest.update(chunk)
+        self.size += len(chunk)
+        return chunk
+
+    def __iter__(self):
+        for line in self.fh:
+            self.digest.update(line)
+            self.size += len(line)
+            yield line
+
+
+def tar_member(name: str, size: int, mtime_ms: int) -> tarfile.TarInfo:
+    info = tarfile.TarInfo(name)
+    info.size = int(size)
+    info.mtime = int(mtime_ms) // 1000
+    info.mode = 0o644
+    return info
+
+
+def _snapshot(conn: sqlite3.Connection, dest: Path) -> None:
+    """Consistent copy of the live DB through SQLite's online backup API."""
+    out = sqlite3.connect(dest)
+    try:
+        conn.backup(out)
+    finally:
+        out.close()
+
+
+def _media_refs_sql() -> str:
+    return (
+        "SELECT image_path AS path FROM assets UNION SELECT thumb_path FROM assets "
+        "UNION SELECT image_path FROM keyframe_set_items UNION SELECT thumb_path FROM keyframe_set_items "
+        "UNION SELECT path FROM media_previews"
+    )
+
+
+def _localize_refs(snap: sqlite3.Connection, media: str) -> None:
+    """Trim a snapshot to `media` and turn its remaining pack/archive refs into loose paths.
+
+    Dropped full-res images get an empty `image_path` (thumbs and preview levels
+    stay). Each rewritten ref is kept in `temp.ref_sources(path, source)` so the
+    exporter can still read it from the live pack or archive.
+    """
+    keep_picked = "EXISTS (SELECT 1 FROM keyframe_sets s WHERE s.id = set_id AND s.picked_index = idx)" if media == "picked" else "0"
+    snap.execute(
+        f"UPDATE keyframe_set_items SET image_path = '' WHERE image_path != '' AND image_path != thumb_path AND NOT {keep_picked}"
+    )
+    layout = sets_layout(snap)
+    snap.execute("CREATE TEMP TABLE ref_sources (source TEXT PRIMARY KEY, path TEXT NOT NULL)")
+    rows = []
+    for row in snap.execute(f"SELECT path FROM ({_media_refs_sql()}) WHERE instr(path, '#') > 0"):
+        ref = row["path"]
+        if is_pack_ref(ref):
+            pack_rel, name = split_pack_ref(ref)
+            rows.append((ref, f"{pack_rel.rsplit('/', 1)[0]}/{name}"))
+        elif is_archive_ref(ref):
+            set_id, name = split_archive_ref(ref)[1].split("/", 1)
+            rows.append((ref, f"{set_dir_rel(set_id, layout)}/{name}"))
+    snap.executemany("INSERT OR IGNORE INTO ref_sources (source, path) VALUES (?, ?)", rows)
+    for table, column in (
+        ("assets", "image_path"),
+        ("assets", "thumb_path"),
+        ("keyframe_set_items", "image_path"),
+        ("keyframe_set_items", "thumb_path"),
+        ("media_previews", "path"),
+    ):
+        snap.execute(
+            f"UPDATE {table} SET {column} = (SELECT path FROM temp.ref_sources WHERE source = {column}) "
+            f"WHERE {column} IN (SELECT source FROM temp.ref_sources)"
+        )
+    snap.commit()
+
+
+def _export_sources(snap: sqlite3.Connection, media: str):
+    """Yield `(rel, source_ref)` for every file the export carries, each rel once."""
+    if media == "full":
+        sql = (
+            f"SELECT path, path AS source FROM ({_media_refs_sql()} UNION SELECT pack_path FROM media_packs "
+            "UNION SELECT pack_path FROM media_pack_entries UNION SELECT archive_path FROM media_archive_entries) "
+            "WHERE path != '' AND instr(path, '#') = 0 ORDER BY path"
+        )
+    else:
+        sql = (
+            f"SELECT r.path, COALESCE(m.source, r.path) AS source FROM ({_media_refs_sql()}) r "
+            "LEFT JOIN temp.ref_sources m ON m.path = r.path WHERE r.path != '' AND instr(r.path, '#') = 0 ORDER BY r.path"
+        )
+    yield from snap.execute(sql)
+
+
+@contextmanager
+def open_stored_media(conn: sqlite3.Connection, root: Path, source: str):
+    """`(stream, size)` for a stored ref: a loose file, a live pack entry or a cold archive member."""
+    if is_pack_ref(source):
+        pack_rel, name = split_pack_ref(source)
+        row = conn.execute(
+            "SELECT byte_offset, byte_length FROM media_pack_entries WHERE pack_path = ? AND name = ?", (pack_rel, name)
+        ).fetchone()
+        entry = PackedMedia(root / pack_rel, name, row["byte_offset"], row["byte_length"]) if row is not None else None
+        if entry is None or not entry.exists():
+            raise FileNotFoundError(source)
+        with open_media(entry) as fh:
+            yield fh, entry.length
+    elif is_archive_ref(source):
+        archive_rel, member = split_archive_ref(source)
+        with zipfile.ZipFile(root / archive_rel) as zf:
+            try:
+                info = zf.getinfo(member)
+            except KeyError as e:
+                raise FileNotFoundError(source) from e
+            with zf.open(info) as fh:
+                yield fh, info.file_size
+    else:
+        with open(root / source, "rb") as fh:
+            yield fh, os.fstat(fh.fileno()).st_size
+
+
+def _sniff_suffix(ref: str, head: bytes) -> str:
+    """File suffix for an exported image; blob refs carry none, so those are told apart by their magic bytes."""
+    suffix = Path(ref.rsplit("#", 1)[-1]).suffix.lower()
+    if suffix:
+        return suffix
+    if head.startswith(b"\x89PNG"):
+        return ".png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    if head.startswith(b"\xff\xd8"):
+        return ".jpg"
+    return ".bin"
+
+
+def hash_stored_media(conn: sqlite3.Connection, root: Path, ref: str) -> tuple[str, int, str]:
+    """`(sha256, size, suffix)` of a stored image, read once; blob refs already name their hash."""
+    with open_stored_media(conn, root, ref) as (src, size):
+        head = src.read(_COPY_CHUNK)
+        if is_blob_ref(ref):
+            return blob_sha_from_ref(ref), size, _sniff_suffix(ref, head)
+        digest = hashlib.sha256(head)
+        for chunk in iter(lambda: src.read(_COPY_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest(), size, _sniff_suffix(ref, head)
+
+
+def copy_stored_media(conn: sqlite3.Connection, root: Path, ref: str, dst) -> tuple[str, int, str]:
+    """Copy a stored image into the open file `dst`, hashing it on the way; returns `(sha256, size, suffix)`.
+
+    The source is read once, so the digest always matches the bytes written.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    head = b""
+    with open_stored_media(conn, root, ref) as (src, _):
+        for chunk in iter(lambda: src.read(_COPY_CHUNK), b""):
+            head = head or chunk
+            digest.update(chunk)
+            dst.write(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size, _sniff_suffix(ref, head)
+
+
+def export_project(conn: sqlite3.Connection, root: Path, out_path: Path | None = None, media: str = "full") -> dict:
+    """Write the project to one tar stream: the selected media, a DB snapshot and a hash manifest.
+
+    `media="full"` carries every referenced file as stored (packs and cold
+    archives included). `thumbs` keeps asset media, set thumbs and preview
+    levels; `picked` also keeps the full-res image of each set's picked item.
+    Both trimmed modes store their media as loose files and clear the refs of
+    dropped images in the snapshot. Files are hashed while they are copied,
+    and the manifest is spooled to disk and written after the media, with the
+    `manifest.json` header last. Files that vanish before they are read are
+    listed under `missing`.
+    """
+    if media not in EXPORT_MEDIA_MODES:
+        raise ValueError(f"unknown export media mode: {media}")
+    started = time.perf_counter()
+    ts = now_ms()
+    out = Path(out_path) if out_path else root / EXPORTS_DIRNAME / f"kcp_export_{ts}.tar"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp_out = out.with_name(out.name + ".tmp")
+    report = {"archive_path": str(out), "media": media, "files": 0, "bytes": 0, "missing": 0, "missing_paths": []}
+    try:
+        with tempfile.TemporaryDirectory(prefix="kcp_export_") as td:
+            snap_path = Path(td) / "kcp.sqlite"
+            _snapshot(conn, snap_path)
+            snap = sqlite3.connect(snap_path)
+            snap.row_factory = sqlite3.Row
+            try:
+                if media != "full":
+                    _localize_refs(snap, media)
+                files_path = Path(td) / MANIFEST_FILES_MEMBER
+                with tarfile.open(tmp_out, "w", format=tarfile.PAX_FORMAT, copybufsize=_COPY_CHUNK) as tar, open(files_path, "wb") as lines:
+                    for row in _export_sources(snap, media):
+                        rel = row["path"].replace("\\", "/")
+                        with ExitStack() as stack:
+                            try:
+                                src, size = stack.enter_context(open_stored_media(snap, root, row["source"]))
+                            except (OSError, zipfile.BadZipFile):
+                                report["missing"] += 1
+                                if len(report["missing_paths"]) < _MAX_LISTED:
+                                    report["missing_paths"].append(rel)
+                                continue
+                            reader = _HashingReader(src)
+                            tar.addfile(tar_member(MEDIA_PREFIX + rel, size, ts), reader)
+                        # Writing never reads the member list back; dropping it keeps memory flat.
+                        tar.members.clear()
+                        lines.write(json.dumps({"path": rel, "sha256": reader.digest.hexdigest(), "size": size}).encode("utf-8") + b"\n")
+                        report["files"] += 1
+                        report["bytes"] += size
+                    if media != "full":
+                        snap.execute("DELETE FROM media_pack_entries")
+                        snap.execute("DELETE FROM media_packs")
+                        snap.execute("DELETE FROM media_archive_entries")
+                        snap.commit()
+                    snap.close()
+                    lines.close()
+                    members = {}
+                    for name, path in ((DB_MEMBER, snap_path), (MANIFEST_FILES_MEMBER, files_path)):
+                        with open(path, "rb") as src:
+                            reader = _HashingReader(src)
+                            tar.addfile(tar_member(name, os.fstat(src.fileno()).st_size, ts), reader)
+                        members[name] = {"path": name, "sha256": reader.digest.hexdigest(), "size": reader.size}
+                    header = {
+                        "format": EXPORT_FORMAT,
+                        "version": EXPORT_VERSION,
+                        "created_at": ts,
+                        "media": media,
+                        "schema_version": get_user_version(conn),
+                        "db": members[DB_MEMBER],
+                        "manifest": members[MANIFEST_FILES_MEMBER],
+                        "files": report["files"],
+                        "bytes": report["bytes"],
+                        "missing": report["missing"],
+                    }
+                    data = json.dumps(header, indent=2).encode("utf-8")
+                    tar.addfile(tar_member(MANIFEST_MEMBER, len(data), ts), io.BytesIO(data))
+            finally:
+                snap.close()
+        fsync_file(tmp_out)
+        os.replace(tmp_out, out)
+    except BaseException:
+        tmp_out.unlink(missing_ok=True)
+        raise
+    report["archive_bytes"] = out.stat().st_size
+    report["elapsed_ms"] = round((time.perf_counter() - started) * 1000.0, 1)
+    return report
+
+
+def _batched(items, size: int):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _hash_path(path: Path) -> str | None:
+    try:
+        with open(path, "rb") as fh:
+            digest = hashlib.sha256()
+            for chunk in iter(lambda: fh.read(_COPY_CHUNK), b""):
+                digest.update(chunk)
+            return digest.hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+def _work_db(td: Path) -> sqlite3.Connection:
+    """Scratch DB for manifest and staged entries, so neither is held in memory."""
+    work = sqlite3.connect(td / "work.sqlite", check_same_thread=False)
+    work.row_factory = sqlite3.Row
+    work.execute("PRAGMA journal_mode = OFF")
+    work.execute("PRAGMA synchronous = OFF")
+    work.execute("CREATE TABLE manifest (path TEXT PRIMARY KEY, sha256 TEXT NOT NULL, size INTEGER NOT NULL)")
+    work.execute("CREATE TABLE staged (path TEXT PRIMARY KEY, sha256 TEXT, size INTEGER, tmp TEXT)")
+    return work
+
+
+def _media_rel(name: str) -> str:
+    rel = name[len(MEDIA_PREFIX) :]
+    parts = rel.split("/")
+    if not rel or rel.startswith("/") or ":" in parts[0] or any(p in ("", ".", "..") for p in parts):
+        raise ValueError(f"unsafe member path in export: {name}")
+    return rel
+
+
+def _stage(rel: str, src, tmp: Path | None) -> tuple:
+    """Hash one media member, writing it to `tmp` when staging; `src` is bytes or a stream."""
+    if isinstance(src, bytes):
+        if tmp is not None:
+            tmp.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp, "wb") as dst:
+                dst.write(src)
+        return hashlib.sha256(src).hexdigest(), len(src), rel
+    if tmp is None:
+        reader = _HashingReader(src)
+        for _ in iter(lambda: reader.read(_COPY_CHUNK), b""):
+            pass
+        return reader.digest.hexdigest(), reader.size, rel
+    tmp.parent.mkdir(parents=True, exist_ok=True)
+    with open(tmp, "wb") as dst:
+        sha, size = _copy_hashed(src, dst)
+    return sha, size, rel
+
+
+def _scan_archive(archive: Path, work: sqlite3.Connection, td: Path, root: Path | None, workers: int) -> dict:
+    """One sequential pass over an export: hash every member and, with `root`, stage media beside its target.
+
+    Small members are read whole and hashed (and written) on a thread pool,
+    with the bytes in flight capped; large ones are streamed inline. Manifest
+    lines and staged entries go to the scratch DB `work`, and the DB snapshot
+    to `td`, so memory does not grow with the number of files. Returns the
+    verification report; staged files stay in place for the caller to move
+    or discard.
+    """
+    header = None
+    db = manifest = None
+    pending: deque = deque()
+    inflight = 0
+    n_workers = _workers(workers)
+
+    def drain(max_bytes: int, max_jobs: int) -> None:
+        nonlocal inflight
+        while pending and (inflight > max_bytes or len(pending) > max_jobs):
+            future, size = pending.popleft()
+            inflight -= size
+            work.execute("UPDATE staged SET sha256 = ?, size = ? WHERE path = ?", future.result())
+
+    try:
+        with tarfile.open(archive, "r:", copybufsize=_COPY_CHUNK) as tar, ThreadPoolExecutor(max_workers=n_workers) as pool:
+            while True:
+                member = tar.next()
+                if member is None:
+                    break
+                # Reading moves forward only; the member list would otherwise grow with the archive.
+                tar.members.clear()
+                if not member.isfile():
+                    continue
+                fh = tar.extractfile(member)
+                if member.name.startswith(MEDIA_PREFIX):
+                    rel = _media_rel(member.name)
+                    tmp = None
+                    if root is not None:
+                        target = root / rel
+                        tmp = target.with_name(target.name + ".import.tmp")
+                    work.execute("INSERT OR REPLACE INTO staged (path, tmp) VALUES (?, ?)", (rel, str(tmp) if tmp else None))
+                    if member.size <= _INLINE_MAX:
+                        data = fh.read()
+                        pending.append((pool.submit(_stage, rel, data, tmp), len(data)))
+                        inflight += len(data)
+                        drain(_INFLIGHT_BYTES, 2 * n_workers)
+                    else:
+                        work.execute("UPDATE staged SET sha256 = ?, size = ? WHERE path = ?", _stage(rel, fh, tmp))
+                elif member.name == DB_MEMBER:
+                    with open(td / "kcp.sqlite", "wb") as dst:
+                        db = _copy_hashed(fh, dst)
+                elif member.name == MANIFEST_FILES_MEMBER:
+                    reader = _HashingReader(fh)
+                    work.executemany(
+                        "INSERT OR REPLACE INTO manifest (path, sha256, size) VALUES (?, ?, ?)",
+                        ((e["path"], e["sha256"], int(e["size"])) for e in (json.loads(line) for line in reader if line.strip())),
+                    )
+                    manifest = (reader.digest.hexdigest(), reader.size)
+                elif member.name == MANIFEST_MEMBER:
+                    header = json.loads(fh.read())
+            drain(-1, -1)
+    except (tarfile.TarError, KeyError, TypeError, json.JSONDecodeError) as e:
+        raise ValueError(f"not a KCP project export: {archive} ({e})") from e
+    if not isinstance(header, dict) or header.get("format") != EXPORT_FORMAT:
+        raise ValueError(f"not a KCP project export: {archive}")
+
+    mismatched_sql = (
+        "SELECT m.path FROM manifest m LEFT JOIN staged s ON s.path = m.path WHERE s.sha256 IS NOT m.sha256 "
+        "UNION ALL SELECT s.path FROM staged s WHERE NOT EXISTS (SELECT 1 FROM manifest m WHERE m.path = s.path)"
+    )
+    totals = work.execute("SELECT COUNT(*) AS n, COALESCE(SUM(size), 0) AS bytes FROM manifest").fetchone()
+    db_ok = db is not None and db[0] == header.get("db", {}).get("sha256")
+    manifest_ok = manifest is not None and manifest[0] == header.get("manifest", {}).get("sha256")
+    report = {
+        "files": int(totals["n"]),
+        "bytes": int(totals["bytes"]),
+        "mismatched": work.execute(f"SELECT COUNT(*) FROM ({mismatched_sql})").fetchone()[0],
+        "mismatched_paths": [row["path"] for row in work.execute(f"{mismatched_sql} LIMIT {_MAX_LISTED}")],
+        "db_ok": db_ok,
+        "manifest_ok": manifest_ok,
+        "header": header,
+    }
+    report["ok"] = db_ok and manifest_ok and report["mismatched"] == 0
+    return report
+
+
+def verify_export(archive: Path, workers: int = 0) -> dict:
+    """Re-hash the DB snapshot, the manifest and every media member of an export, changing nothing."""
+    with tempfile.TemporaryDirectory(prefix="kcp_verify_") as td:
+        work = _work_db(Path(td))
+        try:
+            return _scan_archive(Path(archive), work, Path(td), None, workers)
+        finally:
+            work.close()
+
+
+def _place(root: Path, row: sqlite3.Row, on_conflict: str) -> str:
+    """Settle one staged file before the merge; returns written / identical / conflict / replaced.
+
+    New files are moved into place now. A file that would overwrite existing
+    content stays staged; the caller swaps it in once the merge has committed.
+    """
+    target = root / row["path"]
+    tmp = Path(row["tmp"])
+    existing = _hash_path(target)
+    if existing == row["sha256"] or (existing is not None and on_conflict == "skip"):
+        tmp.unlink(missing_ok=True)
+        return "identical" if existing == row["sha256"] else "conflict"
+    if existing is None:
+        os.replace(tmp, target)
+        return "written"
+    return "replaced"
+
+
+def _discard_staged(work: sqlite3.Connection) -> None:
+    for row in work.execute("SELECT tmp FROM staged WHERE tmp IS NOT NULL"):
+        try:
+            os.unlink(row["tmp"])
+        except FileNotFoundError:
+            pass
+
+
+def _merge_order(conn: sqlite3.Connection, tables: list[str]) -> list[str]:
+    """Parents before children, following the declared foreign keys."""
+    deps = {t: {row["table"] for row in conn.execute(f"PRAGMA main.foreign_key_list({t})")} & set(tables) - {t} for t in tables}
+    order: list[str] = []
+    while deps:
+        ready = sorted(t for t, d in deps.items() if not d)
+        if not ready:
+            raise RuntimeError(f"foreign key cycle between {sorted(deps)}")
+        for t in ready:
+            order.append(t)
+            del deps[t]
+        for d in deps.values():
+            d.difference_update(ready)
+    return order
+
+
+def _merge_table(conn: sqlite3.Connection, table: str, on_conflict: str) -> dict:
+    """Copy `snap.<table>` into `main.<table>` with set-based INSERT ... SELECT statements.
+
+    Rows whose primary key already exists are kept (`skip`) or overwritten
+    (`replace`). Rows that would break another unique constraint, or whose
+    parent row did not make it into the target, are skipped.
+    """
+    main_cols = [row["name"] for row in conn.execute(f"PRAGMA main.table_info({table})")]
+    snap_cols = {row["name"] for row in conn.execute(f"PRAGMA snap.table_info({table})")}
+    cols = [c for c in main_cols if c in snap_cols]
+    pk = [row["name"] for row in sorted(conn.execute(f"PRAGMA main.table_info({table})"), key=lambda r: r["pk"]) if row["pk"]]
+    if not pk:
+        raise RuntimeError(f"table without primary key: {table}")
+    pk_match = " AND ".join(f"m.{c} IS s.{c}" for c in pk)
+    filters = []
+    for index in conn.execute(f"PRAGMA main.index_list({table})"):
+        if not index["unique"] or index["origin"] == "pk":
+            continue
+        unique_cols = [row["name"] for row in conn.execute(f"PRAGMA main.index_info({index['name']})")]
+        match = " AND ".join(f"m.{c} = s.{c}" for c in unique_cols)
+        filters.append(f"NOT EXISTS (SELECT 1 FROM main.{table} m WHERE {match} AND NOT ({pk_match}))")
+    for fk in conn.execute(f"PRAGMA main.foreign_key_list({table})"):
+        if fk["table"] == table:
+            continue
+        parent_col = fk["to"] or "id"
+        filters.append(f"(s.{fk['from']} IS NULL OR EXISTS (SELECT 1 FROM main.{fk['table']} p WHERE p.{parent_col} = s.{fk['from']}))")
+    col_list = ", ".join(cols)
+    select = f"SELECT {', '.join('s.' + c for c in cols)} FROM snap.{table} s"
+    where = " AND ".join(filters) or "1"
+    incoming = conn.execute(f"SELECT COUNT(*) FROM snap.{table}").fetchone()[0]
+    updated = 0
+    non_pk = [c for c in cols if c not in pk]
+    if on_conflict == "replace" and non_pk:
+        # Update existing rows before inserting new ones, so no row is written twice.
+        updated = conn.execute(
+            f"INSERT INTO main.{table} ({col_list}) {select} WHERE EXISTS (SELECT 1 FROM main.{table} m WHERE {pk_match}) AND {where} "
+            f"ON CONFLICT({', '.join(pk)}) DO UPDATE SET {', '.join(f'{c} = excluded.{c}' for c in non_pk)}"
+        ).rowcount
+    inserted = conn.execute(
+        f"INSERT INTO main.{table} ({col_list}) {select} WHERE NOT EXISTS (SELECT 1 FROM main.{table} m WHERE {pk_match}) AND {where}"
+    ).rowcount
+    return {"incoming": int(incoming), "inserted": max(0, inserted), "updated": max(0, updated), "skipped": int(incoming) - max(0, inserted) - max(0, updated)}
+
+
+def _recount_blob_refs(conn: sqlite3.Connection) -> None:
+    """Reset every blob's ref count to the number of DB columns that point at it."""
+    conn.execute("CREATE TEMP TABLE blob_refs (path TEXT PRIMARY KEY, n INTEGER NOT NULL)")
+    try:
+        conn.execute(
+            "INSERT INTO temp.blob_refs (path, n) SELECT path, COUNT(*) FROM ("
+            "SELECT image_path AS path FROM assets UNION ALL SELECT thumb_path FROM assets "
+            "UNION ALL SELECT image_path FROM keyframe_set_items UNION ALL SELECT thumb_path FROM keyframe_set_items "
+            "UNION ALL SELECT path FROM media_previews) WHERE path LIKE ? GROUP BY path",
+            (f"{BLOBS_DIRNAME}/%",),
+        )
+        conn.execute(
+            "UPDATE media_blobs SET ref_count = COALESCE((SELECT n FROM temp.blob_refs WHERE path = ? || '/' || substr(sha256, 1, 2) "
+            "|| '/' || substr(sha256, 3, 2) || '/' || sha256), 0)",
+            (BLOBS_DIRNAME,),
+        )
+    finally:
+        conn.execute("DROP TABLE temp.blob_refs")
+
+
+def import_project(
+    conn: sqlite3.Connection,
+    root: Path,
+    archive: Path,
+    on_conflict: str = "skip",
+    workers: int = 0,
+    verify_only: bool = False,
+) -> dict:
+    """Verify an export in parallel and merge its media and DB rows into this project.
+
+    The archive is read once. Media are staged next to their targets as
+    `.import.tmp` files and only moved into place once every hash, the
+    manifest and the DB snapshot check out; otherwise (or with `verify_only`)
+    the staged files are removed. Files already present with the same hash
+    are left alone, and files present with different content are kept
+    (`skip`) or overwritten (`replace`). The rows are then merged table by
+    table in one transaction (see `_merge_table`); `meta` is never merged.
+    Overwrites happen only after that commit, and new files are removed
+    again if the merge fails.
+    """
+    if on_conflict not in IMPORT_CONFLICT_MODES:
+        raise ValueError(f"unknown conflict mode: {on_conflict}")
+    started = time.perf_counter()
+    archive = Path(archive)
+    with tempfile.TemporaryDirectory(prefix="kcp_import_") as td:
+        work = _work_db(Path(td))
+        written: list[Path] = []
+        replaced: list[tuple[Path, Path]] = []
+        committed = False
+        try:
+            verified = _scan_archive(archive, work, Path(td), None if verify_only else root, workers)
+            header = verified.pop("header")
+            report = {
+                "archive_path": str(archive),
+                "media": header.get("media"),
+                "on_conflict": on_conflict,
+                "verify": verified,
+                "applied": False,
+                "files": {"written": 0, "identical": 0, "replaced": 0, "conflict": 0},
+                "conflict_paths": [],
+                "tables": {},
+            }
+            if int(header.get("schema_version", 0)) > LATEST_SCHEMA_VERSION:
+                raise ValueError(f"export schema v{header['schema_version']} is newer than this install (v{LATEST_SCHEMA_VERSION})")
+            if verify_only or not verified["ok"]:
+                report["elapsed_ms"] = round((time.perf_counter() - started) * 1000.0, 1)
+                return report
+
+            with ThreadPoolExecutor(max_workers=_workers(workers)) as pool:
+                rows = work.execute("SELECT path, sha256, tmp FROM staged ORDER BY path")
+                for batch in _batched(rows, _VERIFY_BATCH):
+                    for row, outcome in zip(batch, pool.map(lambda r: _place(root, r, on_conflict), batch)):
+                        report["files"][outcome] += 1
+                        if outcome == "written":
+                            written.append(root / row["path"])
+                        elif outcome == "replaced":
+                            replaced.append((Path(row["tmp"]), root / row["path"]))
+                        elif outcome == "conflict" and len(report["conflict_paths"]) < _MAX_LISTED:
+                            report["conflict_paths"].append(row["path"])
+
+            snap_path = Path(td) / "kcp.sqlite"
+            # Older snapshots are brought up to the current schema before merging.
+            connect(snap_path).close()
+            conn.commit()
+            conn.execute("ATTACH DATABASE ? AS snap", (str(snap_path),))
+            try:
+                snap_tables = {row["name"] for row in conn.execute("SELECT name FROM snap.sqlite_master WHERE type = 'table'")}
+                tables = [
+                    row["name"]
+                    for row in conn.execute("SELECT name FROM main.sqlite_master WHERE type = 'table'")
+                    if row["name"] in snap_tables and row["name"] not in _SKIP_TABLES
+                ]
+                try:
+                    for table in _merge_order(conn, tables):
+                        report["tables"][table] = _merge_table(conn, table, on_conflict)
+                    _recount_blob_refs(conn)
+                    conn.commit()
+                    committed = True
+                except Exception:
+                    conn.rollback()
+                    raise
+            finally:
+                conn.execute("DETACH DATABASE snap")
+            for tmp, target in replaced:
+                os.replace(tmp, target)
+        finally:
+            if not committed:
+                for target in written:
+                    target.unlink(missing_ok=True)
+            _discard_staged(work)
+            work.close()
+    report["applied"] = True
+    report["elapsed_ms"] = round((time.perf_counter() - started) * 1000.0, 1)
+    return report
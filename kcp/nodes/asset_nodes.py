@@ -2,7 +2,9 @@ from __future__ import annotations
 
 import json
 import sqlite3
+from kcp.db.blobs import blob_store_enabled, discard_ingest, finish_ingest, ingest_file, new_pending_ingest, release_ref
 from kcp.db.paths import DEFAULT_DB_PATH_INPUT, kcp_root_from_db_path, normalize_db_path, with_projectinit_db_path_tip
+from kcp.db.previews import plan_previews, record_previews
 from kcp.db.repo import (
     ASSET_TYPES,
     connect,
@@ -10,10 +12,13 @@ from kcp.db.repo import (
     create_asset_version,
     get_asset_by_type_name,
     list_asset_names,
+    resolve_durability,
+    resolve_encode_profile,
     update_asset_by_id,
 )
+from kcp.util.durable_io import DURABILITY_MODES, fsync_dirs
 from kcp.util.hashing import sha256_file
-from kcp.util.image_io import load_image_as_comfy, make_thumbnail, pillow_available, save_optional_image
+from kcp.util.image_io import DEFAULT_THUMB_MAX_PX, ENCODE_PROFILES, load_image_as_comfy, make_thumbnail, pillow_available, save_optional_image
 from kcp.util.json_utils import validate_asset_json_fields
 
 
@@ -50,7 +55,11 @@ class KCP_AssetSave:
                 "tags_csv": ("STRING", {"default": ""}),
                 "save_mode": (["new", "new_version_of_name", "overwrite_by_name"],),
             },
-            "optional": {"image": ("IMAGE",)},
+            "optional": {
+                "image": ("IMAGE",),
+                "encode_profile": (["project_default", *ENCODE_PROFILES],),
+                "durability": (["project_default", *DURABILITY_MODES],),
+            },
         }
 
     RETURN_TYPES = ("STRING", "IMAGE", "STRING")
@@ -58,7 +67,7 @@ class KCP_AssetSave:
     FUNCTION = "run"
     CATEGORY = "KCP"
 
-    def run(self, db_path, asset_type, name, description, positive_fragment, negative_fragment, json_fields, tags_csv, save_mode, image=None):
+    def run(self, db_path, asset_type, name, description, positive_fragment, negative_fragment, json_fields, tags_csv, save_mode, image=None, encode_profile="project_default", durability="project_default"):
         if asset_type not in ASSET_TYPES:
             raise RuntimeError("kcp_asset_validation_failed: invalid asset_type")
 
@@ -76,6 +85,8 @@ class KCP_AssetSave:
             raise with_projectinit_db_path_tip(db_path, e) from e
         warnings = []
         thumb_image_out = image
+        # Blobs are linked in before the commit; loose sources go only after it.
+        pending = new_pending_ingest()
         try:
             existing = get_asset_by_type_name(conn, asset_type, name, include_archived=True)
             if existing and save_mode == "new":
@@ -128,21 +139,40 @@ class KCP_AssetSave:
                 if not pillow_available():
                     raise RuntimeError("kcp_io_write_failed: Pillow required to save IMAGE input; install with pip install pillow")
 
+                profile = resolve_encode_profile(conn, encode_profile)
+                mode = resolve_durability(conn, durability)
+                if mode not in DURABILITY_MODES:
+                    raise RuntimeError(f"kcp_durability_invalid: {mode}")
+                # One image + thumb: batch staging buys nothing over per-file fsync here.
+                file_mode = "none" if mode == "none" else "file"
                 image_path = root / "images" / asset_type / asset_id / "original.png"
-                if not save_optional_image(image, image_path, fmt="PNG"):
+                if not save_optional_image(image, image_path, fmt="PNG", profile=profile, durability=file_mode):
                     raise RuntimeError("kcp_io_write_failed: failed to save IMAGE input")
 
                 image_rel = str(image_path.relative_to(root))
                 image_hash = sha256_file(image_path)
                 thumb_path = root / "thumbs" / asset_type / asset_id / "thumb.webp"
+                previews = {}
                 try:
-                    if make_thumbnail(image_path, thumb_path, max_px=384):
+                    previews = plan_previews(conn, image_path, thumb_path)
+                    if make_thumbnail(image_path, thumb_path, max_px=DEFAULT_THUMB_MAX_PX, profile=profile, levels=previews, durability=file_mode):
                         thumb_rel = str(thumb_path.relative_to(root))
                         thumb_image_out = load_image_as_comfy(thumb_path)
                     else:
                         warnings.append("thumbnail generation failed; saved original image without thumbnail")
                 except Exception:
                     warnings.append("thumbnail generation failed; saved original image without thumbnail")
+                use_blobs = blob_store_enabled(conn)
+                recorded = record_previews(conn, root, "asset", asset_id, previews if thumb_rel else {}, use_blobs, pending=pending)
+                if use_blobs:
+                    image_rel, _ = ingest_file(conn, root, image_path, sha256=image_hash, pending=pending)
+                    if thumb_rel:
+                        thumb_rel, _ = ingest_file(conn, root, thumb_path, pending=pending)
+                    if existing and save_mode == "overwrite_by_name":
+                        release_ref(conn, existing["image_path"])
+                        release_ref(conn, existing["thumb_path"])
+                    if file_mode == "file":
+                        fsync_dirs([image_path.parent, thumb_path.parent, *((root / rel).parent for rel in (image_rel, thumb_rel, *recorded.values()) if rel)])
             elif asset_type == "environment":
                 warnings.append("environment asset saved without plate image; plate-lock workflows will be blocked")
 
@@ -165,6 +195,7 @@ class KCP_AssetSave:
                     (image_rel, thumb_rel, image_hash, asset_id),
                 )
                 conn.commit()
+            finish_ingest(pending)
 
             out = {
                 "asset_id": asset_id,
@@ -176,8 +207,12 @@ class KCP_AssetSave:
             }
             return (asset_id, thumb_image_out, json.dumps(out))
         except sqlite3.IntegrityError as e:
+            conn.rollback()
+            discard_ingest(pending)
             raise RuntimeError(f"kcp_asset_name_conflict: {e}") from e
         except Exception as e:
+            conn.rollback()
+            discard_ingest(pending)
             if isinstance(e, RuntimeError):
                 raise
             raise RuntimeError(f"kcp_io_write_failed: {e}") from e
@@ -3,10 +3,15 @@ from __future__ import annotations
 import json
 import sqlite3
 
+from kcp.db.blobs import blob_store_enabled, discard_ingest, finish_ingest, ingest_file, new_pending_ingest, release_ref
+from kcp.db.packs import media_source, resolve_packed
 from kcp.db.paths import kcp_root_from_db_path, normalize_db_path, with_projectinit_db_path_tip
-from kcp.db.repo import connect, create_asset, get_asset_by_type_name, get_keyframe_set, get_set_item
+from kcp.db.previews import plan_previews, record_previews
+from kcp.db.repo import connect, create_asset, get_asset_by_type_name, get_keyframe_set, get_set_item, resolve_durability, resolve_encode_profile
+from kcp.db.tiers import is_archive_ref, rehydrate_item
+from kcp.util.durable_io import DURABILITY_MODES, fsync_dirs
 from kcp.util.hashing import sha256_file
-from kcp.util.image_io import load_image_as_comfy, make_thumbnail, pillow_available, save_optional_image
+from kcp.util.image_io import DEFAULT_THUMB_MAX_PX, ENCODE_PROFILES, load_image_as_comfy, make_thumbnail, pillow_available, save_optional_image
 from kcp.util.json_utils import parse_json_object
 from kcp.util.time_utils import now_ms
 
@@ -29,6 +34,8 @@ class KCP_KeyframePromoteToAsset:
             "optional": {
                 "depends_on_item_json": ("STRING", {"default": ""}),
                 "item_json": ("STRING", {"default": ""}),
+                "encode_profile": (["project_default", *ENCODE_PROFILES],),
+                "durability": (["project_default", *DURABILITY_MODES],),
             },
         }
 
@@ -48,6 +55,8 @@ class KCP_KeyframePromoteToAsset:
         save_mode: str = "new",
         depends_on_item_json: str = "",
         item_json: str = "",
+        encode_profile: str = "project_default",
+        durability: str = "project_default",
     ):
         _ = depends_on_item_json
         resolved_set_id = (set_id or "").strip()
@@ -77,8 +86,14 @@ class KCP_KeyframePromoteToAsset:
                 raise RuntimeError("kcp_set_item_not_found")
             if not (item["image_path"] or "").strip():
                 raise RuntimeError("kcp_set_item_image_missing")
+            if is_archive_ref(item["image_path"]):
+                try:
+                    rehydrate_item(conn, root, resolved_set_id, resolved_idx)
+                except (OSError, KeyError, ValueError) as e:
+                    raise RuntimeError(f"kcp_set_item_rehydrate_failed: {item['image_path']} ({e})") from e
+                item = get_set_item(conn, resolved_set_id, resolved_idx)
 
-            src_path = root / item["image_path"]
+            src_path = media_source(root, item["image_path"], resolve_packed(conn, root, [item["image_path"]]))
             if not src_path.exists():
                 raise RuntimeError("kcp_set_item_image_missing")
 
@@ -136,19 +151,45 @@ class KCP_KeyframePromoteToAsset:
 
             image_path = root / "images" / "keyframe" / asset_id / "original.png"
             thumb_path = root / "thumbs" / "keyframe" / asset_id / "thumb.webp"
+            profile = resolve_encode_profile(conn, encode_profile)
+            mode = resolve_durability(conn, durability)
+            if mode not in DURABILITY_MODES:
+                raise RuntimeError(f"kcp_durability_invalid: {mode}")
+            # One image + thumb: batch staging buys nothing over per-file fsync here.
+            file_mode = "none" if mode == "none" else "file"
             image_obj = load_image_as_comfy(src_path)
-            if not save_optional_image(image_obj, image_path):
+            if not save_optional_image(image_obj, image_path, profile=profile, durability=file_mode):
                 raise RuntimeError("kcp_io_write_failed: failed to save promoted keyframe image")
-            make_thumbnail(image_path, thumb_path, max_px=384)
+            previews = plan_previews(conn, image_path, thumb_path)
+            make_thumbnail(image_path, thumb_path, max_px=DEFAULT_THUMB_MAX_PX, profile=profile, levels=previews, durability=file_mode)
             image_rel = str(image_path.relative_to(root))
             thumb_rel = str(thumb_path.relative_to(root)) if thumb_path.exists() else ""
             image_hash = sha256_file(image_path)
+            use_blobs = blob_store_enabled(conn)
+            # Blobs are linked in before the commit; loose sources go only after it.
+            pending = new_pending_ingest()
+            try:
+                recorded = record_previews(conn, root, "asset", asset_id, previews if thumb_rel else {}, use_blobs, pending=pending)
+                if use_blobs:
+                    image_rel, _ = ingest_file(conn, root, image_path, sha256=image_hash, pending=pending)
+                    if thumb_rel:
+                        thumb_rel, _ = ingest_file(conn, root, thumb_path, pending=pending)
+                    if existing and save_mode == "overwrite_by_name":
+                        release_ref(conn, existing["image_path"])
+                        release_ref(conn, existing["thumb_path"])
+                    if file_mode == "file":
+                        fsync_dirs([image_path.parent, thumb_path.parent, *((root / rel).parent for rel in (image_rel, thumb_rel, *recorded.values()) if rel)])
 
-            conn.execute(
-                "UPDATE assets SET image_path=?, thumb_path=?, image_hash=? WHERE id=?",
-                (image_rel, thumb_rel, image_hash, asset_id),
-            )
-            conn.commit()
+                conn.execute(
+                    "UPDATE assets SET image_path=?, thumb_path=?, image_hash=? WHERE id=?",
+                    (image_rel, thumb_rel, image_hash, asset_id),
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                discard_ingest(pending)
+                raise
+            finish_ingest(pending)
 
             out = {
                 "asset_id": asset_id,
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import json
+
+from kcp.db.paths import normalize_db_path, with_projectinit_db_path_tip
+from kcp.db.render_jobs import DEFAULT_MAX_ATTEMPTS, claim_next_item, default_worker_id
+from kcp.db.repo import connect, get_set_item
+
+
+class KCP_ClaimNextItem:
+    OUTPUT_NODE = True
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "db_path": ("STRING", {"default": "output/kcp/db/kcp.sqlite"}),
+                "set_id": ("STRING", {"default": ""}),
+                "lease_seconds": ("INT", {"default": 600, "min": 1, "max": 7 * 24 * 3600}),
+            },
+            "optional": {
+                "worker_id": ("STRING", {"default": ""}),
+                "max_attempts": ("INT", {"default": DEFAULT_MAX_ATTEMPTS, "min": 1, "max": 100}),
+                "fail_if_empty": ("BOOLEAN", {"default": True}),
+            },
+        }
+
+    RETURN_TYPES = ("STRING", "INT", "INT", "STRING", "STRING", "STRING", "STRING", "STRING")
+    RETURN_NAMES = ("set_id", "idx", "seed", "positive", "negative", "gen_params_json", "lease_token", "job_json")
+    FUNCTION = "run"
+    CATEGORY = "KCP"
+
+    @classmethod
+    def IS_CHANGED(cls, **kwargs):
+        # Every execution must claim anew; a cached result would hand out the same item twice.
+        return float("nan")
+
+    def run(
+        self,
+        db_path: str,
+        set_id: str,
+        lease_seconds: int = 600,
+        worker_id: str = "",
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        fail_if_empty: bool = True,
+    ):
+        try:
+            conn = connect(normalize_db_path(db_path))
+        except Exception as e:
+            raise with_projectinit_db_path_tip(db_path, e) from e
+        try:
+            job = claim_next_item(
+                conn, (set_id or "").strip(), (worker_id or "").strip() or default_worker_id(), int(lease_seconds) * 1000, int(max_attempts)
+            )
+            if job is None:
+                if fail_if_empty:
+                    raise RuntimeError(f"kcp_claim_queue_empty: set_id={set_id}")
+                return ((set_id or "").strip(), -1, 0, "", "", "{}", "", json.dumps({"claimed": False}))
+            item = get_set_item(conn, job["set_id"], job["idx"])
+        finally:
+            conn.close()
+        if item is None:
+            raise RuntimeError(f"kcp_set_item_not_found: set_id={job['set_id']} idx={job['idx']}")
+        payload = {"claimed": True, **job}
+        return (
+            job["set_id"],
+            int(job["idx"]),
+            int(item["seed"]),
+            item["positive_prompt"],
+            item["negative_prompt"] or "",
+            item["gen_params_json"],
+            job["lease_token"],
+            json.dumps(payload),
+        )
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import glob
+import hashlib
+import json
+import math
+import re
+
+from kcp.db.packs import media_source, resolve_packed
+from kcp.db.paths import kcp_root_from_db_path, normalize_db_path, with_projectinit_db_path_tip
+from kcp.db.previews import list_previews, pick_preview_level
+from kcp.db.repo import connect, get_keyframe_set
+from kcp.util.image_io import DEFAULT_THUMB_MAX_PX, load_image_as_comfy, open_media, pil_to_comfy_image, pillow_available, save_comfy_image_atomic
+
+
+CONTACT_SHEET_DIR = "cache/contact_sheets"
+LABEL_HEIGHT = 14
+PICKED_BORDER = 4
+
+
+def _policy_labels(set_row) -> dict[int, str]:
+    try:
+        policy = json.loads(set_row["variant_policy_json"] or "{}") if set_row else {}
+    except ValueError:
+        return {}
+    injections = policy.get("injections") if isinstance(policy, dict) else None
+    if not isinstance(injections, list):
+        return {}
+    return {i: str(inj.get("label", "")) for i, inj in enumerate(injections) if isinstance(inj, dict)}
+
+
+class KCP_SetContactSheet:
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "db_path": ("STRING", {"default": "output/kcp/db/kcp.sqlite"}),
+                "set_id": ("STRING", {"default": ""}),
+            },
+            "optional": {
+                "columns": ("INT", {"default": 0, "min": 0, "max": 64}),
+                "tile_px": ("INT", {"default": 192, "min": 32, "max": 1024}),
+                "show_labels": ("BOOLEAN", {"default": True}),
+                "use_cache": ("BOOLEAN", {"default": True}),
+            },
+        }
+
+    RETURN_TYPES = ("IMAGE", "STRING")
+    RETURN_NAMES = ("sheet", "sheet_json")
+    FUNCTION = "run"
+    CATEGORY = "KCP"
+
+    def run(self, db_path: str, set_id: str, columns: int = 0, tile_px: int = 192, show_labels: bool = True, use_cache: bool = True):
+        if not pillow_available():
+            raise RuntimeError("kcp_io_read_failed: Pillow required to build a contact sheet; install with pip install pillow")
+        try:
+            dbp = normalize_db_path(db_path)
+            root = kcp_root_from_db_path(db_path)
+            conn = connect(dbp)
+        except Exception as e:
+            raise with_projectinit_db_path_tip(db_path, e) from e
+        try:
+            set_row = get_keyframe_set(conn, set_id)
+            if set_row is None:
+                raise RuntimeError(f"kcp_keyframe_set_not_found: {set_id}")
+            rows = conn.execute(
+                "SELECT id, idx, seed, image_path, thumb_path FROM keyframe_set_items WHERE set_id=? ORDER BY idx",
+                (set_id,),
+            ).fetchall()
+            previews = list_previews(conn, "set_item", [r["id"] for r in rows])
+            rels = [r[k] for r in rows for k in ("image_path", "thumb_path")]
+            packed = resolve_packed(conn, root, [*rels, *(rel for levels in previews.values() for rel in levels.values())])
+        finally:
+            conn.close()
+
+        tile = int(tile_px)
+        labels = _policy_labels(set_row)
+        picked = set_row["picked_index"]
+        cells = []
+        sources = []
+        for row in rows:
+            # Smallest stored level that covers the tile; the 384px thumb is the default level.
+            levels = dict(previews.get(row["id"], {}))
+            if (row["thumb_path"] or "").strip():
+                levels.setdefault(DEFAULT_THUMB_MAX_PX, row["thumb_path"])
+            rel = pick_preview_level(levels, tile) or (row["image_path"] or "").strip()
+            src = media_source(root, rel, packed) if rel else None
+            try:
+                st = src.stat() if src is not None else None
+            except OSError:
+                st = None
+            sources.append(src if st is not None else None)
+            cells.append(
+                {
+                    "idx": int(row["idx"]),
+                    "seed": int(row["seed"]),
+                    "label": labels.get(int(row["idx"]), ""),
+                    "picked": picked is not None and int(picked) == int(row["idx"]),
+                    "source": rel if st is not None else "",
+                    "stamp": [st.st_size, st.st_mtime_ns] if st is not None else None,
+                }
+            )
+
+        cols = int(columns) or max(1, math.ceil(math.sqrt(len(cells) or 1)))
+        n_rows = max(1, math.ceil(len(cells) / cols))
+        label_h = LABEL_HEIGHT if show_labels else 0
+        layout = {"set_id": set_id, "columns": cols, "rows": n_rows, "tile_px": tile, "show_labels": bool(show_labels)}
+        # Key covers everything drawn: layout, labels/picked state and each source's size+mtime.
+        key = hashlib.sha256(json.dumps([layout, cells], sort_keys=True).encode("utf-8")).hexdigest()[:16]
+        cache_dir = root / CONTACT_SHEET_DIR
+        cache_path = cache_dir / f"{set_id}_{key}.png"
+        sheet_meta = {
+            **layout,
+            "cache_key": key,
+            "cache_path": str(cache_path.relative_to(root)),
+            "cells": [
+                {
+                    "idx": c["idx"],
+                    "seed": c["seed"],
+                    "label": c["label"],
+                    "picked": c["picked"],
+                    "x": (i % cols) * tile,
+                    "y": (i // cols) * (tile + label_h),
+                    "missing": not c["source"],
+                }
+                for i, c in enumerate(cells)
+            ],
+        }
+
+        if use_cache and cache_path.exists():
+            sheet_meta["cache_hit"] = True
+            return (load_image_as_comfy(cache_path), json.dumps(sheet_meta))
+
+        canvas = self._compose(sources, cells, cols, n_rows, tile, label_h)
+        if use_cache:
+            # Exact `<set_id>_<key>.png` match: a glob would also catch sets whose id starts with `<set_id>_`.
+            own = re.compile(re.escape(set_id) + r"_[0-9a-f]{16}\.png")
+            for stale in cache_dir.glob(f"{glob.escape(set_id)}_*.png"):
+                if own.fullmatch(stale.name):
+                    stale.unlink()
+            save_comfy_image_atomic(canvas, cache_path, fmt="PNG", profile="fast")
+        sheet_meta["cache_hit"] = False
+        return (pil_to_comfy_image(canvas), json.dumps(sheet_meta))
+
+    @staticmethod
+    def _compose(sources: list, cells: list[dict], cols: int, n_rows: int, tile: int, label_h: int):
+        from PIL import Image, ImageDraw
+
+        # One canvas for the whole sheet; every tile is pasted into it in place.
+        canvas = Image.new("RGB", (cols * tile, n_rows * (tile + label_h)), (24, 24, 24))
+        draw = ImageDraw.Draw(canvas)
+        for i, cell in enumerate(cells):
+            x = (i % cols) * tile
+            y = (i // cols) * (tile + label_h)
+            thumb = None
+            if sources[i] is not None:
+                try:
+                    with open_media(sources[i]) as fh, Image.open(fh) as img:
+                        img.draft("RGB", (tile, tile))
+                        thumb = img.convert("RGB")
+                        thumb.thumbnail((tile, tile))
+                except Exception:
+                    thumb = None
+            if thumb is None:
+                draw.rectangle([x + 1, y + 1, x + tile - 2, y + tile - 2], outline=(160, 40, 40))
+                draw.text((x + 6, y + tile // 2 - 6), "missing", fill=(200, 80, 80))
+            else:
+                canvas.paste(thumb, (x + (tile - thumb.width) // 2, y + (tile - thumb.height) // 2))
+            if cell["picked"]:
+                draw.rectangle([x, y, x + tile - 1, y + tile - 1], outline=(40, 220, 90), width=PICKED_BORDER)
+            if label_h:
+                text = f"#{cell['idx']} s{cell['seed']}" + (f" {cell['label']}" if cell["label"] else "")
+                if cell["picked"]:
+                    text = "* " + text
+                max_chars = max(4, tile // 6)
+                draw.text((x + 3, y + tile + 1), text[:max_chars], fill=(40, 220, 90) if cell["picked"] else (220, 220, 220))
+        return canvas
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import json
+
+from kcp.db.packs import media_source, resolve_packed
+from kcp.db.paths import kcp_root_from_db_path, normalize_db_path, with_projectinit_db_path_tip
+from kcp.db.repo import connect, media_housekeeping
+from kcp.util.phash import HASH_BITS, cluster_by_hash, dhash_file, format_hash, hamming, parse_hash
+
+
+class KCP_SetDedupe:
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "db_path": ("STRING", {"default": "output/kcp/db/kcp.sqlite"}),
+                "set_id": ("STRING", {"default": ""}),
+                "max_distance": ("INT", {"default": 6, "min": 0, "max": HASH_BITS}),
+            },
+            "optional": {
+                "backfill": ("BOOLEAN", {"default": True}),
+            },
+        }
+
+    RETURN_TYPES = ("STRING", "STRING")
+    RETURN_NAMES = ("clusters_json", "summary")
+    FUNCTION = "run"
+    CATEGORY = "KCP"
+
+    def run(self, db_path: str, set_id: str, max_distance: int = 6, backfill: bool = True):
+        set_id = (set_id or "").strip()
+        try:
+            dbp = normalize_db_path(db_path)
+            root = kcp_root_from_db_path(db_path)
+            conn = connect(dbp)
+        except Exception as e:
+            raise with_projectinit_db_path_tip(db_path, e) from e
+        try:
+            sql = (
+                "SELECT i.id, i.set_id, i.idx, i.image_path, i.thumb_path, i.phash, s.picked_index "
+                "FROM keyframe_set_items i JOIN keyframe_sets s ON s.id = i.set_id "
+                "WHERE i.image_path != ''"
+            )
+            params: tuple = ()
+            if set_id:
+                sql += " AND i.set_id = ?"
+                params = (set_id,)
+            rows = conn.execute(sql + " ORDER BY i.set_id, i.idx", params).fetchall()
+            if set_id and not rows and conn.execute("SELECT 1 FROM keyframe_sets WHERE id=?", (set_id,)).fetchone() is None:
+                raise RuntimeError(f"kcp_keyframe_set_not_found: {set_id}")
+
+            packed = resolve_packed(conn, root, [row["thumb_path"] or row["image_path"] for row in rows]) if backfill else {}
+            items = []
+            unhashed = []
+            backfilled = 0
+            for row in rows:
+                h = parse_hash(row["phash"])
+                if h is None and backfill:
+                    # Hash the stored thumb; the full-res image is only read when there is no thumb.
+                    h = dhash_file(media_source(root, row["thumb_path"] or row["image_path"], packed))
+                    if h is not None:
+                        with media_housekeeping(conn):
+                            conn.execute("UPDATE keyframe_set_items SET phash=? WHERE id=?", (format_hash(h), row["id"]))
+                        backfilled += 1
+                if h is None:
+                    unhashed.append({"set_id": row["set_id"], "idx": int(row["idx"])})
+                    continue
+                items.append((h, row))
+            if backfilled:
+                conn.commit()
+        finally:
+            conn.close()
+
+        hashes = {row["id"]: h for h, row in items}
+        clusters = []
+        for members in cluster_by_hash(items, int(max_distance)):
+            # Keep the set's picked item when it is in the cluster, else the lowest idx.
+            picked = [m for m in members if m["picked_index"] is not None and int(m["picked_index"]) == int(m["idx"])]
+            keep = picked[0] if picked else members[0]
+            keep_hash = hashes[keep["id"]]
+            clusters.append(
+                {
+                    "keep": {"set_id": keep["set_id"], "idx": int(keep["idx"])},
+                    "members": [
+                        {"set_id": m["set_id"], "idx": int(m["idx"]), "distance": hamming(keep_hash, hashes[m["id"]])}
+                        for m in members
+                    ],
+                }
+            )
+        duplicates = sum(len(c["members"]) - 1 for c in clusters)
+        payload = {
+            "set_id": set_id,
+            "max_distance": int(max_distance),
+            "items": len(items),
+            "backfilled": backfilled,
+            "unhashed": unhashed,
+            "clusters": clusters,
+            "duplicates": duplicates,
+        }
+        scope = f"set={set_id}" if set_id else "project"
+        summary = f"{scope} items={len(items)} clusters={len(clusters)} duplicates={duplicates} unhashed={len(unhashed)}"
+        return (json.dumps(payload), summary)
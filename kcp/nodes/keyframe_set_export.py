@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import json
+import re
+from pathlib import Path
+
+from kcp.db.paths import kcp_root_from_db_path, normalize_db_path, with_projectinit_db_path_tip
+from kcp.db.repo import connect
+from kcp.db.set_export import SET_EXPORT_DESTINATIONS, export_sets, parse_date_bound
+
+
+class KCP_SetExport:
+    OUTPUT_NODE = True
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "db_path": ("STRING", {"default": "output/kcp/db/kcp.sqlite"}),
+                "destination": (list(SET_EXPORT_DESTINATIONS),),
+                "picked_only": ("BOOLEAN", {"default": True}),
+            },
+            "optional": {
+                "set_ids": ("STRING", {"default": "", "multiline": True}),
+                "stack_id": ("STRING", {"default": ""}),
+                "date_from": ("STRING", {"default": ""}),
+                "date_to": ("STRING", {"default": ""}),
+                "output_path": ("STRING", {"default": ""}),
+            },
+        }
+
+    RETURN_TYPES = ("STRING", "STRING", "STRING")
+    RETURN_NAMES = ("summary", "report_json", "output_path")
+    FUNCTION = "run"
+    CATEGORY = "KCP"
+
+    def run(
+        self,
+        db_path: str,
+        destination: str = "folder",
+        picked_only: bool = True,
+        set_ids: str = "",
+        stack_id: str = "",
+        date_from: str = "",
+        date_to: str = "",
+        output_path: str = "",
+    ):
+        if destination not in SET_EXPORT_DESTINATIONS:
+            raise RuntimeError(f"kcp_set_export_destination_invalid: {destination}")
+        try:
+            since_ms = parse_date_bound(date_from)
+            until_ms = parse_date_bound(date_to, end=True)
+        except ValueError as e:
+            raise RuntimeError(f"kcp_set_export_date_invalid: expected YYYY-MM-DD ({e})") from e
+        wanted = [s for s in dict.fromkeys(re.split(r"[\s,]+", set_ids or "")) if s]
+        try:
+            dbp = normalize_db_path(db_path)
+            root = kcp_root_from_db_path(db_path)
+            conn = connect(dbp)
+        except Exception as e:
+            raise with_projectinit_db_path_tip(db_path, e) from e
+        try:
+            report = export_sets(
+                conn,
+                root,
+                Path(output_path.strip()) if (output_path or "").strip() else None,
+                destination,
+                set_ids=wanted,
+                stack_id=(stack_id or "").strip(),
+                since_ms=since_ms,
+                until_ms=until_ms,
+                picked_only=bool(picked_only),
+            )
+        finally:
+            conn.close()
+        summary = (
+            f"exported {report['items']} items from {report['sets']} sets: {report['files']} files ({report['bytes']} bytes), "
+            f"{report['deduplicated']} duplicates shared, to {report['output_path']}"
+        )
+        if report["missing"]:
+            summary += f"; {report['missing']} without media"
+        return (summary, json.dumps(report), report["output_path"])
@@ -2,8 +2,12 @@ from __future__ import annotations
 
 import json
 
+from kcp.db.packs import media_source, resolve_packed
 from kcp.db.paths import kcp_root_from_db_path, normalize_db_path, with_projectinit_db_path_tip
 from kcp.db.repo import connect, get_set_item
+from kcp.db.sets_layout import sets_layout
+from kcp.db.sidecars import load_set_item_image, sidecar_budget_bytes
+from kcp.db.tiers import is_archive_ref, rehydrate_item
 from kcp.util.image_io import load_image_as_comfy
 
 
@@ -33,6 +37,17 @@ class KCP_KeyframeSetItemLoad:
             row = get_set_item(conn, set_id, idx)
             if row is None:
                 raise RuntimeError("kcp_set_item_not_found")
+            root = kcp_root_from_db_path(db_path)
+            rehydrate_error = ""
+            if is_archive_ref(row["image_path"]):
+                # Cold-tier image: restore it to the hot tier, then load it like any other item.
+                try:
+                    rehydrate_item(conn, root, row["set_id"], row["idx"])
+                    row = get_set_item(conn, set_id, idx)
+                except (OSError, KeyError, ValueError) as e:
+                    if strict:
+                        raise RuntimeError(f"kcp_set_item_rehydrate_failed: {row['image_path']} ({e})") from e
+                    rehydrate_error = str(e)
 
             payload = {
                 "set_id": row["set_id"],
@@ -42,23 +57,31 @@ class KCP_KeyframeSetItemLoad:
                 "gen_params_json": row["gen_params_json"],
                 "image_path": row["image_path"],
                 "thumb_path": row["thumb_path"],
+                "media_retention": row["media_retention"] or "",
             }
 
-            root = kcp_root_from_db_path(db_path)
+            sidecar_budget = sidecar_budget_bytes(conn)
+            packed = resolve_packed(conn, root, [row["image_path"], row["thumb_path"]])
             image = None
             thumb = None
 
             if row["image_path"]:
-                ip = root / row["image_path"]
+                ip = media_source(root, row["image_path"], packed)
                 if ip.exists():
-                    image = load_image_as_comfy(ip)
+                    if sidecar_budget > 0:
+                        image = load_set_item_image(root, row["set_id"], row["idx"], ip, sidecar_budget, sets_layout(conn))
+                    else:
+                        image = load_image_as_comfy(ip)
                 elif strict:
                     raise RuntimeError("kcp_set_item_image_missing")
                 else:
-                    payload["warning_json"] = {"warning": "image missing on disk"}
+                    payload["warning_json"] = {"warning": f"image rehydrate failed: {rehydrate_error}" if rehydrate_error else "image missing on disk"}
+            elif row["media_retention"]:
+                # Retired by retention: no image on purpose, so strict mode does not raise and the thumb is still returned.
+                payload["warning_json"] = {"warning": f"image retired by retention ({row['media_retention']})"}
 
             if row["thumb_path"]:
-                tp = root / row["thumb_path"]
+                tp = media_source(root, row["thumb_path"], packed)
                 if tp.exists():
                     thumb = load_image_as_comfy(tp)
                 elif strict:
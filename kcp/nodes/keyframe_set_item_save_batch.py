@@ -2,9 +2,16 @@ from __future__ import annotations
 
 import json
 
-from kcp.db.paths import kcp_root_from_db_path, normalize_db_path, with_projectinit_db_path_tip
-from kcp.db.repo import connect, get_set_item, update_set_item_media
-from kcp.util.image_io import make_thumbnail, pillow_available, save_comfy_image_atomic
+from kcp.db.blobs import blob_store_enabled, discard_ingest, finish_ingest, ingest_media_pair, is_blob_ref, new_pending_ingest
+from kcp.db.packs import drop_loose_files, is_pack_ref, pack_files, set_packs_enabled
+from kcp.db.paths import kcp_root_from_db_path, normalize_db_path, set_item_media_rels, with_projectinit_db_path_tip
+from kcp.db.previews import plan_previews, record_previews
+from kcp.db.repo import connect, get_set_item, resolve_durability, resolve_encode_profile, update_set_item_media
+from kcp.db.sets_layout import sets_layout
+from kcp.db.tiers import is_archive_ref
+from kcp.util.durable_io import DURABILITY_MODES, StagedWrites, fsync_dirs
+from kcp.util.image_io import DEFAULT_THUMB_MAX_PX, ENCODE_PROFILES, make_thumbnail, pillow_available, save_comfy_image_atomic
+from kcp.util.phash import dhash_file, format_hash
 
 
 class KCP_KeyframeSetItemSaveBatch:
@@ -20,7 +27,11 @@ class KCP_KeyframeSetItemSaveBatch:
                 "images": ("IMAGE",),
                 "format": ("STRING", {"default": "webp"}),
                 "overwrite": ("BOOLEAN", {"default": True}),
-            }
+            },
+            "optional": {
+                "encode_profile": (["project_default", *ENCODE_PROFILES],),
+                "durability": (["project_default", *DURABILITY_MODES],),
+            },
         }
 
     RETURN_TYPES = ("STRING", "INT", "STRING")
@@ -48,7 +59,17 @@ class KCP_KeyframeSetItemSaveBatch:
             return images
         return images[bi : bi + 1]
 
-    def run(self, db_path: str, set_id: str, idx_start: int, images, format: str = "webp", overwrite: bool = True):
+    def run(
+        self,
+        db_path: str,
+        set_id: str,
+        idx_start: int,
+        images,
+        format: str = "webp",
+        overwrite: bool = True,
+        encode_profile: str = "project_default",
+        durability: str = "project_default",
+    ):
         if not pillow_available():
             raise RuntimeError("kcp_io_write_failed: Pillow required to save IMAGE input; install with pip install pillow")
         if idx_start < 0:
@@ -62,21 +83,6 @@ class KCP_KeyframeSetItemSaveBatch:
         try:
             dbp = normalize_db_path(db_path)
             root = kcp_root_from_db_path(db_path)
-            # Preflight: avoid partial batch writes when overwrite=False.
-            # If ANY target index already has media, fail before writing anything.
-            if not overwrite:
-                _shape = getattr(images, 'shape', None)
-                _batch_size = int(_shape[0]) if _shape is not None and len(_shape) == 4 else 1
-                _ext = (format or 'webp').lower().strip('.')
-                if _ext not in {'webp', 'png'}:
-                    _ext = 'webp'
-                for _j in range(_batch_size):
-                    _idx = int(idx_start) + _j
-                    _image_abs = (root / f"sets/{set_id}/{_idx}.{_ext}").resolve()
-                    _thumb_abs = (root / f"sets/{set_id}/{_idx}_thumb.webp").resolve()
-                    if _image_abs.exists() or _thumb_abs.exists():
-                        raise RuntimeError(f"kcp_set_item_media_exists: set_id={set_id} idx={_idx}")
-
         except Exception as e:
             raise with_projectinit_db_path_tip(db_path, e) from e
 
@@ -87,39 +93,126 @@ class KCP_KeyframeSetItemSaveBatch:
         except Exception as e:
             raise with_projectinit_db_path_tip(db_path, e) from e
         try:
+            rows = {}
             for bi in range(batch_size):
                 idx = int(idx_start + bi)
                 row = get_set_item(conn, set_id, idx)
                 if row is None:
                     raise RuntimeError(f"kcp_set_item_not_found: set_id={set_id} first_missing_idx={idx} db_path={dbp} root={root}")
-
-            saved = []
-            for bi in range(batch_size):
-                idx = int(idx_start + bi)
-                image_rel = f"sets/{set_id}/{idx}.{ext}"
-                thumb_rel = f"sets/{set_id}/{idx}_thumb.webp"
-                image_abs = (root / image_rel).resolve()
-                thumb_abs = (root / thumb_rel).resolve()
-
-                if (image_abs.exists() or thumb_abs.exists()) and not overwrite:
+                if not overwrite and (is_blob_ref(row["image_path"]) or is_pack_ref(row["image_path"]) or is_archive_ref(row["image_path"])):
                     raise RuntimeError(f"kcp_set_item_media_exists: set_id={set_id} idx={idx}")
+                rows[idx] = row
+
+            # Preflight: avoid partial batch writes when overwrite=False.
+            # If ANY target index already has media, fail before writing anything.
+            layout = sets_layout(conn)
+            targets = {idx: set_item_media_rels(set_id, idx, ext, layout) for idx in rows}
+            if not overwrite:
+                for idx, rels in targets.items():
+                    if any((root / rel).exists() for rel in rels):
+                        raise RuntimeError(f"kcp_set_item_media_exists: set_id={set_id} idx={idx}")
+
+            use_blobs = blob_store_enabled(conn)
+            use_packs = set_packs_enabled(conn) and not use_blobs
+            profile = resolve_encode_profile(conn, encode_profile)
+            mode = resolve_durability(conn, durability)
+            if mode not in DURABILITY_MODES:
+                raise RuntimeError(f"kcp_durability_invalid: {mode}")
+            # Every output is staged in all modes, so a failure mid-batch replaces
+            # no existing file. file/batch fsync the staged files and their
+            # directories once, before any DB row points at them.
+            staged = StagedWrites(sync=mode != "none")
+            out = staged.stage
+            file_mode = "none"
+
+            written = []
+            try:
+                for bi in range(batch_size):
+                    idx = int(idx_start + bi)
+                    image_rel, thumb_rel = targets[idx]
+                    image_abs = (root / image_rel).resolve()
+                    thumb_abs = (root / thumb_rel).resolve()
+
+                    if (image_abs.exists() or thumb_abs.exists()) and not overwrite:
+                        raise RuntimeError(f"kcp_set_item_media_exists: set_id={set_id} idx={idx}")
+
+                    try:
+                        image_abs.parent.mkdir(parents=True, exist_ok=True)
+                        image_one = self._batch_slice(images, bi, batch_size)
+                        ok = save_comfy_image_atomic(image_one, out(image_abs), fmt=encode_fmt, profile=profile, durability=file_mode)
+                        if not ok:
+                            raise RuntimeError("failed to save set item image")
+                        previews = plan_previews(conn, out(image_abs), thumb_abs)
+                        has_thumb = make_thumbnail(
+                            out(image_abs),
+                            out(thumb_abs),
+                            max_px=DEFAULT_THUMB_MAX_PX,
+                            profile=profile,
+                            levels={px: out(p) for px, p in previews.items()},
+                            durability=file_mode,
+                        )
+                    except Exception as e:
+                        raise RuntimeError(
+                            f"kcp_io_write_failed: set_id={set_id} idx={idx} root={root} "
+                            f"image_path={image_abs} thumb_path={thumb_abs} err={e!r}"
+                        ) from e
+                    written.append((idx, image_rel, thumb_rel if has_thumb else image_rel, image_abs, thumb_abs, has_thumb, previews))
+                staged.commit()
+            except Exception:
+                staged.discard()
+                raise
 
+            saved = []
+            synced_dirs = set()
+            hashes = {}
+            loose = []
+            for idx, _, _, image_abs, thumb_abs, has_thumb, previews in written:
+                hashes[idx] = format_hash(dhash_file(thumb_abs if has_thumb else image_abs))
+                loose += [image_abs, *((thumb_abs, *previews.values()) if has_thumb else ())]
+            # Packs: one append (and at most one fsync) for the whole batch.
+            packed = pack_files(conn, root, set_id, layout, loose, durability=mode) if use_packs else {}
+            pending = new_pending_ingest()
+            for idx, image_rel, thumb_rel, image_abs, thumb_abs, has_thumb, previews in written:
+                if use_packs:
+                    image_rel = packed[image_abs]
+                    thumb_rel = packed.get(thumb_abs, image_rel)
                 try:
-                    image_abs.parent.mkdir(parents=True, exist_ok=True)
-                    image_one = self._batch_slice(images, bi, batch_size)
-                    ok = save_comfy_image_atomic(image_one, image_abs, fmt=encode_fmt)
-                    if not ok:
-                        raise RuntimeError("failed to save set item image")
-                    if not make_thumbnail(image_abs, thumb_abs, max_px=384):
-                        thumb_rel = image_rel
+                    if use_blobs:
+                        image_rel, thumb_rel = ingest_media_pair(
+                            conn,
+                            root,
+                            image_abs,
+                            thumb_abs if has_thumb else None,
+                            previous=(rows[idx]["image_path"], rows[idx]["thumb_path"]),
+                            pending=pending,
+                        )
+                    recorded = record_previews(conn, root, "set_item", rows[idx]["id"], previews if has_thumb else {}, use_blobs, packed, pending)
                 except Exception as e:
+                    conn.rollback()
+                    discard_ingest(pending)
                     raise RuntimeError(
                         f"kcp_io_write_failed: set_id={set_id} idx={idx} root={root} "
                         f"image_path={image_abs} thumb_path={thumb_abs} err={e!r}"
                     ) from e
-
-                update_set_item_media(conn, set_id, idx, image_rel, thumb_rel)
+                if use_blobs:
+                    synced_dirs.update([image_abs.parent, *((root / rel).parent for rel in (image_rel, thumb_rel, *recorded.values()))])
+                try:
+                    update_set_item_media(conn, set_id, idx, image_rel, thumb_rel, phash=hashes[idx], commit=False)
+                except Exception:
+                    conn.rollback()
+                    discard_ingest(pending)
+                    raise
                 saved.append({"idx": idx, "image_path": image_rel, "thumb_path": thumb_rel})
+            try:
+                if mode != "none":
+                    fsync_dirs(synced_dirs)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                discard_ingest(pending)
+                raise
+            finish_ingest(pending)
+            drop_loose_files(packed)
 
             return (set_id, len(saved), json.dumps({"set_id": set_id, "saved_count": len(saved), "items": saved}))
         finally:
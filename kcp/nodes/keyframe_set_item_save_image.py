@@ -3,9 +3,16 @@ from __future__ import annotations
 import json
 import os
 
-from kcp.db.paths import kcp_root_from_db_path, normalize_db_path, with_projectinit_db_path_tip
-from kcp.db.repo import connect, get_set_item, update_set_item_media
-from kcp.util.image_io import make_thumbnail, pillow_available, save_comfy_image_atomic
+from kcp.db.blobs import blob_store_enabled, discard_ingest, finish_ingest, ingest_media_pair, is_blob_ref, new_pending_ingest
+from kcp.db.packs import drop_loose_files, is_pack_ref, pack_files, set_packs_enabled
+from kcp.db.paths import kcp_root_from_db_path, normalize_db_path, set_item_media_rels, with_projectinit_db_path_tip
+from kcp.db.previews import plan_previews, record_previews
+from kcp.db.repo import connect, get_set_item, resolve_durability, resolve_encode_profile, update_set_item_media
+from kcp.db.sets_layout import sets_layout
+from kcp.db.tiers import is_archive_ref
+from kcp.util.durable_io import DURABILITY_MODES, StagedWrites, fsync_dirs
+from kcp.util.image_io import DEFAULT_THUMB_MAX_PX, ENCODE_PROFILES, make_thumbnail, pillow_available, save_comfy_image_atomic
+from kcp.util.phash import dhash_file, format_hash
 
 
 DEBUG = False
@@ -28,6 +35,10 @@ class KCP_KeyframeSetItemSaveImage:
                 "overwrite": ("BOOLEAN", {"default": True}),
                 "batch_index": ("INT", {"default": 0, "min": 0}),
             },
+            "optional": {
+                "encode_profile": (["project_default", *ENCODE_PROFILES],),
+                "durability": (["project_default", *DURABILITY_MODES],),
+            },
         }
 
     RETURN_TYPES = ("STRING",)
@@ -53,7 +64,18 @@ class KCP_KeyframeSetItemSaveImage:
                 raise RuntimeError(f"kcp_batch_index_oob: batch_index={batch_index} batch_size=1")
         return image
 
-    def run(self, db_path: str, set_id: str, idx: int, image, format: str = "webp", overwrite: bool = True, batch_index: int = 0):
+    def run(
+        self,
+        db_path: str,
+        set_id: str,
+        idx: int,
+        image,
+        format: str = "webp",
+        overwrite: bool = True,
+        batch_index: int = 0,
+        encode_profile: str = "project_default",
+        durability: str = "project_default",
+    ):
         if not pillow_available():
             raise RuntimeError("kcp_io_write_failed: Pillow required to save IMAGE input; install with pip install pillow")
         if idx < 0:
@@ -76,10 +98,6 @@ class KCP_KeyframeSetItemSaveImage:
                 f"[KCP_KeyframeSetItemSaveImage] raw_db_path={db_path!r} "
                 f"normalized_db_path={dbp} resolved_root={root}"
             )
-        image_rel = f"sets/{set_id}/{idx}.{ext}"
-        thumb_rel = f"sets/{set_id}/{idx}_thumb.webp"
-        image_abs = (root / image_rel).resolve()
-        thumb_abs = (root / thumb_rel).resolve()
 
         try:
             conn = connect(dbp)
@@ -89,24 +107,83 @@ class KCP_KeyframeSetItemSaveImage:
             row = get_set_item(conn, set_id, idx)
             if row is None:
                 raise RuntimeError(f"kcp_set_item_not_found: set_id={set_id} idx={idx} db_path={dbp} root={root}")
-
-            if (image_abs.exists() or thumb_abs.exists()) and not overwrite:
+            layout = sets_layout(conn)
+            image_rel, thumb_rel = set_item_media_rels(set_id, idx, ext, layout)
+            image_abs = (root / image_rel).resolve()
+            thumb_abs = (root / thumb_rel).resolve()
+
+            use_blobs = blob_store_enabled(conn)
+            use_packs = set_packs_enabled(conn) and not use_blobs
+            profile = resolve_encode_profile(conn, encode_profile)
+            mode = resolve_durability(conn, durability)
+            if mode not in DURABILITY_MODES:
+                raise RuntimeError(f"kcp_durability_invalid: {mode}")
+            has_media = image_abs.exists() or thumb_abs.exists() or is_blob_ref(row["image_path"]) or is_pack_ref(row["image_path"]) or is_archive_ref(row["image_path"])
+            if has_media and not overwrite:
                 raise RuntimeError("kcp_set_item_media_exists")
 
+            # batch: stage every output, then fsync + rename them together before the DB update.
+            staged = StagedWrites() if mode == "batch" else None
+            out = staged.stage if staged else (lambda p: p)
+            file_mode = "file" if mode == "file" else "none"
+            # Blobs are linked in before the commit; loose sources go only after it.
+            pending = new_pending_ingest()
             try:
                 image_abs.parent.mkdir(parents=True, exist_ok=True)
-                ok = save_comfy_image_atomic(selected_image, image_abs, fmt=encode_fmt)
+                ok = save_comfy_image_atomic(selected_image, out(image_abs), fmt=encode_fmt, profile=profile, durability=file_mode)
                 if not ok:
                     raise RuntimeError("failed to save set item image")
-                if not make_thumbnail(image_abs, thumb_abs, max_px=384):
+                previews = plan_previews(conn, out(image_abs), thumb_abs)
+                has_thumb = make_thumbnail(
+                    out(image_abs),
+                    out(thumb_abs),
+                    max_px=DEFAULT_THUMB_MAX_PX,
+                    profile=profile,
+                    levels={px: out(p) for px, p in previews.items()},
+                    durability=file_mode,
+                )
+                if staged:
+                    staged.commit()
+                if not has_thumb:
                     thumb_rel = image_rel
+                phash = format_hash(dhash_file(thumb_abs if has_thumb else image_abs))
+                packed = {}
+                if use_packs:
+                    packed = pack_files(
+                        conn, root, set_id, layout, [image_abs, thumb_abs if has_thumb else None, *previews.values()], durability=mode
+                    )
+                    image_rel = packed[image_abs]
+                    thumb_rel = packed.get(thumb_abs, image_rel)
+                if use_blobs:
+                    image_rel, thumb_rel = ingest_media_pair(
+                        conn,
+                        root,
+                        image_abs,
+                        thumb_abs if has_thumb else None,
+                        previous=(row["image_path"], row["thumb_path"]),
+                        pending=pending,
+                    )
+                recorded = record_previews(conn, root, "set_item", row["id"], previews if has_thumb else {}, use_blobs, packed, pending)
+                if use_blobs and mode != "none":
+                    fsync_dirs([image_abs.parent, *((root / rel).parent for rel in (image_rel, thumb_rel, *recorded.values()))])
             except Exception as e:
+                conn.rollback()
+                discard_ingest(pending)
+                if staged:
+                    staged.discard()
                 raise RuntimeError(
                     f"kcp_io_write_failed: set_id={set_id} idx={idx} root={root} "
                     f"image_path={image_abs} thumb_path={thumb_abs} err={e!r}"
                 ) from e
 
-            updated = update_set_item_media(conn, set_id, idx, image_rel, thumb_rel)
+            try:
+                updated = update_set_item_media(conn, set_id, idx, image_rel, thumb_rel, phash=phash)
+            except Exception:
+                conn.rollback()
+                discard_ingest(pending)
+                raise
+            finish_ingest(pending)
+            drop_loose_files(packed)
             payload = {k: updated[k] for k in updated.keys()}
             return (json.dumps(payload),)
         finally:
@@ -3,9 +3,15 @@ from __future__ import annotations
 
 import json
 
+from kcp.db.packs import media_source, resolve_packed
 from kcp.db.paths import kcp_root_from_db_path, normalize_db_path, with_projectinit_db_path_tip
-from kcp.db.repo import connect
-from kcp.util.image_io import load_image_as_comfy, pillow_available
+from kcp.db.previews import list_previews, pick_preview_level
+from kcp.db.repo import connect, iter_set_items
+from kcp.db.tiers import is_archive_ref
+from kcp.util.image_io import DEFAULT_THUMB_MAX_PX, load_image_as_comfy, load_image_as_comfy_reduced, pillow_available
+
+
+LOAD_MODES = ["full", "thumbs_only", "max_side"]
 
 
 class KCP_KeyframeSetLoadBatch:
@@ -19,80 +25,163 @@ class KCP_KeyframeSetLoadBatch:
             },
             "optional": {
                 "only_with_media": ("BOOLEAN", {"default": True}),
+                "load_mode": (LOAD_MODES,),
+                "max_side": ("INT", {"default": 512, "min": 16, "max": 16384}),
+                "start_idx": ("INT", {"default": 0, "min": 0}),
+                "limit": ("INT", {"default": 0, "min": 0}),
             },
         }
 
-    RETURN_TYPES = ("IMAGE", "IMAGE", "STRING")
-    RETURN_NAMES = ("images", "thumbs", "items_json")
-    OUTPUT_IS_LIST = (True, True, True)
+    RETURN_TYPES = ("IMAGE", "IMAGE", "STRING", "STRING")
+    RETURN_NAMES = ("images", "thumbs", "items_json", "page_json")
+    OUTPUT_IS_LIST = (True, True, True, False)
     FUNCTION = "run"
     CATEGORY = "KCP"
 
-    def run(self, db_path: str, set_id: str, strict: bool = False, only_with_media: bool = True):
-        if not pillow_available():
-            raise RuntimeError("kcp_io_read_failed: Pillow required to load IMAGE output; install with pip install pillow")
-        try:
-            dbp = normalize_db_path(db_path)
-            root = kcp_root_from_db_path(db_path)
-        except Exception as e:
-            raise with_projectinit_db_path_tip(db_path, e) from e
+    @staticmethod
+    def _load_pair(image_abs, thumb_abs, load_mode: str, max_side: int, previews=None):
+        has_thumb = thumb_abs is not None and thumb_abs != image_abs and thumb_abs.exists()
+        if load_mode == "thumbs_only":
+            # Never decode the full-res file when a stored thumb exists.
+            if has_thumb:
+                thumb_obj = load_image_as_comfy(thumb_abs)
+            else:
+                thumb_obj = load_image_as_comfy_reduced(image_abs, DEFAULT_THUMB_MAX_PX)
+            return thumb_obj, thumb_obj
+        if load_mode == "max_side":
+            thumb_obj = load_image_as_comfy(thumb_abs) if has_thumb else None
+            # Decode the smallest stored pyramid level that still covers max_side.
+            levels = dict(previews or {})
+            if has_thumb:
+                levels[DEFAULT_THUMB_MAX_PX] = thumb_abs
+            source = pick_preview_level(levels, int(max_side)) or image_abs
+            image_obj = load_image_as_comfy_reduced(source, int(max_side))
+            return image_obj, (thumb_obj if thumb_obj is not None else image_obj)
+        image_obj = load_image_as_comfy(image_abs)
+        thumb_obj = load_image_as_comfy(thumb_abs) if has_thumb else image_obj
+        return image_obj, thumb_obj
 
-        try:
-            conn = connect(dbp)
-        except Exception as e:
-            raise with_projectinit_db_path_tip(db_path, e) from e
-        try:
-            rows = conn.execute("SELECT * FROM keyframe_set_items WHERE set_id=? ORDER BY idx", (set_id,)).fetchall()
-        finally:
-            conn.close()
+    def _iter_loaded(self, root, set_id: str, rows, strict: bool, load_mode: str, max_side: int, previews=None, packed=None):
+        """Decode rows lazily, yielding (image, thumb, item_payload) one item at a time.
 
-        rows = sorted(rows, key=lambda r: int(r["idx"]))
-        images = []
-        thumbs = []
-        items_json = []
+        `packed` maps set pack refs to their entries (see `kcp.db.packs.resolve_packed`).
+        Items whose image sits in a cold archive are yielded with `status: archived`
+        and no image, unless only their (hot) thumb is needed; they are not rehydrated.
+        """
+        previews = previews or {}
         for row in rows:
             idx = int(row["idx"])
             image_rel = (row["image_path"] or "").strip()
             thumb_rel = (row["thumb_path"] or "").strip()
-            if only_with_media and not image_rel:
-                continue
 
-            image_abs = (root / image_rel).resolve() if image_rel else None
-            thumb_abs = (root / thumb_rel).resolve() if thumb_rel else None
-            exists = image_abs is not None and image_abs.exists()
+            image_abs = media_source(root, image_rel, packed) if image_rel else None
+            thumb_abs = media_source(root, thumb_rel, packed) if thumb_rel else None
+            if load_mode == "thumbs_only" and thumb_abs is not None and thumb_abs.exists():
+                exists = True
+            elif is_archive_ref(image_rel):
+                yield None, None, {
+                    "set_id": set_id,
+                    "idx": idx,
+                    "image_path": image_rel,
+                    "thumb_path": thumb_rel,
+                    "status": "archived",
+                    "warning": {"code": "kcp_set_media_archived", "idx": idx, "image_path": image_rel},
+                }
+                continue
+            else:
+                exists = image_abs is not None and image_abs.exists()
             if not exists:
                 if strict:
                     raise RuntimeError(f"kcp_set_media_missing: set_id={set_id} idx={idx} image_path={image_abs}")
-                images.append(None)
-                thumbs.append(None)
-                items_json.append(json.dumps({
+                yield None, None, {
                     "set_id": set_id,
                     "idx": idx,
                     "image_path": image_rel,
                     "thumb_path": thumb_rel,
                     "warning": {"code": "kcp_set_media_missing", "idx": idx, "image_path": str(image_abs) if image_abs else ""},
-                }))
+                }
                 continue
 
             try:
-                image_obj = load_image_as_comfy(image_abs)
-                thumb_obj = load_image_as_comfy(thumb_abs) if (thumb_abs is not None and thumb_abs.exists()) else image_obj
+                levels = {px: media_source(root, rel, packed) for px, rel in previews.get(row["id"], {}).items()}
+                levels = {px: p for px, p in levels.items() if p.exists()}
+                image_obj, thumb_obj = self._load_pair(image_abs, thumb_abs, load_mode, max_side, levels)
             except Exception as e:
                 if strict:
                     raise RuntimeError(f"kcp_set_media_missing: set_id={set_id} idx={idx} image_path={image_abs} err={e!r}") from e
-                images.append(None)
-                thumbs.append(None)
-                items_json.append(json.dumps({
+                yield None, None, {
                     "set_id": set_id,
                     "idx": idx,
                     "image_path": image_rel,
                     "thumb_path": thumb_rel,
                     "warning": {"code": "kcp_set_media_missing", "idx": idx, "image_path": str(image_abs), "err": repr(e)},
-                }))
+                }
                 continue
 
-            images.append(image_obj)
-            thumbs.append(thumb_obj)
-            items_json.append(json.dumps({"set_id": set_id, "idx": idx, "image_path": image_rel, "thumb_path": thumb_rel}))
+            yield image_obj, thumb_obj, {"set_id": set_id, "idx": idx, "image_path": image_rel, "thumb_path": thumb_rel}
+
+    def run(
+        self,
+        db_path: str,
+        set_id: str,
+        strict: bool = False,
+        only_with_media: bool = True,
+        load_mode: str = "full",
+        max_side: int = 512,
+        start_idx: int = 0,
+        limit: int = 0,
+    ):
+        """Load the set's items with `idx >= start_idx` in idx order, at most `limit` of them (0 = all).
+
+        `start_idx` is an item idx cursor, not a row offset: idx values with no
+        row (or no media, with `only_with_media`) are skipped, so a page may
+        span a gap. `page_json` always carries `next_start_idx`, the idx the
+        next page starts at, or -1 once the set is exhausted.
+        """
+        if load_mode not in LOAD_MODES:
+            raise RuntimeError(f"kcp_load_mode_invalid: {load_mode}")
+        if not pillow_available():
+            raise RuntimeError("kcp_io_read_failed: Pillow required to load IMAGE output; install with pip install pillow")
+        try:
+            dbp = normalize_db_path(db_path)
+            root = kcp_root_from_db_path(db_path)
+        except Exception as e:
+            raise with_projectinit_db_path_tip(db_path, e) from e
+
+        try:
+            conn = connect(dbp)
+        except Exception as e:
+            raise with_projectinit_db_path_tip(db_path, e) from e
+
+        start_idx = max(0, int(start_idx))
+        limit = max(0, int(limit))
+        images = []
+        thumbs = []
+        payloads = []
+        next_start_idx = -1
+        try:
+            rows = iter_set_items(conn, set_id, start_idx=start_idx, limit=limit + 1 if limit else 0, only_with_media=only_with_media)
+            if limit:
+                # One row past the page tells us where the continuation starts (rows only, no decode).
+                rows = list(rows)
+                if len(rows) > limit:
+                    next_start_idx = int(rows[limit]["idx"])
+                    rows = rows[:limit]
+            rows = list(rows)
+            previews = {}
+            if load_mode == "max_side":
+                previews = list_previews(conn, "set_item", [r["id"] for r in rows])
+            rels = [r[k] for r in rows for k in ("image_path", "thumb_path")]
+            packed = resolve_packed(conn, root, [*rels, *(rel for levels in previews.values() for rel in levels.values())])
+            for image_obj, thumb_obj, payload in self._iter_loaded(root, set_id, rows, strict, load_mode, max_side, previews, packed):
+                images.append(image_obj)
+                thumbs.append(thumb_obj)
+                payloads.append(payload)
+        finally:
+            conn.close()
 
-        return (images, thumbs, items_json)
+        page = {"start_idx": start_idx, "limit": limit, "next_start_idx": next_start_idx}
+        if limit:
+            for payload in payloads:
+                payload["page"] = page
+        return (images, thumbs, [json.dumps(p) for p in payloads], json.dumps(page))
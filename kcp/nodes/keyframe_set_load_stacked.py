@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import json
+
+from kcp.db.packs import media_source, resolve_packed
+from kcp.db.paths import kcp_root_from_db_path, normalize_db_path, with_projectinit_db_path_tip
+from kcp.db.repo import connect
+from kcp.db.tiers import is_archive_ref
+from kcp.util.image_io import STACK_FIT_MODES, alloc_comfy_image, decode_image_into, image_size, numpy_available, pillow_available
+
+
+class KCP_KeyframeSetLoadStacked:
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "db_path": ("STRING", {"default": "output/kcp/db/kcp.sqlite"}),
+                "set_id": ("STRING", {"default": ""}),
+                "strict": ("BOOLEAN", {"default": False}),
+            },
+            "optional": {
+                "source": (["images", "thumbs"],),
+                "fit": (list(STACK_FIT_MODES),),
+                "width": ("INT", {"default": 0, "min": 0, "max": 16384}),
+                "height": ("INT", {"default": 0, "min": 0, "max": 16384}),
+            },
+        }
+
+    RETURN_TYPES = ("IMAGE", "STRING", "STRING")
+    RETURN_NAMES = ("images", "index_map_json", "items_json")
+    FUNCTION = "run"
+    CATEGORY = "KCP"
+
+    def run(
+        self,
+        db_path: str,
+        set_id: str,
+        strict: bool = False,
+        source: str = "images",
+        fit: str = "none",
+        width: int = 0,
+        height: int = 0,
+    ):
+        if not pillow_available():
+            raise RuntimeError("kcp_io_read_failed: Pillow required to load IMAGE output; install with pip install pillow")
+        if not numpy_available():
+            raise RuntimeError("kcp_io_read_failed: NumPy required for stacked IMAGE output")
+        if fit not in STACK_FIT_MODES:
+            raise RuntimeError(f"kcp_stack_fit_invalid: {fit}")
+
+        try:
+            dbp = normalize_db_path(db_path)
+            root = kcp_root_from_db_path(db_path)
+            conn = connect(dbp)
+        except Exception as e:
+            raise with_projectinit_db_path_tip(db_path, e) from e
+        try:
+            rows = conn.execute(
+                "SELECT idx,image_path,thumb_path FROM keyframe_set_items WHERE set_id=? AND image_path != '' ORDER BY idx",
+                (set_id,),
+            ).fetchall()
+            packed = resolve_packed(conn, root, [r[k] for r in rows for k in ("image_path", "thumb_path")])
+        finally:
+            conn.close()
+
+        entries = []
+        warnings = []
+        for row in rows:
+            idx = int(row["idx"])
+            rel = (row["thumb_path"] if source == "thumbs" and (row["thumb_path"] or "").strip() else row["image_path"]).strip()
+            if is_archive_ref(rel):
+                # Cold images are skipped, not rehydrated; KCP_KeyframeSetItemLoad restores single items.
+                warnings.append({"code": "kcp_set_media_archived", "idx": idx, "image_path": rel})
+                continue
+            path = media_source(root, rel, packed)
+            try:
+                w, h = image_size(path)
+            except Exception as e:
+                if strict:
+                    raise RuntimeError(f"kcp_set_media_missing: set_id={set_id} idx={idx} image_path={path} err={e!r}") from e
+                warnings.append({"code": "kcp_set_media_missing", "idx": idx, "image_path": str(path)})
+                continue
+            entries.append((idx, rel, path, w, h))
+
+        if not entries:
+            # An IMAGE output cannot be empty: downstream nodes would fail on None.
+            archived = sum(w["code"] == "kcp_set_media_archived" for w in warnings)
+            if archived:
+                raise RuntimeError(
+                    f"kcp_set_media_archived: set_id={set_id} no loadable items (archived={archived} skipped={len(warnings)}); "
+                    "use source=thumbs or rehydrate items with KCP_KeyframeSetItemLoad"
+                )
+            raise RuntimeError(f"kcp_set_media_missing: set_id={set_id} no loadable items (skipped={len(warnings)})")
+
+        target_w = int(width) or max(e[3] for e in entries)
+        target_h = int(height) or max(e[4] for e in entries)
+        if fit == "none":
+            mismatched = [e[0] for e in entries if (e[3], e[4]) != (target_w, target_h)]
+            if mismatched:
+                raise RuntimeError(
+                    f"kcp_set_batch_size_mismatch: set_id={set_id} idxs={mismatched} "
+                    f"expected={target_w}x{target_h}; use fit=letterbox or fit=resize"
+                )
+
+        batch, view = alloc_comfy_image(len(entries), target_h, target_w)
+        for bi, (idx, _, path, _, _) in enumerate(entries):
+            decode_image_into(path, view[bi], fit=fit)
+
+        index_map = {
+            "set_id": set_id,
+            "idx": [e[0] for e in entries],
+            "width": target_w,
+            "height": target_h,
+            "source": source,
+            "fit": fit,
+            "warnings": warnings,
+        }
+        items = [
+            {"set_id": set_id, "idx": idx, "batch_index": bi, "path": rel, "source_width": w, "source_height": h}
+            for bi, (idx, rel, _, w, h) in enumerate(entries)
+        ]
+        return (batch, json.dumps(index_map), json.dumps(items))
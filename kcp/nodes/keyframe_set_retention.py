@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import json
+
+from kcp.db.paths import kcp_root_from_db_path, normalize_db_path, with_projectinit_db_path_tip
+from kcp.db.repo import connect, resolve_durability
+from kcp.db.retention import DEFAULT_BATCH_SIZE, DEFAULT_DOWNSCALE_PX, RETENTION_ACTIONS, run_retention
+from kcp.util.durable_io import DURABILITY_MODES
+from kcp.util.image_io import pillow_available
+
+
+class KCP_SetRetention:
+    OUTPUT_NODE = True
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "db_path": ("STRING", {"default": "output/kcp/db/kcp.sqlite"}),
+                "action": (list(RETENTION_ACTIONS),),
+                "older_than_days": ("INT", {"default": 30, "min": 0, "max": 36500}),
+                "dry_run": ("BOOLEAN", {"default": True}),
+            },
+            "optional": {
+                "set_id": ("STRING", {"default": ""}),
+                "max_px": ("INT", {"default": DEFAULT_DOWNSCALE_PX, "min": 64, "max": 16384}),
+                "keep_promoted": ("BOOLEAN", {"default": True}),
+                "only_picked_sets": ("BOOLEAN", {"default": True}),
+                "batch_size": ("INT", {"default": DEFAULT_BATCH_SIZE, "min": 1, "max": 100000}),
+                "limit": ("INT", {"default": 0, "min": 0}),
+                "durability": (["project_default", *DURABILITY_MODES],),
+            },
+        }
+
+    RETURN_TYPES = ("STRING", "STRING")
+    RETURN_NAMES = ("summary", "report_json")
+    FUNCTION = "run"
+    CATEGORY = "KCP"
+
+    def run(
+        self,
+        db_path: str,
+        action: str = "delete",
+        older_than_days: int = 30,
+        dry_run: bool = True,
+        set_id: str = "",
+        max_px: int = DEFAULT_DOWNSCALE_PX,
+        keep_promoted: bool = True,
+        only_picked_sets: bool = True,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        limit: int = 0,
+        durability: str = "project_default",
+    ):
+        if action not in RETENTION_ACTIONS:
+            raise RuntimeError(f"kcp_retention_action_invalid: {action}")
+        if action == "downscale" and not dry_run and not pillow_available():
+            raise RuntimeError("kcp_io_write_failed: Pillow required to downscale set media; install with pip install pillow")
+        try:
+            dbp = normalize_db_path(db_path)
+            root = kcp_root_from_db_path(db_path)
+            conn = connect(dbp)
+        except Exception as e:
+            raise with_projectinit_db_path_tip(db_path, e) from e
+        try:
+            mode = resolve_durability(conn, durability)
+            if mode not in DURABILITY_MODES:
+                raise RuntimeError(f"kcp_durability_invalid: {mode}")
+            set_id = (set_id or "").strip()
+            if set_id and conn.execute("SELECT 1 FROM keyframe_sets WHERE id=?", (set_id,)).fetchone() is None:
+                raise RuntimeError(f"kcp_keyframe_set_not_found: {set_id}")
+            report = run_retention(
+                conn,
+                root,
+                action,
+                older_than_days,
+                set_id=set_id,
+                keep_promoted=bool(keep_promoted),
+                only_picked_sets=bool(only_picked_sets),
+                max_px=int(max_px),
+                batch_size=int(batch_size),
+                limit=int(limit),
+                durability=mode,
+                dry_run=bool(dry_run),
+            )
+        finally:
+            conn.close()
+        if report["dry_run"]:
+            summary = f"dry run: would {action} {report['candidates']} of {report['items_scanned']} item images ({report['bytes_in_scope']} bytes)"
+        else:
+            summary = f"{action}: {report['items_retired']} item images, {report['files_deleted']} files deleted, {report['bytes_freed']} bytes freed"
+        return (summary, json.dumps(report))
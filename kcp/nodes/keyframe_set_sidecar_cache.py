@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import json
+
+from kcp.db.packs import media_source, resolve_packed
+from kcp.db.paths import kcp_root_from_db_path, normalize_db_path, with_projectinit_db_path_tip
+from kcp.db.repo import connect
+from kcp.db.sets_layout import sets_layout
+from kcp.db.tiers import is_archive_ref
+from kcp.db.sidecars import (
+    clear_sidecars,
+    enforce_budget,
+    load_sidecar,
+    sidecar_budget_bytes,
+    sidecar_path,
+    sidecar_stats,
+    write_sidecar,
+)
+from kcp.util.image_io import numpy_available, pillow_available
+
+
+SIDECAR_ACTIONS = ["stats", "warm", "clear"]
+
+
+class KCP_KeyframeSetSidecarCache:
+    OUTPUT_NODE = True
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "db_path": ("STRING", {"default": "output/kcp/db/kcp.sqlite"}),
+                "set_id": ("STRING", {"default": ""}),
+                "action": (SIDECAR_ACTIONS,),
+            }
+        }
+
+    RETURN_TYPES = ("STRING",)
+    RETURN_NAMES = ("status_json",)
+    FUNCTION = "run"
+    CATEGORY = "KCP"
+
+    def run(self, db_path: str, set_id: str, action: str = "stats"):
+        if action not in SIDECAR_ACTIONS:
+            raise RuntimeError(f"kcp_sidecar_action_invalid: {action}")
+        set_id = (set_id or "").strip()
+        try:
+            dbp = normalize_db_path(db_path)
+            root = kcp_root_from_db_path(db_path)
+            conn = connect(dbp)
+        except Exception as e:
+            raise with_projectinit_db_path_tip(db_path, e) from e
+        try:
+            budget = sidecar_budget_bytes(conn)
+            layout = sets_layout(conn)
+            rows = []
+            if action == "warm":
+                if not set_id:
+                    raise RuntimeError("kcp_set_id_required: warm needs a set_id")
+                rows = conn.execute(
+                    "SELECT idx, image_path FROM keyframe_set_items WHERE set_id=? AND image_path != '' ORDER BY idx",
+                    (set_id,),
+                ).fetchall()
+                packed = resolve_packed(conn, root, [row["image_path"] for row in rows])
+        finally:
+            conn.close()
+
+        status = {"set_id": set_id, "action": action, "budget_bytes": budget}
+        if action == "clear":
+            status.update(clear_sidecars(root, set_id, layout))
+        elif action == "warm":
+            if budget <= 0:
+                raise RuntimeError("kcp_sidecar_cache_disabled: set KCP_ProjectInit.sidecar_cache_mb > 0")
+            if not (numpy_available() and pillow_available()):
+                raise RuntimeError("kcp_io_read_failed: NumPy and Pillow required to warm sidecars")
+            written = 0
+            fresh = 0
+            missing = []
+            archived = []
+            for row in rows:
+                if is_archive_ref(row["image_path"]):
+                    # Cold items are not warmed: archiving drops their sidecars on purpose.
+                    archived.append(int(row["idx"]))
+                    continue
+                source = media_source(root, row["image_path"], packed)
+                if not source.exists():
+                    missing.append(int(row["idx"]))
+                    continue
+                sidecar = sidecar_path(root, set_id, row["idx"], layout)
+                if load_sidecar(sidecar, source) is not None:
+                    fresh += 1
+                    continue
+                write_sidecar(sidecar, source)
+                written += 1
+            status.update({"written": written, "already_fresh": fresh, "missing_idxs": missing, "archived_idxs": archived})
+            status["evicted"] = enforce_budget(root, budget)["evicted"]
+        status.update(sidecar_stats(root, set_id, layout))
+        return (json.dumps(status),)
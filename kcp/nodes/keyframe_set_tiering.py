@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import json
+
+from kcp.db.paths import kcp_root_from_db_path, normalize_db_path, with_projectinit_db_path_tip
+from kcp.db.repo import connect
+from kcp.db.tiers import archive_cold_sets, gc_archives, tier_stats
+
+
+TIERING_ACTIONS = ["stats", "archive", "gc"]
+
+
+class KCP_SetTiering:
+    OUTPUT_NODE = True
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "db_path": ("STRING", {"default": "output/kcp/db/kcp.sqlite"}),
+                "action": (TIERING_ACTIONS,),
+                "older_than_days": ("INT", {"default": 90, "min": 0, "max": 36500}),
+                "dry_run": ("BOOLEAN", {"default": True}),
+            },
+            "optional": {
+                "set_id": ("STRING", {"default": ""}),
+            },
+        }
+
+    RETURN_TYPES = ("STRING", "STRING")
+    RETURN_NAMES = ("summary", "report_json")
+    FUNCTION = "run"
+    CATEGORY = "KCP"
+
+    def run(self, db_path: str, action: str = "stats", older_than_days: int = 90, dry_run: bool = True, set_id: str = ""):
+        if action not in TIERING_ACTIONS:
+            raise RuntimeError(f"kcp_tiering_action_invalid: {action}")
+        try:
+            dbp = normalize_db_path(db_path)
+            root = kcp_root_from_db_path(db_path)
+            conn = connect(dbp)
+        except Exception as e:
+            raise with_projectinit_db_path_tip(db_path, e) from e
+        try:
+            report = {}
+            if action == "archive":
+                report = archive_cold_sets(conn, root, older_than_days, set_id=(set_id or "").strip(), dry_run=bool(dry_run))
+            elif action == "gc":
+                report = gc_archives(conn, root, dry_run=bool(dry_run))
+            report["tiers"] = tier_stats(conn, root)
+        finally:
+            conn.close()
+        tiers = report["tiers"]
+        summary = (
+            f"hot {tiers['hot_items']} items / {tiers['hot_bytes']} bytes, "
+            f"cold {tiers['cold_items']} items / {tiers['cold_bytes']} bytes ({tiers['archive_bytes_on_disk']} on disk)"
+        )
+        if action == "archive":
+            verb = "would archive" if report["dry_run"] else "archived"
+            summary = f"{verb} {report['items']} items from {report['sets']} sets; " + summary
+        elif action == "gc":
+            verb = "would delete" if report["dry_run"] else "deleted"
+            summary = f"{verb} {report['archives_deleted']} archives ({report['bytes_freed']} bytes); " + summary
+        return (summary, json.dumps(report))
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import json
+
+from kcp.db.dashboard import DEFAULT_DAYS, DEFAULT_TOP_N, project_dashboard
+from kcp.db.paths import normalize_db_path, with_projectinit_db_path_tip
+
+
+class KCP_ProjectDashboard:
+    OUTPUT_NODE = True
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "db_path": ("STRING", {"default": "output/kcp/db/kcp.sqlite"}),
+            },
+            "optional": {
+                "days": ("INT", {"default": DEFAULT_DAYS, "min": 1, "max": 3650}),
+                "top_n": ("INT", {"default": DEFAULT_TOP_N, "min": 1, "max": 1000}),
+            },
+        }
+
+    RETURN_TYPES = ("STRING", "STRING")
+    RETURN_NAMES = ("summary", "dashboard_json")
+    FUNCTION = "run"
+    CATEGORY = "KCP"
+
+    def run(self, db_path: str, days: int = DEFAULT_DAYS, top_n: int = DEFAULT_TOP_N):
+        try:
+            dashboard = project_dashboard(normalize_db_path(db_path), int(days), int(top_n))
+        except Exception as e:
+            raise with_projectinit_db_path_tip(db_path, e) from e
+        sets, items = dashboard["sets"], dashboard["items"]
+        assets = sum(t["total"] for t in dashboard["assets"]["by_type"].values())
+        summary = (
+            f"{assets} assets ({dashboard['assets']['promoted_keyframes']} promoted keyframes), "
+            f"{sets['total']} sets ({sets['picked']} picked, {sets['picked_rate'] * 100:.1f}%), "
+            f"{items['total']} items ({items['with_media']} with media: {items['hot']} hot / {items['cold']} cold)"
+        )
+        return (summary, json.dumps(dashboard))
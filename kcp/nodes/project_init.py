@@ -2,9 +2,16 @@ from __future__ import annotations
 
 import json
 
+from kcp.db.blobs import blob_store_enabled, set_blob_store_enabled
 from kcp.db.migrate import migrate
-from kcp.db.paths import ensure_layout, resolve_root
-from kcp.db.repo import connect
+from kcp.db.packs import set_packs_enabled, set_set_packs_enabled
+from kcp.db.paths import SETS_LAYOUTS, ensure_layout, resolve_root
+from kcp.db.previews import parse_preview_levels, preview_levels as project_preview_levels, set_preview_levels
+from kcp.db.repo import META_DURABILITY, META_ENCODE_PROFILE, connect, get_meta, set_meta
+from kcp.db.sets_layout import project_has_set_media, set_sets_layout, sets_layout as project_sets_layout
+from kcp.db.sidecars import set_sidecar_budget_mb, sidecar_budget_bytes
+from kcp.util.durable_io import DURABILITY_MODES
+from kcp.util.image_io import ENCODE_PROFILES
 
 
 class KCP_ProjectInit:
@@ -17,7 +24,16 @@ class KCP_ProjectInit:
                 "kcp_root": ("STRING", {"default": "output/kcp"}),
                 "db_filename": ("STRING", {"default": "kcp.sqlite"}),
                 "create_if_missing": ("BOOLEAN", {"default": True}),
-            }
+            },
+            "optional": {
+                "blob_store": (["keep", "enable", "disable"],),
+                "encode_profile": (["keep", *ENCODE_PROFILES, "pillow_default"],),
+                "preview_levels": ("STRING", {"default": ""}),
+                "durability": (["keep", *DURABILITY_MODES],),
+                "sidecar_cache_mb": ("INT", {"default": -1, "min": -1, "max": 1048576}),
+                "sets_layout": (["keep", *SETS_LAYOUTS],),
+                "set_packs": (["keep", "enable", "disable"],),
+            },
         }
 
     RETURN_TYPES = ("STRING", "STRING", "STRING")
@@ -25,7 +41,25 @@ class KCP_ProjectInit:
     FUNCTION = "run"
     CATEGORY = "KCP"
 
-    def run(self, kcp_root: str, db_filename: str, create_if_missing: bool = True):
+    def run(
+        self,
+        kcp_root: str,
+        db_filename: str,
+        create_if_missing: bool = True,
+        blob_store: str = "keep",
+        encode_profile: str = "keep",
+        preview_levels: str = "",
+        durability: str = "keep",
+        sidecar_cache_mb: int = -1,
+        sets_layout: str = "keep",
+        set_packs: str = "keep",
+    ):
+        levels = None
+        if (preview_levels or "").strip():
+            try:
+                levels = parse_preview_levels(preview_levels)
+            except ValueError as e:
+                raise RuntimeError(f"kcp_preview_levels_invalid: {preview_levels!r} ({e})") from e
         root = resolve_root(kcp_root)
         if create_if_missing:
             layout = ensure_layout(root, db_filename)
@@ -41,9 +75,43 @@ class KCP_ProjectInit:
         try:
             conn = connect(db_path)
             ver = migrate(conn)
+            # Set packs and the blob store are alternative storage backends for set media.
+            want_blobs = blob_store == "enable" or (blob_store == "keep" and blob_store_enabled(conn))
+            want_packs = set_packs == "enable" or (set_packs == "keep" and set_packs_enabled(conn))
+            packs_conflict = want_blobs and want_packs
+            if blob_store in {"enable", "disable"} and not packs_conflict:
+                set_blob_store_enabled(conn, blob_store == "enable")
+            if set_packs in {"enable", "disable"} and not packs_conflict:
+                set_set_packs_enabled(conn, set_packs == "enable")
+            blobs_on = blob_store_enabled(conn)
+            packs_on = set_packs_enabled(conn)
+            if encode_profile in ENCODE_PROFILES or encode_profile == "pillow_default":
+                set_meta(conn, META_ENCODE_PROFILE, "" if encode_profile == "pillow_default" else encode_profile)
+            project_profile = get_meta(conn, META_ENCODE_PROFILE, "") or "pillow_default"
+            if levels is not None:
+                set_preview_levels(conn, levels)
+            project_levels = project_preview_levels(conn)
+            if durability in DURABILITY_MODES:
+                set_meta(conn, META_DURABILITY, durability)
+            project_durability = get_meta(conn, META_DURABILITY, "") or "none"
+            if int(sidecar_cache_mb) >= 0:
+                set_sidecar_budget_mb(conn, int(sidecar_cache_mb))
+            project_sidecar_mb = sidecar_budget_bytes(conn) // (1024 * 1024)
+            # Switching layouts only applies to new saves, so refuse once set media exists.
+            layout_blocked = sets_layout in SETS_LAYOUTS and sets_layout != project_sets_layout(conn) and project_has_set_media(conn)
+            if sets_layout in SETS_LAYOUTS and not layout_blocked:
+                set_sets_layout(conn, sets_layout)
+            project_layout = project_sets_layout(conn)
             conn.close()
         except Exception as e:
             raise RuntimeError(f"kcp_db_migration_failed: {e}") from e
+        if packs_conflict:
+            raise RuntimeError("kcp_set_packs_conflict: set_packs and blob_store cannot both be enabled; disable one of them")
+        if layout_blocked:
+            raise RuntimeError(
+                f"kcp_sets_layout_change_requires_migration: project uses sets_layout={project_layout}; "
+                f"run tools/migrate_sets_layout.py --db-path {db_path} --to {sets_layout}"
+            )
 
         status = {
             "ok": True,
@@ -51,5 +119,12 @@ class KCP_ProjectInit:
             "kcp_root_resolved": str(root),
             "schema_version": ver,
             "create_if_missing": bool(create_if_missing),
+            "blob_store": blobs_on,
+            "encode_profile": project_profile,
+            "preview_levels": project_levels,
+            "durability": project_durability,
+            "sidecar_cache_mb": project_sidecar_mb,
+            "sets_layout": project_layout,
+            "set_packs": packs_on,
         }
         return (str(db_path), str(root), json.dumps(status))
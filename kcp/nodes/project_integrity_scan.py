@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import json
+
+from kcp.db.integrity import SCAN_MODES, scan_project
+from kcp.db.paths import kcp_root_from_db_path, normalize_db_path, with_projectinit_db_path_tip
+from kcp.db.repo import connect
+
+
+class KCP_ProjectIntegrityScan:
+    OUTPUT_NODE = True
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "db_path": ("STRING", {"default": "output/kcp/db/kcp.sqlite"}),
+                "mode": (list(SCAN_MODES),),
+                "verify_hashes": ("BOOLEAN", {"default": True}),
+            },
+            "optional": {
+                "workers": ("INT", {"default": 0, "min": 0, "max": 64}),
+                "max_listed": ("INT", {"default": 1000, "min": 0, "max": 1000000}),
+            },
+        }
+
+    RETURN_TYPES = ("STRING", "STRING", "BOOLEAN")
+    RETURN_NAMES = ("summary", "report_json", "is_clean")
+    FUNCTION = "run"
+    CATEGORY = "KCP"
+
+    def run(self, db_path: str, mode: str = "full", verify_hashes: bool = True, workers: int = 0, max_listed: int = 1000):
+        if mode not in SCAN_MODES:
+            raise RuntimeError(f"kcp_scan_mode_invalid: {mode}")
+        try:
+            dbp = normalize_db_path(db_path)
+            root = kcp_root_from_db_path(db_path)
+            conn = connect(dbp)
+        except Exception as e:
+            raise with_projectinit_db_path_tip(db_path, e) from e
+        try:
+            report = scan_project(conn, root, mode=mode, verify_hashes=bool(verify_hashes), workers=int(workers), max_listed=int(max_listed))
+        finally:
+            conn.close()
+        counts = report["counts"]
+        summary = (
+            f"{report['files_scanned']} files, {report['refs']} refs, checked {report['checked']} "
+            f"(unchanged {report['skipped_unchanged']}): {counts['orphans']} orphans, "
+            f"{counts['dangling']} dangling, {counts['corrupt']} corrupt"
+        )
+        return (summary, json.dumps(report), bool(report["ok"]))
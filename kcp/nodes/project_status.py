@@ -1,8 +1,12 @@
 from __future__ import annotations
 
 import json
-from kcp.db.paths import normalize_db_path, with_projectinit_db_path_tip
+from kcp.db.paths import kcp_root_from_db_path, normalize_db_path, with_projectinit_db_path_tip
 from kcp.db.repo import connect
+from kcp.util.image_io import probe
+
+
+SCAN_MODES = ["off", "integrity"]
 
 
 class KCP_ProjectStatus:
@@ -13,7 +17,10 @@ class KCP_ProjectStatus:
                 "db_path": ("STRING", {"default": "output/kcp/db/kcp.sqlite"}),
                 "required_environment_names_csv": ("STRING", {"default": ""}),
                 "strict_plate_check": ("BOOLEAN", {"default": True}),
-            }
+            },
+            "optional": {
+                "scan_mode": (SCAN_MODES,),
+            },
         }
 
     RETURN_TYPES = ("STRING", "STRING", "BOOLEAN")
@@ -21,7 +28,26 @@ class KCP_ProjectStatus:
     FUNCTION = "run"
     CATEGORY = "KCP"
 
-    def run(self, db_path, required_environment_names_csv="", strict_plate_check=True):
+    @staticmethod
+    def _scan_asset_media(conn, root) -> dict:
+        """Probe headers of every non-archived asset image/thumb (no pixel decode)."""
+        checked = 0
+        corrupt = []
+        rows = conn.execute("SELECT type, name, image_path, thumb_path FROM assets WHERE is_archived=0 ORDER BY type, name").fetchall()
+        for row in rows:
+            for col in ("image_path", "thumb_path"):
+                rel = (row[col] or "").strip()
+                if not rel:
+                    continue
+                checked += 1
+                info = probe(root / rel)
+                if not info["ok"]:
+                    corrupt.append({"type": row["type"], "name": row["name"], "path": rel, "error": info["error"]})
+        return {"checked": checked, "corrupt": corrupt}
+
+    def run(self, db_path, required_environment_names_csv="", strict_plate_check=True, scan_mode="off"):
+        if scan_mode not in SCAN_MODES:
+            raise RuntimeError(f"kcp_scan_mode_invalid: {scan_mode}")
         try:
             conn = connect(normalize_db_path(db_path))
         except Exception as e:
@@ -43,8 +69,17 @@ class KCP_ProjectStatus:
                 if missing_required:
                     warnings.append(f"required environments missing: {', '.join(missing_required)}")
 
+            media_scan = None
+            if scan_mode == "integrity":
+                media_scan = self._scan_asset_media(conn, kcp_root_from_db_path(db_path))
+                if media_scan["corrupt"]:
+                    names = sorted({c["name"] for c in media_scan["corrupt"]})
+                    warnings.append(f"corrupt media: {', '.join(names)}")
+
             ready = len(warnings) == 0
             status = {"ready": ready, "warnings": warnings, "environment_count": len(env_rows)}
+            if media_scan is not None:
+                status["media_scan"] = media_scan
             text = "Ready for keyframes" if ready else " ; ".join(warnings)
             return (text, json.dumps(status), ready)
         finally:
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+from kcp.db.paths import kcp_root_from_db_path, normalize_db_path, with_projectinit_db_path_tip
+from kcp.db.repo import connect
+from kcp.db.sync import export_changes, import_changes
+
+
+class KCP_SyncExport:
+    OUTPUT_NODE = True
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "db_path": ("STRING", {"default": "output/kcp/db/kcp.sqlite"}),
+                "since_seq": ("INT", {"default": 0, "min": 0, "max": 2**63 - 1}),
+            },
+            "optional": {
+                "output_path": ("STRING", {"default": ""}),
+            },
+        }
+
+    RETURN_TYPES = ("STRING", "STRING", "STRING", "INT")
+    RETURN_NAMES = ("summary", "report_json", "changeset_path", "watermark")
+    FUNCTION = "run"
+    CATEGORY = "KCP"
+
+    def run(self, db_path: str, since_seq: int = 0, output_path: str = ""):
+        try:
+            dbp = normalize_db_path(db_path)
+            root = kcp_root_from_db_path(db_path)
+            conn = connect(dbp)
+        except Exception as e:
+            raise with_projectinit_db_path_tip(db_path, e) from e
+        try:
+            report = export_changes(conn, root, int(since_seq), Path(output_path.strip()) if (output_path or "").strip() else None)
+        finally:
+            conn.close()
+        summary = (
+            f"exported {report['changes']} changes ({report['since']}..{report['until']}) and {report['files']} files "
+            f"({report['bytes']} bytes) to {report['changeset_path']}"
+        )
+        if report["missing"]:
+            summary += f"; {report['missing']} media missing"
+        return (summary, json.dumps(report), report["changeset_path"], report["until"])
+
+
+class KCP_SyncImport:
+    OUTPUT_NODE = True
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "db_path": ("STRING", {"default": "output/kcp/db/kcp.sqlite"}),
+                "changeset_path": ("STRING", {"default": ""}),
+            },
+        }
+
+    RETURN_TYPES = ("STRING", "STRING")
+    RETURN_NAMES = ("summary", "report_json")
+    FUNCTION = "run"
+    CATEGORY = "KCP"
+
+    def run(self, db_path: str, changeset_path: str):
+        changeset = Path(str(changeset_path).strip())
+        if not changeset.is_file():
+            raise RuntimeError(f"kcp_sync_changeset_missing: {changeset}")
+        try:
+            dbp = normalize_db_path(db_path)
+            root = kcp_root_from_db_path(db_path)
+            conn = connect(dbp)
+        except Exception as e:
+            raise with_projectinit_db_path_tip(db_path, e) from e
+        try:
+            try:
+                report = import_changes(conn, root, changeset)
+            except ValueError as e:
+                raise RuntimeError(f"kcp_sync_changeset_invalid: {e}") from e
+        finally:
+            conn.close()
+        summary = (
+            f"applied {report['applied']} of {report['changes']} changes from {report['origin']}: "
+            f"{report['stale']} older than local, {report['duplicate']} already applied, {report['conflict']} conflicts"
+        )
+        return (summary, json.dumps(report))
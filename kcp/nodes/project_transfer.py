@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+from kcp.db.paths import kcp_root_from_db_path, normalize_db_path, with_projectinit_db_path_tip
+from kcp.db.repo import connect
+from kcp.db.transfer import EXPORT_MEDIA_MODES, IMPORT_CONFLICT_MODES, export_project, import_project
+
+
+class KCP_ProjectExport:
+    OUTPUT_NODE = True
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "db_path": ("STRING", {"default": "output/kcp/db/kcp.sqlite"}),
+                "media": (list(EXPORT_MEDIA_MODES),),
+            },
+            "optional": {
+                "output_path": ("STRING", {"default": ""}),
+            },
+        }
+
+    RETURN_TYPES = ("STRING", "STRING", "STRING")
+    RETURN_NAMES = ("summary", "report_json", "archive_path")
+    FUNCTION = "run"
+    CATEGORY = "KCP"
+
+    def run(self, db_path: str, media: str = "full", output_path: str = ""):
+        if media not in EXPORT_MEDIA_MODES:
+            raise RuntimeError(f"kcp_export_media_invalid: {media}")
+        try:
+            dbp = normalize_db_path(db_path)
+            root = kcp_root_from_db_path(db_path)
+            conn = connect(dbp)
+        except Exception as e:
+            raise with_projectinit_db_path_tip(db_path, e) from e
+        try:
+            report = export_project(conn, root, Path(output_path.strip()) if (output_path or "").strip() else None, media)
+        finally:
+            conn.close()
+        summary = f"exported {report['files']} files ({report['bytes']} bytes, media={media}) to {report['archive_path']}"
+        if report["missing"]:
+            summary += f"; {report['missing']} missing"
+        return (summary, json.dumps(report), report["archive_path"])
+
+
+class KCP_ProjectImport:
+    OUTPUT_NODE = True
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "db_path": ("STRING", {"default": "output/kcp/db/kcp.sqlite"}),
+                "archive_path": ("STRING", {"default": ""}),
+                "on_conflict": (list(IMPORT_CONFLICT_MODES),),
+                "verify_only": ("BOOLEAN", {"default": False}),
+            },
+            "optional": {
+                "workers": ("INT", {"default": 0, "min": 0, "max": 64}),
+            },
+        }
+
+    RETURN_TYPES = ("STRING", "STRING")
+    RETURN_NAMES = ("summary", "report_json")
+    FUNCTION = "run"
+    CATEGORY = "KCP"
+
+    def run(self, db_path: str, archive_path: str, on_conflict: str = "skip", verify_only: bool = False, workers: int = 0):
+        if on_conflict not in IMPORT_CONFLICT_MODES:
+            raise RuntimeError(f"kcp_import_conflict_mode_invalid: {on_conflict}")
+        archive = Path(str(archive_path).strip())
+        if not archive.is_file():
+            raise RuntimeError(f"kcp_import_archive_missing: {archive}")
+        try:
+            dbp = normalize_db_path(db_path)
+            root = kcp_root_from_db_path(db_path)
+            conn = connect(dbp)
+        except Exception as e:
+            raise with_projectinit_db_path_tip(db_path, e) from e
+        try:
+            try:
+                report = import_project(conn, root, archive, on_conflict, int(workers), bool(verify_only))
+            except ValueError as e:
+                raise RuntimeError(f"kcp_import_invalid: {e}") from e
+        finally:
+            conn.close()
+        verify = report["verify"]
+        if not verify["ok"]:
+            raise RuntimeError(
+                f"kcp_import_verify_failed: db_ok={verify['db_ok']} manifest_ok={verify['manifest_ok']} mismatched={verify['mismatched']} paths={verify['mismatched_paths'][:10]}"
+            )
+        if not report["applied"]:
+            return (f"verified {verify['files']} files ({verify['bytes']} bytes); nothing imported", json.dumps(report))
+        files = report["files"]
+        rows = sum(t["inserted"] + t["updated"] for t in report["tables"].values())
+        skipped = sum(t["skipped"] for t in report["tables"].values())
+        summary = (
+            f"imported {rows} rows ({skipped} skipped), {files['written'] + files['replaced']} files written, "
+            f"{files['identical']} already present, {files['conflict']} conflicts kept"
+        )
+        return (summary, json.dumps(report))
@@ -2,9 +2,51 @@
 from __future__ import annotations
 
 import json
+import os
+import posixpath
+import re
 
-from kcp.db.paths import kcp_root_from_db_path, normalize_db_path, with_projectinit_db_path_tip
+from kcp.db.blobs import is_blob_ref
+from kcp.db.packs import is_pack_ref, resolve_packed, split_pack_ref
+from kcp.db.paths import kcp_root_from_db_path, normalize_db_path, set_dir_rel, with_projectinit_db_path_tip
 from kcp.db.repo import connect
+from kcp.db.sets_layout import sets_layout
+from kcp.db.sidecars import SIDECAR_SUFFIX
+from kcp.db.tiers import is_archive_ref, split_archive_ref
+from kcp.util.durable_io import STAGED_SUFFIX
+from kcp.util.image_io import probe
+
+
+SCAN_MODES = ["exists", "integrity"]
+_CACHE_SUFFIXES = (SIDECAR_SUFFIX, ".tmp", STAGED_SUFFIX)
+_IN_CHUNK = 500
+
+
+class _DirListings:
+    """One `os.scandir` per directory; every existence/size check is answered from memory."""
+
+    def __init__(self, root):
+        self.root = str(root)
+        self._dirs: dict[str, dict[str, tuple[int, int]]] = {}
+
+    def listing(self, dir_rel: str) -> dict[str, tuple[int, int]]:
+        entries = self._dirs.get(dir_rel)
+        if entries is None:
+            entries = {}
+            try:
+                with os.scandir(os.path.join(self.root, dir_rel)) as it:
+                    for entry in it:
+                        if entry.is_file():
+                            st = entry.stat()
+                            entries[entry.name] = (st.st_size, st.st_mtime_ns)
+            except OSError:
+                pass
+            self._dirs[dir_rel] = entries
+        return entries
+
+    def stat(self, rel: str) -> tuple[int, int] | None:
+        dir_rel, name = posixpath.split(posixpath.normpath(rel.replace("\\", "/")))
+        return self.listing(dir_rel).get(name)
 
 
 class KCP_RenderPackStatus:
@@ -15,7 +57,11 @@ class KCP_RenderPackStatus:
                 "db_path": ("STRING", {"default": "output/kcp/db/kcp.sqlite"}),
                 "set_id": ("STRING", {"default": ""}),
                 "strict": ("BOOLEAN", {"default": False}),
-            }
+            },
+            "optional": {
+                "scan_mode": (SCAN_MODES,),
+                "set_ids": ("STRING", {"default": "", "multiline": True}),
+            },
         }
 
     RETURN_TYPES = ("STRING", "STRING")
@@ -23,7 +69,102 @@ class KCP_RenderPackStatus:
     FUNCTION = "run"
     CATEGORY = "KCP"
 
-    def run(self, db_path: str, set_id: str, strict: bool = False):
+    @staticmethod
+    def _load_rows(conn, set_ids: list[str]) -> tuple[dict[str, list], dict[str, list[str]]]:
+        """Item rows and preview paths for every requested set, a few IN-queries at a time."""
+        rows: dict[str, list] = {sid: [] for sid in set_ids}
+        previews: dict[str, list[str]] = {sid: [] for sid in set_ids}
+        for i in range(0, len(set_ids), _IN_CHUNK):
+            chunk = set_ids[i : i + _IN_CHUNK]
+            marks = ",".join("?" * len(chunk))
+            for row in conn.execute(
+                f"SELECT set_id, idx, image_path, thumb_path, media_retention FROM keyframe_set_items WHERE set_id IN ({marks}) ORDER BY set_id, idx", chunk
+            ):
+                rows[row["set_id"]].append(row)
+            for row in conn.execute(
+                "SELECT i.set_id, p.path FROM media_previews p JOIN keyframe_set_items i ON i.id = p.owner_id "
+                f"WHERE p.owner_kind = 'set_item' AND i.set_id IN ({marks})",
+                chunk,
+            ):
+                previews[row["set_id"]].append(row["path"])
+        return rows, previews
+
+    @staticmethod
+    def _set_status(root, listings: _DirListings, set_id: str, rows: list, preview_paths: list[str], packed: dict, layout: str, scan_mode: str) -> dict:
+        items_with_media = 0
+        missing_idxs = []
+        retired_idxs = []
+        corrupt = []
+        for row in rows:
+            idx = int(row["idx"])
+            rel = (row["image_path"] or "").strip()
+            if not rel and row["media_retention"]:
+                # Retention freed this image on purpose; the item is not missing.
+                retired_idxs.append(idx)
+                continue
+            if not rel:
+                exists = False
+            elif is_pack_ref(rel):
+                entry = packed.get(rel)
+                st = listings.stat(split_pack_ref(rel)[0])
+                exists = entry is not None and st is not None and st[0] >= entry.offset + entry.length
+            elif is_archive_ref(rel):
+                exists = listings.stat(split_archive_ref(rel)[0]) is not None
+            else:
+                exists = listings.stat(rel) is not None
+            if not exists:
+                missing_idxs.append(idx)
+                continue
+            items_with_media += 1
+            if scan_mode == "integrity" and not is_archive_ref(rel):
+                # Header-only probe: no pixel decode, so large sets scan in seconds.
+                info = probe(packed[rel] if is_pack_ref(rel) else root / rel)
+                if not info["ok"]:
+                    corrupt.append({"idx": idx, "image_path": rel, "error": info["error"]})
+
+        # Hot bytes: the set directory (minus cache and temp files) plus any blobs its media points at.
+        files = {
+            f"{set_dir_rel(set_id, layout)}/{name}": st
+            for name, st in listings.listing(set_dir_rel(set_id, layout)).items()
+            if not name.endswith(_CACHE_SUFFIXES)
+        }
+        for rel in [*(r["image_path"] for r in rows), *(r["thumb_path"] for r in rows), *preview_paths]:
+            if is_blob_ref(rel):
+                st = listings.stat(rel)
+                if st is not None:
+                    files[rel] = st
+        newest_ns = max((st[1] for st in files.values()), default=0)
+
+        payload = {
+            "set_id": set_id,
+            "expected_count": len(rows),
+            "total_items": len(rows),
+            "items_with_media": items_with_media,
+            "missing_idxs": sorted(missing_idxs),
+            "retired_idxs": retired_idxs,
+            "scan_mode": scan_mode,
+            "bytes_on_disk": sum(st[0] for st in files.values()),
+            "newest_mtime": newest_ns // 1_000_000,
+        }
+        if scan_mode == "integrity":
+            payload["corrupt_idxs"] = [c["idx"] for c in corrupt]
+            payload["corrupt"] = corrupt
+        return payload
+
+    @staticmethod
+    def _summary(status: dict) -> str:
+        text = f"set_id={status['set_id']} total={status['total_items']} saved={status['items_with_media']} missing={len(status['missing_idxs'])}"
+        if status["retired_idxs"]:
+            text += f" retired={len(status['retired_idxs'])}"
+        if "corrupt_idxs" in status:
+            text += f" corrupt={len(status['corrupt_idxs'])}"
+        return text
+
+    def run(self, db_path: str, set_id: str, strict: bool = False, scan_mode: str = "exists", set_ids: str = ""):
+        if scan_mode not in SCAN_MODES:
+            raise RuntimeError(f"kcp_scan_mode_invalid: {scan_mode}")
+        multi = [s for s in dict.fromkeys(re.split(r"[\s,]+", set_ids or "")) if s]
+        wanted = multi or [set_id]
         try:
             dbp = normalize_db_path(db_path)
             root = kcp_root_from_db_path(db_path)
@@ -32,33 +173,44 @@ class KCP_RenderPackStatus:
             raise with_projectinit_db_path_tip(db_path, e) from e
 
         try:
-            rows = conn.execute("SELECT idx,image_path FROM keyframe_set_items WHERE set_id=? ORDER BY idx", (set_id,)).fetchall()
+            rows, previews = self._load_rows(conn, wanted)
+            packed = resolve_packed(conn, root, [r["image_path"] for set_rows in rows.values() for r in set_rows])
+            layout = sets_layout(conn)
         finally:
             conn.close()
 
-        total_items = len(rows)
-        expected_count = total_items
-        items_with_media = 0
-        missing_idxs = []
-        for row in rows:
-            idx = int(row["idx"])
-            rel = (row["image_path"] or "").strip()
-            exists = bool(rel) and (root / rel).resolve().exists()
-            if exists:
-                items_with_media += 1
-            else:
-                missing_idxs.append(idx)
+        listings = _DirListings(root)
+        statuses = [self._set_status(root, listings, sid, rows[sid], previews[sid], packed, layout, scan_mode) for sid in wanted]
 
-        missing_idxs = sorted(missing_idxs)
-        if strict and missing_idxs:
-            raise RuntimeError(f"kcp_set_media_missing: set_id={set_id} missing_idxs={missing_idxs}")
+        missing = {s["set_id"]: s["missing_idxs"] for s in statuses if s["missing_idxs"]}
+        corrupt = {s["set_id"]: s["corrupt_idxs"] for s in statuses if s.get("corrupt_idxs")}
+        if not multi:
+            if strict and missing:
+                raise RuntimeError(f"kcp_set_media_missing: set_id={set_id} missing_idxs={statuses[0]['missing_idxs']}")
+            if strict and corrupt:
+                raise RuntimeError(f"kcp_set_media_corrupt: set_id={set_id} corrupt_idxs={statuses[0]['corrupt_idxs']}")
+            return (self._summary(statuses[0]), json.dumps(statuses[0]))
 
+        if strict and missing:
+            raise RuntimeError(f"kcp_set_media_missing: missing_idxs_by_set={missing}")
+        if strict and corrupt:
+            raise RuntimeError(f"kcp_set_media_corrupt: corrupt_idxs_by_set={corrupt}")
         payload = {
-            "set_id": set_id,
-            "expected_count": expected_count,
-            "total_items": total_items,
-            "items_with_media": items_with_media,
-            "missing_idxs": missing_idxs,
+            "set_count": len(statuses),
+            "total_items": sum(s["total_items"] for s in statuses),
+            "items_with_media": sum(s["items_with_media"] for s in statuses),
+            "items_retired": sum(len(s["retired_idxs"]) for s in statuses),
+            "sets_with_missing": sorted(missing),
+            "scan_mode": scan_mode,
+            "bytes_on_disk": sum(s["bytes_on_disk"] for s in statuses),
+            "newest_mtime": max((s["newest_mtime"] for s in statuses), default=0),
+            "sets": statuses,
         }
-        summary = f"set_id={set_id} total={total_items} saved={items_with_media} missing={len(missing_idxs)}"
+        summary = "\n".join(
+            [
+                f"sets={payload['set_count']} total={payload['total_items']} saved={payload['items_with_media']} "
+                f"sets_with_missing={len(missing)}",
+                *(self._summary(s) for s in statuses),
+            ]
+        )
         return (summary, json.dumps(payload))
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+
+DURABILITY_MODES = ("none", "file", "batch")
+STAGED_SUFFIX = ".staged"
+
+
+def fsync_file(path: Path) -> None:
+    fd = os.open(str(path), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def fsync_dir(path: Path) -> None:
+    """Persist directory entries (renames) in `path`; no-op where directories cannot be opened (Windows)."""
+    if os.name == "nt":
+        return
+    fd = os.open(str(path), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def fsync_dirs(paths) -> int:
+    """fsync each distinct existing directory once; returns how many were synced."""
+    synced = 0
+    for d in sorted({Path(p) for p in paths}):
+        if d.is_dir():
+            fsync_dir(d)
+            synced += 1
+    return synced
+
+
+def finalize_file(tmp: Path, final: Path, durability: str = "none") -> None:
+    """Atomically move a fully written `tmp` over `final`.
+
+    `durability="file"` fsyncs the data before the rename and the parent
+    directory after it, so a crash leaves either the old or the new file.
+    """
+    if durability == "file":
+        fsync_file(tmp)
+    os.replace(tmp, final)
+    if durability == "file":
+        fsync_dir(final.parent)
+
+
+class StagedWrites:
+    """Group atomic writes so their fsyncs are paid once per batch.
+
+    Writers produce `stage(final)` paths; `commit()` fsyncs every staged file,
+    renames them onto their final paths, then fsyncs each touched directory
+    once. Callers commit DB rows only after `commit()` returns. With
+    `sync=False` only the all-or-nothing renames remain.
+    """
+
+    def __init__(self, sync: bool = True):
+        self.sync = bool(sync)
+        self._pending: dict[Path, Path] = {}
+        self.files_synced = 0
+        self.dirs_synced = 0
+
+    def stage(self, final: Path) -> Path:
+        staged = final.with_name(final.name + STAGED_SUFFIX)
+        self._pending[final] = staged
+        return staged
+
+    def commit(self) -> None:
+        written = [(final, staged) for final, staged in self._pending.items() if staged.exists()]
+        if self.sync:
+            for _, staged in written:
+                fsync_file(staged)
+        for final, staged in written:
+            os.replace(staged, final)
+        if self.sync:
+            self.files_synced += len(written)
+            self.dirs_synced += fsync_dirs(final.parent for final, _ in written)
+        self._pending.clear()
+
+    def discard(self) -> None:
+        for staged in self._pending.values():
+            try:
+                staged.unlink()
+            except FileNotFoundError:
+                pass
+        self._pending.clear()
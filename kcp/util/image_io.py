@@ -1,8 +1,36 @@
 from __future__ import annotations
 
+import os
+import struct
+import threading
+from collections import OrderedDict
 from pathlib import Path
 from typing import Any
 
+from kcp.util.durable_io import finalize_file
+
+
+DEFAULT_THUMB_MAX_PX = 384
+IMAGE_CACHE_ENV = "KCP_IMAGE_CACHE_MB"
+PIN_MEMORY_ENV = "KCP_PIN_MEMORY"
+DEFAULT_IMAGE_CACHE_MB = 256
+
+# Named encoder settings; profile=None keeps Pillow's defaults.
+ENCODE_PROFILES: dict[str, dict[str, dict[str, Any]]] = {
+    "fast": {
+        "WEBP": {"quality": 80, "method": 0},
+        "PNG": {"compress_level": 1},
+    },
+    "balanced": {
+        "WEBP": {"quality": 90, "method": 4},
+        "PNG": {"compress_level": 6},
+    },
+    "archival": {
+        "WEBP": {"lossless": True, "quality": 80, "method": 4},
+        "PNG": {"compress_level": 9, "optimize": True},
+    },
+}
+
 
 def pillow_available() -> bool:
     try:
@@ -26,6 +54,8 @@ def comfy_image_to_pil(image_obj: Any):
     - Expects channel-last tensors/arrays and at least 3 channels.
     - Values <= 1.0 are treated as normalized and scaled to [0,255];
       otherwise values are clamped directly to [0,255].
+    - Each value becomes `int(v * scale + 0.5)` clamped to [0,255], with or
+      without NumPy (see `_rgb_plane_to_pil`).
     """
     if not pillow_available():
         raise RuntimeError("Pillow not available")
@@ -41,7 +71,14 @@ def comfy_image_to_pil(image_obj: Any):
     if hasattr(data, "cpu"):
         data = data.cpu()
     if hasattr(data, "numpy"):
-        data = data.numpy()
+        try:
+            data = data.numpy()
+        except Exception:
+            # torch without NumPy: fall back to nested lists.
+            data = data.tolist()
+
+    if isinstance(data, (list, tuple)):
+        return _nested_image_to_pil(data)
 
     if not hasattr(data, "shape"):
         raise ValueError("unsupported IMAGE type")
@@ -58,66 +95,125 @@ def comfy_image_to_pil(image_obj: Any):
         raise ValueError("IMAGE must have at least 3 channels")
 
     if hasattr(data, "astype") and hasattr(data, "max"):
-        arr = data[..., :3]
-        max_val = float(arr.max()) if arr.size else 0.0
-        if max_val <= 1.0:
-            arr = arr * 255.0
-        arr = arr.clip(0.0, 255.0).astype("uint8")
-        return Image.fromarray(arr, mode="RGB")
+        import numpy as np  # type: ignore
+
+        if h == 0 or w == 0:
+            raise ValueError("invalid IMAGE data")
+        arr = np.ascontiguousarray(data[..., :3], dtype=np.float32)
+        return _rgb_plane_to_pil(memoryview(arr).cast("B"), w, h)
 
     if hasattr(data, "tolist"):
-        data = data.tolist()
+        return _nested_image_to_pil(data.tolist())
+    raise ValueError("invalid IMAGE data")
+
+
+def _rgb_plane_to_pil(buf: Any, w: int, h: int):
+    """Quantize packed float32 RGB values (`h` rows of `w * 3`) into a PIL RGB image.
+
+    Both conversion paths end here, so their bytes match: a max <= 1.0 means
+    the image is normalized, and Pillow's "F" mode does the scale, round and
+    clamp in C.
+    """
+    from PIL import Image
+
+    plane = Image.frombuffer("F", (w * 3, h), buf, "raw", "F", 0, 1)
+    _, hi = plane.getextrema()
+    scale = 255.0 if hi <= 1.0 else 1.0
+    # F -> L truncates and clamps to [0, 255]; the +0.5 makes that a round.
+    return Image.frombytes("RGB", (w, h), plane.point(lambda v: v * scale + 0.5).convert("L").tobytes())
 
-    if not isinstance(data, list) or h == 0 or w == 0:
+
+def _nested_image_to_pil(data: Any):
+    """Stdlib fast path for nested-list IMAGE values ([B,H,W,C] or [H,W,C]).
+
+    The RGB floats are packed once into `array('f')` and quantized by
+    `_rgb_plane_to_pil`, so no per-channel Python work is needed.
+    """
+    from array import array
+    from itertools import chain
+
+    try:
+        if data and isinstance(data[0][0][0], (list, tuple)):
+            data = data[0]
+        h = len(data)
+        w = len(data[0])
+        c = len(data[0][0])
+    except (IndexError, TypeError) as e:
+        raise ValueError("invalid IMAGE data") from e
+    if h == 0 or w == 0:
         raise ValueError("invalid IMAGE data")
+    if c < 3:
+        raise ValueError("IMAGE must have at least 3 channels")
+
+    flat = array("f")
+    try:
+        for row in data:
+            # Extra channels (alpha) are dropped before the range check, as in the NumPy path.
+            flat.fromlist(list(chain.from_iterable(row if c == 3 else (px[:3] for px in row))))
+    except TypeError as e:
+        raise ValueError("invalid pixel format") from e
+    if len(flat) != h * w * 3:
+        raise ValueError("ragged IMAGE rows")
+    return _rgb_plane_to_pil(memoryview(flat).cast("B"), w, h)
+
+
+_U8_TO_UNIT = tuple(i / 255.0 for i in range(256))
+
+
+def _pin_memory_requested() -> bool:
+    return os.getenv(PIN_MEMORY_ENV, "").strip().lower() in {"1", "true", "yes", "on"}
+
 
-    pixels = bytearray()
-    for row in data:
-        if not isinstance(row, list) or len(row) != w:
-            raise ValueError("ragged IMAGE rows")
-        for px in row:
-            if not isinstance(px, list) or len(px) < 3:
-                raise ValueError("invalid pixel format")
-            for ch in px[:3]:
-                cv = float(ch)
-                if cv <= 1.0:
-                    cv *= 255.0
-                pixels.append(int(max(0, min(255, round(cv)))))
+def alloc_comfy_image(batch: int, height: int, width: int):
+    """Allocate an uninitialized float32 `[B,H,W,3]` IMAGE buffer.
 
-    return Image.frombytes("RGB", (w, h), bytes(pixels))
+    Returns `(image, ndarray_view)` where both share memory. With torch
+    installed the image is a tensor (page-locked when KCP_PIN_MEMORY=1 and
+    CUDA is available); otherwise it is the NumPy array itself.
+    """
+    import numpy as np  # type: ignore
+
+    try:
+        import torch  # type: ignore
+    except Exception:
+        arr = np.empty((batch, height, width, 3), dtype=np.float32)
+        return arr, arr
+
+    pin = _pin_memory_requested() and torch.cuda.is_available()
+    tensor = torch.empty((batch, height, width, 3), dtype=torch.float32, pin_memory=pin)
+    return tensor, tensor.numpy()
 
 
 def pil_to_comfy_image(pil_image: Any):
-    """Convert PIL image to ComfyUI IMAGE tensor/array with batch dim [1,H,W,C] in 0..1."""
+    """Convert PIL image to ComfyUI IMAGE tensor/array with batch dim [1,H,W,C] in 0..1.
+
+    With NumPy, pixels are read once as uint8 and scaled in place into a single
+    preallocated float32 buffer (see `alloc_comfy_image`).
+    """
     if not pillow_available():
         raise RuntimeError("Pillow not available")
 
-    rgb = pil_image.convert("RGB")
+    rgb = pil_image if pil_image.mode == "RGB" else pil_image.convert("RGB")
+    w, h = rgb.size
 
     try:
         import numpy as np  # type: ignore
+    except Exception:
+        np = None
 
-        arr = np.asarray(rgb, dtype=np.float32) / 255.0
-        arr = arr[None, ...]
-        try:
-            import torch  # type: ignore
+    if np is not None:
+        out, view = alloc_comfy_image(1, h, w)
+        np.multiply(np.asarray(rgb), np.float32(1.0 / 255.0), out=view[0], casting="unsafe")
+        return out
 
-            return torch.from_numpy(arr)
-        except Exception:
-            return arr
-    except Exception:
-        data = list(rgb.getdata())
-        w, h = rgb.size
-        rows = []
-        idx = 0
-        for _ in range(h):
-            row = []
-            for _ in range(w):
-                r, g, b = data[idx]
-                idx += 1
-                row.append([r / 255.0, g / 255.0, b / 255.0])
-            rows.append(row)
-        return [rows]
+    data = rgb.tobytes()
+    stride = w * 3
+    lut = _U8_TO_UNIT
+    rows = []
+    for y in range(h):
+        vals = [lut[b] for b in data[y * stride : (y + 1) * stride]]
+        rows.append([vals[i : i + 3] for i in range(0, stride, 3)])
+    return [rows]
 
 
 def _infer_format_from_suffix(path: Path) -> str:
@@ -127,10 +223,27 @@ def _infer_format_from_suffix(path: Path) -> str:
     return "PNG"
 
 
-def save_comfy_image_atomic(image_obj: Any, path: Path, fmt: str | None = None) -> bool:
+def encode_options(fmt: str, profile: str | None = None) -> dict[str, Any]:
+    """Pillow save kwargs for `fmt` under a named encode profile."""
+    if not profile:
+        return {}
+    if profile not in ENCODE_PROFILES:
+        raise ValueError(f"unknown encode profile: {profile}")
+    return dict(ENCODE_PROFILES[profile].get(fmt.upper(), {}))
+
+
+def save_comfy_image_atomic(
+    image_obj: Any,
+    path: Path,
+    fmt: str | None = None,
+    profile: str | None = None,
+    durability: str = "none",
+) -> bool:
     """Save a ComfyUI IMAGE atomically with explicit encoding format.
 
     If fmt is omitted, it is inferred from path suffix (.webp -> WEBP, else PNG).
+    `profile` selects an entry of ENCODE_PROFILES; `durability="file"` fsyncs
+    the file and its directory (see durable_io.finalize_file).
     """
     if image_obj is None:
         return False
@@ -140,38 +253,388 @@ def save_comfy_image_atomic(image_obj: Any, path: Path, fmt: str | None = None)
     encode_fmt = (fmt or "").upper().strip() or _infer_format_from_suffix(path)
     if encode_fmt not in {"PNG", "WEBP"}:
         raise ValueError(f"unsupported image format: {encode_fmt}")
+    opts = encode_options(encode_fmt, profile)
 
     path.parent.mkdir(parents=True, exist_ok=True)
     tmp = path.with_suffix(path.suffix + ".tmp")
     img = comfy_image_to_pil(image_obj)
-    img.save(tmp, format=encode_fmt)
-    tmp.replace(path)
+    img.save(tmp, format=encode_fmt, **opts)
+    finalize_file(tmp, path, durability)
     return True
 
 
-def load_image_as_comfy(path: Path):
+def _estimate_nbytes(value: Any) -> int:
+    nbytes = getattr(value, "nbytes", None)
+    if nbytes is not None:
+        return int(nbytes)
+    if hasattr(value, "element_size") and hasattr(value, "nelement"):
+        return int(value.element_size() * value.nelement())
+    try:
+        rows = value[0]
+        return len(rows) * len(rows[0]) * 3 * 8
+    except Exception:
+        return 0
+
+
+def _mark_read_only(value: Any) -> None:
+    flags = getattr(value, "flags", None)
+    if flags is not None and hasattr(flags, "writeable"):
+        flags.writeable = False
+
+
+def _hand_out(value: Any) -> Any:
+    """What a caller gets for a cached value.
+
+    Tensors cannot be made read-only, and nodes may edit IMAGE tensors in
+    place, so each caller gets its own copy (a memcpy, far cheaper than a
+    decode). Nested-list IMAGE values (no NumPy) are rebuilt row by row, so
+    no inner list is shared with the cache or with another caller.
+    Non-writeable NumPy arrays are shared as they are.
+    """
+    clone = getattr(value, "clone", None)
+    if callable(clone):
+        return clone()
+    if isinstance(value, list):
+        return [[[list(px) for px in row] for row in image] for image in value]
+    return value
+
+
+class DecodedImageCache:
+    """Byte-budgeted LRU of decoded IMAGE values keyed by (path, size, mtime_ns).
+
+    Stored values are never handed out directly for tensors or nested lists; see `_hand_out`.
+    """
+
+    def __init__(self, budget_bytes: int):
+        self.budget_bytes = max(0, int(budget_bytes))
+        self._entries: OrderedDict[tuple, tuple[Any, int]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: tuple):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: tuple, value: Any) -> None:
+        nbytes = _estimate_nbytes(value)
+        if nbytes <= 0 or nbytes > self.budget_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            self._entries[key] = (value, nbytes)
+            self.current_bytes += nbytes
+            while self.current_bytes > self.budget_bytes and self._entries:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "budget_bytes": self.budget_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+def _budget_from_env() -> int:
+    raw = os.getenv(IMAGE_CACHE_ENV, "").strip()
+    try:
+        mb = float(raw) if raw else float(DEFAULT_IMAGE_CACHE_MB)
+    except ValueError:
+        mb = float(DEFAULT_IMAGE_CACHE_MB)
+    return int(max(0.0, mb) * 1024 * 1024)
+
+
+_IMAGE_CACHE = DecodedImageCache(_budget_from_env())
+
+
+def image_cache() -> DecodedImageCache:
+    return _IMAGE_CACHE
+
+
+def configure_image_cache(budget_bytes: int | None = None) -> DecodedImageCache:
+    """Replace the process-wide cache; `None` re-reads KCP_IMAGE_CACHE_MB."""
+    global _IMAGE_CACHE
+    _IMAGE_CACHE = DecodedImageCache(_budget_from_env() if budget_bytes is None else budget_bytes)
+    return _IMAGE_CACHE
+
+
+def image_cache_stats() -> dict:
+    return _IMAGE_CACHE.stats()
+
+
+def open_media(source: Any):
+    """Open a media source for binary reads.
+
+    `source` is a filesystem path, or an object with `open_media()` such as a
+    set pack entry (`kcp.db.packs.PackedMedia`).
+    """
+    opener = getattr(source, "open_media", None)
+    return opener() if opener is not None else open(source, "rb")
+
+
+def _cache_key(path: Path, *variant: Any) -> tuple | None:
+    try:
+        media_key = getattr(path, "media_key", None)
+        if media_key is not None:
+            return (*media_key(), *variant)
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (os.path.abspath(path), st.st_size, st.st_mtime_ns, *variant)
+
+
+def _decode_image_as_comfy(path: Path):
+    from PIL import Image
+
+    with open_media(path) as fh, Image.open(fh) as img:
+        return pil_to_comfy_image(img)
+
+
+def load_image_as_comfy(path: Path, use_cache: bool = True):
+    """Decode `path` to a ComfyUI IMAGE, served from the shared LRU when possible.
+
+    Tensors and nested lists are returned as private copies; NumPy results are shared and non-writeable.
+    """
     if not pillow_available():
         raise RuntimeError("Pillow not available")
+
+    cache = _IMAGE_CACHE
+    key = _cache_key(path) if use_cache and cache.budget_bytes > 0 else None
+    if key is not None:
+        hit = cache.get(key)
+        if hit is not None:
+            return _hand_out(hit)
+
+    value = _decode_image_as_comfy(path)
+    if key is not None:
+        _mark_read_only(value)
+        cache.put(key, value)
+        return _hand_out(value)
+    return value
+
+
+def _decode_reduced_as_comfy(path: Path, max_side: int):
     from PIL import Image
 
-    with Image.open(path) as img:
+    with open_media(path) as fh, Image.open(fh) as img:
+        # draft() lets JPEG decode at 1/2..1/8 scale; for PNG/WebP it is a no-op
+        # and reduce() does a cheap box-filter integer downscale after decode.
+        img.draft("RGB", (max_side, max_side))
+        factor = max(img.size) // max_side
+        if factor >= 2:
+            img = img.reduce(factor)
+        if max(img.size) > max_side:
+            img = img.copy()
+            img.thumbnail((max_side, max_side))
         return pil_to_comfy_image(img)
 
 
-def save_optional_image(image_obj: Any, path: Path, fmt: str | None = None) -> bool:
-    return save_comfy_image_atomic(image_obj, path, fmt=fmt)
+def load_image_as_comfy_reduced(path: Path, max_side: int, use_cache: bool = True):
+    """Decode `path` so its longest side is at most `max_side` pixels.
+
+    Images already within `max_side` are returned at native size. Results share
+    the decoded-image LRU (keyed additionally by `max_side`).
+    """
+    if not pillow_available():
+        raise RuntimeError("Pillow not available")
+    max_side = max(1, int(max_side))
+
+    cache = _IMAGE_CACHE
+    key = _cache_key(path, "max_side", max_side) if use_cache and cache.budget_bytes > 0 else None
+    if key is not None:
+        hit = cache.get(key)
+        if hit is not None:
+            return _hand_out(hit)
+
+    value = _decode_reduced_as_comfy(path, max_side)
+    if key is not None:
+        _mark_read_only(value)
+        cache.put(key, value)
+        return _hand_out(value)
+    return value
+
 
+STACK_FIT_MODES = ("none", "letterbox", "resize")
 
-def make_thumbnail(source: Path, target: Path, max_px: int = 384) -> bool:
+
+def numpy_available() -> bool:
+    try:
+        import numpy  # noqa: F401
+
+        return True
+    except Exception:
+        return False
+
+
+def image_size(path: Path) -> tuple[int, int]:
+    """Return (width, height) from the file header without decoding pixels."""
+    if not pillow_available():
+        raise RuntimeError("Pillow not available")
+    from PIL import Image
+
+    with open_media(path) as fh, Image.open(fh) as img:
+        return img.size
+
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_PNG_IEND = b"\x00\x00\x00\x00IEND\xaeB`\x82"
+_VP8_START_CODE = b"\x9d\x01\x2a"
+
+
+def probe(path: Path) -> dict[str, Any]:
+    """Read format and dimensions from the PNG IHDR or WebP VP8/VP8L/VP8X header.
+
+    Reads the first 32 and last 12 bytes only; Pillow is not used. `ok=False`
+    with `error` set means the file is unreadable, unrecognized or truncated
+    (PNG without a trailing IEND chunk, WebP shorter than its RIFF size).
+    """
+    info: dict[str, Any] = {"format": "", "width": 0, "height": 0, "size_bytes": 0, "ok": False, "error": ""}
+    try:
+        with open_media(path) as fh:
+            head = fh.read(32)
+            size = fh.seek(0, os.SEEK_END)
+            fh.seek(max(0, size - 12))
+            tail = fh.read(12)
+    except OSError as e:
+        info["error"] = f"unreadable: {e.strerror or e}"
+        return info
+    info["size_bytes"] = size
+
+    if head.startswith(_PNG_SIGNATURE):
+        info["format"] = "PNG"
+        if len(head) < 24 or head[12:16] != b"IHDR":
+            info["error"] = "truncated: missing IHDR"
+            return info
+        info["width"], info["height"] = struct.unpack(">II", head[16:24])
+        if tail != _PNG_IEND:
+            info["error"] = "truncated: missing IEND"
+            return info
+    elif head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        info["format"] = "WEBP"
+        if len(head) < 30:
+            info["error"] = "truncated: short WebP header"
+            return info
+        chunk = head[12:16]
+        if chunk == b"VP8 ":
+            if head[23:26] != _VP8_START_CODE:
+                info["error"] = "corrupt: bad VP8 start code"
+                return info
+            w, h = struct.unpack("<HH", head[26:30])
+            info["width"], info["height"] = w & 0x3FFF, h & 0x3FFF
+        elif chunk == b"VP8L":
+            if head[20] != 0x2F:
+                info["error"] = "corrupt: bad VP8L signature"
+                return info
+            bits = int.from_bytes(head[21:25], "little")
+            info["width"], info["height"] = (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        elif chunk == b"VP8X":
+            info["width"] = int.from_bytes(head[24:27], "little") + 1
+            info["height"] = int.from_bytes(head[27:30], "little") + 1
+        else:
+            info["error"] = f"corrupt: unknown WebP chunk {chunk!r}"
+            return info
+        riff_size = struct.unpack("<I", head[4:8])[0]
+        if size < riff_size + 8:
+            info["error"] = f"truncated: {size} of {riff_size + 8} bytes"
+            return info
+    else:
+        info["error"] = "empty file" if size == 0 else "unrecognized format"
+        return info
+
+    info["ok"] = True
+    return info
+
+
+def decode_image_into(path: Path, out: Any, fit: str = "none") -> None:
+    """Decode `path` directly into a preallocated float32 `[H,W,3]` NumPy slice.
+
+    `fit` handles size mismatches: `none` raises, `resize` stretches to the
+    slice size, `letterbox` scales to fit and pads with black.
+    """
+    if not pillow_available():
+        raise RuntimeError("Pillow not available")
+    import numpy as np  # type: ignore
+    from PIL import Image
+
+    h, w = int(out.shape[0]), int(out.shape[1])
+    with open_media(path) as fh, Image.open(fh) as img:
+        rgb = img if img.mode == "RGB" else img.convert("RGB")
+        target = out
+        if rgb.size != (w, h):
+            if fit == "resize":
+                rgb = rgb.resize((w, h), Image.Resampling.BICUBIC)
+            elif fit == "letterbox":
+                iw, ih = rgb.size
+                scale = min(w / iw, h / ih)
+                nw, nh = max(1, round(iw * scale)), max(1, round(ih * scale))
+                rgb = rgb.resize((nw, nh), Image.Resampling.BICUBIC)
+                x0, y0 = (w - nw) // 2, (h - nh) // 2
+                out.fill(0.0)
+                target = out[y0 : y0 + nh, x0 : x0 + nw]
+            else:
+                raise ValueError(f"image size {rgb.size[0]}x{rgb.size[1]} does not match batch size {w}x{h}")
+        np.multiply(np.asarray(rgb), np.float32(1.0 / 255.0), out=target, casting="unsafe")
+
+
+def save_optional_image(
+    image_obj: Any,
+    path: Path,
+    fmt: str | None = None,
+    profile: str | None = None,
+    durability: str = "none",
+) -> bool:
+    return save_comfy_image_atomic(image_obj, path, fmt=fmt, profile=profile, durability=durability)
+
+
+def make_thumbnail(
+    source: Path,
+    target: Path,
+    max_px: int = DEFAULT_THUMB_MAX_PX,
+    profile: str | None = None,
+    levels: dict[int, Path] | None = None,
+    durability: str = "none",
+) -> bool:
+    """Write the WEBP thumb for `source`, plus optional preview-pyramid levels.
+
+    `levels` maps extra max-side sizes to output paths. All outputs come from
+    one decode and one resample cascade, largest level first, each level
+    downscaled from the previous one.
+    """
     if not pillow_available() or not source.exists():
         return False
     from PIL import Image
 
-    target.parent.mkdir(parents=True, exist_ok=True)
+    opts = encode_options("WEBP", profile)
+    outputs = dict(levels or {})
+    outputs[int(max_px)] = target
     with Image.open(source) as img:
         img = img.convert("RGB")
-        img.thumbnail((max_px, max_px))
-        tmp = target.with_suffix(target.suffix + ".tmp")
-        img.save(tmp, format="WEBP")
-        tmp.replace(target)
+        for px in sorted(outputs, reverse=True):
+            out = outputs[px]
+            img.thumbnail((px, px))
+            out.parent.mkdir(parents=True, exist_ok=True)
+            tmp = out.with_suffix(out.suffix + ".tmp")
+            img.save(tmp, format="WEBP", **opts)
+            finalize_file(tmp, out, durability)
     return True
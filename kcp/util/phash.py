@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Generic, Iterable, TypeVar
+
+from kcp.util.image_io import open_media
+
+
+HASH_BITS = 64
+T = TypeVar("T")
+
+
+def dhash(img: Any, hash_size: int = 8) -> int:
+    """Difference hash of a PIL image: one bit per horizontal gradient sign.
+
+    The image is reduced to `(hash_size + 1) x hash_size` grayscale first, so
+    the cost is dominated by that resample, not by the source resolution.
+    """
+    from PIL import Image
+
+    small = img.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.BOX)
+    px = small.tobytes()
+    w = hash_size + 1
+    bits = 0
+    for y in range(hash_size):
+        row = px[y * w : (y + 1) * w]
+        for x in range(hash_size):
+            bits = (bits << 1) | (1 if row[x] > row[x + 1] else 0)
+    return bits
+
+
+def dhash_file(path: Path) -> int | None:
+    """dHash of a stored thumb/preview (path or pack entry); None when Pillow is missing or the file is unreadable."""
+    try:
+        from PIL import Image
+
+        with open_media(path) as fh, Image.open(fh) as img:
+            img.draft("L", (64, 64))
+            return dhash(img)
+    except Exception:
+        return None
+
+
+def format_hash(value: int | None) -> str | None:
+    return None if value is None else f"{value:016x}"
+
+
+def parse_hash(text: str | None) -> int | None:
+    try:
+        return int(text, 16) if text else None
+    except ValueError:
+        return None
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class BKTree(Generic[T]):
+    """Burkhard-Keller tree over 64-bit hashes under Hamming distance.
+
+    `query(h, r)` only descends into children whose edge distance lies in
+    `[d - r, d + r]`, so small radii touch a small fraction of the nodes.
+    """
+
+    def __init__(self, items: Iterable[tuple[int, T]] = ()):
+        self._root: list | None = None  # [hash, payloads, {distance: child}]
+        self.size = 0
+        for h, item in items:
+            self.add(h, item)
+
+    def add(self, h: int, item: T) -> None:
+        self.size += 1
+        if self._root is None:
+            self._root = [h, [item], {}]
+            return
+        node = self._root
+        while True:
+            d = hamming(h, node[0])
+            if d == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [h, [item], {}]
+                return
+            node = child
+
+    def query(self, h: int, max_distance: int) -> list[tuple[int, T]]:
+        out: list[tuple[int, T]] = []
+        if self._root is None:
+            return out
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            d = hamming(h, node[0])
+            if d <= max_distance:
+                out.extend((d, item) for item in node[1])
+            for edge, child in node[2].items():
+                if d - max_distance <= edge <= d + max_distance:
+                    stack.append(child)
+        return out
+
+
+def cluster_by_hash(items: list[tuple[int, T]], max_distance: int) -> list[list[T]]:
+    """Group items whose hashes are within `max_distance` (single linkage).
+
+    Returns clusters of two or more items, each in input order, ordered by
+    their first member.
+    """
+    tree: BKTree[int] = BKTree((h, i) for i, (h, _) in enumerate(items))
+    parent = list(range(len(items)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, (h, _) in enumerate(items):
+        for _, j in tree.query(h, max_distance):
+            ri, rj = find(i), find(j)
+            if ri != rj:
+                parent[max(ri, rj)] = min(ri, rj)
+
+    groups: dict[int, list[int]] = {}
+    for i in range(len(items)):
+        groups.setdefault(find(i), []).append(i)
+    return [[items[i][1] for i in members] for _, members in sorted(groups.items()) if len(members) > 1]
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""Move the full-res images of sets untouched for N days into per-month zip archives."""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+
+def main() -> int:
+    from kcp.db.paths import kcp_root_from_db_path, normalize_db_path
+    from kcp.db.repo import connect
+    from kcp.db.tiers import archive_cold_sets, gc_archives, tier_stats
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db-path", required=True, help=".../db/kcp.sqlite")
+    parser.add_argument("--older-than-days", type=float, default=90, help="archive sets not picked, edited or extended for this long")
+    parser.add_argument("--set-id", default="", help="archive one set (default: every cold set)")
+    parser.add_argument("--dry-run", action="store_true", help="report only; move nothing")
+    parser.add_argument("--gc", action="store_true", help="afterwards drop stale archive entries and delete archives no item points at")
+    args = parser.parse_args()
+
+    root = kcp_root_from_db_path(args.db_path)
+    conn = connect(normalize_db_path(args.db_path))
+    try:
+        report = archive_cold_sets(conn, root, args.older_than_days, set_id=args.set_id.strip(), dry_run=args.dry_run)
+        if args.gc:
+            report["gc"] = gc_archives(conn, root, dry_run=args.dry_run)
+        report["tiers"] = tier_stats(conn, root)
+    finally:
+        conn.close()
+    print(json.dumps(report, indent=2))
+    print(f"ITEMS_ARCHIVED={0 if report['dry_run'] else report['items']}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""Benchmark: render-job claim throughput with several worker processes on one DB.
+
+Builds `--sets` sets of `--items-per-set` items (DB rows only), queues them,
+then starts `--workers` processes that claim, "render" for `--render-ms` and
+save a fake image path until the queue is drained. Every `--abandon-every`th
+claim is dropped without saving, to exercise lease expiry and reclaim.
+Prints claims per second and checks that no item was saved twice.
+"""
+from __future__ import annotations
+
+import argparse
+import multiprocessing
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+
+def _build(db_path: Path, n_sets: int, per_set: int, wal: bool) -> list[str]:
+    from kcp.db.render_jobs import enqueue_set
+    from kcp.db.repo import connect
+
+    conn = connect(db_path)
+    try:
+        if wal:
+            conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("INSERT INTO stacks (id,name,created_at,updated_at) VALUES ('stack1', 'stack1', 1, 1)")
+        set_ids = [f"kset_{s:05d}" for s in range(n_sets)]
+        conn.executemany(
+            "INSERT INTO keyframe_sets (id,stack_id,variant_policy_id,variant_policy_json,base_seed,width,height,created_at,updated_at) "
+            "VALUES (?, 'stack1', 'seed_sweep_12_v1', '{}', 1, 1024, 1024, 1, 1)",
+            [(s,) for s in set_ids],
+        )
+        conn.executemany(
+            "INSERT INTO keyframe_set_items (id,set_id,idx,seed,positive_prompt,gen_params_json,created_at) VALUES (?, ?, ?, ?, 'p', '{}', 1)",
+            [(f"{s}_{i:03d}", s, i, i) for s in set_ids for i in range(per_set)],
+        )
+        conn.commit()
+        for set_id in set_ids:
+            enqueue_set(conn, set_id)
+    finally:
+        conn.close()
+    return set_ids
+
+
+def _worker(db_path: str, n: int, render_ms: float, lease_ms: int, abandon_every: int) -> dict:
+    from kcp.db.render_jobs import claim_next_item, queue_status
+    from kcp.db.repo import connect, update_set_item_media
+
+    conn = connect(Path(db_path))
+    stats = {"claims": 0, "saved": [], "abandoned": 0, "reclaims": 0, "claim_ms": 0.0}
+    try:
+        while True:
+            t = time.perf_counter()
+            job = claim_next_item(conn, worker=f"bench-{n}", lease_ms=lease_ms, max_attempts=100)
+            stats["claim_ms"] += (time.perf_counter() - t) * 1000.0
+            if job is None:
+                if queue_status(conn)["leased"]:
+                    # Someone else's lease may still run out; wait for it.
+                    time.sleep(lease_ms / 4000.0)
+                    continue
+                break
+            stats["claims"] += 1
+            stats["reclaims"] += int(job["attempts"]) > 1
+            if render_ms:
+                time.sleep(render_ms / 1000.0)
+            if abandon_every and stats["claims"] % abandon_every == 0:
+                stats["abandoned"] += 1
+                continue
+            rel = f"sets/{job['set_id']}/{job['idx']}.webp"
+            update_set_item_media(conn, job["set_id"], job["idx"], rel, rel)
+            stats["saved"].append(job["item_id"])
+    finally:
+        conn.close()
+    return stats
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sets", type=int, default=8)
+    parser.add_argument("--items-per-set", type=int, default=256)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--render-ms", type=float, default=0.0, help="simulated render time per item")
+    parser.add_argument("--lease-ms", type=int, default=2000)
+    parser.add_argument("--abandon-every", type=int, default=0, help="drop every Nth claim without saving (0: never)")
+    parser.add_argument("--wal", action="store_true", help="put the DB in WAL mode first")
+    parser.add_argument("--dir", default="", help="build the DB here instead of a temp dir")
+    args = parser.parse_args()
+
+    from kcp.db.render_jobs import RETURNING_SUPPORTED, queue_status
+    from kcp.db.repo import connect
+
+    with tempfile.TemporaryDirectory(dir=args.dir or None) as td:
+        db_path = Path(td) / "kcp.sqlite"
+        _build(db_path, args.sets, args.items_per_set, args.wal)
+        total = args.sets * args.items_per_set
+        print(f"items={total} workers={args.workers} render_ms={args.render_ms} wal={int(args.wal)} returning={int(RETURNING_SUPPORTED)}")
+
+        t0 = time.perf_counter()
+        with multiprocessing.Pool(args.workers) as pool:
+            results = pool.starmap(
+                _worker, [(str(db_path), n, args.render_ms, args.lease_ms, args.abandon_every) for n in range(args.workers)]
+            )
+        wall = time.perf_counter() - t0
+
+        claims = sum(r["claims"] for r in results)
+        saved = [item for r in results for item in r["saved"]]
+        conn = connect(db_path)
+        try:
+            status = queue_status(conn)
+        finally:
+            conn.close()
+        print(
+            f"wall_s={wall:.2f} claims={claims} claims_per_s={claims / wall:.0f} "
+            f"mean_claim_ms={sum(r['claim_ms'] for r in results) / max(claims, 1):.2f}"
+        )
+        print(f"abandoned={sum(r['abandoned'] for r in results)} reclaimed={sum(r['reclaims'] for r in results)} status={status}")
+        print(f"per_worker={[r['claims'] for r in results]}")
+        ok = len(saved) == len(set(saved)) == total and status["done"] == total
+        print(f"EXACTLY_ONCE={int(ok)}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""Benchmark: project dashboard latency on a synthetic DB.
+
+Builds `--items` set items (DB rows only, no media files) with prompt and
+gen-params text of realistic size, spread over many stacks, policies and
+days, then times a cold `compute_dashboard`, a cached `project_dashboard`
+hit, and a recompute after a commit from another connection.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+_DAY_MS = 24 * 60 * 60 * 1000
+_PROMPT = "cinematic keyframe, hero walking through neon market at night, rain, volumetric light, 35mm, " * 3
+_PARAMS = '{"steps": 30, "cfg": 6.5, "sampler": "dpmpp_2m", "scheduler": "karras", "denoise": 1.0, "model": "sdxl_base_1.0"}'
+
+
+def _build(db_path: Path, n_items: int, per_set: int, n_stacks: int) -> None:
+    from kcp.db.repo import connect
+
+    conn = connect(db_path)
+    try:
+        conn.executemany(
+            "INSERT INTO stacks (id,name,created_at,updated_at) VALUES (?, ?, 1, 1)",
+            [(f"stack_{s:04d}", f"stack {s}") for s in range(n_stacks)],
+        )
+        n_sets = (n_items + per_set - 1) // per_set
+        base = 1_700_000_000_000
+        conn.executemany(
+            "INSERT INTO keyframe_sets (id,stack_id,variant_policy_id,variant_policy_json,base_seed,width,height,created_at,updated_at,picked_index) "
+            "VALUES (?, ?, ?, '{}', 1, 1024, 1024, ?, ?, ?)",
+            [
+                (f"kset_{s:07d}", f"stack_{s % n_stacks:04d}", f"policy_{s % 7}", base + s * 60_000, base + s * 60_000, (s % per_set) if s % 3 else None)
+                for s in range(n_sets)
+            ],
+        )
+        batch = []
+        for n in range(n_items):
+            s, idx = n // per_set, n % per_set
+            set_id = f"kset_{s:07d}"
+            if n % 10 == 0:
+                image, thumb = "", ""
+            elif n % 10 == 1:
+                image, thumb = f"archive/2024-01/1.zip#{set_id}/{idx}.webp", f"sets/{set_id}/{idx}_thumb.webp"
+            else:
+                image, thumb = f"sets/{set_id}/{idx}.webp", f"sets/{set_id}/{idx}_thumb.webp"
+            batch.append((f"kitem_{n:08d}", set_id, idx, n, _PROMPT, _PARAMS, image, thumb, base + s * 60_000))
+            if len(batch) >= 50_000:
+                conn.executemany(
+                    "INSERT INTO keyframe_set_items (id,set_id,idx,seed,positive_prompt,gen_params_json,image_path,thumb_path,created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    batch,
+                )
+                batch = []
+        if batch:
+            conn.executemany(
+                "INSERT INTO keyframe_set_items (id,set_id,idx,seed,positive_prompt,gen_params_json,image_path,thumb_path,created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                batch,
+            )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=1_000_000)
+    parser.add_argument("--items-per-set", type=int, default=12)
+    parser.add_argument("--stacks", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--dir", default="", help="build the DB here instead of a temp dir")
+    args = parser.parse_args()
+
+    from kcp.db.dashboard import clear_dashboard_cache, compute_dashboard, project_dashboard
+    from kcp.db.repo import connect
+
+    with tempfile.TemporaryDirectory(dir=args.dir or None) as td:
+        db_path = Path(td) / "kcp.sqlite"
+        t0 = time.perf_counter()
+        _build(db_path, args.items, args.items_per_set, args.stacks)
+        print(f"items={args.items} items_per_set={args.items_per_set} db_mb={db_path.stat().st_size / 1e6:.0f} build_s={time.perf_counter() - t0:.1f}")
+
+        conn = connect(db_path)
+        try:
+            cold = []
+            for _ in range(args.repeat):
+                t = time.perf_counter()
+                compute_dashboard(conn)
+                cold.append((time.perf_counter() - t) * 1000.0)
+        finally:
+            conn.close()
+        print(f"compute  best_ms={min(cold):.1f} worst_ms={max(cold):.1f}")
+
+        project_dashboard(db_path)
+        t = time.perf_counter()
+        hit = project_dashboard(db_path)
+        print(f"cached   ms={(time.perf_counter() - t) * 1000.0:.2f} cached={hit['cached']}")
+
+        writer = connect(db_path)
+        try:
+            writer.execute("UPDATE keyframe_sets SET picked_index = 0 WHERE id = 'kset_0000000'")
+            writer.commit()
+        finally:
+            writer.close()
+        t = time.perf_counter()
+        fresh = project_dashboard(db_path)
+        print(f"changed  ms={(time.perf_counter() - t) * 1000.0:.1f} cached={fresh['cached']}")
+        clear_dashboard_cache()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
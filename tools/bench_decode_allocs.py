@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""Microbenchmark: time and Python-visible allocations per IMAGE decode.
+
+Compares the legacy `np.asarray(rgb, float32) / 255.0` conversion against the
+current `image_io.pil_to_comfy_image` single-buffer path. NumPy reports its
+buffers to tracemalloc, so `peak_bytes` reflects transient float copies.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+
+def _legacy_pil_to_comfy(pil_image):
+    import numpy as np  # type: ignore
+
+    rgb = pil_image.convert("RGB")
+    return (np.asarray(rgb, dtype=np.float32) / 255.0)[None, ...]
+
+
+def _measure(fn, path: Path, repeats: int) -> dict:
+    from PIL import Image
+
+    times = []
+    peaks = []
+    blocks = []
+    for _ in range(repeats):
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        with Image.open(path) as img:
+            out = fn(img)
+        times.append(time.perf_counter() - t0)
+        snap = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peaks.append(peak)
+        blocks.append(sum(stat.count for stat in snap.statistics("filename")))
+        del out
+    return {
+        "ms_per_decode": 1000.0 * min(times),
+        "peak_bytes": max(peaks),
+        "live_blocks": min(blocks),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=1024)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    from PIL import Image
+
+    from kcp.util.image_io import pil_to_comfy_image
+
+    with tempfile.TemporaryDirectory() as td:
+        path = Path(td) / "sample.png"
+        Image.effect_mandelbrot((args.size, args.size), (-2.0, -1.5, 1.0, 1.5), 64).convert("RGB").save(path)
+        output_bytes = args.size * args.size * 3 * 4
+        print(f"image={args.size}x{args.size} float32_output_bytes={output_bytes}")
+        for name, fn in [("legacy", _legacy_pil_to_comfy), ("current", pil_to_comfy_image)]:
+            r = _measure(fn, path, args.repeats)
+            print(
+                f"{name:8s} ms_per_decode={r['ms_per_decode']:.2f} "
+                f"peak_bytes={r['peak_bytes']} peak_over_output={r['peak_bytes'] / output_bytes:.2f}x "
+                f"live_blocks={r['live_blocks']}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""Benchmark encode time and output bytes per encode profile (WEBP and PNG).
+
+Sample renders are synthetic stand-ins for keyframes: a smooth gradient, a
+fractal with hard edges, and a noisy photo-like frame. Pass `--image` to
+measure real renders instead.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+
+def _sample_renders(size: int) -> dict:
+    from PIL import Image
+
+    gradient = Image.merge(
+        "RGB",
+        (
+            Image.linear_gradient("L").resize((size, size)),
+            Image.linear_gradient("L").rotate(90).resize((size, size)),
+            Image.radial_gradient("L").resize((size, size)),
+        ),
+    )
+    fractal = Image.effect_mandelbrot((size, size), (-2.0, -1.5, 1.0, 1.5), 96).convert("RGB")
+    noise = Image.effect_noise((size, size), 24).convert("RGB")
+    noisy = Image.blend(gradient, noise, 0.35)
+    return {"gradient": gradient, "fractal": fractal, "noisy": noisy}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=1024)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--image", action="append", default=[], help="real render to include (repeatable)")
+    args = parser.parse_args()
+
+    from PIL import Image
+
+    from kcp.util.image_io import ENCODE_PROFILES, save_comfy_image_atomic
+
+    samples = _sample_renders(args.size)
+    for p in args.image:
+        with Image.open(p) as img:
+            samples[Path(p).name] = img.convert("RGB")
+
+    profiles = [None, *ENCODE_PROFILES]
+    with tempfile.TemporaryDirectory() as td:
+        for name, img in samples.items():
+            print(f"sample={name} size={img.width}x{img.height}")
+            for fmt in ("WEBP", "PNG"):
+                for profile in profiles:
+                    out = Path(td) / f"{name}.{fmt.lower()}"
+                    best = float("inf")
+                    for _ in range(args.repeats):
+                        t0 = time.perf_counter()
+                        save_comfy_image_atomic(img, out, fmt=fmt, profile=profile)
+                        best = min(best, time.perf_counter() - t0)
+                    print(f"  {fmt:4s} {profile or 'pillow_default':14s} ms={1000.0 * best:8.1f} bytes={out.stat().st_size}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
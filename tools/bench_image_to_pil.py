@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""Benchmark comfy_image_to_pil: NumPy path vs stdlib nested-list path vs legacy per-channel loop.
+
+`numpy` times an ndarray input; `numpy_from_lists` includes building that
+array from the same nested lists the stdlib path receives.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+
+def _legacy_nested_to_pil(data):
+    from PIL import Image
+
+    data = data[0]
+    h, w = len(data), len(data[0])
+    pixels = bytearray()
+    for row in data:
+        for px in row:
+            for ch in px[:3]:
+                cv = float(ch)
+                if cv <= 1.0:
+                    cv *= 255.0
+                pixels.append(int(max(0, min(255, round(cv)))))
+    return Image.frombytes("RGB", (w, h), bytes(pixels))
+
+
+def _best_of(fn, arg, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=1024)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args()
+
+    from kcp.util.image_io import _nested_image_to_pil, comfy_image_to_pil
+
+    rng = random.Random(0)
+    row_vals = [[rng.random(), rng.random(), rng.random()] for _ in range(args.size)]
+    nested = [[[list(px) for px in row_vals] for _ in range(args.size)]]
+    print(f"image={args.size}x{args.size}")
+
+    results = {}
+    try:
+        import numpy as np  # type: ignore
+
+        arr = np.asarray(nested, dtype=np.float32)
+        results["numpy"] = _best_of(comfy_image_to_pil, arr, args.repeats)
+        results["numpy_from_lists"] = _best_of(lambda d: comfy_image_to_pil(np.asarray(d, dtype=np.float32)), nested, args.repeats)
+    except Exception:
+        print("numpy: not installed")
+    results["stdlib"] = _best_of(_nested_image_to_pil, nested, args.repeats)
+    if not args.skip_legacy:
+        results["legacy"] = _best_of(_legacy_nested_to_pil, nested, 1)
+
+    for name, secs in results.items():
+        ratio = f" ({secs / results['numpy']:.1f}x numpy)" if "numpy" in results else ""
+        print(f"{name:16s} ms={1000.0 * secs:.1f}{ratio}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
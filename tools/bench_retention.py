@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Benchmark: retention planning and delete throughput on a synthetic project tree.
+
+Builds `--files` media files (one full-res image + one thumb per set item,
+a few bytes each) with matching DB rows, then times a dry-run plan and an
+applied `delete` run. Every set has a picked item, so all other items are
+candidates.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+
+def _build(root: Path, n_items: int, per_set: int) -> None:
+    from kcp.db.paths import ensure_layout, set_item_media_rels
+    from kcp.db.repo import connect
+
+    layout = ensure_layout(root, "kcp.sqlite")
+    conn = connect(layout["db_path"])
+    try:
+        conn.execute("INSERT INTO stacks (id,name,created_at,updated_at) VALUES ('stack1','stack1',1,1)")
+        n_sets = (n_items + per_set - 1) // per_set
+        conn.executemany(
+            "INSERT INTO keyframe_sets (id,stack_id,variant_policy_id,variant_policy_json,base_seed,width,height,created_at,updated_at,picked_index) "
+            "VALUES (?, 'stack1', 'bench', '{}', 1, 64, 64, 1, 1, 0)",
+            [(f"kset_{s:06d}",) for s in range(n_sets)],
+        )
+        rows = []
+        for n in range(n_items):
+            set_id, idx = f"kset_{n // per_set:06d}", n % per_set
+            image_rel, thumb_rel = set_item_media_rels(set_id, idx, "webp")
+            rows.append((f"kitem_{n:08d}", set_id, idx, idx, image_rel, thumb_rel))
+            if idx == 0:
+                (root / image_rel).parent.mkdir(parents=True, exist_ok=True)
+            for rel in (image_rel, thumb_rel):
+                with open(root / rel, "wb") as fh:
+                    fh.write(b"RIFF\x00\x00\x00\x00WEBP")
+        conn.executemany(
+            "INSERT INTO keyframe_set_items (id,set_id,idx,seed,positive_prompt,gen_params_json,image_path,thumb_path,created_at) "
+            "VALUES (?, ?, ?, ?, 'p', '{}', ?, ?, 1)",
+            rows,
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=1_000_000, help="total media files (two per set item)")
+    parser.add_argument("--items-per-set", type=int, default=64)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dir", default="", help="build the tree here instead of a temp dir (must be empty)")
+    args = parser.parse_args()
+
+    from kcp.db.repo import connect
+    from kcp.db.retention import run_retention
+
+    n_items = max(1, args.files // 2)
+    with tempfile.TemporaryDirectory(dir=args.dir or None) as td:
+        root = Path(td) / "kcp"
+        t0 = time.perf_counter()
+        _build(root, n_items, args.items_per_set)
+        build_s = time.perf_counter() - t0
+        print(f"items={n_items} files={2 * n_items} items_per_set={args.items_per_set} build_s={build_s:.1f}")
+
+        conn = connect(root / "db" / "kcp.sqlite")
+        try:
+            plan = run_retention(conn, root, "delete", 0, dry_run=True)
+            print(f"plan     candidates={plan['candidates']} elapsed_s={plan['elapsed_ms'] / 1000:.2f} items_per_s={plan['items_per_s']:.0f}")
+            applied = run_retention(conn, root, "delete", 0, batch_size=args.batch_size, dry_run=False)
+        finally:
+            conn.close()
+        elapsed_s = applied["elapsed_ms"] / 1000
+        print(
+            f"delete   items={applied['items_retired']} files_deleted={applied['files_deleted']} batches={applied['batches']} "
+            f"elapsed_s={elapsed_s:.2f} items_per_s={applied['items_per_s']:.0f} files_per_s={applied['files_deleted'] / max(elapsed_s, 1e-9):.0f}"
+        )
+        remaining = sum(len(files) for _, _, files in os.walk(root / "sets"))
+        print(f"files_left={remaining}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
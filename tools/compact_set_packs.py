@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""Rewrite set media packs so they hold only the entries still referenced by the DB."""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+
+def main() -> int:
+    from kcp.db.packs import compact_packs
+    from kcp.db.paths import kcp_root_from_db_path, normalize_db_path
+    from kcp.db.repo import connect
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db-path", required=True, help=".../db/kcp.sqlite")
+    parser.add_argument("--set-id", default="", help="compact one set (default: every packed set)")
+    parser.add_argument("--min-dead-ratio", type=float, default=0.0, help="skip packs with a smaller share of superseded bytes")
+    parser.add_argument("--dry-run", action="store_true", help="report only; rewrite nothing")
+    args = parser.parse_args()
+
+    conn = connect(normalize_db_path(args.db_path))
+    try:
+        report = compact_packs(
+            conn,
+            kcp_root_from_db_path(args.db_path),
+            set_id=args.set_id.strip(),
+            min_dead_ratio=args.min_dead_ratio,
+            dry_run=args.dry_run,
+        )
+    finally:
+        conn.close()
+    print(json.dumps(report, indent=2))
+    print(f"BYTES_RECLAIMED={report['bytes_reclaimed']}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""Convert an existing KCP project to the content-addressed blob store in place, or collect unreferenced blobs."""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+
+def main() -> int:
+    from kcp.db.blobs import convert_project, gc_blobs
+    from kcp.db.paths import kcp_root_from_db_path, normalize_db_path
+    from kcp.db.repo import connect
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db-path", required=True, help=".../db/kcp.sqlite")
+    parser.add_argument("--dry-run", action="store_true", help="hash and report only; move nothing")
+    parser.add_argument("--gc", action="store_true", help="delete blobs no row references instead of converting")
+    args = parser.parse_args()
+
+    conn = connect(normalize_db_path(args.db_path))
+    try:
+        root = kcp_root_from_db_path(args.db_path)
+        report = gc_blobs(conn, root, dry_run=args.dry_run) if args.gc else convert_project(conn, root, dry_run=args.dry_run)
+    finally:
+        conn.close()
+    print(json.dumps(report, indent=2))
+    print(f"BYTES_FREED={report['bytes_freed']}" if args.gc else f"BYTES_RECLAIMED={report['bytes_reclaimed']}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""Move an existing KCP project's set directories to the flat or sharded layout in place."""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+
+def main() -> int:
+    from kcp.db.paths import SETS_LAYOUTS, kcp_root_from_db_path, normalize_db_path
+    from kcp.db.repo import connect
+    from kcp.db.sets_layout import convert_sets_layout
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db-path", required=True, help=".../db/kcp.sqlite")
+    parser.add_argument("--to", required=True, choices=SETS_LAYOUTS, help="target layout")
+    parser.add_argument("--dry-run", action="store_true", help="report only; move nothing")
+    args = parser.parse_args()
+
+    conn = connect(normalize_db_path(args.db_path))
+    try:
+        report = convert_sets_layout(conn, kcp_root_from_db_path(args.db_path), args.to, dry_run=args.dry_run)
+    finally:
+        conn.close()
+    print(json.dumps(report, indent=2))
+    print(f"SETS_MOVED={report['sets_moved']} CONFLICTS={len(report['conflicts'])}")
+    return 1 if report["conflicts"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""Export a project to one streaming tar, or verify/import such an archive into a project."""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+
+def main() -> int:
+    from kcp.db.paths import kcp_root_from_db_path, normalize_db_path
+    from kcp.db.repo import connect
+    from kcp.db.transfer import EXPORT_MEDIA_MODES, IMPORT_CONFLICT_MODES, export_project, import_project
+
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="command", required=True)
+    exp = sub.add_parser("export", help="write a DB snapshot, media and a hash manifest into one tar")
+    exp.add_argument("--db-path", required=True, help=".../db/kcp.sqlite")
+    exp.add_argument("--media", choices=EXPORT_MEDIA_MODES, default="full")
+    exp.add_argument("--out", default="", help="archive to write (default: <root>/exports/kcp_export_<ts>.tar)")
+    imp = sub.add_parser("import", help="verify an export and merge it into a project")
+    imp.add_argument("--db-path", required=True, help="target .../db/kcp.sqlite")
+    imp.add_argument("--archive", required=True)
+    imp.add_argument("--on-conflict", choices=IMPORT_CONFLICT_MODES, default="skip")
+    imp.add_argument("--workers", type=int, default=0)
+    imp.add_argument("--verify-only", action="store_true", help="check hashes; change nothing")
+    args = parser.parse_args()
+
+    root = kcp_root_from_db_path(args.db_path)
+    conn = connect(normalize_db_path(args.db_path))
+    try:
+        if args.command == "export":
+            report = export_project(conn, root, Path(args.out) if args.out else None, args.media)
+        else:
+            report = import_project(conn, root, Path(args.archive), args.on_conflict, args.workers, args.verify_only)
+    finally:
+        conn.close()
+    print(json.dumps(report, indent=2))
+    if args.command == "export":
+        print(f"FILES_EXPORTED={report['files']}")
+        return 0
+    print(f"VERIFY_OK={int(report['verify']['ok'])}")
+    return 0 if report["verify"]["ok"] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
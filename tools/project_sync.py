@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""Write the changes made since a watermark to a changeset tar, or apply another host's changeset."""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+
+def main() -> int:
+    from kcp.db.paths import kcp_root_from_db_path, normalize_db_path
+    from kcp.db.repo import connect
+    from kcp.db.sync import export_changes, import_changes
+
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="command", required=True)
+    exp = sub.add_parser("export", help="write rows changed after --since (a change seq) and their media")
+    exp.add_argument("--db-path", required=True, help=".../db/kcp.sqlite")
+    exp.add_argument("--since", type=int, default=0, help="watermark printed by the previous export")
+    exp.add_argument("--out", default="", help="changeset to write (default: <root>/exports/changes_<host>_<since>_<until>.tar)")
+    imp = sub.add_parser("import", help="apply a changeset from another host (last writer wins)")
+    imp.add_argument("--db-path", required=True, help="target .../db/kcp.sqlite")
+    imp.add_argument("--changeset", required=True)
+    args = parser.parse_args()
+
+    root = kcp_root_from_db_path(args.db_path)
+    conn = connect(normalize_db_path(args.db_path))
+    try:
+        if args.command == "export":
+            report = export_changes(conn, root, args.since, Path(args.out) if args.out else None)
+        else:
+            report = import_changes(conn, root, Path(args.changeset))
+    finally:
+        conn.close()
+    print(json.dumps(report, indent=2))
+    if args.command == "export":
+        print(f"WATERMARK={report['until']}")
+    else:
+        print(f"CHANGES_APPLIED={report['applied']}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
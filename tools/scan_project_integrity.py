@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""Report orphaned files, dangling DB refs and corrupt media across a KCP project."""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+
+def main() -> int:
+    from kcp.db.integrity import scan_project
+    from kcp.db.paths import kcp_root_from_db_path, normalize_db_path
+    from kcp.db.repo import connect
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db-path", required=True, help=".../db/kcp.sqlite")
+    parser.add_argument("--incremental", action="store_true", help="only recheck files whose size or mtime changed since the last scan")
+    parser.add_argument("--no-hashes", action="store_true", help="header probe only; skip sha256 re-verification")
+    parser.add_argument("--workers", type=int, default=0, help="checker threads (default: cpu count + 4, max 32)")
+    parser.add_argument("--max-listed", type=int, default=0, help="cap each report list (default: list everything)")
+    args = parser.parse_args()
+
+    conn = connect(normalize_db_path(args.db_path))
+    try:
+        report = scan_project(
+            conn,
+            kcp_root_from_db_path(args.db_path),
+            mode="incremental" if args.incremental else "full",
+            verify_hashes=not args.no_hashes,
+            workers=args.workers,
+            max_listed=args.max_listed,
+        )
+    finally:
+        conn.close()
+    print(json.dumps(report, indent=2))
+    print(f"INTEGRITY_OK={1 if report['ok'] else 0}")
+    return 0 if report["ok"] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -49,7 +49,7 @@ def smoke_asset_thumb() -> tuple[bool, str]:
     original_make_thumbnail = asset_nodes.make_thumbnail
     original_load_image_as_comfy = asset_nodes.load_image_as_comfy
 
-    def _fake_save_optional_image(_image, path: Path, fmt: str | None = None) -> bool:
+    def _fake_save_optional_image(_image, path: Path, fmt: str | None = None, **_kwargs) -> bool:
         _ = fmt
         path.parent.mkdir(parents=True, exist_ok=True)
         path.write_bytes(b"fake")
@@ -102,7 +102,7 @@ def smoke_asset_overwrite_preserves_media_without_image() -> tuple[bool, str]:
     original_make_thumbnail = asset_nodes.make_thumbnail
     original_load_image_as_comfy = asset_nodes.load_image_as_comfy
 
-    def _fake_save_optional_image(_image, path: Path, fmt: str | None = None) -> bool:
+    def _fake_save_optional_image(_image, path: Path, fmt: str | None = None, **_kwargs) -> bool:
         _ = fmt
         path.parent.mkdir(parents=True, exist_ok=True)
         path.write_bytes(b"fake")
@@ -951,12 +951,12 @@ def smoke_promote_keyframe() -> tuple[bool, str]:
 
         mod.pillow_available = lambda: True
         mod.load_image_as_comfy = lambda _p: [[[[1.0, 0.0, 0.0]]]]
-        def _fake_save(_img, path):
+        def _fake_save(_img, path, fmt=None, **_kwargs):
             path.parent.mkdir(parents=True, exist_ok=True)
             path.write_bytes(b"img")
             return True
         mod.save_optional_image = _fake_save
-        mod.make_thumbnail = lambda _s, t, max_px=384: (t.parent.mkdir(parents=True, exist_ok=True) or t.write_bytes(b"thumb") or True)
+        mod.make_thumbnail = lambda _s, t, max_px=384, **_kwargs: (t.parent.mkdir(parents=True, exist_ok=True) or t.write_bytes(b"thumb") or True)
 
         try:
             with tempfile.TemporaryDirectory() as td:
@@ -1082,7 +1082,7 @@ def smoke_image_format_headers() -> tuple[bool, str]:
         orig_conv = image_io.comfy_image_to_pil
 
         class _FakeImage:
-            def save(self, path, format=None):
+            def save(self, path, format=None, **_kwargs):
                 p = Path(path)
                 if (format or "").upper() == "PNG":
                     p.write_bytes(b"\x89PNG\r\n\x1a\nFAKE")
@@ -1271,7 +1271,7 @@ def smoke_set_item_save_batch_node() -> tuple[bool, str]:
             mod.pillow_available = lambda: True
             saved = []
 
-            def _fake_save(image_obj, path, fmt=None):
+            def _fake_save(image_obj, path, fmt=None, **_kwargs):
                 _ = fmt
                 path.parent.mkdir(parents=True, exist_ok=True)
                 path.write_bytes(b"fake")
@@ -1289,7 +1289,7 @@ def smoke_set_item_save_batch_node() -> tuple[bool, str]:
                 saved.append((path, v))
                 return True
 
-            def _fake_thumb(source, target, max_px=384):
+            def _fake_thumb(source, target, max_px=384, **_kwargs):
                 _ = source, max_px
                 target.parent.mkdir(parents=True, exist_ok=True)
                 target.write_bytes(b"thumb")
@@ -1391,7 +1391,7 @@ def smoke_set_item_save_batch_index() -> tuple[bool, str]:
                     cur = cur[0]
                 return float(cur)
 
-            def _fake_save(image_obj, path, fmt=None):
+            def _fake_save(image_obj, path, fmt=None, **_kwargs):
                 _ = path, fmt
                 data = image_obj
                 if hasattr(data, "detach"):
@@ -1462,7 +1462,7 @@ def smoke_promote_prompt_dna() -> tuple[bool, str]:
         try:
             mod.pillow_available = lambda: True
             mod.load_image_as_comfy = lambda *_args, **_kwargs: [[[[1.0, 0.0, 0.0]]]]
-            def _fake_save(_img, path, fmt=None):
+            def _fake_save(_img, path, fmt=None, **_kwargs):
                 _ = fmt
                 path.parent.mkdir(parents=True, exist_ok=True)
                 path.write_bytes(b"fake")
@@ -1612,7 +1612,7 @@ def smoke_set_load_batch_sorted_idx_order() -> tuple[bool, str]:
                 finally:
                     conn.close()
 
-                images, thumbs, items_json = mod.KCP_KeyframeSetLoadBatch().run(db_path, set_id, False, True)
+                images, thumbs, items_json, _ = mod.KCP_KeyframeSetLoadBatch().run(db_path, set_id, False, True)
                 if len(images) != 3 or len(thumbs) != 3 or len(items_json) != 3:
                     return False, f"length mismatch images={len(images)} thumbs={len(thumbs)} items_json={len(items_json)}"
                 parsed = [json.loads(x) for x in items_json]
@@ -1656,7 +1656,7 @@ def smoke_set_load_batch_node() -> tuple[bool, str]:
                 finally:
                     conn.close()
 
-                images, thumbs, items_json = mod.KCP_KeyframeSetLoadBatch().run(db_path, set_id, False, True)
+                images, thumbs, items_json, _ = mod.KCP_KeyframeSetLoadBatch().run(db_path, set_id, False, True)
                 if len(images) != 2 or len(thumbs) != 2 or len(items_json) != 2:
                     return False, f"expected list outputs len=2 got images={len(images)} thumbs={len(thumbs)} items={len(items_json)}"
                 if [json.loads(x).get("idx") for x in items_json] != [0, 1]:
@@ -1718,8 +1718,8 @@ def smoke_promote_derives_from_item_json() -> tuple[bool, str]:
         try:
             mod.pillow_available = lambda: True
             mod.load_image_as_comfy = lambda _path: [[[[1.0, 0.0, 0.0]]]]
-            mod.save_optional_image = lambda _img, path, fmt=None: (path.parent.mkdir(parents=True, exist_ok=True), path.write_bytes(bytes.fromhex("89504E470D0A1A0A")), True)[2]
-            mod.make_thumbnail = lambda _src, dst, max_px=384: (dst.parent.mkdir(parents=True, exist_ok=True), dst.write_bytes(b"RIFFxxxxWEBPVP8 "), True)[2]
+            mod.save_optional_image = lambda _img, path, fmt=None, **_kwargs: (path.parent.mkdir(parents=True, exist_ok=True), path.write_bytes(bytes.fromhex("89504E470D0A1A0A")), True)[2]
+            mod.make_thumbnail = lambda _src, dst, max_px=384, **_kwargs: (dst.parent.mkdir(parents=True, exist_ok=True), dst.write_bytes(b"RIFFxxxxWEBPVP8 "), True)[2]
 
             with tempfile.TemporaryDirectory() as td:
                 db_path, _, _ = KCP_ProjectInit().run(str(Path(td) / "kcp"), "kcp.sqlite", True)
@@ -1956,19 +1956,19 @@ def smoke_set_image_load_promote_e2e() -> tuple[bool, str]:
         orig_promote_thumb = promote_mod.make_thumbnail
         try:
             save_mod.pillow_available = lambda: True
-            def _save_atomic(_img, path, fmt=None):
+            def _save_atomic(_img, path, fmt=None, **_kwargs):
                 path.parent.mkdir(parents=True, exist_ok=True)
                 path.write_bytes(b"RIFFxxxxWEBPVP8 ")
                 return True
             save_mod.save_comfy_image_atomic = _save_atomic
-            save_mod.make_thumbnail = lambda _src, dst, max_px=384: (dst.parent.mkdir(parents=True, exist_ok=True), dst.write_bytes(b"RIFFxxxxWEBPVP8 "), True)[2]
+            save_mod.make_thumbnail = lambda _src, dst, max_px=384, **_kwargs: (dst.parent.mkdir(parents=True, exist_ok=True), dst.write_bytes(b"RIFFxxxxWEBPVP8 "), True)[2]
 
             load_mod.load_image_as_comfy = lambda _path: [[[[1.0, 0.0, 0.0]]]]
 
             promote_mod.pillow_available = lambda: True
             promote_mod.load_image_as_comfy = lambda _path: [[[[1.0, 0.0, 0.0]]]]
-            promote_mod.save_optional_image = lambda _img, path, fmt=None: (path.parent.mkdir(parents=True, exist_ok=True), path.write_bytes(bytes.fromhex("89504E470D0A1A0A")), True)[2]
-            promote_mod.make_thumbnail = lambda _src, dst, max_px=384: (dst.parent.mkdir(parents=True, exist_ok=True), dst.write_bytes(b"RIFFxxxxWEBPVP8 "), True)[2]
+            promote_mod.save_optional_image = lambda _img, path, fmt=None, **_kwargs: (path.parent.mkdir(parents=True, exist_ok=True), path.write_bytes(bytes.fromhex("89504E470D0A1A0A")), True)[2]
+            promote_mod.make_thumbnail = lambda _src, dst, max_px=384, **_kwargs: (dst.parent.mkdir(parents=True, exist_ok=True), dst.write_bytes(b"RIFFxxxxWEBPVP8 "), True)[2]
 
             with tempfile.TemporaryDirectory() as td:
                 db_path, _, _ = KCP_ProjectInit().run(str(Path(td) / "kcp"), "kcp.sqlite", True)
@@ -2292,6 +2292,2421 @@ def smoke_readme_mentions_winner_loop_wiring() -> tuple[bool, str]:
         return True, "readme winner loop wiring ok"
     except Exception as e:
         return False, str(e)
+def smoke_blob_store_dedupe_refcount() -> tuple[bool, str]:
+    """Smoke: blob store dedupes identical set item media and tracks ref counts."""
+    try:
+        import kcp.nodes.keyframe_set_item_save_image as save_mod
+        from kcp.nodes.project_init import KCP_ProjectInit
+        from kcp.db.repo import connect, create_keyframe_set, add_keyframe_set_item, get_set_item
+
+        orig_pillow = save_mod.pillow_available
+        orig_atomic = save_mod.save_comfy_image_atomic
+        orig_thumb = save_mod.make_thumbnail
+        try:
+            save_mod.pillow_available = lambda: True
+
+            def _save_atomic(_img, path, fmt=None, **_kwargs):
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_bytes(b"RIFFxxxxWEBPVP8 same")
+                return True
+
+            save_mod.save_comfy_image_atomic = _save_atomic
+            save_mod.make_thumbnail = lambda _src, dst, max_px=384, **_kwargs: (dst.parent.mkdir(parents=True, exist_ok=True), dst.write_bytes(b"RIFFxxxxWEBPVP8 thumb"), True)[2]
+            with tempfile.TemporaryDirectory() as td:
+                db_path, _, status = KCP_ProjectInit().run(str(Path(td) / "kcp"), "kcp.sqlite", True, "enable")
+                if not json.loads(status).get("blob_store"):
+                    return False, f"blob_store not enabled in status: {status}"
+                conn = connect(Path(db_path))
+                try:
+                    conn.execute("INSERT INTO stacks (id,name,created_at,updated_at) VALUES (?,?,?,?)", ("stack1", "stack1", 1, 1))
+                    conn.commit()
+                    set_id = create_keyframe_set(conn, {"stack_id": "stack1", "variant_policy_id": "seed_sweep_12_v1", "variant_policy_json": {}, "base_seed": 1, "width": 64, "height": 64})
+                    for i in range(2):
+                        add_keyframe_set_item(conn, {"set_id": set_id, "idx": i, "seed": i, "positive_prompt": "p", "negative_prompt": "n", "gen_params_json": {}})
+                finally:
+                    conn.close()
+
+                for i in range(2):
+                    save_mod.KCP_KeyframeSetItemSaveImage().run(db_path, set_id, i, [[[[1, 0, 0]]]], "webp", True)
+                save_mod.KCP_KeyframeSetItemSaveImage().run(db_path, set_id, 0, [[[[1, 0, 0]]]], "webp", True)
+                try:
+                    save_mod.KCP_KeyframeSetItemSaveImage().run(db_path, set_id, 0, [[[[1, 0, 0]]]], "webp", False)
+                    return False, "overwrite=False did not detect blob-backed media"
+                except RuntimeError as e:
+                    if "kcp_set_item_media_exists" not in str(e):
+                        return False, f"unexpected overwrite error: {e}"
+
+                root = Path(db_path).parent.parent
+                conn = connect(Path(db_path))
+                try:
+                    a = get_set_item(conn, set_id, 0)
+                    b = get_set_item(conn, set_id, 1)
+                    if not a["image_path"].startswith("blobs/") or a["image_path"] != b["image_path"]:
+                        return False, f"expected shared blob refs: {a['image_path']} {b['image_path']}"
+                    if not (root / a["image_path"]).exists():
+                        return False, "blob file missing"
+                    if (root / "sets" / set_id / "0.webp").exists():
+                        return False, "flat media file left behind"
+                    refs = {r["sha256"]: r["ref_count"] for r in conn.execute("SELECT sha256, ref_count FROM media_blobs").fetchall()}
+                    if sorted(refs.values()) != [2, 2]:
+                        return False, f"unexpected ref counts: {refs}"
+                finally:
+                    conn.close()
+        finally:
+            save_mod.pillow_available = orig_pillow
+            save_mod.save_comfy_image_atomic = orig_atomic
+            save_mod.make_thumbnail = orig_thumb
+        return True, "blob store dedupe/refcount ok"
+    except Exception as e:
+        return False, str(e)
+
+
+def smoke_blob_store_gc() -> tuple[bool, str]:
+    """Smoke: a rolled-back save leaves no blobs; gc_blobs deletes released blobs and only old stray store files."""
+    try:
+        from kcp.util import image_io
+
+        if not image_io.pillow_available():
+            return True, "blob store gc skipped: Pillow not installed"
+        import os
+        import sqlite3
+
+        from PIL import Image
+
+        from kcp.db.blobs import gc_blobs
+        from kcp.db.repo import add_keyframe_set_item, connect, create_keyframe_set, get_set_item
+        from kcp.nodes.keyframe_set_item_load import KCP_KeyframeSetItemLoad
+        from kcp.nodes.keyframe_set_item_save_image import KCP_KeyframeSetItemSaveImage
+        from kcp.nodes.project_init import KCP_ProjectInit
+
+        with tempfile.TemporaryDirectory() as td:
+            root = Path(td) / "kcp"
+            db_path = KCP_ProjectInit().run(str(root), "kcp.sqlite", True, "enable")[0]
+            conn = connect(Path(db_path))
+            try:
+                conn.execute("INSERT INTO stacks (id,name,created_at,updated_at) VALUES (?,?,?,?)", ("stack1", "stack1", 1, 1))
+                conn.commit()
+                set_id = create_keyframe_set(conn, {"stack_id": "stack1", "variant_policy_id": "seed_sweep_12_v1", "variant_policy_json": {}, "base_seed": 1, "width": 64, "height": 64})
+                add_keyframe_set_item(conn, {"set_id": set_id, "idx": 0, "seed": 1, "positive_prompt": "p", "negative_prompt": "n", "gen_params_json": {}})
+            finally:
+                conn.close()
+            save = KCP_KeyframeSetItemSaveImage()
+            save.run(db_path, set_id, 0, Image.new("RGB", (96, 64), (200, 10, 10)), "png", True)
+            conn = connect(Path(db_path))
+            try:
+                first = get_set_item(conn, set_id, 0)
+            finally:
+                conn.close()
+            save.run(db_path, set_id, 0, Image.new("RGB", (96, 64), (10, 200, 10)), "png", True)
+            superseded = [root / first["image_path"], root / first["thumb_path"]]
+
+            # A save that fails after ingesting must take its new blobs back with the rollback.
+            import kcp.nodes.keyframe_set_item_save_image as save_mod
+
+            def _blob_files() -> list[str]:
+                return sorted(p.relative_to(root).as_posix() for p in (root / "blobs").rglob("*") if p.is_file())
+
+            before = _blob_files()
+            orig_update = save_mod.update_set_item_media
+
+            def _fail_update(*_args, **_kwargs):
+                raise sqlite3.OperationalError("simulated failure")
+
+            save_mod.update_set_item_media = _fail_update
+            try:
+                save.run(db_path, set_id, 0, Image.new("RGB", (96, 64), (1, 2, 250)), "png", True)
+                return False, "failing save did not raise"
+            except sqlite3.OperationalError:
+                pass
+            finally:
+                save_mod.update_set_item_media = orig_update
+            if _blob_files() != before:
+                return False, f"rolled-back save left blobs: {sorted(set(_blob_files()) - set(before))}"
+            stale = root / "blobs" / "ab" / "cd" / ("ab" + "0" * 62)
+            stale.parent.mkdir(parents=True)
+            stale.write_bytes(b"left by an interrupted ingest")
+            os.utime(stale, (1, 1))
+            fresh = stale.with_name("ab" + "1" * 62)
+            fresh.write_bytes(b"ingest still in flight")
+
+            conn = connect(Path(db_path))
+            try:
+                dry = gc_blobs(conn, root)
+                if not all(p.exists() for p in superseded) or not stale.exists():
+                    return False, "gc dry run deleted files"
+                report = gc_blobs(conn, root, dry_run=False)
+                zero = conn.execute("SELECT COUNT(*) FROM media_blobs WHERE ref_count = 0").fetchone()[0]
+                again = gc_blobs(conn, root, dry_run=False)
+            finally:
+                conn.close()
+            if (dry["blobs_deleted"], dry["stray_files_deleted"]) != (2, 1) or report != {**dry, "dry_run": False}:
+                return False, f"unexpected gc report: dry={dry} report={report}"
+            if any(p.exists() for p in superseded) or stale.exists() or zero:
+                return False, f"superseded blobs kept: rows={zero}"
+            if not fresh.exists() or again["blobs_deleted"] or again["stray_files_deleted"]:
+                return False, f"gc collected too much: fresh={fresh.exists()} again={again}"
+            image = KCP_KeyframeSetItemLoad().run(db_path, set_id, 0, True)[0]
+            if image is None or image_io.comfy_image_to_pil(image).getpixel((0, 0)) != (10, 200, 10):
+                return False, "live item unreadable after gc"
+        return True, "blob store gc ok"
+    except Exception as e:
+        return False, str(e)
+
+
+def smoke_blob_store_convert_project() -> tuple[bool, str]:
+    """Smoke: convert_project moves existing media into blobs and reports bytes reclaimed."""
+    try:
+        from kcp.nodes.project_init import KCP_ProjectInit
+        import kcp.db.blobs as blobs_mod
+        from kcp.db.blobs import blob_store_enabled, convert_project
+        from kcp.db.repo import connect, create_asset
+
+        with tempfile.TemporaryDirectory() as td:
+            db_path, _, _ = KCP_ProjectInit().run(str(Path(td) / "kcp"), "kcp.sqlite", True)
+            root = Path(db_path).parent.parent
+            conn = connect(Path(db_path))
+            try:
+                for name in ["a", "b"]:
+                    rel = f"images/keyframe/{name}/original.png"
+                    (root / rel).parent.mkdir(parents=True, exist_ok=True)
+                    (root / rel).write_bytes(b"\x89PNG\r\n\x1a\nSAME")
+                    create_asset(conn, {"type": "keyframe", "name": name, "positive_fragment": "p", "image_path": rel})
+                dry = convert_project(conn, root, dry_run=True)
+                if dry["bytes_reclaimed"] != 12 or not (root / "images/keyframe/a/original.png").exists():
+                    return False, f"unexpected dry-run report: {dry}"
+                # A failure before the commit leaves every loose file and row as it was.
+                orig_set_meta = blobs_mod.set_meta
+                blobs_mod.set_meta = lambda *a, **k: (_ for _ in ()).throw(RuntimeError("forced"))
+                try:
+                    convert_project(conn, root)
+                    return False, "forced conversion failure did not raise"
+                except RuntimeError:
+                    pass
+                finally:
+                    blobs_mod.set_meta = orig_set_meta
+                rows = {r[0] for r in conn.execute("SELECT image_path FROM assets").fetchall()}
+                blob_files = [p for p in (root / "blobs").rglob("*") if p.is_file()] if (root / "blobs").exists() else []
+                if rows != {"images/keyframe/a/original.png", "images/keyframe/b/original.png"} or blob_files:
+                    return False, f"failed conversion changed state: rows={rows} blobs={blob_files}"
+                if not all((root / r).exists() for r in rows):
+                    return False, "failed conversion removed loose files"
+                report = convert_project(conn, root)
+                if report["duplicates_removed"] != 1 or report["bytes_reclaimed"] != 12:
+                    return False, f"unexpected report: {report}"
+                if (root / "images/keyframe/a/original.png").exists():
+                    return False, "loose source left after conversion"
+                paths = {r[0] for r in conn.execute("SELECT image_path FROM assets").fetchall()}
+                if len(paths) != 1 or not next(iter(paths)).startswith("blobs/"):
+                    return False, f"asset paths not converted: {paths}"
+                if not blob_store_enabled(conn):
+                    return False, "blob store flag not set after conversion"
+                again = convert_project(conn, root)
+                if again["files_converted"] != 0:
+                    return False, f"conversion not idempotent: {again}"
+                (root / "images/keyframe/c/original.png").parent.mkdir(parents=True, exist_ok=True)
+                (root / "images/keyframe/c/original.png").write_bytes(b"\x89PNG\r\n\x1a\nSAME")
+                create_asset(conn, {"type": "keyframe", "name": "c", "positive_fragment": "p", "image_path": "images/keyframe/c/original.png"})
+                dry = convert_project(conn, root, dry_run=True)
+                if dry["duplicates_removed"] != 1:
+                    return False, f"dry run missed bytes already in the store: {dry}"
+            finally:
+                conn.close()
+        return True, "blob store convert ok"
+    except Exception as e:
+        return False, str(e)
+
+
+def smoke_image_cache_lru() -> tuple[bool, str]:
+    """Smoke: decoded-image LRU hits on repeat loads, evicts by bytes and invalidates on mtime change."""
+    try:
+        import os
+        from kcp.util import image_io
+
+        class _Decoded:
+            nbytes = 100
+
+        orig_pillow = image_io.pillow_available
+        orig_decode = image_io._decode_image_as_comfy
+        orig_cache = image_io.image_cache()
+        decodes = []
+
+        def _fake_decode(path):
+            decodes.append(Path(path).name)
+            return _Decoded()
+
+        try:
+            image_io.pillow_available = lambda: True
+            image_io._decode_image_as_comfy = _fake_decode
+            cache = image_io.configure_image_cache(250)
+            with tempfile.TemporaryDirectory() as td:
+                paths = [Path(td) / f"{i}.webp" for i in range(3)]
+                for p in paths:
+                    p.write_bytes(b"x")
+                first = image_io.load_image_as_comfy(paths[0])
+                if image_io.load_image_as_comfy(paths[0]) is not first:
+                    return False, "repeat load did not return shared cached value"
+                image_io.load_image_as_comfy(paths[1])
+                image_io.load_image_as_comfy(paths[2])
+                stats = image_io.image_cache_stats()
+                if stats["hits"] != 1 or stats["misses"] != 3 or stats["entries"] != 2 or stats["bytes"] > 250:
+                    return False, f"unexpected stats after eviction: {stats}"
+                st = paths[2].stat()
+                os.utime(paths[2], ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+                image_io.load_image_as_comfy(paths[2])
+                if decodes != ["0.webp", "1.webp", "2.webp", "2.webp"]:
+                    return False, f"unexpected decode sequence: {decodes}"
+                image_io.load_image_as_comfy(paths[2], use_cache=False)
+                if len(decodes) != 5 or cache.stats()["hits"] != 1:
+                    return False, "use_cache=False should bypass cache"
+
+                # Tensors cannot be made read-only: every caller gets its own copy.
+                class _Tensor(_Decoded):
+                    def clone(self):
+                        return _Tensor()
+
+                image_io._decode_image_as_comfy = lambda path: _Tensor()
+                tensor_path = Path(td) / "t.webp"
+                tensor_path.write_bytes(b"t")
+                a = image_io.load_image_as_comfy(tensor_path)
+                b = image_io.load_image_as_comfy(tensor_path)
+                stored = image_io.image_cache()._entries[image_io._cache_key(tensor_path)][0]
+                if a is b or stored in (a, b):
+                    return False, "cached tensors were handed out shared"
+
+                # Nested-list IMAGE values (no NumPy): writing one pixel must not reach the cache or other pixels.
+                image_io._decode_image_as_comfy = lambda path: [[[[0.5, 0.5, 0.5], [0.5, 0.5, 0.5]], [[0.5, 0.5, 0.5], [0.5, 0.5, 0.5]]]]
+                nested_path = Path(td) / "n.webp"
+                nested_path.write_bytes(b"n")
+                a = image_io.load_image_as_comfy(nested_path)
+                a[0][0][0][0] = 1.0
+                b = image_io.load_image_as_comfy(nested_path)
+                flat_a = [v for row in a[0] for px in row for v in px]
+                flat_b = [v for row in b[0] for px in row for v in px]
+                if flat_a.count(1.0) != 1 or flat_b.count(1.0) != 0:
+                    return False, f"nested IMAGE rows shared: {a} {b}"
+        finally:
+            image_io.pillow_available = orig_pillow
+            image_io._decode_image_as_comfy = orig_decode
+            image_io._IMAGE_CACHE = orig_cache
+        return True, "image cache lru ok"
+    except Exception as e:
+        return False, str(e)
+
+
+def smoke_set_load_batch_load_modes() -> tuple[bool, str]:
+    """Smoke: thumbs_only never decodes full-res files; max_side decodes reduced."""
+    try:
+        import kcp.nodes.keyframe_set_load_batch as mod
+        from kcp.nodes.project_init import KCP_ProjectInit
+        from kcp.db.repo import connect, create_keyframe_set, add_keyframe_set_item, update_set_item_media
+
+        orig_pillow = mod.pillow_available
+        orig_load = mod.load_image_as_comfy
+        orig_reduced = mod.load_image_as_comfy_reduced
+        calls = []
+        try:
+            mod.pillow_available = lambda: True
+            mod.load_image_as_comfy = lambda p: (calls.append(("full", Path(p).name)), [[[[1.0, 0.0, 0.0]]]])[1]
+            mod.load_image_as_comfy_reduced = lambda p, n: (calls.append((f"reduced{n}", Path(p).name)), [[[[0.0, 1.0, 0.0]]]])[1]
+            with tempfile.TemporaryDirectory() as td:
+                db_path, _, _ = KCP_ProjectInit().run(str(Path(td) / "kcp"), "kcp.sqlite", True)
+                root = Path(db_path).parent.parent
+                conn = connect(Path(db_path))
+                try:
+                    conn.execute("INSERT INTO stacks (id,name,created_at,updated_at) VALUES (?,?,?,?)", ("stack1", "stack1", 1, 1))
+                    conn.commit()
+                    set_id = create_keyframe_set(conn, {"stack_id": "stack1", "variant_policy_id": "seed_sweep_12_v1", "variant_policy_json": {}, "base_seed": 1, "width": 64, "height": 64})
+                    for i in range(2):
+                        add_keyframe_set_item(conn, {"set_id": set_id, "idx": i, "seed": i + 1, "positive_prompt": "p", "negative_prompt": "n", "gen_params_json": {}})
+                        img_rel = f"sets/{set_id}/{i}.webp"
+                        th_rel = f"sets/{set_id}/{i}_thumb.webp"
+                        (root / img_rel).parent.mkdir(parents=True, exist_ok=True)
+                        (root / img_rel).write_bytes(b"img")
+                        (root / th_rel).write_bytes(b"th")
+                        update_set_item_media(conn, set_id, i, img_rel, th_rel)
+                finally:
+                    conn.close()
+
+                images, thumbs, _, _ = mod.KCP_KeyframeSetLoadBatch().run(db_path, set_id, True, True, "thumbs_only")
+                if len(images) != 2 or any(kind != "full" or not name.endswith("_thumb.webp") for kind, name in calls):
+                    return False, f"thumbs_only touched full-res media: {calls}"
+                if images[0] is not thumbs[0]:
+                    return False, "thumbs_only should return thumb tensors on images output"
+                calls.clear()
+                mod.KCP_KeyframeSetLoadBatch().run(db_path, set_id, True, True, "max_side", 128)
+                if ("reduced128", "0_thumb.webp") not in calls or any(name == "0.webp" for _, name in calls):
+                    return False, f"max_side<=thumb should decode from thumb: {calls}"
+                calls.clear()
+                mod.KCP_KeyframeSetLoadBatch().run(db_path, set_id, True, True, "max_side", 1024)
+                if ("reduced1024", "0.webp") not in calls or ("full", "0.webp") in calls:
+                    return False, f"max_side>thumb should reduce-decode full-res: {calls}"
+        finally:
+            mod.pillow_available = orig_pillow
+            mod.load_image_as_comfy = orig_load
+            mod.load_image_as_comfy_reduced = orig_reduced
+        return True, "set load batch load modes ok"
+    except Exception as e:
+        return False, str(e)
+
+
+def smoke_set_load_stacked_batch() -> tuple[bool, str]:
+    """Smoke: stacked loader returns one [B,H,W,C] batch plus idx map; size mismatch needs fit."""
+    try:
+        try:
+            import numpy  # noqa: F401
+        except Exception:
+            return True, "stacked load skipped: numpy not installed"
+        import kcp.nodes.keyframe_set_load_stacked as mod
+        from kcp.nodes.project_init import KCP_ProjectInit
+        from kcp.db.repo import connect, create_keyframe_set, add_keyframe_set_item, update_set_item_media
+
+        sizes = {"0.webp": (4, 2), "1.webp": (4, 2), "2.webp": (2, 2)}
+        orig_pillow = mod.pillow_available
+        orig_size = mod.image_size
+        orig_decode = mod.decode_image_into
+        try:
+            mod.pillow_available = lambda: True
+            mod.image_size = lambda p: sizes[Path(p).name]
+            mod.decode_image_into = lambda p, out, fit="none": out.fill(float(Path(p).name[0]) / 10.0)
+            with tempfile.TemporaryDirectory() as td:
+                db_path, _, _ = KCP_ProjectInit().run(str(Path(td) / "kcp"), "kcp.sqlite", True)
+                conn = connect(Path(db_path))
+                try:
+                    conn.execute("INSERT INTO stacks (id,name,created_at,updated_at) VALUES (?,?,?,?)", ("stack1", "stack1", 1, 1))
+                    conn.commit()
+                    set_id = create_keyframe_set(conn, {"stack_id": "stack1", "variant_policy_id": "seed_sweep_12_v1", "variant_policy_json": {}, "base_seed": 1, "width": 64, "height": 64})
+                    for i in [2, 0, 1]:
+                        add_keyframe_set_item(conn, {"set_id": set_id, "idx": i, "seed": i, "positive_prompt": "p", "negative_prompt": "n", "gen_params_json": {}})
+                        update_set_item_media(conn, set_id, i, f"sets/{set_id}/{i}.webp", f"sets/{set_id}/{i}.webp")
+                finally:
+                    conn.close()
+
+                try:
+                    mod.KCP_KeyframeSetLoadStacked().run(db_path, set_id, False)
+                    return False, "mixed sizes with fit=none should raise"
+                except RuntimeError as e:
+                    if "kcp_set_batch_size_mismatch" not in str(e):
+                        return False, f"unexpected error: {e}"
+                batch, index_map_json, _ = mod.KCP_KeyframeSetLoadStacked().run(db_path, set_id, False, "images", "letterbox")
+                shape = tuple(int(x) for x in batch.shape)
+                if shape != (3, 2, 4, 3):
+                    return False, f"unexpected batch shape {shape}"
+                index_map = json.loads(index_map_json)
+                if index_map.get("idx") != [0, 1, 2]:
+                    return False, f"unexpected idx map {index_map}"
+                if abs(float(batch[2].max()) - 0.2) > 1e-6:
+                    return False, "batch slice not decoded in idx order"
+                try:
+                    mod.KCP_KeyframeSetLoadStacked().run(db_path, "no_such_set", False)
+                    return False, "a set with nothing to load should raise"
+                except RuntimeError as e:
+                    if not str(e).startswith("kcp_set_media_missing:"):
+                        return False, f"unexpected empty-set error: {e}"
+        finally:
+            mod.pillow_available = orig_pillow
+            mod.image_size = orig_size
+            mod.decode_image_into = orig_decode
+        return True, "set load stacked batch ok"
+    except Exception as e:
+        return False, str(e)
+
+
+def smoke_set_load_batch_paging() -> tuple[bool, str]:
+    """Smoke: start_idx/limit pages a set by idx and always returns a continuation cursor."""
+    try:
+        import kcp.nodes.keyframe_set_load_batch as mod
+        from kcp.nodes.project_init import KCP_ProjectInit
+        from kcp.db.repo import connect, create_keyframe_set, add_keyframe_set_item, update_set_item_media
+
+        orig_pillow = mod.pillow_available
+        orig_load = mod.load_image_as_comfy
+        decodes = []
+        try:
+            mod.pillow_available = lambda: True
+            mod.load_image_as_comfy = lambda p: (decodes.append(Path(p).name), [[[[1.0, 0.0, 0.0]]]])[1]
+            with tempfile.TemporaryDirectory() as td:
+                db_path, _, _ = KCP_ProjectInit().run(str(Path(td) / "kcp"), "kcp.sqlite", True)
+                root = Path(db_path).parent.parent
+                conn = connect(Path(db_path))
+                try:
+                    conn.execute("INSERT INTO stacks (id,name,created_at,updated_at) VALUES (?,?,?,?)", ("stack1", "stack1", 1, 1))
+                    conn.commit()
+                    set_id = create_keyframe_set(conn, {"stack_id": "stack1", "variant_policy_id": "seed_sweep_12_v1", "variant_policy_json": {}, "base_seed": 1, "width": 64, "height": 64})
+                    for i in range(6):
+                        add_keyframe_set_item(conn, {"set_id": set_id, "idx": i, "seed": i, "positive_prompt": "p", "negative_prompt": "n", "gen_params_json": {}})
+                        if i == 3:
+                            continue
+                        img_rel = f"sets/{set_id}/{i}.webp"
+                        (root / img_rel).parent.mkdir(parents=True, exist_ok=True)
+                        (root / img_rel).write_bytes(b"img")
+                        update_set_item_media(conn, set_id, i, img_rel, img_rel)
+                finally:
+                    conn.close()
+
+                seen = []
+                start_idx = 0
+                pages = 0
+                while start_idx >= 0 and pages < 10:
+                    images, _, items_json, page_json = mod.KCP_KeyframeSetLoadBatch().run(db_path, set_id, True, True, "full", 512, start_idx, 2)
+                    parsed = [json.loads(x) for x in items_json]
+                    if len(images) > 2:
+                        return False, f"page exceeded limit: {len(images)}"
+                    seen.extend(p["idx"] for p in parsed)
+                    page = json.loads(page_json)
+                    if any(p["page"] != page for p in parsed):
+                        return False, f"item page differs from page_json: {page_json}"
+                    start_idx = page["next_start_idx"]
+                    pages += 1
+                # idx 3 has no media: the cursor skips the gap instead of counting it.
+                if seen != [0, 1, 2, 4, 5] or pages != 3:
+                    return False, f"unexpected paging seen={seen} pages={pages}"
+                if len(decodes) != 5:
+                    return False, f"expected one decode per returned item, got {decodes}"
+                _, _, all_items, page_json = mod.KCP_KeyframeSetLoadBatch().run(db_path, set_id, True, True)
+                if "page" in json.loads(all_items[0]) or json.loads(page_json)["next_start_idx"] != -1:
+                    return False, f"limit=0 should not add item page cursors: {page_json}"
+                images, _, items_json, page_json = mod.KCP_KeyframeSetLoadBatch().run(db_path, set_id, True, True, "full", 512, 6, 2)
+                if images or items_json or json.loads(page_json) != {"start_idx": 6, "limit": 2, "next_start_idx": -1}:
+                    return False, f"empty page did not report the end: {page_json}"
+        finally:
+            mod.pillow_available = orig_pillow
+            mod.load_image_as_comfy = orig_load
+        return True, "set load batch paging ok"
+    except Exception as e:
+        return False, str(e)
+
+
+def smoke_pil_to_comfy_stdlib_fallback() -> tuple[bool, str]:
+    """Smoke: pil_to_comfy_image stdlib fallback converts bytes without getdata()."""
+    try:
+        from kcp.util import image_io
+
+        class _FakeRGB:
+            mode = "RGB"
+            size = (2, 1)
+
+            def tobytes(self):
+                return bytes([255, 0, 51, 0, 255, 102])
+
+            def getdata(self):
+                raise AssertionError("getdata() should not be used")
+
+        orig_pillow = image_io.pillow_available
+        orig_numpy = sys.modules.get("numpy", "__missing__")
+        try:
+            image_io.pillow_available = lambda: True
+            sys.modules["numpy"] = None  # type: ignore[assignment]
+            out = image_io.pil_to_comfy_image(_FakeRGB())
+        finally:
+            image_io.pillow_available = orig_pillow
+            if orig_numpy == "__missing__":
+                sys.modules.pop("numpy", None)
+            else:
+                sys.modules["numpy"] = orig_numpy
+        expected = [[[[1.0, 0.0, 0.2], [0.0, 1.0, 0.4]]]]
+        if out != expected:
+            return False, f"unexpected fallback output {out}"
+        return True, "pil_to_comfy stdlib fallback ok"
+    except Exception as e:
+        return False, str(e)
+
+
+def smoke_comfy_to_pil_nested_fast_path() -> tuple[bool, str]:
+    """Smoke: nested-list IMAGE converts via the stdlib fast path with clamp/round and >3 channels."""
+    try:
+        from kcp.util import image_io
+
+        if not image_io.pillow_available():
+            return True, "nested fast path skipped: Pillow not installed"
+        img = image_io.comfy_image_to_pil([[[[1.0, 0.0, 0.2, 0.9], [0.5, -1.0, 0.0, 0.0]]]])
+        if img.size != (2, 1) or img.tobytes() != bytes([255, 0, 51, 128, 0, 0]):
+            return False, f"unexpected normalized conversion: {list(img.tobytes())}"
+        img = image_io.comfy_image_to_pil([[[10.0, 300.0, 127.6]]])
+        if img.tobytes() != bytes([10, 255, 128]):
+            return False, f"unexpected 0..255 conversion: {list(img.tobytes())}"
+        try:
+            image_io.comfy_image_to_pil([[[[1.0, 0.0, 0.0]], [[1.0, 0.0]]]])
+            return False, "ragged input should raise"
+        except ValueError:
+            pass
+        return True, "nested fast path ok"
+    except Exception as e:
+        return False, str(e)
+
+
+def smoke_comfy_to_pil_paths_match() -> tuple[bool, str]:
+    """Smoke: the NumPy and stdlib IMAGE conversions produce the same bytes for the same tensor."""
+    try:
+        from kcp.util import image_io
+
+        if not image_io.pillow_available() or not image_io.numpy_available():
+            return True, "to_pil path match skipped: Pillow/NumPy not installed"
+        import numpy as np  # type: ignore
+
+        # Rounding edges (k/255 +- half a step), out-of-range values, and an alpha channel above 1.0.
+        edges = [0.0, 0.5, 1.0, -0.25, 0.5 / 255, 1.5 / 255, 127.5 / 255, 254.49 / 255, 254.51 / 255, 0.2, 0.3, 0.7]
+        normalized = [[[edges[(y * 4 + x + ch) % len(edges)] for ch in range(3)] + [3.0] for x in range(4)] for y in range(3)]
+        ranged = [[[v * 300.0 - 10.0 for v in px[:3]] for px in row] for row in normalized]
+        for label, nested in (("normalized", normalized), ("0..255", ranged)):
+            arr = np.asarray([nested], dtype=np.float32)
+            via_numpy = image_io.comfy_image_to_pil(arr).tobytes()
+            via_stdlib = image_io.comfy_image_to_pil(arr.tolist()).tobytes()
+            if via_numpy != via_stdlib:
+                return False, f"{label}: paths differ: {list(via_numpy)} != {list(via_stdlib)}"
+        if image_io.comfy_image_to_pil(np.full((1, 1, 1, 3), 0.5, dtype=np.float32)).tobytes() != bytes([128] * 3):
+            return False, "NumPy path does not round"
+        return True, "to_pil paths match"
+    except Exception as e:
+        return False, str(e)
+
+
+def smoke_encode_profiles() -> tuple[bool, str]:
+    """Smoke: encode profiles resolve per node / project default and reach Pillow's encoder."""
+    try:
+        import kcp.nodes.keyframe_set_item_save_image as mod
+        from kcp.db.repo import add_keyframe_set_item, connect, create_keyframe_set
+        from kcp.nodes.project_init import KCP_ProjectInit
+        from kcp.util import image_io
+
+        if image_io.encode_options("PNG", None) != {}:
+            return False, "profile=None must keep Pillow defaults"
+        if image_io.encode_options("webp", "archival").get("lossless") is not True:
+            return False, "archival WEBP must be lossless"
+        try:
+            image_io.encode_options("PNG", "bogus")
+            return False, "unknown profile should raise"
+        except ValueError:
+            pass
+
+        orig_pillow = mod.pillow_available
+        orig_save = mod.save_comfy_image_atomic
+        orig_thumb = mod.make_thumbnail
+        try:
+            mod.pillow_available = lambda: True
+            seen = []
+
+            def _fake_save(_img, path, fmt=None, profile=None, **_kwargs):
+                seen.append(("image", profile))
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_bytes(b"fake")
+                return True
+
+            def _fake_thumb(_src, dst, max_px=384, profile=None, **_kwargs):
+                seen.append(("thumb", profile))
+                dst.parent.mkdir(parents=True, exist_ok=True)
+                dst.write_bytes(b"thumb")
+                return True
+
+            mod.save_comfy_image_atomic = _fake_save
+            mod.make_thumbnail = _fake_thumb
+            with tempfile.TemporaryDirectory() as td:
+                db_path, _, status_json = KCP_ProjectInit().run(str(Path(td) / "kcp"), "kcp.sqlite", True, encode_profile="fast")
+                if json.loads(status_json).get("encode_profile") != "fast":
+                    return False, f"project default not recorded: {status_json}"
+                conn = connect(Path(db_path))
+                try:
+                    conn.execute("INSERT INTO stacks (id,name,created_at,updated_at) VALUES (?,?,?,?)", ("stack1", "stack1", 1, 1))
+                    conn.commit()
+                    set_id = create_keyframe_set(conn, {"stack_id": "stack1", "variant_policy_id": "seed_sweep_12_v1", "variant_policy_json": {}, "base_seed": 1, "width": 64, "height": 64})
+                    add_keyframe_set_item(conn, {"set_id": set_id, "idx": 0, "seed": 1, "positive_prompt": "p", "negative_prompt": "n", "gen_params_json": {}})
+                finally:
+                    conn.close()
+                node = mod.KCP_KeyframeSetItemSaveImage()
+                node.run(db_path, set_id, 0, [[[[0.0, 0.0, 0.0]]]], "webp", True)
+                node.run(db_path, set_id, 0, [[[[0.0, 0.0, 0.0]]]], "webp", True, encode_profile="archival")
+                KCP_ProjectInit().run(str(Path(td) / "kcp"), "kcp.sqlite", True, encode_profile="pillow_default")
+                node.run(db_path, set_id, 0, [[[[0.0, 0.0, 0.0]]]], "webp", True)
+            expected = [("image", "fast"), ("thumb", "fast"), ("image", "archival"), ("thumb", "archival"), ("image", None), ("thumb", None)]
+            if seen != expected:
+                return False, f"unexpected profile routing: {seen}"
+        finally:
+            mod.pillow_available = orig_pillow
+            mod.save_comfy_image_atomic = orig_save
+            mod.make_thumbnail = orig_thumb
+
+        if not image_io.pillow_available():
+            return True, "encode profiles ok (encoder check skipped: Pillow not installed)"
+        from PIL import Image
+
+        src = Image.effect_mandelbrot((96, 96), (-2.0, -1.5, 1.0, 1.5), 32).convert("RGB")
+        with tempfile.TemporaryDirectory() as td:
+            sizes = {}
+            for profile in ("fast", "archival"):
+                path = Path(td) / f"{profile}.png"
+                image_io.save_comfy_image_atomic(src, path, profile=profile)
+                sizes[profile] = path.stat().st_size
+            if sizes["archival"] > sizes["fast"]:
+                return False, f"archival PNG larger than fast: {sizes}"
+            webp = Path(td) / "archival.webp"
+            image_io.save_comfy_image_atomic(src, webp, profile="archival")
+            with Image.open(webp) as img:
+                if img.convert("RGB").tobytes() != src.tobytes():
+                    return False, "archival WEBP is not lossless"
+        return True, "encode profiles ok"
+    except Exception as e:
+        return False, str(e)
+
+
+def smoke_preview_pyramid() -> tuple[bool, str]:
+    """Smoke: pyramid levels are written in one cascade, recorded, and picked by max_side loads."""
+    try:
+        from kcp.util import image_io
+
+        if not image_io.pillow_available():
+            return True, "preview pyramid skipped: Pillow not installed"
+        from PIL import Image
+
+        import kcp.nodes.keyframe_set_load_batch as load_mod
+        from kcp.db.previews import pick_preview_level
+        from kcp.db.repo import add_keyframe_set_item, connect, create_keyframe_set
+        from kcp.nodes.keyframe_set_item_save_image import KCP_KeyframeSetItemSaveImage
+        from kcp.nodes.project_init import KCP_ProjectInit
+
+        if pick_preview_level({128: "a", 384: "b"}, 200) != "b" or pick_preview_level({128: "a"}, 512) is not None:
+            return False, "pick_preview_level chose the wrong level"
+
+        orig_reduced = load_mod.load_image_as_comfy_reduced
+        try:
+            picked = []
+            load_mod.load_image_as_comfy_reduced = lambda path, max_side, use_cache=True: picked.append(path.name) or "img"
+            with tempfile.TemporaryDirectory() as td:
+                db_path, _, status_json = KCP_ProjectInit().run(str(Path(td) / "kcp"), "kcp.sqlite", True, preview_levels="1024, 128")
+                if json.loads(status_json).get("preview_levels") != [128, 384, 1024]:
+                    return False, f"unexpected preview_levels: {status_json}"
+                conn = connect(Path(db_path))
+                try:
+                    conn.execute("INSERT INTO stacks (id,name,created_at,updated_at) VALUES (?,?,?,?)", ("stack1", "stack1", 1, 1))
+                    conn.commit()
+                    set_id = create_keyframe_set(conn, {"stack_id": "stack1", "variant_policy_id": "seed_sweep_12_v1", "variant_policy_json": {}, "base_seed": 1, "width": 64, "height": 64})
+                    for i in range(2):
+                        add_keyframe_set_item(conn, {"set_id": set_id, "idx": i, "seed": i + 1, "positive_prompt": "p", "negative_prompt": "n", "gen_params_json": {}})
+                finally:
+                    conn.close()
+
+                node = KCP_KeyframeSetItemSaveImage()
+                node.run(db_path, set_id, 0, Image.new("RGB", (1500, 1000), (200, 10, 10)), "png", True)
+                node.run(db_path, set_id, 1, Image.new("RGB", (300, 200), (10, 200, 10)), "png", True)
+                conn = connect(Path(db_path))
+                try:
+                    rows = conn.execute(
+                        "SELECT i.idx, p.level_px, p.path FROM media_previews p JOIN keyframe_set_items i ON i.id = p.owner_id "
+                        "WHERE p.owner_kind='set_item' ORDER BY i.idx, p.level_px"
+                    ).fetchall()
+                finally:
+                    conn.close()
+                got = [(r["idx"], r["level_px"]) for r in rows]
+                if got != [(0, 128), (0, 1024), (1, 128)]:
+                    return False, f"unexpected recorded levels: {got}"
+                root = Path(td) / "kcp"
+                with Image.open(root / rows[1]["path"]) as img:
+                    if img.size != (1024, 683):
+                        return False, f"unexpected 1024 level size: {img.size}"
+                with Image.open(root / rows[0]["path"]) as img:
+                    if max(img.size) != 128:
+                        return False, f"unexpected 128 level size: {img.size}"
+
+                for max_side in (100, 300, 900, 1200):
+                    load_mod.KCP_KeyframeSetLoadBatch().run(db_path, set_id, True, True, "max_side", max_side)
+        finally:
+            load_mod.load_image_as_comfy_reduced = orig_reduced
+        expected = [
+            "0_thumb_128.webp", "1_thumb_128.webp",
+            "0_thumb.webp", "1_thumb.webp",
+            "0_thumb_1024.webp", "1.png",
+            "0.png", "1.png",
+        ]
+        if picked != expected:
+            return False, f"unexpected decode sources: {picked}"
+        return True, "preview pyramid ok"
+    except Exception as e:
+        return False, str(e)
+
+
+def _minimal_png_bytes(width: int, height: int) -> bytes:
+    import struct
+    import zlib
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    raw = b"".join(b"\x00" + b"\x00\x00\x00" * width for _ in range(height))
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(raw))
+        + chunk(b"IEND", b"")
+    )
+
+
+def smoke_probe_integrity_scan() -> tuple[bool, str]:
+    """Smoke: header-only probe (no Pillow) and the integrity scan modes of the status nodes."""
+    try:
+        from kcp.db.repo import add_keyframe_set_item, connect, create_asset, create_keyframe_set
+        from kcp.nodes.project_init import KCP_ProjectInit
+        from kcp.nodes.project_status import KCP_ProjectStatus
+        from kcp.nodes.render_pack_status import KCP_RenderPackStatus
+        from kcp.util.image_io import probe
+
+        with tempfile.TemporaryDirectory() as td:
+            tdp = Path(td)
+            png = _minimal_png_bytes(7, 5)
+            (tdp / "ok.png").write_bytes(png)
+            (tdp / "cut.png").write_bytes(png[:-6])
+            vp8l = b"RIFF" + (25).to_bytes(4, "little") + b"WEBPVP8L" + (13).to_bytes(4, "little") + b"\x2f" + ((9 - 1) | ((4 - 1) << 14)).to_bytes(4, "little") + b"\x00" * 8
+            (tdp / "ok.webp").write_bytes(vp8l)
+            (tdp / "cut.webp").write_bytes(vp8l[:-4])
+            (tdp / "junk.png").write_bytes(b"not an image")
+            got = {name: probe(tdp / name) for name in ("ok.png", "cut.png", "ok.webp", "cut.webp", "junk.png", "absent.png")}
+            if (got["ok.png"]["format"], got["ok.png"]["width"], got["ok.png"]["height"], got["ok.png"]["ok"]) != ("PNG", 7, 5, True):
+                return False, f"unexpected PNG probe: {got['ok.png']}"
+            if (got["ok.webp"]["format"], got["ok.webp"]["width"], got["ok.webp"]["height"], got["ok.webp"]["ok"]) != ("WEBP", 9, 4, True):
+                return False, f"unexpected WEBP probe: {got['ok.webp']}"
+            bad = [n for n in ("cut.png", "cut.webp", "junk.png", "absent.png") if got[n]["ok"] or not got[n]["error"]]
+            if bad:
+                return False, f"corrupt files not flagged: {bad}"
+
+            db_path, _, _ = KCP_ProjectInit().run(str(tdp / "kcp"), "kcp.sqlite", True)
+            root = tdp / "kcp"
+            conn = connect(Path(db_path))
+            try:
+                conn.execute("INSERT INTO stacks (id,name,created_at,updated_at) VALUES (?,?,?,?)", ("stack1", "stack1", 1, 1))
+                conn.commit()
+                set_id = create_keyframe_set(conn, {"stack_id": "stack1", "variant_policy_id": "seed_sweep_12_v1", "variant_policy_json": {}, "base_seed": 1, "width": 64, "height": 64})
+                for i in range(3):
+                    add_keyframe_set_item(conn, {"set_id": set_id, "idx": i, "seed": i + 1, "positive_prompt": "p", "negative_prompt": "n", "gen_params_json": {}})
+                (root / "sets" / set_id).mkdir(parents=True, exist_ok=True)
+                (root / "sets" / set_id / "0.png").write_bytes(png)
+                (root / "sets" / set_id / "1.png").write_bytes(png[:-6])
+                for i in range(3):
+                    conn.execute("UPDATE keyframe_set_items SET image_path=? WHERE set_id=? AND idx=?", (f"sets/{set_id}/{i}.png", set_id, i))
+                aid = create_asset(conn, {"type": "environment", "name": "plate", "description": "", "tags": [], "positive_fragment": "", "negative_fragment": "", "json_fields": {}, "version": 1, "parent_id": None})
+                (root / "images" / "environment" / aid).mkdir(parents=True, exist_ok=True)
+                (root / "images" / "environment" / aid / "original.png").write_bytes(b"\x89PNG\r\n\x1a\n")
+                conn.execute("UPDATE assets SET image_path=? WHERE id=?", (f"images/environment/{aid}/original.png", aid))
+                conn.commit()
+            finally:
+                conn.close()
+
+            _, status_json = KCP_RenderPackStatus().run(db_path, set_id, False)
+            status = json.loads(status_json)
+            if status["missing_idxs"] != [2] or "corrupt_idxs" in status:
+                return False, f"unexpected exists-mode status: {status}"
+            summary, status_json = KCP_RenderPackStatus().run(db_path, set_id, False, "integrity")
+            status = json.loads(status_json)
+            if status["missing_idxs"] != [2] or status["corrupt_idxs"] != [1] or "corrupt=1" not in summary:
+                return False, f"unexpected integrity status: {status}"
+            try:
+                KCP_RenderPackStatus().run(db_path, set_id, True, "integrity")
+                return False, "strict integrity scan should raise"
+            except RuntimeError as e:
+                if "kcp_set_media_missing" not in str(e):
+                    return False, f"unexpected strict error: {e}"
+
+            _, proj_json, ready = KCP_ProjectStatus().run(db_path, "", True)
+            if not ready:
+                return False, f"exists-only project status should be ready: {proj_json}"
+            _, proj_json, ready = KCP_ProjectStatus().run(db_path, "", True, "integrity")
+            scan = json.loads(proj_json).get("media_scan") or {}
+            if ready or scan.get("checked") != 1 or [c["name"] for c in scan.get("corrupt", [])] != ["plate"]:
+                return False, f"unexpected project integrity scan: {proj_json}"
+        return True, "probe integrity scan ok"
+    except Exception as e:
+        return False, str(e)
+
+
+def smoke_durable_batch_writes() -> tuple[bool, str]:
+    """Smoke: durability=batch fsyncs staged files, renames, syncs dirs once, then commits the DB."""
+    try:
+        import kcp.nodes.keyframe_set_item_save_batch as mod
+        from kcp.db.repo import add_keyframe_set_item, connect, create_keyframe_set
+        from kcp.nodes.project_init import KCP_ProjectInit
+        from kcp.util import durable_io, image_io
+
+        orig = (mod.pillow_available, mod.save_comfy_image_atomic, mod.make_thumbnail, durable_io.fsync_file, durable_io.fsync_dir)
+        try:
+            events = []
+            fail_on = []
+            content = [b"img"]
+            mod.pillow_available = lambda: True
+
+            def _fake_save(_img, path, fmt=None, **_kwargs):
+                if fail_on and path.name.startswith(fail_on[0]):
+                    raise ValueError("forced-write-failure")
+                path.write_bytes(content[-1])
+                return True
+
+            def _fake_thumb(_src, dst, max_px=384, **_kwargs):
+                dst.write_bytes(b"thumb")
+                return True
+
+            mod.save_comfy_image_atomic = _fake_save
+            mod.make_thumbnail = _fake_thumb
+            durable_io.fsync_file = lambda path: events.append(("file", Path(path).name))
+
+            with tempfile.TemporaryDirectory() as td:
+                db_path, _, status_json = KCP_ProjectInit().run(str(Path(td) / "kcp"), "kcp.sqlite", True, durability="batch")
+                if json.loads(status_json).get("durability") != "batch":
+                    return False, f"project durability not recorded: {status_json}"
+                conn = connect(Path(db_path))
+                try:
+                    conn.execute("INSERT INTO stacks (id,name,created_at,updated_at) VALUES (?,?,?,?)", ("stack1", "stack1", 1, 1))
+                    conn.commit()
+                    set_id = create_keyframe_set(conn, {"stack_id": "stack1", "variant_policy_id": "seed_sweep_12_v1", "variant_policy_json": {}, "base_seed": 1, "width": 64, "height": 64})
+                    for i in range(3):
+                        add_keyframe_set_item(conn, {"set_id": set_id, "idx": i, "seed": i + 1, "positive_prompt": "p", "negative_prompt": "n", "gen_params_json": {}})
+                finally:
+                    conn.close()
+                set_dir = Path(td) / "kcp" / "sets" / set_id
+
+                def _db_paths():
+                    c = connect(Path(db_path))
+                    try:
+                        return [r[0] for r in c.execute("SELECT image_path FROM keyframe_set_items WHERE set_id=? ORDER BY idx", (set_id,)).fetchall()]
+                    finally:
+                        c.close()
+
+                def _fake_fsync_dir(path):
+                    # Directory sync must happen after the renames and before the DB commit.
+                    events.append(("dir", sorted(p.name for p in Path(path).iterdir()), _db_paths()))
+
+                durable_io.fsync_dir = _fake_fsync_dir
+
+                class _Batch(list):
+                    shape = (3, 1, 1, 3)
+
+                fail_on.append("2.")
+                try:
+                    mod.KCP_KeyframeSetItemSaveBatch().run(db_path, set_id, 0, _Batch([None, None, None]), "png", True)
+                    return False, "forced failure did not raise"
+                except RuntimeError:
+                    pass
+                leftovers = sorted(p.name for p in set_dir.iterdir()) if set_dir.exists() else []
+                if leftovers or events or _db_paths() != ["", "", ""]:
+                    return False, f"failed batch left state behind: files={leftovers} events={events} db={_db_paths()}"
+
+                fail_on.clear()
+                mod.KCP_KeyframeSetItemSaveBatch().run(db_path, set_id, 0, _Batch([None, None, None]), "png", True)
+                files = [e for e in events if e[0] == "file"]
+                dirs = [e for e in events if e[0] == "dir"]
+                if len(files) != 6 or any(not name.endswith(durable_io.STAGED_SUFFIX) for _, name in files):
+                    return False, f"expected 6 staged file fsyncs: {files}"
+                if len(dirs) != 1 or events[-1][0] != "dir":
+                    return False, f"expected one dir fsync after file fsyncs: {events}"
+                expected_files = ["0.png", "0_thumb.webp", "1.png", "1_thumb.webp", "2.png", "2_thumb.webp"]
+                if dirs[0][1] != expected_files or dirs[0][2] != ["", "", ""]:
+                    return False, f"dir sync saw unexpected state: {dirs[0]}"
+                if _db_paths() != [f"sets/{set_id}/{i}.png" for i in range(3)]:
+                    return False, f"DB not committed after batch: {_db_paths()}"
+
+                # durability=none stages too: a failure on item 2 replaces none of the existing files.
+                events.clear()
+                content.append(b"new")
+                fail_on.append("2.")
+                try:
+                    mod.KCP_KeyframeSetItemSaveBatch().run(db_path, set_id, 0, _Batch([None, None, None]), "png", True, durability="none")
+                    return False, "forced failure did not raise (durability=none)"
+                except RuntimeError:
+                    pass
+                if (set_dir / "0.png").read_bytes() != b"img" or events or any(p.name.endswith(durable_io.STAGED_SUFFIX) for p in set_dir.iterdir()):
+                    return False, f"failed durability=none batch replaced files: {sorted(p.name for p in set_dir.iterdir())} {events}"
+                fail_on.clear()
+
+            if image_io.pillow_available():
+                events.clear()
+                durable_io.fsync_dir = lambda path: events.append(("dir", Path(path).name))
+                from PIL import Image
+
+                with tempfile.TemporaryDirectory() as td:
+                    image_io.save_comfy_image_atomic(Image.new("RGB", (4, 4)), Path(td) / "a.png", durability="file")
+                    image_io.save_comfy_image_atomic(Image.new("RGB", (4, 4)), Path(td) / "b.png")
+                if [e[0] for e in events] != ["file", "dir"] or events[0][1] != "a.png.tmp":
+                    return False, f"unexpected file-mode fsyncs: {events}"
+        finally:
+            mod.pillow_available, mod.save_comfy_image_atomic, mod.make_thumbnail, durable_io.fsync_file, durable_io.fsync_dir = orig
+        return True, "durable batch writes ok"
+    except Exception as e:
+        return False, str(e)
+
+
+def smoke_sidecar_cache() -> tuple[bool, str]:
+    """Smoke: .npy sidecars are mmap-loaded, invalidated by source mtime, LRU-evicted and managed per set."""
+    try:
+        from kcp.util import image_io
+
+        if not (image_io.pillow_available() and image_io.numpy_available()):
+            return True, "sidecar cache skipped: Pillow/NumPy not installed"
+        import os
+
+        import numpy as np  # type: ignore
+        from PIL import Image
+
+        from kcp.db import sidecars
+        from kcp.db.repo import add_keyframe_set_item, connect, create_keyframe_set, update_set_item_media
+        from kcp.nodes.keyframe_set_item_load import KCP_KeyframeSetItemLoad
+        from kcp.nodes.keyframe_set_sidecar_cache import KCP_KeyframeSetSidecarCache
+        from kcp.nodes.project_init import KCP_ProjectInit
+
+        orig_write = sidecars.write_sidecar
+        writes = []
+
+        def _counting_write(sidecar, source):
+            writes.append(sidecar.name)
+            return orig_write(sidecar, source)
+
+        sidecars.write_sidecar = _counting_write
+        try:
+            with tempfile.TemporaryDirectory() as td:
+                root = Path(td) / "kcp"
+                db_path, _, status_json = KCP_ProjectInit().run(str(root), "kcp.sqlite", True, sidecar_cache_mb=1)
+                if json.loads(status_json).get("sidecar_cache_mb") != 1:
+                    return False, f"sidecar budget not recorded: {status_json}"
+                conn = connect(Path(db_path))
+                try:
+                    conn.execute("INSERT INTO stacks (id,name,created_at,updated_at) VALUES (?,?,?,?)", ("stack1", "stack1", 1, 1))
+                    conn.commit()
+                    set_id = create_keyframe_set(conn, {"stack_id": "stack1", "variant_policy_id": "seed_sweep_12_v1", "variant_policy_json": {}, "base_seed": 1, "width": 64, "height": 64})
+                    for i in range(3):
+                        add_keyframe_set_item(conn, {"set_id": set_id, "idx": i, "seed": i + 1, "positive_prompt": "p", "negative_prompt": "n", "gen_params_json": {}})
+                        rel = f"sets/{set_id}/{i}.png"
+                        (root / rel).parent.mkdir(parents=True, exist_ok=True)
+                        Image.effect_mandelbrot((120, 90), (-2.0, -1.5, 1.0, 1.5), 16 + i).convert("RGB").save(root / rel)
+                        update_set_item_media(conn, set_id, i, rel, rel)
+                finally:
+                    conn.close()
+
+                loader = KCP_KeyframeSetItemLoad()
+                first = loader.run(db_path, set_id, 0, True)[0]
+                second = loader.run(db_path, set_id, 0, True)[0]
+                reference = image_io.load_image_as_comfy(root / f"sets/{set_id}/0.png", use_cache=False)
+                if writes != ["0.npy"]:
+                    return False, f"expected one sidecar write then a hit: {writes}"
+                if not (np.array_equal(np.asarray(first), np.asarray(reference)) and np.array_equal(np.asarray(second), np.asarray(reference))):
+                    return False, "sidecar load differs from decode"
+                sidecar = sidecars.sidecar_path(root, set_id, 0)
+                if not isinstance(sidecars.load_sidecar(sidecar, root / f"sets/{set_id}/0.png"), np.memmap):
+                    return False, "sidecar hit is not memory-mapped"
+
+                src = root / f"sets/{set_id}/0.png"
+                st = src.stat()
+                os.utime(src, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+                loader.run(db_path, set_id, 0, True)
+                if writes != ["0.npy", "0.npy"]:
+                    return False, f"stale sidecar was not rewritten: {writes}"
+
+                node = KCP_KeyframeSetSidecarCache()
+                warm = json.loads(node.run(db_path, set_id, "warm")[0])
+                if (warm["written"], warm["already_fresh"], warm["files"]) != (2, 1, 3):
+                    return False, f"unexpected warm status: {warm}"
+                one = sidecar.stat().st_size
+                os.utime(sidecars.sidecar_path(root, set_id, 1), ns=(1, sidecars.sidecar_path(root, set_id, 1).stat().st_mtime_ns))
+                ev = sidecars.enforce_budget(root, 2 * one)
+                if ev["evicted"] != 1 or sidecars.sidecar_path(root, set_id, 1).exists():
+                    return False, f"LRU eviction removed the wrong sidecar: {ev}"
+                cleared = json.loads(node.run(db_path, set_id, "clear")[0])
+                if cleared["files_removed"] != 2 or cleared["files"] != 0:
+                    return False, f"unexpected clear status: {cleared}"
+
+                # Misses keep a running total; only crossing the budget walks the sets tree.
+                walks = []
+                orig_iter = sidecars._iter_sidecars
+                sidecars._iter_sidecars = lambda *a, **k: (walks.append(1), orig_iter(*a, **k))[1]
+                try:
+                    for i in range(3):
+                        loader.run(db_path, set_id, i, True)
+                    if len(walks) != 1:
+                        return False, f"sidecar misses walked the sets tree {len(walks)} times"
+                    src = root / f"sets/{set_id}/2.png"
+                    st = src.stat()
+                    os.utime(src, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+                    sidecars.load_set_item_image(root, set_id, 2, src, 2 * one)
+                    stats = sidecars.sidecar_stats(root)
+                    if len(walks) != 3 or stats["bytes"] > 2 * one:
+                        return False, f"over-budget miss did not evict: walks={len(walks)} {stats}"
+                finally:
+                    sidecars._iter_sidecars = orig_iter
+        finally:
+            sidecars.write_sidecar = orig_write
+        return True, "sidecar cache ok"
+    except Exception as e:
+        return False, str(e)
+
+
+def smoke_contact_sheet() -> tuple[bool, str]:
+    """Smoke: contact sheet grid layout, picked marker, disk cache hit and invalidation."""
+    try:
+        import os
+
+        from kcp.util import image_io
+
+        if not image_io.pillow_available():
+            return True, "contact sheet skipped: Pillow not installed"
+        from PIL import Image
+
+        import kcp.nodes.keyframe_set_contact_sheet as sheet_mod
+        from kcp.db.repo import add_keyframe_set_item, connect, create_keyframe_set, set_picked_index
+        from kcp.nodes.project_init import KCP_ProjectInit
+
+        orig_to_comfy = sheet_mod.pil_to_comfy_image
+        orig_load = sheet_mod.load_image_as_comfy
+        try:
+            sheet_mod.pil_to_comfy_image = lambda img: ("built", img.size)
+            sheet_mod.load_image_as_comfy = lambda path: ("cached", path.name)
+            with tempfile.TemporaryDirectory() as td:
+                db_path, _, _ = KCP_ProjectInit().run(str(Path(td) / "kcp"), "kcp.sqlite", True)
+                root = Path(td) / "kcp"
+                conn = connect(Path(db_path))
+                try:
+                    conn.execute("INSERT INTO stacks (id,name,created_at,updated_at) VALUES (?,?,?,?)", ("stack1", "stack1", 1, 1))
+                    conn.commit()
+                    policy = {"injections": [{"label": f"look{i}"} for i in range(5)]}
+                    set_id = create_keyframe_set(conn, {"stack_id": "stack1", "variant_policy_id": "seed_sweep_12_v1", "variant_policy_json": policy, "base_seed": 1, "width": 64, "height": 64})
+                    for i in range(5):
+                        thumb_rel = f"sets/{set_id}/{i}_thumb.webp" if i != 4 else ""
+                        add_keyframe_set_item(conn, {"set_id": set_id, "idx": i, "seed": i + 10, "positive_prompt": "p", "negative_prompt": "n", "gen_params_json": {}, "thumb_path": thumb_rel})
+                        if thumb_rel:
+                            (root / thumb_rel).parent.mkdir(parents=True, exist_ok=True)
+                            Image.new("RGB", (96, 64), (20 * i, 100, 200)).save(root / thumb_rel, format="WEBP")
+                    set_picked_index(conn, set_id, 2)
+                finally:
+                    conn.close()
+
+                node = sheet_mod.KCP_SetContactSheet()
+                img, meta_json = node.run(db_path, set_id, 0, 64)
+                meta = json.loads(meta_json)
+                if img != ("built", (3 * 64, 2 * (64 + sheet_mod.LABEL_HEIGHT))) or meta["cache_hit"]:
+                    return False, f"unexpected first build: {img} {meta.get('cache_hit')}"
+                cells = {c["idx"]: c for c in meta["cells"]}
+                if not cells[2]["picked"] or cells[1]["picked"] or not cells[4]["missing"] or cells[3]["label"] != "look3":
+                    return False, f"unexpected cells: {meta['cells']}"
+                with Image.open(root / meta["cache_path"]) as sheet:
+                    if sheet.getpixel((2 * 64 + 1, 1)) != (40, 220, 90):
+                        return False, "picked border not drawn"
+
+                img2, meta_json2 = node.run(db_path, set_id, 0, 64)
+                if img2 != ("cached", Path(meta["cache_path"]).name) or not json.loads(meta_json2)["cache_hit"]:
+                    return False, f"repeat view missed the cache: {img2}"
+
+                # A sheet of another set whose id merely starts with this one's must survive.
+                neighbour = root / sheet_mod.CONTACT_SHEET_DIR / f"{set_id}_b_0123456789abcdef.png"
+                neighbour.write_bytes(b"other set")
+                Image.new("RGB", (64, 96), (0, 0, 0)).save(root / f"sets/{set_id}/1_thumb.webp", format="WEBP")
+                os.utime(root / f"sets/{set_id}/1_thumb.webp", ns=(1, 1))
+                _, meta_json3 = node.run(db_path, set_id, 0, 64)
+                meta3 = json.loads(meta_json3)
+                if meta3["cache_hit"] or meta3["cache_key"] == meta["cache_key"]:
+                    return False, "thumb change did not invalidate the sheet"
+                if (root / meta["cache_path"]).exists() or len(list((root / sheet_mod.CONTACT_SHEET_DIR).iterdir())) != 2:
+                    return False, "stale contact sheet was kept"
+                if not neighbour.exists():
+                    return False, "another set's contact sheet was deleted"
+        finally:
+            sheet_mod.pil_to_comfy_image = orig_to_comfy
+            sheet_mod.load_image_as_comfy = orig_load
+        return True, "contact sheet ok"
+    except Exception as e:
+        return False, str(e)
+
+
+def smoke_set_dedupe() -> tuple[bool, str]:
+    """Smoke: dHash stored at save time, BK-tree matches brute force, near-duplicates cluster."""
+    try:
+        import random
+
+        from kcp.util.phash import BKTree, hamming
+
+        rng = random.Random(7)
+        hashes = [rng.getrandbits(64) for _ in range(300)]
+        hashes += [h ^ (1 << rng.randrange(64)) for h in hashes[:50]]
+        tree = BKTree((h, i) for i, h in enumerate(hashes))
+        for q in hashes[:20]:
+            for r in (0, 3, 12):
+                got = sorted(i for _, i in tree.query(q, r))
+                want = [i for i, h in enumerate(hashes) if hamming(q, h) <= r]
+                if got != want:
+                    return False, f"BK-tree query mismatch at radius {r}"
+
+        from kcp.util import image_io
+
+        if not image_io.pillow_available():
+            return True, "set dedupe ok (image checks skipped: Pillow not installed)"
+        from PIL import Image, ImageDraw
+
+        from kcp.db.repo import add_keyframe_set_item, connect, create_keyframe_set, set_picked_index
+        from kcp.nodes.keyframe_set_dedupe import KCP_SetDedupe
+        from kcp.nodes.keyframe_set_item_save_image import KCP_KeyframeSetItemSaveImage
+        from kcp.nodes.project_init import KCP_ProjectInit
+
+        def frame(shift: int, flip: bool = False):
+            img = Image.linear_gradient("L").resize((256, 256)).convert("RGB")
+            if flip:
+                img = img.transpose(Image.Transpose.ROTATE_90)
+            ImageDraw.Draw(img).ellipse([60 + shift, 60, 180 + shift, 180], fill=(230, 40, 40))
+            return img
+
+        with tempfile.TemporaryDirectory() as td:
+            db_path, _, _ = KCP_ProjectInit().run(str(Path(td) / "kcp"), "kcp.sqlite", True)
+            conn = connect(Path(db_path))
+            try:
+                conn.execute("INSERT INTO stacks (id,name,created_at,updated_at) VALUES (?,?,?,?)", ("stack1", "stack1", 1, 1))
+                conn.commit()
+                set_id = create_keyframe_set(conn, {"stack_id": "stack1", "variant_policy_id": "seed_sweep_12_v1", "variant_policy_json": {}, "base_seed": 1, "width": 64, "height": 64})
+                for i in range(4):
+                    add_keyframe_set_item(conn, {"set_id": set_id, "idx": i, "seed": i + 1, "positive_prompt": "p", "negative_prompt": "n", "gen_params_json": {}})
+                set_picked_index(conn, set_id, 1)
+            finally:
+                conn.close()
+
+            save = KCP_KeyframeSetItemSaveImage()
+            for i, img in enumerate([frame(0), frame(2), frame(0, flip=True), frame(1)]):
+                item = json.loads(save.run(db_path, set_id, i, img, "png", True)[0])
+                if not item.get("phash") or len(item["phash"]) != 16:
+                    return False, f"phash not stored at save time: {item}"
+
+            conn = connect(Path(db_path))
+            try:
+                conn.execute("UPDATE keyframe_set_items SET phash=NULL WHERE set_id=? AND idx=3", (set_id,))
+                conn.commit()
+            finally:
+                conn.close()
+            clusters_json, summary = KCP_SetDedupe().run(db_path, set_id, 6)
+            payload = json.loads(clusters_json)
+            if payload["backfilled"] != 1 or len(payload["clusters"]) != 1:
+                return False, f"unexpected dedupe result: {summary} {payload}"
+            cluster = payload["clusters"][0]
+            if cluster["keep"]["idx"] != 1 or sorted(m["idx"] for m in cluster["members"]) != [0, 1, 3]:
+                return False, f"unexpected cluster: {cluster}"
+            if json.loads(KCP_SetDedupe().run(db_path, "", 0)[0])["items"] != 4:
+                return False, "project scope did not see every hashed item"
+        return True, "set dedupe ok"
+    except Exception as e:
+        return False, str(e)
+
+
+def smoke_sets_layout() -> tuple[bool, str]:
+    """Smoke: sharded set dirs on save, layout switch guard, and in-place migration back to flat."""
+    try:
+        from kcp.db.paths import set_dir_rel, set_item_media_rels
+
+        sharded = set_dir_rel("abc", "sharded")
+        if not sharded.startswith("sets/") or sharded.count("/") != 3 or not sharded.endswith("/abc"):
+            return False, f"unexpected sharded dir: {sharded}"
+        if set_item_media_rels("abc", 3, "png") != ("sets/abc/3.png", "sets/abc/3_thumb.webp"):
+            return False, "flat media rels changed"
+
+        from kcp.util import image_io
+
+        if not image_io.pillow_available():
+            return True, "sets layout ok (save/migrate skipped: Pillow not installed)"
+        from PIL import Image
+
+        from kcp.db.repo import add_keyframe_set_item, connect, create_keyframe_set, get_set_item
+        from kcp.db.sets_layout import convert_sets_layout
+        from kcp.nodes.keyframe_set_item_save_image import KCP_KeyframeSetItemSaveImage
+        from kcp.nodes.project_init import KCP_ProjectInit
+
+        with tempfile.TemporaryDirectory() as td:
+            root = Path(td) / "kcp"
+            db_path, _, status_json = KCP_ProjectInit().run(str(root), "kcp.sqlite", True, preview_levels="128", sets_layout="sharded")
+            if json.loads(status_json).get("sets_layout") != "sharded":
+                return False, f"sets_layout not recorded: {status_json}"
+            conn = connect(Path(db_path))
+            try:
+                conn.execute("INSERT INTO stacks (id,name,created_at,updated_at) VALUES (?,?,?,?)", ("stack1", "stack1", 1, 1))
+                conn.commit()
+                set_id = create_keyframe_set(conn, {"stack_id": "stack1", "variant_policy_id": "seed_sweep_12_v1", "variant_policy_json": {}, "base_seed": 1, "width": 64, "height": 64})
+                add_keyframe_set_item(conn, {"set_id": set_id, "idx": 0, "seed": 1, "positive_prompt": "p", "negative_prompt": "n", "gen_params_json": {}})
+            finally:
+                conn.close()
+            item = json.loads(KCP_KeyframeSetItemSaveImage().run(db_path, set_id, 0, Image.new("RGB", (400, 300), (9, 9, 9)), "png", True)[0])
+            shard_rel = set_dir_rel(set_id, "sharded")
+            if item["image_path"] != f"{shard_rel}/0.png" or not (root / item["thumb_path"]).exists():
+                return False, f"item not saved in sharded dir: {item}"
+            if (root / "sets" / set_id).exists():
+                return False, "flat set dir created in sharded project"
+
+            try:
+                KCP_ProjectInit().run(str(root), "kcp.sqlite", True, sets_layout="flat")
+                return False, "layout switch with existing media was allowed"
+            except RuntimeError as e:
+                if "kcp_sets_layout_change_requires_migration" not in str(e):
+                    return False, f"unexpected layout switch error: {e}"
+
+            conn = connect(Path(db_path))
+            try:
+                dry = convert_sets_layout(conn, root, "flat", dry_run=True)
+                if dry["sets_moved"] != 1 or not (root / shard_rel).is_dir():
+                    return False, f"dry run moved files: {dry}"
+                report = convert_sets_layout(conn, root, "flat")
+                row = get_set_item(conn, set_id, 0)
+                preview = conn.execute("SELECT path FROM media_previews WHERE owner_kind='set_item'").fetchone()
+            finally:
+                conn.close()
+            if report["sets_moved"] != 1 or report["rows_rewritten"] != 3:
+                return False, f"unexpected migration report: {report}"
+            if row["image_path"] != f"sets/{set_id}/0.png" or not (root / row["image_path"]).exists():
+                return False, f"image path not migrated: {row['image_path']}"
+            if preview["path"] != f"sets/{set_id}/0_thumb_128.webp" or not (root / preview["path"]).exists():
+                return False, f"preview path not migrated: {preview['path']}"
+            if (root / shard_rel).parent.parent.exists():
+                return False, "empty shard dirs were left behind"
+            if json.loads(KCP_ProjectInit().run(str(root), "kcp.sqlite", True)[2])["sets_layout"] != "flat":
+                return False, "migration did not switch the project layout"
+        return True, "sets layout ok"
+    except Exception as e:
+        return False, str(e)
+
+
+def smoke_set_packs() -> tuple[bool, str]:
+    """Smoke: set media appended to one pack, loaders read it transparently, compaction drops superseded bytes."""
+    try:
+        from kcp.util import image_io
+
+        if not image_io.pillow_available():
+            return True, "set packs skipped: Pillow not installed"
+        from PIL import Image
+
+        from kcp.db.packs import compact_packs, is_pack_ref, media_source, pack_stats, resolve_packed
+        from kcp.db.repo import add_keyframe_set_item, connect, create_keyframe_set, get_set_item
+        from kcp.nodes.keyframe_set_item_load import KCP_KeyframeSetItemLoad
+        from kcp.nodes.keyframe_set_item_save_batch import KCP_KeyframeSetItemSaveBatch
+        from kcp.nodes.keyframe_set_item_save_image import KCP_KeyframeSetItemSaveImage
+        from kcp.nodes.keyframe_set_load_batch import KCP_KeyframeSetLoadBatch
+        from kcp.nodes.project_init import KCP_ProjectInit
+        from kcp.nodes.render_pack_status import KCP_RenderPackStatus
+
+        with tempfile.TemporaryDirectory() as td:
+            root = Path(td) / "kcp"
+            try:
+                KCP_ProjectInit().run(str(root), "kcp.sqlite", True, blob_store="enable", set_packs="enable")
+                return False, "set packs + blob store was allowed"
+            except RuntimeError as e:
+                if "kcp_set_packs_conflict" not in str(e):
+                    return False, f"unexpected conflict error: {e}"
+            db_path, _, status_json = KCP_ProjectInit().run(str(root), "kcp.sqlite", True, preview_levels="128", set_packs="enable")
+            if not json.loads(status_json).get("set_packs"):
+                return False, f"set_packs not recorded: {status_json}"
+            conn = connect(Path(db_path))
+            try:
+                conn.execute("INSERT INTO stacks (id,name,created_at,updated_at) VALUES (?,?,?,?)", ("stack1", "stack1", 1, 1))
+                conn.commit()
+                set_id = create_keyframe_set(conn, {"stack_id": "stack1", "variant_policy_id": "seed_sweep_12_v1", "variant_policy_json": {}, "base_seed": 1, "width": 64, "height": 64})
+                for i in range(3):
+                    add_keyframe_set_item(conn, {"set_id": set_id, "idx": i, "seed": i + 1, "positive_prompt": "p", "negative_prompt": "n", "gen_params_json": {}})
+            finally:
+                conn.close()
+
+            save = KCP_KeyframeSetItemSaveImage()
+            sizes = [(300, 200), (200, 300), (256, 256)]
+            for i, size in enumerate(sizes):
+                save.run(db_path, set_id, i, Image.new("RGB", size, (40 * i, 90, 150)), "png", True)
+            save.run(db_path, set_id, 1, Image.new("RGB", (210, 310), (1, 2, 3)), "png", True)
+            sizes[1] = (210, 310)
+            set_dir = root / "sets" / set_id
+            if sorted(p.name for p in set_dir.iterdir()) != ["media.kpack"]:
+                return False, f"loose files left next to the pack: {sorted(p.name for p in set_dir.iterdir())}"
+
+            def _check_media(label: str, n_levels: int = 3) -> str:
+                conn = connect(Path(db_path))
+                try:
+                    rows = [get_set_item(conn, set_id, i) for i in range(3)]
+                    levels = [r["path"] for r in conn.execute("SELECT path FROM media_previews ORDER BY owner_id").fetchall()]
+                    packed = resolve_packed(conn, root, [*(r["image_path"] for r in rows), *levels])
+                finally:
+                    conn.close()
+                if not all(is_pack_ref(r["image_path"]) and is_pack_ref(r["thumb_path"]) for r in rows) or len(levels) != n_levels:
+                    return f"{label}: refs not packed: {[r['image_path'] for r in rows]} levels={levels}"
+                for row, size in zip(rows, sizes):
+                    src = media_source(root, row["image_path"], packed)
+                    if image_io.image_size(src) != size or not image_io.probe(src)["ok"]:
+                        return f"{label}: packed image mismatch for idx={row['idx']}"
+                if any(max(image_io.image_size(media_source(root, rel, packed))) != 128 for rel in levels):
+                    return f"{label}: packed preview level mismatch"
+                status = json.loads(KCP_RenderPackStatus().run(db_path, set_id, True, "integrity")[1])
+                if status["items_with_media"] != 3 or status["corrupt_idxs"]:
+                    return f"{label}: render pack status wrong: {status}"
+                images, _, items, _ = KCP_KeyframeSetLoadBatch().run(db_path, set_id, True, True, "max_side", 100)
+                if len(images) != 3 or any("warning" in json.loads(p) for p in items):
+                    return f"{label}: batch load from pack failed: {items}"
+                if KCP_KeyframeSetItemLoad().run(db_path, set_id, 2, True)[0] is None:
+                    return f"{label}: item load from pack failed"
+                return ""
+
+            err = _check_media("packed")
+            if err:
+                return False, err
+
+            conn = connect(Path(db_path))
+            try:
+                before = pack_stats(conn, root, set_id)[0]
+                dry = compact_packs(conn, root, dry_run=True)
+                report = compact_packs(conn, root)
+                after = pack_stats(conn, root, set_id)[0]
+                again = compact_packs(conn, root)
+            finally:
+                conn.close()
+            if before["dead_bytes"] <= 0 or dry["bytes_reclaimed"] != before["dead_bytes"] or report["packs_compacted"] != 1:
+                return False, f"unexpected compaction report: before={before} dry={dry} report={report}"
+            if after["dead_bytes"] != 0 or after["size_bytes"] != before["live_bytes"] or again["packs_compacted"] != 0:
+                return False, f"compaction left dead bytes: {after} {again}"
+            if (root / before["pack_path"]).exists() or len(list(set_dir.iterdir())) != 1:
+                return False, "old pack kept after compaction"
+            err = _check_media("compacted")
+            if err:
+                return False, err
+
+            if image_io.numpy_available():
+                import numpy as np  # type: ignore
+
+                batch = np.zeros((3, 32, 48, 3), dtype=np.float32)
+                KCP_KeyframeSetItemSaveBatch().run(db_path, set_id, 0, batch, "webp", True)
+                sizes[:] = [(48, 32)] * 3
+                err = _check_media("batch", n_levels=0)
+                if err:
+                    return False, err
+        return True, "set packs ok"
+    except Exception as e:
+        return False, str(e)
+
+
+def smoke_set_packs_concurrent() -> tuple[bool, str]:
+    """Smoke: two writers packing into one set at once get offsets that point at their own bytes."""
+    try:
+        import threading
+
+        from kcp.db.packs import drop_loose_files, pack_files, resolve_packed
+        from kcp.db.repo import connect
+        from kcp.nodes.project_init import KCP_ProjectInit
+
+        with tempfile.TemporaryDirectory() as td:
+            root = Path(td) / "kcp"
+            db_path = KCP_ProjectInit().run(str(root), "kcp.sqlite", True, set_packs="enable")[0]
+            set_dir = root / "sets" / "set_x"
+            set_dir.mkdir(parents=True)
+            expected: dict[str, bytes] = {}
+            errors: list[str] = []
+
+            def _writer(tag: str) -> None:
+                conn = connect(Path(db_path))
+                try:
+                    for n in range(20):
+                        loose = []
+                        for k in range(3):
+                            path = set_dir / f"{tag}_{n}_{k}.png"
+                            data = f"{tag}:{n}:{k}:".encode() * (200 + 37 * k)
+                            path.write_bytes(data)
+                            loose.append((path, data))
+                        refs = pack_files(conn, root, "set_x", "flat", [p for p, _ in loose])
+                        conn.commit()
+                        drop_loose_files(refs)
+                        expected.update({refs[p]: data for p, data in loose})
+                except Exception as e:
+                    errors.append(f"{tag}: {e!r}")
+                finally:
+                    conn.close()
+
+            threads = [threading.Thread(target=_writer, args=(tag,)) for tag in ("a", "b")]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            if errors:
+                return False, f"concurrent pack writers failed: {errors}"
+            conn = connect(Path(db_path))
+            try:
+                packed = resolve_packed(conn, root, list(expected))
+            finally:
+                conn.close()
+            if len(expected) != 120 or set(packed) != set(expected):
+                return False, f"pack entries missing: {len(expected)} refs, {len(packed)} resolved"
+            bad = sorted(ref for ref, data in expected.items() if packed[ref].read_bytes() != data)
+            if bad:
+                return False, f"pack entries point at other writers' bytes: {bad[:3]}"
+            if sorted(p.name for p in set_dir.iterdir()) != ["media.kpack"]:
+                return False, "loose files left after packing"
+        return True, "set packs concurrent ok"
+    except Exception as e:
+        return False, str(e)
+
+
+def smoke_integrity_scan() -> tuple[bool, str]:
+    """Smoke: project scan finds orphans, dangling refs, corrupt files and hash mismatches; incremental rechecks only changed files."""
+    try:
+        from kcp.util import image_io
+
+        if not image_io.pillow_available():
+            return True, "integrity scan skipped: Pillow not installed"
+        import os
+
+        from PIL import Image
+
+        from kcp.db.integrity import scan_project
+        from kcp.db.repo import add_keyframe_set_item, connect, create_keyframe_set, get_asset_by_type_name, get_set_item
+        from kcp.nodes.keyframe_promote import KCP_KeyframePromoteToAsset
+        from kcp.nodes.keyframe_set_item_save_image import KCP_KeyframeSetItemSaveImage
+        from kcp.nodes.project_init import KCP_ProjectInit
+        from kcp.nodes.project_integrity_scan import KCP_ProjectIntegrityScan
+
+        with tempfile.TemporaryDirectory() as td:
+            root = Path(td) / "kcp"
+            db_path, _, _ = KCP_ProjectInit().run(str(root), "kcp.sqlite", True)
+            conn = connect(Path(db_path))
+            try:
+                conn.execute("INSERT INTO stacks (id,name,created_at,updated_at) VALUES (?,?,?,?)", ("stack1", "stack1", 1, 1))
+                conn.commit()
+                set_id = create_keyframe_set(conn, {"stack_id": "stack1", "variant_policy_id": "seed_sweep_12_v1", "variant_policy_json": {}, "base_seed": 1, "width": 64, "height": 64})
+                for i in range(3):
+                    add_keyframe_set_item(conn, {"set_id": set_id, "idx": i, "seed": i + 1, "positive_prompt": "p", "negative_prompt": "n", "gen_params_json": {}})
+            finally:
+                conn.close()
+            for i in range(3):
+                KCP_KeyframeSetItemSaveImage().run(db_path, set_id, i, Image.new("RGB", (64, 48), (60 * i, 20, 90)), "png", True)
+            KCP_KeyframePromoteToAsset().run(db_path, set_id, 0, "hero", "", "", "new")
+
+            summary, report_json, clean = KCP_ProjectIntegrityScan().run(db_path, "full", True)
+            report = json.loads(report_json)
+            if not clean or report["checked"] != report["refs"] or report["refs"] < 8:
+                return False, f"fresh project not clean: {summary} {report}"
+
+            conn = connect(Path(db_path))
+            try:
+                item1 = get_set_item(conn, set_id, 1)
+                item2 = get_set_item(conn, set_id, 2)
+                asset = get_asset_by_type_name(conn, "keyframe", "hero")
+            finally:
+                conn.close()
+            set_dir = root / "sets" / set_id
+            (set_dir / "stray.png").write_bytes(b"x" * 10)
+            (set_dir / "9.png.tmp").write_bytes(b"")
+            (root / item1["thumb_path"]).unlink()
+            image2 = root / item2["image_path"]
+            image2.write_bytes(image2.read_bytes()[:-12])
+            Image.new("RGB", (64, 48), (1, 2, 3)).save(root / asset["image_path"])
+
+            conn = connect(Path(db_path))
+            try:
+                full = scan_project(conn, root, mode="full", workers=2)
+                again = scan_project(conn, root, mode="incremental")
+                os.utime(image2, ns=(image2.stat().st_atime_ns, image2.stat().st_mtime_ns + 10**9))
+                touched = scan_project(conn, root, mode="incremental")
+            finally:
+                conn.close()
+            if full["ok"] or full["counts"] != {"orphans": 2, "orphan_bytes": 10, "dangling": 1, "corrupt": 2}:
+                return False, f"unexpected full scan counts: {full['counts']}"
+            if [o["temp"] for o in full["orphans"]] != [True, False] or full["dangling"][0]["owners"][0]["idx"] != 1:
+                return False, f"orphans/dangling not attributed: {full['orphans']} {full['dangling']}"
+            errors = sorted(c["error"].split(":", 1)[0] for c in full["corrupt"])
+            if errors != ["corrupt", "hash_mismatch"] or not all(c["owners"] for c in full["corrupt"]):
+                return False, f"corrupt files not reported: {full['corrupt']}"
+            if again["checked"] != 0 or again["counts"] != full["counts"]:
+                return False, f"incremental rescan rechecked unchanged files: {again['checked']} {again['counts']}"
+            if touched["checked"] != 1 or touched["counts"]["corrupt"] != 2:
+                return False, f"incremental rescan missed the touched file: {touched['checked']} {touched['counts']}"
+        return True, "integrity scan ok"
+    except Exception as e:
+        return False, str(e)
+
+
+def smoke_set_retention() -> tuple[bool, str]:
+    """Smoke: retention keeps picked/promoted/recent items, dry-run touches nothing, downscale/delete update rows before files."""
+    try:
+        from kcp.util import image_io
+
+        if not image_io.pillow_available():
+            return True, "set retention skipped: Pillow not installed"
+        from PIL import Image
+
+        from kcp.db.integrity import scan_project
+        from kcp.db.repo import add_keyframe_set_item, connect, create_keyframe_set, get_set_item, set_picked_index
+        from kcp.nodes.keyframe_promote import KCP_KeyframePromoteToAsset
+        from kcp.nodes.keyframe_set_item_load import KCP_KeyframeSetItemLoad
+        from kcp.nodes.keyframe_set_item_save_image import KCP_KeyframeSetItemSaveImage
+        from kcp.nodes.keyframe_set_retention import KCP_SetRetention
+        from kcp.nodes.project_init import KCP_ProjectInit
+        from kcp.nodes.render_pack_status import KCP_RenderPackStatus
+
+        with tempfile.TemporaryDirectory() as td:
+            root = Path(td) / "kcp"
+            db_path, _, _ = KCP_ProjectInit().run(str(root), "kcp.sqlite", True)
+            conn = connect(Path(db_path))
+            try:
+                conn.execute("INSERT INTO stacks (id,name,created_at,updated_at) VALUES (?,?,?,?)", ("stack1", "stack1", 1, 1))
+                conn.commit()
+                set_ids = []
+                for n in (5, 2):
+                    sid = create_keyframe_set(conn, {"stack_id": "stack1", "variant_policy_id": "seed_sweep_12_v1", "variant_policy_json": {}, "base_seed": 1, "width": 64, "height": 64})
+                    for i in range(n):
+                        add_keyframe_set_item(conn, {"set_id": sid, "idx": i, "seed": i + 1, "positive_prompt": "p", "negative_prompt": "n", "gen_params_json": {}})
+                    set_ids.append(sid)
+                set_a, set_b = set_ids
+                set_picked_index(conn, set_a, 0)
+            finally:
+                conn.close()
+            for sid, n in ((set_a, 5), (set_b, 2)):
+                for i in range(n):
+                    KCP_KeyframeSetItemSaveImage().run(db_path, sid, i, Image.new("RGB", (300, 200), (50 * i, 80, 120)), "png", True)
+            KCP_KeyframePromoteToAsset().run(db_path, set_a, 1, "hero", "", "", "new")
+            conn = connect(Path(db_path))
+            try:
+                # Items 2 and 3 of set A are old; item 4 stays recent.
+                conn.execute("UPDATE keyframe_set_items SET created_at = 1000 WHERE idx < 4")
+                conn.commit()
+                before = {i: get_set_item(conn, set_a, i) for i in range(5)}
+            finally:
+                conn.close()
+
+            node = KCP_SetRetention()
+            dry = json.loads(node.run(db_path, "delete", 30, True)[1])
+            if dry["candidates"] != 2 or dry["kept"] != {"picked": 1, "promoted": 1, "unpicked_set": 2, "no_thumb": 0, "recent": 1, "already_downscaled": 0, "archived": 0}:
+                return False, f"unexpected retention plan: {dry}"
+            if dry["items_retired"] or not all((root / before[i]["image_path"]).exists() for i in range(5)):
+                return False, "dry run touched media"
+
+            down = json.loads(node.run(db_path, "downscale", 30, False, max_px=64, batch_size=1)[1])
+            image2 = root / before[2]["image_path"]
+            if down["items_retired"] != 2 or down["batches"] != 2 or max(image_io.image_size(image2)) != 64 or image2.with_name(image2.name + ".tmp").exists():
+                return False, f"downscale did not apply: {down}"
+            again = json.loads(node.run(db_path, "downscale", 30, False, max_px=64)[1])
+            if again["candidates"] != 0 or again["kept"]["already_downscaled"] != 2:
+                return False, f"downscale not idempotent: {again}"
+
+            deleted = json.loads(node.run(db_path, "delete", 30, False)[1])
+            conn = connect(Path(db_path))
+            try:
+                after = {i: get_set_item(conn, set_a, i) for i in range(5)}
+                scan = scan_project(conn, root, verify_hashes=False)
+            finally:
+                conn.close()
+            if deleted["items_retired"] != 2 or deleted["files_deleted"] != 2 or deleted["bytes_freed"] <= 0:
+                return False, f"unexpected delete report: {deleted}"
+            for i in (2, 3):
+                if after[i]["image_path"] or after[i]["media_retention"] != "deleted" or (root / before[i]["image_path"]).exists():
+                    return False, f"item {i} image not retired: {dict(after[i])}"
+                if after[i]["thumb_path"] != before[i]["thumb_path"] or not (root / after[i]["thumb_path"]).exists():
+                    return False, f"item {i} thumb not kept"
+            if any(after[i]["image_path"] != before[i]["image_path"] for i in (0, 1, 4)):
+                return False, "kept item media changed"
+            if not scan["ok"]:
+                return False, f"retention left orphans or dangling refs: {scan['counts']}"
+            status = json.loads(KCP_RenderPackStatus().run(db_path, set_a, True)[1])
+            if status["missing_idxs"] or status["retired_idxs"] != [2, 3] or status["items_with_media"] != 3:
+                return False, f"retired items reported as missing: {status}"
+            thumb, item_json = KCP_KeyframeSetItemLoad().run(db_path, set_a, 2, True)[1:]
+            if thumb is None or json.loads(item_json)["media_retention"] != "deleted":
+                return False, f"strict item load did not treat the item as retired: {item_json}"
+
+            KCP_KeyframeSetItemSaveImage().run(db_path, set_a, 2, Image.new("RGB", (300, 200), (9, 9, 9)), "png", True)
+            conn = connect(Path(db_path))
+            try:
+                resaved = get_set_item(conn, set_a, 2)
+            finally:
+                conn.close()
+            if not resaved["image_path"] or resaved["media_retention"] != "":
+                return False, "re-saving an item did not clear its retention marker"
+
+        # Blob store: a downscale batch that rolls back takes its new blobs with it.
+        import sqlite3
+
+        import kcp.db.retention as retention_mod
+
+        with tempfile.TemporaryDirectory() as td:
+            root = Path(td) / "kcp"
+            db_path = KCP_ProjectInit().run(str(root), "kcp.sqlite", True, "enable")[0]
+            conn = connect(Path(db_path))
+            try:
+                conn.execute("INSERT INTO stacks (id,name,created_at,updated_at) VALUES (?,?,?,?)", ("stack1", "stack1", 1, 1))
+                conn.commit()
+                sid = create_keyframe_set(conn, {"stack_id": "stack1", "variant_policy_id": "seed_sweep_12_v1", "variant_policy_json": {}, "base_seed": 1, "width": 64, "height": 64})
+                for i in range(2):
+                    add_keyframe_set_item(conn, {"set_id": sid, "idx": i, "seed": i + 1, "positive_prompt": "p", "negative_prompt": "n", "gen_params_json": {}})
+                set_picked_index(conn, sid, 0)
+            finally:
+                conn.close()
+            for i in range(2):
+                KCP_KeyframeSetItemSaveImage().run(db_path, sid, i, Image.new("RGB", (300, 200), (90 * i, 40, 10)), "png", True)
+
+            def _store_files() -> list[str]:
+                return sorted(p.relative_to(root).as_posix() for p in root.rglob("*") if p.is_file() and p.parent.name != "db")
+
+            conn = connect(Path(db_path))
+            try:
+                conn.execute("UPDATE keyframe_set_items SET created_at = 1000")
+                conn.commit()
+                old = get_set_item(conn, sid, 1)["image_path"]
+                files = _store_files()
+                orig_release = retention_mod.release_ref
+
+                def _fail_release(*_args, **_kwargs):
+                    raise sqlite3.OperationalError("simulated failure")
+
+                retention_mod.release_ref = _fail_release
+                try:
+                    retention_mod.run_retention(conn, root, "downscale", 30, max_px=64, dry_run=False)
+                    return False, "failing downscale did not raise"
+                except sqlite3.OperationalError:
+                    pass
+                finally:
+                    retention_mod.release_ref = orig_release
+                if _store_files() != files or get_set_item(conn, sid, 1)["image_path"] != old:
+                    return False, f"rolled-back downscale left files: {sorted(set(_store_files()) - set(files))}"
+                down = retention_mod.run_retention(conn, root, "downscale", 30, max_px=64, dry_run=False)
+                new = get_set_item(conn, sid, 1)["image_path"]
+            finally:
+                conn.close()
+            if down["items_retired"] != 1 or new == old or (root / old).exists() or not (root / new).exists():
+                return False, f"blob downscale did not apply: {down}"
+            if max(image_io.image_size(root / new)) != 64 or any("_retained" in rel for rel in _store_files()):
+                return False, "blob downscale left its loose copy behind"
+        return True, "set retention ok"
+    except Exception as e:
+        return False, str(e)
+
+
+def smoke_set_tiering() -> tuple[bool, str]:
+    """Smoke: cold set images move into a month archive, thumbs stay hot, set loaders skip them, item load and promote rehydrate."""
+    try:
+        from kcp.util import image_io
+
+        if not image_io.pillow_available():
+            return True, "set tiering skipped: Pillow not installed"
+        from PIL import Image
+
+        from kcp.db.integrity import scan_project
+        from kcp.db.repo import add_keyframe_set_item, connect, create_keyframe_set, get_set_item
+        from kcp.db.sidecars import set_sidecar_budget_mb
+        from kcp.db.tiers import is_archive_ref, tier_stats
+        from kcp.nodes.keyframe_promote import KCP_KeyframePromoteToAsset
+        from kcp.nodes.keyframe_set_item_load import KCP_KeyframeSetItemLoad
+        from kcp.nodes.keyframe_set_item_save_image import KCP_KeyframeSetItemSaveImage
+        from kcp.nodes.keyframe_set_load_batch import KCP_KeyframeSetLoadBatch
+        from kcp.nodes.keyframe_set_load_stacked import KCP_KeyframeSetLoadStacked
+        from kcp.nodes.keyframe_set_sidecar_cache import KCP_KeyframeSetSidecarCache
+        from kcp.nodes.keyframe_set_tiering import KCP_SetTiering
+        from kcp.nodes.project_init import KCP_ProjectInit
+
+        with tempfile.TemporaryDirectory() as td:
+            root = Path(td) / "kcp"
+            db_path, _, _ = KCP_ProjectInit().run(str(root), "kcp.sqlite", True)
+            conn = connect(Path(db_path))
+            try:
+                conn.execute("INSERT INTO stacks (id,name,created_at,updated_at) VALUES (?,?,?,?)", ("stack1", "stack1", 1, 1))
+                conn.commit()
+                set_id = create_keyframe_set(conn, {"stack_id": "stack1", "variant_policy_id": "seed_sweep_12_v1", "variant_policy_json": {}, "base_seed": 1, "width": 64, "height": 64})
+                for i in range(3):
+                    add_keyframe_set_item(conn, {"set_id": set_id, "idx": i, "seed": i + 1, "positive_prompt": "p", "negative_prompt": "n", "gen_params_json": {}})
+            finally:
+                conn.close()
+            for i in range(3):
+                KCP_KeyframeSetItemSaveImage().run(db_path, set_id, i, Image.new("RGB", (96, 64), (70 * i, 30, 200)), "png", True)
+
+            node = KCP_SetTiering()
+            if json.loads(node.run(db_path, "archive", 30, False)[1])["items"] != 0:
+                return False, "fresh set was archived"
+            conn = connect(Path(db_path))
+            try:
+                conn.execute("UPDATE keyframe_sets SET created_at = 1000, updated_at = 1000")
+                conn.execute("UPDATE keyframe_set_items SET created_at = 1000")
+                conn.commit()
+                before = {i: get_set_item(conn, set_id, i) for i in range(3)}
+            finally:
+                conn.close()
+            dry = json.loads(node.run(db_path, "archive", 30, True)[1])
+            if dry["items"] != 3 or not all((root / before[i]["image_path"]).exists() for i in range(3)):
+                return False, f"dry run moved media: {dry}"
+
+            report = json.loads(node.run(db_path, "archive", 30, False)[1])
+            conn = connect(Path(db_path))
+            try:
+                after = {i: get_set_item(conn, set_id, i) for i in range(3)}
+                scan = scan_project(conn, root, verify_hashes=False)
+            finally:
+                conn.close()
+            archives = [a["archive_path"] for a in report["archives"]]
+            if report["items"] != 3 or archives != [archives[0]] or not archives[0].startswith("archive/1970-01/"):
+                return False, f"unexpected archive report: {report}"
+            if not all(is_archive_ref(after[i]["image_path"]) and not (root / before[i]["image_path"]).exists() for i in range(3)):
+                return False, f"images not moved to the archive: {[after[i]['image_path'] for i in range(3)]}"
+            if not all(after[i]["thumb_path"] == before[i]["thumb_path"] and (root / after[i]["thumb_path"]).exists() for i in range(3)):
+                return False, "thumbs did not stay hot"
+            tiers = report["tiers"]
+            if tiers["cold_items"] != 3 or tiers["hot_items"] != 0 or tiers["cold_bytes"] <= 0 or tiers["archive_files"] != 1:
+                return False, f"unexpected tier stats: {tiers}"
+            if not scan["ok"]:
+                return False, f"integrity scan flagged archived media: {scan['counts']}"
+            # Set-wide loaders skip archived images with an explicit status instead of rehydrating the set.
+            for mode in ("full", "max_side"):
+                images, _, items, _ = KCP_KeyframeSetLoadBatch().run(db_path, set_id, True, True, mode, 64)
+                statuses = [json.loads(p).get("status") for p in items]
+                if any(img is not None for img in images) or statuses != ["archived"] * 3:
+                    return False, f"batch load ({mode}) of an archived set: {items}"
+            images, _, items, _ = KCP_KeyframeSetLoadBatch().run(db_path, set_id, True, True, "thumbs_only")
+            if any(img is None for img in images) or any("warning" in json.loads(p) for p in items):
+                return False, f"thumbs of an archived set did not load: {items}"
+            if image_io.numpy_available():
+                try:
+                    KCP_KeyframeSetLoadStacked().run(db_path, set_id)
+                    return False, "stacked load of an archived set did not fail"
+                except RuntimeError as e:
+                    if "kcp_set_media_archived" not in str(e):
+                        return False, f"unexpected stacked load error: {e}"
+                if KCP_KeyframeSetLoadStacked().run(db_path, set_id, True, "thumbs")[0].shape[0] != 3:
+                    return False, "stacked thumbs of an archived set did not load"
+                conn = connect(Path(db_path))
+                try:
+                    set_sidecar_budget_mb(conn, 8)
+                finally:
+                    conn.close()
+                warm = json.loads(KCP_KeyframeSetSidecarCache().run(db_path, set_id, "warm")[0])
+                if warm["archived_idxs"] != [0, 1, 2] or warm["missing_idxs"] or warm["written"]:
+                    return False, f"sidecar warm of an archived set: {warm}"
+            try:
+                KCP_KeyframeSetItemSaveImage().run(db_path, set_id, 0, Image.new("RGB", (96, 64)), "png", False)
+                return False, "save over an archived item without overwrite was allowed"
+            except RuntimeError as e:
+                if "kcp_set_item_media_exists" not in str(e):
+                    return False, f"unexpected save error: {e}"
+
+            image, _, item_json = KCP_KeyframeSetItemLoad().run(db_path, set_id, 1, True)
+            if image is None or json.loads(item_json)["image_path"] != before[1]["image_path"]:
+                return False, f"item load did not rehydrate: {item_json}"
+            if image_io.comfy_image_to_pil(image).size != (96, 64):
+                return False, "rehydrated image has the wrong size"
+            asset_json = json.loads(KCP_KeyframePromoteToAsset().run(db_path, set_id, 2, "cold_hero", "", "", "new")[1])
+            if not (root / asset_json["image_path"]).exists():
+                return False, "promote from an archived item failed"
+            conn = connect(Path(db_path))
+            try:
+                tiers = tier_stats(conn, root)
+            finally:
+                conn.close()
+            if tiers["cold_items"] != 1 or tiers["hot_items"] != 2:
+                return False, f"rehydration not reflected in tier stats: {tiers}"
+            set_bytes = sum(p.stat().st_size for p in (root / "sets").rglob("*") if p.is_file() and not p.name.endswith(".npy"))
+            if tiers["hot_bytes"] != set_bytes:
+                return False, f"hot bytes count more than set media: {tiers['hot_bytes']} != {set_bytes}"
+
+            # Unchanged rehydrated images point back at their archived copy instead of being archived again.
+            again = json.loads(node.run(db_path, "archive", 30, False)[1])
+            if again["items"] != 2 or again["reused"] != 2 or again["archives"] or again["tiers"]["archive_files"] != 1:
+                return False, f"rehydrated items were archived again: {again}"
+            if again["tiers"]["cold_items"] != 3:
+                return False, f"reused items not cold: {again['tiers']}"
+
+            KCP_KeyframeSetItemSaveImage().run(db_path, set_id, 0, Image.new("RGB", (96, 64), (1, 2, 3)), "png", True)
+            gc = json.loads(node.run(db_path, "gc", 30, True)[1])
+            if gc["entries_dropped"] != 1 or gc["archives_deleted"] != 0 or gc["dead_bytes_kept"] <= 0:
+                return False, f"unexpected gc plan: {gc}"
+            for i in (1, 2):
+                KCP_KeyframeSetItemSaveImage().run(db_path, set_id, i, Image.new("RGB", (96, 64), (i, 2, 3)), "png", True)
+            gc = json.loads(node.run(db_path, "gc", 30, False)[1])
+            conn = connect(Path(db_path))
+            try:
+                entries = conn.execute("SELECT COUNT(*) FROM media_archive_entries").fetchone()[0]
+            finally:
+                conn.close()
+            if gc["archives_deleted"] != 1 or gc["bytes_freed"] <= 0 or entries or (root / archives[0]).exists():
+                return False, f"gc did not reclaim the dead archive: {gc} entries={entries}"
+        return True, "set tiering ok"
+    except Exception as e:
+        return False, str(e)
+
+
+def smoke_render_pack_status_multi_set() -> tuple[bool, str]:
+    """Smoke: render pack status reports bytes/mtime from one directory scan and handles many sets per call."""
+    try:
+        from kcp.nodes.project_init import KCP_ProjectInit
+        from kcp.nodes.render_pack_status import KCP_RenderPackStatus
+        from kcp.db.repo import connect, create_keyframe_set, add_keyframe_set_item, update_set_item_media
+
+        with tempfile.TemporaryDirectory() as td:
+            db_path, _, _ = KCP_ProjectInit().run(str(Path(td) / "kcp"), "kcp.sqlite", True)
+            root = Path(db_path).parent.parent
+            conn = connect(Path(db_path))
+            try:
+                conn.execute("INSERT INTO stacks (id,name,created_at,updated_at) VALUES (?,?,?,?)", ("stack1", "stack1", 1, 1))
+                conn.commit()
+                set_ids = []
+                for n in range(2):
+                    set_id = create_keyframe_set(conn, {"stack_id": "stack1", "variant_policy_id": "seed_sweep_12_v1", "variant_policy_json": {}, "base_seed": n, "width": 64, "height": 64})
+                    set_ids.append(set_id)
+                    for i in range(2):
+                        add_keyframe_set_item(conn, {"set_id": set_id, "idx": i, "seed": i + 1, "positive_prompt": "p", "negative_prompt": "n", "gen_params_json": {}})
+                    saved = 2 if n == 0 else 1
+                    for i in range(saved):
+                        rel = f"sets/{set_id}/{i}.webp"
+                        (root / rel).parent.mkdir(parents=True, exist_ok=True)
+                        (root / rel).write_bytes(b"x" * (10 * (i + 1)))
+                        update_set_item_media(conn, set_id, i, rel, "")
+                # The sidecar cache is not counted as media bytes.
+                (root / f"sets/{set_ids[0]}/0.npy").write_bytes(b"cache" * 100)
+            finally:
+                conn.close()
+
+            node = KCP_RenderPackStatus()
+            _, status_json = node.run(db_path, set_ids[0], False)
+            status = json.loads(status_json)
+            if status.get("bytes_on_disk") != 30 or not status.get("newest_mtime") or status.get("missing_idxs") != []:
+                return False, f"single-set status mismatch status={status}"
+
+            summary_text, status_json = node.run(db_path, "", False, "exists", f"{set_ids[0]}, {set_ids[1]}\n{set_ids[0]}")
+            status = json.loads(status_json)
+            by_set = {s["set_id"]: s for s in status.get("sets", [])}
+            if status.get("set_count") != 2 or status.get("total_items") != 4 or status.get("items_with_media") != 3:
+                return False, f"multi-set totals mismatch status={status}"
+            if status.get("sets_with_missing") != [set_ids[1]] or by_set[set_ids[1]]["missing_idxs"] != [1] or status.get("bytes_on_disk") != 40:
+                return False, f"multi-set per-set mismatch status={status}"
+            if "sets=2" not in summary_text or f"set_id={set_ids[1]}" not in summary_text:
+                return False, f"summary mismatch summary={summary_text}"
+            try:
+                node.run(db_path, "", True, "exists", ",".join(set_ids))
+                return False, "expected strict missing error"
+            except RuntimeError as e:
+                if not str(e).startswith("kcp_set_media_missing:") or set_ids[1] not in str(e):
+                    return False, f"unexpected strict error: {e}"
+
+        return True, "render pack status multi-set ok"
+    except Exception as e:
+        return False, str(e)
+
+
+def smoke_project_dashboard() -> tuple[bool, str]:
+    """Smoke: dashboard counters track inserts/updates/deletes and the cache follows data_version."""
+    try:
+        from kcp.nodes.project_init import KCP_ProjectInit
+        from kcp.nodes.project_dashboard import KCP_ProjectDashboard
+        from kcp.db.dashboard import clear_dashboard_cache
+        from kcp.db.repo import connect, create_keyframe_set, add_keyframe_set_item, update_set_item_media
+
+        with tempfile.TemporaryDirectory() as td:
+            db_path, _, _ = KCP_ProjectInit().run(str(Path(td) / "kcp"), "kcp.sqlite", True)
+            conn = connect(Path(db_path))
+            try:
+                conn.execute("INSERT INTO stacks (id,name,created_at,updated_at) VALUES (?,?,?,?)", ("stack1", "hero", 1, 1))
+                conn.execute("INSERT INTO stacks (id,name,created_at,updated_at) VALUES (?,?,?,?)", ("stack2", "villain", 1, 1))
+                conn.commit()
+                set_ids = []
+                for n, stack_id in enumerate(["stack1", "stack1", "stack2"]):
+                    set_id = create_keyframe_set(conn, {"stack_id": stack_id, "variant_policy_id": "seed_sweep_12_v1", "variant_policy_json": {}, "base_seed": n, "width": 64, "height": 64})
+                    set_ids.append(set_id)
+                    for i in range(3):
+                        add_keyframe_set_item(conn, {"set_id": set_id, "idx": i, "seed": i + 1, "positive_prompt": "p", "negative_prompt": "n", "gen_params_json": {}})
+                update_set_item_media(conn, set_ids[0], 0, f"sets/{set_ids[0]}/0.webp", f"sets/{set_ids[0]}/0_thumb.webp")
+                update_set_item_media(conn, set_ids[0], 1, "blobs/ab/cd/abcd", "")
+                update_set_item_media(conn, set_ids[1], 0, f"archive/2026-01/1.zip#{set_ids[1]}/0.webp", "")
+                conn.execute("UPDATE keyframe_set_items SET image_path = '', media_retention = 'deleted' WHERE set_id = ? AND idx = 2", (set_ids[0],))
+                conn.execute("UPDATE keyframe_sets SET picked_index = 0 WHERE id IN (?, ?)", (set_ids[0], set_ids[2]))
+                conn.commit()
+            finally:
+                conn.close()
+
+            node = KCP_ProjectDashboard()
+            summary, dashboard_json = node.run(db_path)
+            dash = json.loads(dashboard_json)
+            items, sets = dash["items"], dash["sets"]
+            if items["total"] != 9 or items["with_media"] != 3 or items["cold"] != 1 or items["retired"] != 1:
+                return False, f"item counters mismatch items={items}"
+            if items["by_storage"] != {"loose": 1, "blob": 1, "pack": 0, "archive": 1}:
+                return False, f"storage counters mismatch items={items}"
+            if "disk" in dash or set(dash["recorded_bytes"]) != {"hot", "cold"}:
+                return False, f"byte totals not labelled as DB-recorded: {sorted(dash)}"
+            if sets["total"] != 3 or sets["picked"] != 2 or sum(d["sets"] for d in sets["per_day"]) != 3:
+                return False, f"set counters mismatch sets={sets}"
+            if [(s["stack_id"], s["name"], s["sets"]) for s in dash["top_stacks"]] != [("stack1", "hero", 2), ("stack2", "villain", 1)]:
+                return False, f"top stacks mismatch top_stacks={dash['top_stacks']}"
+            if dash["cached"] or "3 sets (2 picked" not in summary:
+                return False, f"first call mismatch cached={dash['cached']} summary={summary}"
+            if not json.loads(node.run(db_path)[1])["cached"]:
+                return False, "expected cached dashboard on unchanged DB"
+
+            conn = connect(Path(db_path))
+            try:
+                conn.execute("DELETE FROM keyframe_sets WHERE id = ?", (set_ids[0],))
+                conn.commit()
+                direct = conn.execute("SELECT COUNT(*) FROM keyframe_set_items").fetchone()[0]
+            finally:
+                conn.close()
+            dash = json.loads(node.run(db_path)[1])
+            if dash["cached"] or dash["items"]["total"] != direct or dash["sets"]["total"] != 2 or dash["sets"]["picked"] != 1:
+                return False, f"counters after delete mismatch dash={dash}"
+            clear_dashboard_cache()
+
+        return True, "project dashboard ok"
+    except Exception as e:
+        return False, str(e)
+
+
+def smoke_project_transfer() -> tuple[bool, str]:
+    """Smoke: project export/import round-trips rows and media for loose, blob and pack projects."""
+    try:
+        from kcp.util import image_io
+
+        if not image_io.pillow_available():
+            return True, "project transfer skipped: Pillow not installed"
+        import io
+        import tarfile
+
+        from PIL import Image
+
+        from kcp.db import transfer as transfer_mod
+        from kcp.db.integrity import scan_project
+        from kcp.db.repo import add_keyframe_set_item, connect, create_keyframe_set
+        from kcp.db.tiers import archive_cold_sets
+        from kcp.nodes.keyframe_promote import KCP_KeyframePromoteToAsset
+        from kcp.nodes.keyframe_set_item_save_image import KCP_KeyframeSetItemSaveImage
+        from kcp.nodes.keyframe_set_mark_picked import KCP_KeyframeSetMarkPicked
+        from kcp.nodes.project_init import KCP_ProjectInit
+        from kcp.nodes.project_transfer import KCP_ProjectExport, KCP_ProjectImport
+
+        for storage in ("loose", "blob", "pack"):
+            with tempfile.TemporaryDirectory() as td:
+                src_root = Path(td) / "src"
+                src_db, _, _ = KCP_ProjectInit().run(
+                    str(src_root), "kcp.sqlite", True,
+                    blob_store="enable" if storage == "blob" else "keep",
+                    set_packs="enable" if storage == "pack" else "keep",
+                )
+                conn = connect(Path(src_db))
+                try:
+                    conn.execute("INSERT INTO stacks (id,name,created_at,updated_at) VALUES (?,?,?,?)", ("stack1", "stack1", 1, 1))
+                    conn.commit()
+                    set_ids = []
+                    for n in range(2):
+                        set_id = create_keyframe_set(conn, {"stack_id": "stack1", "variant_policy_id": "seed_sweep_12_v1", "variant_policy_json": {}, "base_seed": n, "width": 64, "height": 64})
+                        set_ids.append(set_id)
+                        for i in range(3):
+                            add_keyframe_set_item(conn, {"set_id": set_id, "idx": i, "seed": i + 1, "positive_prompt": "p", "negative_prompt": "n", "gen_params_json": {}})
+                finally:
+                    conn.close()
+                for n, set_id in enumerate(set_ids):
+                    for i in range(3):
+                        KCP_KeyframeSetItemSaveImage().run(src_db, set_id, i, Image.new("RGB", (96, 64), (70 * i, 40 * n, 200)), "png", True)
+                KCP_KeyframeSetMarkPicked().run(src_db, set_ids[0], 1)
+                KCP_KeyframePromoteToAsset().run(src_db, set_ids[0], 1, "hero_kf")
+                # The second set goes to the cold tier, so its images travel as archive refs.
+                conn = connect(Path(src_db))
+                try:
+                    conn.execute("UPDATE keyframe_sets SET created_at = 1000, updated_at = 1000 WHERE id = ?", (set_ids[1],))
+                    conn.execute("UPDATE keyframe_set_items SET created_at = 1000 WHERE set_id = ?", (set_ids[1],))
+                    conn.commit()
+                    archive_cold_sets(conn, src_root, 30, dry_run=False)
+                finally:
+                    conn.close()
+
+                full_tar = Path(td) / "full.tar"
+                summary, report_json, archive_path = KCP_ProjectExport().run(src_db, "full", str(full_tar))
+                exported = json.loads(report_json)
+                if archive_path != str(full_tar) or exported["missing"] or not exported["files"]:
+                    return False, f"{storage}: unexpected export report: {exported}"
+
+                for media, dst_name in (("full", "dst_full"), ("picked", "dst_picked")):
+                    tar_path = full_tar if media == "full" else Path(KCP_ProjectExport().run(src_db, media, str(Path(td) / f"{media}.tar"))[2])
+                    dst_root = Path(td) / dst_name
+                    dst_db, _, _ = KCP_ProjectInit().run(str(dst_root), "kcp.sqlite", True)
+                    report = json.loads(KCP_ProjectImport().run(dst_db, str(tar_path), "skip", False)[1])
+                    if not report["applied"] or report["tables"]["keyframe_set_items"]["inserted"] != 6:
+                        return False, f"{storage}/{media}: import did not apply: {report}"
+                    conn = connect(Path(dst_db))
+                    try:
+                        scan = scan_project(conn, dst_root, verify_hashes=True)
+                        images = {(r["set_id"], r["idx"]): r["image_path"] for r in conn.execute("SELECT set_id, idx, image_path FROM keyframe_set_items")}
+                        kf = conn.execute("SELECT COUNT(*) FROM assets WHERE type = 'keyframe'").fetchone()[0]
+                    finally:
+                        conn.close()
+                    if scan["counts"]["dangling"] or scan["counts"]["corrupt"]:
+                        return False, f"{storage}/{media}: imported project not clean: {scan['counts']} {scan['dangling'][:3]}"
+                    with_image = sorted(k for k, v in images.items() if v)
+                    expected = sorted(images) if media == "full" else [(set_ids[0], 1)]
+                    if with_image != expected or kf != 1:
+                        return False, f"{storage}/{media}: unexpected images {with_image} keyframes={kf}"
+
+                # Importing the same export again changes nothing.
+                again = json.loads(KCP_ProjectImport().run(str(Path(td) / "dst_full" / "db" / "kcp.sqlite"), str(full_tar), "skip", False)[1])
+                if any(t["inserted"] for t in again["tables"].values()) or again["files"]["written"] or again["files"]["conflict"]:
+                    return False, f"{storage}: re-import was not a no-op: {again['files']} {again['tables']}"
+
+                tampered = Path(td) / "tampered.tar"
+                with tarfile.open(full_tar) as tin, tarfile.open(tampered, "w") as tout:
+                    flipped = False
+                    for info in tin.getmembers():
+                        data = tin.extractfile(info).read() if info.isfile() else b""
+                        if info.name.startswith("media/") and not flipped:
+                            data, flipped = data[:-1] + bytes([data[-1] ^ 0xFF]), True
+                        tout.addfile(info, io.BytesIO(data))
+                dst_full = Path(td) / "dst_full"
+                try:
+                    KCP_ProjectImport().run(str(dst_full / "db" / "kcp.sqlite"), str(tampered), "replace", False)
+                    return False, f"{storage}: tampered export passed verification"
+                except RuntimeError as e:
+                    if not str(e).startswith("kcp_import_verify_failed:"):
+                        return False, f"{storage}: unexpected verify error: {e}"
+                leftovers = [p for p in dst_full.rglob("*.import.tmp")]
+                if leftovers:
+                    return False, f"{storage}: staged files left after a failed verify: {leftovers[:3]}"
+
+                # The target's own settings survive an import from a project stored differently.
+                fresh_db, _, _ = KCP_ProjectInit().run(str(Path(td) / "fresh"), "kcp.sqlite", True)
+                conn = connect(Path(fresh_db))
+                try:
+                    fresh_meta = {r["key"]: r["value"] for r in conn.execute("SELECT key, value FROM meta")}
+                finally:
+                    conn.close()
+                conn = connect(dst_full / "db" / "kcp.sqlite")
+                try:
+                    dst_meta = {r["key"]: r["value"] for r in conn.execute("SELECT key, value FROM meta")}
+                    row = conn.execute("SELECT image_path FROM keyframe_set_items WHERE image_path != '' ORDER BY set_id, idx LIMIT 1").fetchone()
+                    thumb = conn.execute(
+                        "SELECT path FROM (SELECT thumb_path AS path FROM keyframe_set_items UNION SELECT image_path FROM assets) "
+                        "WHERE path != '' AND instr(path, '#') = 0 ORDER BY path LIMIT 1"
+                    ).fetchone()
+                finally:
+                    conn.close()
+                if set(dst_meta) != set(fresh_meta):
+                    return False, f"{storage}: import merged source meta: {sorted(set(dst_meta) ^ set(fresh_meta))}"
+
+                # A merge that fails leaves existing files untouched and removes the ones it added.
+                kept_file = dst_full / row["image_path"].split("#")[0]
+                original = kept_file.read_bytes()
+                kept_file.write_bytes(b"local edit")
+                dropped = dst_full / thumb["path"]
+                dropped.unlink()
+                real_recount = transfer_mod._recount_blob_refs
+
+                def failing_recount(conn):
+                    raise RuntimeError("simulated merge failure")
+
+                transfer_mod._recount_blob_refs = failing_recount
+                try:
+                    KCP_ProjectImport().run(str(dst_full / "db" / "kcp.sqlite"), str(full_tar), "replace", False)
+                    return False, f"{storage}: failing merge did not raise"
+                except RuntimeError:
+                    pass
+                finally:
+                    transfer_mod._recount_blob_refs = real_recount
+                if kept_file.read_bytes() != b"local edit" or dropped.exists() or list(dst_full.rglob("*.import.tmp")):
+                    return False, f"{storage}: failed merge changed files on disk"
+                replaced = json.loads(KCP_ProjectImport().run(str(dst_full / "db" / "kcp.sqlite"), str(full_tar), "replace", False)[1])
+                if kept_file.read_bytes() != original or not dropped.exists() or not replaced["files"]["replaced"]:
+                    return False, f"{storage}: replace import did not restore files: {replaced['files']}"
+
+        return True, "project transfer ok"
+    except Exception as e:
+        return False, str(e)
+
+
+def smoke_set_export() -> tuple[bool, str]:
+    """Smoke: KCP_SetExport writes deduplicated media plus a joined JSON/CSV manifest, to a folder or a tar."""
+    try:
+        from kcp.util import image_io
+
+        if not image_io.pillow_available():
+            return True, "set export skipped: Pillow not installed"
+        import csv
+        import hashlib
+        import tarfile
+
+        from PIL import Image
+
+        from kcp.db import transfer as transfer_mod
+        from kcp.db.repo import add_keyframe_set_item, connect, create_keyframe_set
+        from kcp.nodes.keyframe_promote import KCP_KeyframePromoteToAsset
+        from kcp.nodes.keyframe_set_export import KCP_SetExport
+        from kcp.nodes.keyframe_set_item_save_image import KCP_KeyframeSetItemSaveImage
+        from kcp.nodes.keyframe_set_mark_picked import KCP_KeyframeSetMarkPicked
+        from kcp.nodes.project_init import KCP_ProjectInit
+
+        for storage in ("loose", "blob", "pack"):
+            with tempfile.TemporaryDirectory() as td:
+                root = Path(td) / "kcp"
+                db_path, _, _ = KCP_ProjectInit().run(
+                    str(root), "kcp.sqlite", True,
+                    blob_store="enable" if storage == "blob" else "keep",
+                    set_packs="enable" if storage == "pack" else "keep",
+                )
+                conn = connect(Path(db_path))
+                try:
+                    conn.execute(
+                        "INSERT INTO assets (id,type,name,positive_fragment,created_at,updated_at) VALUES (?,?,?,?,?,?)",
+                        ("char1", "character", "mira", "a woman", 1, 1),
+                    )
+                    conn.execute(
+                        "INSERT INTO stacks (id,name,character_id,created_at,updated_at) VALUES (?,?,?,?,?)", ("stack1", "alley", "char1", 1, 1)
+                    )
+                    conn.commit()
+                    set_ids = []
+                    for n in range(2):
+                        set_id = create_keyframe_set(conn, {"stack_id": "stack1", "variant_policy_id": "seed_sweep_12_v1", "variant_policy_json": {"n": 3}, "base_seed": n, "width": 64, "height": 64})
+                        set_ids.append(set_id)
+                        for i in range(3):
+                            add_keyframe_set_item(conn, {"set_id": set_id, "idx": i, "seed": 100 * n + i, "positive_prompt": f"p{i}", "negative_prompt": "n", "gen_params_json": {"steps": 20 + i}})
+                finally:
+                    conn.close()
+                # idx 0 of both sets is the same image, so picking both exports one file.
+                for n, set_id in enumerate(set_ids):
+                    for i in range(3):
+                        color = (10, 20, 30) if i == 0 else (80 * i, 40 * n, 200)
+                        KCP_KeyframeSetItemSaveImage().run(db_path, set_id, i, Image.new("RGB", (96, 64), color), "png", True)
+                    KCP_KeyframeSetMarkPicked().run(db_path, set_id, 0)
+                KCP_KeyframePromoteToAsset().run(db_path, set_ids[0], 0, "hero_kf")
+
+                out = Path(td) / "handoff"
+                reads = []
+                real_open = transfer_mod.open_stored_media
+
+                def counting_open(conn, root, ref):
+                    reads.append(ref)
+                    return real_open(conn, root, ref)
+
+                transfer_mod.open_stored_media = counting_open
+                try:
+                    _, report_json, out_path = KCP_SetExport().run(db_path, "folder", True, output_path=str(out))
+                finally:
+                    transfer_mod.open_stored_media = real_open
+                report = json.loads(report_json)
+                if out_path != str(out) or report["items"] != 2 or report["files"] != 1 or report["deduplicated"] != 1 or report["missing"]:
+                    return False, f"{storage}: unexpected picked export report: {report}"
+                # Each image is read once, hashed while it is copied; a blob shared by both picks is read once in total.
+                media_files = sorted(p.name for p in (out / "media").iterdir())
+                if len(reads) != (1 if storage == "blob" else 2) or len(media_files) != 1 or media_files[0].startswith(".spool"):
+                    return False, f"{storage}: media read more than once or spool left behind: {reads} {media_files}"
+                manifest = json.loads((out / "manifest.json").read_text(encoding="utf-8"))
+                rows = manifest["rows"]
+                first = rows[0]
+                if manifest["items"] != 2 or len(rows) != 2 or rows[0]["file"] != rows[1]["file"]:
+                    return False, f"{storage}: unexpected manifest: {manifest}"
+                if (first["stack_name"], first["character"], first["gen_params"], first["variant_policy"]) != ("alley", "mira", {"steps": 20}, {"n": 3}):
+                    return False, f"{storage}: lineage not denormalized: {first}"
+                if first["promoted_assets"] != ["hero_kf"] or not first["picked"] or rows[1]["promoted_assets"]:
+                    return False, f"{storage}: promoted lineage wrong: {rows}"
+                media = out / first["file"]
+                if not first["file"].endswith(".png") or hashlib.sha256(media.read_bytes()).hexdigest() != first["sha256"]:
+                    return False, f"{storage}: exported file does not match its hash: {first['file']}"
+                with open(out / "manifest.csv", encoding="utf-8", newline="") as fh:
+                    csv_rows = list(csv.DictReader(fh))
+                if len(csv_rows) != 2 or csv_rows[0]["character"] != "mira" or json.loads(csv_rows[0]["gen_params"]) != {"steps": 20}:
+                    return False, f"{storage}: unexpected csv manifest: {csv_rows[:1]}"
+
+                tar_path = Path(td) / "set1.tar"
+                report = json.loads(KCP_SetExport().run(db_path, "tar", False, set_ids=set_ids[1], output_path=str(tar_path))[1])
+                with tarfile.open(tar_path) as tar:
+                    names = tar.getnames()
+                    rows = json.loads(tar.extractfile("manifest.json").read())["rows"]
+                if report["items"] != 3 or report["files"] != 3 or names[-2:] != ["manifest.csv", "manifest.json"] or len(names) != 5:
+                    return False, f"{storage}: unexpected tar export: {report} {names}"
+                if {r["set_id"] for r in rows} != {set_ids[1]} or [r["idx"] for r in rows] != [0, 1, 2]:
+                    return False, f"{storage}: set filter not applied: {rows}"
+
+                report = json.loads(KCP_SetExport().run(db_path, "folder", False, date_to="1970-01-01", output_path=str(Path(td) / "none"))[1])
+                if report["items"] != 0 or json.loads((Path(td) / "none" / "manifest.json").read_text(encoding="utf-8"))["rows"] != []:
+                    return False, f"{storage}: date filter not applied: {report}"
+        try:
+            KCP_SetExport().run(db_path, "folder", True, date_from="yesterday")
+            return False, "invalid date accepted"
+        except RuntimeError as e:
+            if not str(e).startswith("kcp_set_export_date_invalid:"):
+                return False, f"unexpected date error: {e}"
+        return True, "set export ok"
+    except Exception as e:
+        return False, str(e)
+
+
+def smoke_project_sync() -> tuple[bool, str]:
+    """Smoke: changesets converge a loose and a blob project under last-writer-wins, idempotently."""
+    try:
+        from kcp.util import image_io
+
+        if not image_io.pillow_available():
+            return True, "project sync skipped: Pillow not installed"
+        import hashlib
+        import time
+
+        from PIL import Image
+
+        from kcp.db.blobs import release_ref
+        from kcp.db.integrity import scan_project
+        from kcp.db.repo import add_keyframe_set_item, connect, create_keyframe_set
+        from kcp.db.tiers import archive_cold_sets
+        from kcp.nodes.keyframe_promote import KCP_KeyframePromoteToAsset
+        from kcp.nodes.keyframe_set_item_save_image import KCP_KeyframeSetItemSaveImage
+        from kcp.nodes.project_init import KCP_ProjectInit
+        from kcp.nodes.project_sync import KCP_SyncExport, KCP_SyncImport
+        from kcp.util.time_utils import now_ms
+
+        with tempfile.TemporaryDirectory() as td:
+            root_a, root_b = Path(td) / "a", Path(td) / "b"
+            db_a, _, _ = KCP_ProjectInit().run(str(root_a), "kcp.sqlite", True)
+            db_b, _, _ = KCP_ProjectInit().run(str(root_b), "kcp.sqlite", True, blob_store="enable")
+            conn = connect(Path(db_a))
+            try:
+                conn.execute("INSERT INTO stacks (id,name,created_at,updated_at) VALUES (?,?,?,?)", ("stack1", "alley", 1, 1))
+                conn.commit()
+                set_id = create_keyframe_set(conn, {"stack_id": "stack1", "variant_policy_id": "seed_sweep_12_v1", "variant_policy_json": {}, "base_seed": 0, "width": 64, "height": 64})
+                for i in range(3):
+                    add_keyframe_set_item(conn, {"set_id": set_id, "idx": i, "seed": i, "positive_prompt": "p", "negative_prompt": "n", "gen_params_json": {}})
+            finally:
+                conn.close()
+            for i in range(3):
+                KCP_KeyframeSetItemSaveImage().run(db_a, set_id, i, Image.new("RGB", (96, 64), (60 * i, 30, 200)), "png", True)
+            KCP_KeyframePromoteToAsset().run(db_a, set_id, 1, "hero_kf")
+
+            _, report_json, first_cs, mark_a = KCP_SyncExport().run(db_a, 0, str(Path(td) / "a0.tar"))
+            exported = json.loads(report_json)
+            if exported["missing"] or not exported["files"] or mark_a != exported["until"]:
+                return False, f"unexpected first export: {exported}"
+            report = json.loads(KCP_SyncImport().run(db_b, first_cs)[1])
+            if report["conflict"] or report["applied"] != report["changes"] or report["by_table"]["keyframe_set_items"]["applied"] != 3:
+                return False, f"first import did not apply cleanly: {report}"
+            again = json.loads(KCP_SyncImport().run(db_b, first_cs)[1])
+            if again["applied"] or again["duplicate"] != again["changes"]:
+                return False, f"re-import was not a no-op: {again}"
+            # B sends everything it has (A's rows, received) back: nothing to apply on A.
+            _, _, echo_cs, mark_b = KCP_SyncExport().run(db_b, 0, str(Path(td) / "b0.tar"))
+            echo = json.loads(KCP_SyncImport().run(db_a, echo_cs)[1])
+            if echo["applied"]:
+                return False, f"echoed changes were applied: {echo}"
+
+            # Concurrent edits of the same stack: B's is later and wins on both hosts.
+            conn = connect(Path(db_a))
+            try:
+                conn.execute("UPDATE stacks SET name = 'a-edit', updated_at = ? WHERE id = 'stack1'", (now_ms(),))
+                conn.commit()
+            finally:
+                conn.close()
+            time.sleep(0.02)
+            conn = connect(Path(db_b))
+            try:
+                conn.execute("UPDATE stacks SET name = 'b-edit', updated_at = ? WHERE id = 'stack1'", (now_ms(),))
+                gone = conn.execute("SELECT id, image_path, thumb_path FROM keyframe_set_items WHERE set_id = ? AND idx = 2", (set_id,)).fetchone()
+                release_ref(conn, gone["image_path"])
+                release_ref(conn, gone["thumb_path"])
+                conn.execute("DELETE FROM keyframe_set_items WHERE id = ?", (gone["id"],))
+                conn.commit()
+            finally:
+                conn.close()
+            KCP_KeyframeSetItemSaveImage().run(db_b, set_id, 0, Image.new("RGB", (96, 64), (250, 250, 0)), "png", True)
+
+            cs_a = KCP_SyncExport().run(db_a, mark_a, str(Path(td) / "a1.tar"))[2]
+            cs_b = KCP_SyncExport().run(db_b, mark_b, str(Path(td) / "b1.tar"))[2]
+            to_b = json.loads(KCP_SyncImport().run(db_b, cs_a)[1])
+            to_a = json.loads(KCP_SyncImport().run(db_a, cs_b)[1])
+            if to_b["stale"] != 1 or to_b["applied"] or to_a["conflict"]:
+                return False, f"unexpected LWW outcome: a->b {to_b} b->a {to_a}"
+            state = {}
+            for name, db, root in (("a", db_a, root_a), ("b", db_b, root_b)):
+                conn = connect(Path(db))
+                try:
+                    scan = scan_project(conn, root, verify_hashes=True)
+                    stack = conn.execute("SELECT name FROM stacks WHERE id = 'stack1'").fetchone()["name"]
+                    items = conn.execute("SELECT idx, image_path FROM keyframe_set_items WHERE set_id = ? ORDER BY idx", (set_id,)).fetchall()
+                finally:
+                    conn.close()
+                if scan["counts"]["dangling"] or scan["counts"]["corrupt"]:
+                    return False, f"{name}: project not clean after sync: {scan['counts']} {scan['dangling'][:3]}"
+                image0 = hashlib.sha256((root / items[0]["image_path"]).read_bytes()).hexdigest()
+                state[name] = (stack, [r["idx"] for r in items], image0)
+            if state["a"] != state["b"] or state["a"][:2] != ("b-edit", [0, 1]):
+                return False, f"hosts did not converge: {state}"
+            if next(root_a.rglob("*.sync.tmp"), None) is not None:
+                return False, "staged sync files left behind"
+
+            # B re-renders an item, then A archives the set: moving bytes to the cold tier is not an edit, so B's render wins.
+            KCP_KeyframeSetItemSaveImage().run(db_b, set_id, 1, Image.new("RGB", (96, 64), (5, 250, 5)), "png", True)
+            time.sleep(0.02)
+            conn = connect(Path(db_a))
+            try:
+                logged = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+                archived = archive_cold_sets(conn, root_a, 0, set_id=set_id, dry_run=False)
+                relogged = conn.execute("SELECT COUNT(*) FROM changes WHERE seq > ?", (logged,)).fetchone()[0]
+            finally:
+                conn.close()
+            if not archived["items"] or relogged:
+                return False, f"archiving logged sync changes: items={archived['items']} changes={relogged}"
+            json.loads(KCP_SyncImport().run(db_b, KCP_SyncExport().run(db_a, 0, str(Path(td) / "a2.tar"))[2])[1])
+            json.loads(KCP_SyncImport().run(db_a, KCP_SyncExport().run(db_b, 0, str(Path(td) / "b2.tar"))[2])[1])
+            renders = {}
+            for name, db, root in (("a", db_a, root_a), ("b", db_b, root_b)):
+                conn = connect(Path(db))
+                try:
+                    ref = conn.execute("SELECT image_path FROM keyframe_set_items WHERE set_id = ? AND idx = 1", (set_id,)).fetchone()["image_path"]
+                finally:
+                    conn.close()
+                renders[name] = image_io.comfy_image_to_pil(image_io.load_image_as_comfy(root / ref)).getpixel((0, 0))
+            if renders != {"a": (5, 250, 5), "b": (5, 250, 5)}:
+                return False, f"re-render lost to a storage move: {renders}"
+        return True, "project sync ok"
+    except Exception as e:
+        return False, str(e)
+
+
+def smoke_claim_next_item() -> tuple[bool, str]:
+    """Smoke: KCP_ClaimNextItem leases distinct items, and leases expire, heartbeat, release and finish on save."""
+    try:
+        import time
+
+        from kcp.db.render_jobs import claim_next_item, heartbeat, queue_status, release_job
+        from kcp.db.repo import add_keyframe_set_item, connect, create_keyframe_set, update_set_item_media
+        from kcp.nodes.keyframe_set_claim import KCP_ClaimNextItem
+        from kcp.nodes.project_init import KCP_ProjectInit
+
+        with tempfile.TemporaryDirectory() as td:
+            db_path, _, _ = KCP_ProjectInit().run(str(Path(td) / "kcp"), "kcp.sqlite", True)
+            conn = connect(Path(db_path))
+            try:
+                conn.execute("INSERT INTO stacks (id,name,created_at,updated_at) VALUES (?,?,?,?)", ("stack1", "stack1", 1, 1))
+                conn.commit()
+                set_id = create_keyframe_set(conn, {"stack_id": "stack1", "variant_policy_id": "seed_sweep_12_v1", "variant_policy_json": {}, "base_seed": 0, "width": 64, "height": 64})
+                for i in range(4):
+                    add_keyframe_set_item(conn, {"set_id": set_id, "idx": i, "seed": 10 + i, "positive_prompt": f"p{i}", "negative_prompt": "n", "gen_params_json": {}})
+                # Already rendered, or retired by retention: never queued.
+                update_set_item_media(conn, set_id, 3, "sets/x/3.webp", "sets/x/3.webp")
+                add_keyframe_set_item(conn, {"set_id": set_id, "idx": 4, "seed": 14, "positive_prompt": "p4", "negative_prompt": "n", "gen_params_json": {}})
+                conn.execute(
+                    "UPDATE keyframe_set_items SET image_path = '', thumb_path = 'sets/x/4_thumb.webp', media_retention = 'deleted', media_retention_at = 1 "
+                    "WHERE set_id = ? AND idx = 4",
+                    (set_id,),
+                )
+                conn.commit()
+            finally:
+                conn.close()
+
+            first = KCP_ClaimNextItem().run(db_path, set_id, 60, worker_id="w1")
+            second = KCP_ClaimNextItem().run(db_path, set_id, 60, worker_id="w2")
+            if (first[1], first[2], first[3]) != (0, 10, "p0") or second[1] != 1 or first[6] == second[6]:
+                return False, f"unexpected claims: {first[:7]} {second[:7]}"
+
+            conn = connect(Path(db_path))
+            try:
+                update_set_item_media(conn, set_id, 0, "sets/x/0.webp", "sets/x/0.webp")
+                if not heartbeat(conn, json.loads(second[7])["item_id"], second[6], 60_000) or heartbeat(conn, json.loads(first[7])["item_id"], first[6]):
+                    return False, "heartbeat accepted for a finished job or refused for a held one"
+                if not release_job(conn, json.loads(second[7])["item_id"], second[6], "oom"):
+                    return False, "release refused"
+                # A lease that runs out is claimed again; once out of attempts it fails instead.
+                short = claim_next_item(conn, set_id, "w3", lease_ms=1)
+                time.sleep(0.01)
+                again = claim_next_item(conn, set_id, "w4", lease_ms=1, max_attempts=3)
+                time.sleep(0.01)
+                third = claim_next_item(conn, set_id, "w5", lease_ms=60_000, max_attempts=3)
+                status = queue_status(conn, set_id)
+            finally:
+                conn.close()
+            if (short["idx"], again["idx"], again["attempts"], again["worker"]) != (1, 1, 3, "w4"):
+                return False, f"expired lease not reclaimed: {short} {again}"
+            if third is None or third["idx"] != 2 or status != {"pending": 0, "leased": 1, "done": 1, "failed": 1, "expired": 0}:
+                return False, f"unexpected queue after expiry: {third} {status}"
+
+            empty = KCP_ClaimNextItem().run(db_path, set_id, 60, fail_if_empty=False)
+            if empty[1] != -1 or json.loads(empty[7])["claimed"]:
+                return False, f"empty queue returned a claim: {empty}"
+            try:
+                KCP_ClaimNextItem().run(db_path, set_id, 60)
+                return False, "empty queue did not fail"
+            except RuntimeError as e:
+                if not str(e).startswith("kcp_claim_queue_empty:"):
+                    return False, f"unexpected empty-queue error: {e}"
+        return True, "claim next item ok"
+    except Exception as e:
+        return False, str(e)
+
+
 def main() -> int:
     parser = argparse.ArgumentParser()
     parser.add_argument("--fast", action="store_true")
@@ -2375,6 +4790,35 @@ def main() -> int:
             ("smoke_forge_asset_roundtrip_character", smoke_forge_asset_roundtrip_character),
             ("smoke_forge_asset_roundtrip_environment_meta", smoke_forge_asset_roundtrip_environment_meta),
             ("smoke_readme_mentions_winner_loop_wiring", smoke_readme_mentions_winner_loop_wiring),
+            ("smoke_blob_store_dedupe_refcount", smoke_blob_store_dedupe_refcount),
+            ("smoke_blob_store_convert_project", smoke_blob_store_convert_project),
+            ("smoke_blob_store_gc", smoke_blob_store_gc),
+            ("smoke_image_cache_lru", smoke_image_cache_lru),
+            ("smoke_set_load_batch_load_modes", smoke_set_load_batch_load_modes),
+            ("smoke_set_load_stacked_batch", smoke_set_load_stacked_batch),
+            ("smoke_set_load_batch_paging", smoke_set_load_batch_paging),
+            ("smoke_pil_to_comfy_stdlib_fallback", smoke_pil_to_comfy_stdlib_fallback),
+            ("smoke_comfy_to_pil_nested_fast_path", smoke_comfy_to_pil_nested_fast_path),
+            ("smoke_comfy_to_pil_paths_match", smoke_comfy_to_pil_paths_match),
+            ("smoke_encode_profiles", smoke_encode_profiles),
+            ("smoke_preview_pyramid", smoke_preview_pyramid),
+            ("smoke_probe_integrity_scan", smoke_probe_integrity_scan),
+            ("smoke_durable_batch_writes", smoke_durable_batch_writes),
+            ("smoke_sidecar_cache", smoke_sidecar_cache),
+            ("smoke_contact_sheet", smoke_contact_sheet),
+            ("smoke_set_dedupe", smoke_set_dedupe),
+            ("smoke_sets_layout", smoke_sets_layout),
+            ("smoke_set_packs", smoke_set_packs),
+            ("smoke_set_packs_concurrent", smoke_set_packs_concurrent),
+            ("smoke_integrity_scan", smoke_integrity_scan),
+            ("smoke_set_retention", smoke_set_retention),
+            ("smoke_set_tiering", smoke_set_tiering),
+            ("smoke_render_pack_status_multi_set", smoke_render_pack_status_multi_set),
+            ("smoke_project_dashboard", smoke_project_dashboard),
+            ("smoke_project_transfer", smoke_project_transfer),
+            ("smoke_set_export", smoke_set_export),
+            ("smoke_project_sync", smoke_project_sync),
+            ("smoke_claim_next_item", smoke_claim_next_item),
         ]:
             ok, msg = fn()
             oracles.append(name)